@@ -0,0 +1,5 @@
+"""
+Benchmarks, load tests and local stand-ins for external services.
+
+Run the modules from the repository root, e.g. ``python -m bench.load_test``.
+"""
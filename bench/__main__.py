@@ -0,0 +1,52 @@
+"""
+Entry point for the benchmark suites and tools: ``python -m bench <name> [options]``.
+"""
+import importlib
+import sys
+
+
+COMMANDS = {
+    "parsing": ("bench.bench_parsing", "Parsing and validation micro-benchmarks"),
+    "batch-generation": ("bench.bench_batch_generation",
+                         "Several quizzes from one LLM call vs one call per quiz: tokens, cost, latency"),
+    "repair": ("bench.bench_repair", "Validation-with-repair cost vs all-or-nothing validation"),
+    "telemetry": ("bench.bench_telemetry", "Span overhead with telemetry disabled and enabled"),
+    "load": ("bench.load_test", "Concurrent-session load test against the mock API"),
+    "mock-server": ("bench.mock_poe_server", "Local mock of the Poe chat completions API"),
+    "render": ("bench.bench_render", "Per-click server cost of the quiz loop on a real Streamlit server"),
+    "question-model": ("bench.bench_question_model", "Memory and time of the compact vs dict question model"),
+    "quiz-session": ("bench.bench_quiz_session", "QuizSession engine 10k-question benchmark"),
+    "quiz-store": ("bench.bench_quiz_store", "Quiz progress checkpoint/restore per-answer cost"),
+    "source-store": ("bench.bench_source_store", "SQLite source store passage search vs scanning every source"),
+    "retrieval": ("bench.bench_retrieval", "BM25 topic retrieval: 10 MB index build and query times"),
+    "near-duplicates": ("bench.bench_near_duplicates", "Near-duplicate question filter cost per 100 questions"),
+    "question-bank": ("bench.bench_question_bank", "Question bank add and assemble cost"),
+    "review": ("bench.bench_review", "Spaced-repetition scheduler: due questions from a heap vs a full scan"),
+    "quiz-pack": ("bench.bench_quiz_pack", "Quiz packs: opening a pack vs pasted JSON, streaming memory"),
+    "memory": ("bench.bench_memory", "Session memory accounting: per-key sizes, summary over 1000 sessions"),
+    "api": ("bench.bench_api", "Quiz HTTP API request latency and job throughput"),
+    "local-storage": ("bench.bench_local_storage", "Bytes the Text Collector writes to browser localStorage"),
+    "cloud-cache": ("bench.bench_cloud_cache", "Per-user cloud read cache vs whole-tree reads"),
+    "startup": ("bench.bench_startup", "Cold-start import cost and per-rerun time of each page"),
+}
+
+
+def usage():
+    lines = ["usage: python -m bench <command> [options]", "", "commands:"]
+    width = max(map(len, COMMANDS)) + 2
+    lines += [f"  {name:<{width}}{help_text}" for name, (_, help_text) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help") or argv[0] not in COMMANDS:
+        print(usage())
+        return 0 if argv and argv[0] in ("-h", "--help") else 2
+    module = importlib.import_module(COMMANDS[argv[0]][0])
+    module.main(argv[1:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
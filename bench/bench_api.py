@@ -0,0 +1,120 @@
+"""
+Local test client for the quiz HTTP API (quiz_api): starts the server
+in-process on a free port with the stub backend, then measures request
+latency over keep-alive and new connections, and job throughput with many
+clients submitting at once.
+
+What each endpoint answers, including the 404/400/413/429/503 cases, is
+covered by tests/test_quiz_api.py.
+
+    python -m bench api
+    python -m bench api --save-baseline
+"""
+import http.client
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.harness import run_suite
+from llm_backends import StubBackend
+from quiz_api import create_server
+
+
+MATERIAL = ("Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs mostly blue and "
+            "red light. The Calvin cycle fixes carbon dioxide into sugars. Oxygen is released as a by-product. ") * 20
+JOBS = 200
+CLIENTS = 20
+
+
+class Client:
+    """A keep-alive JSON client on one connection."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+
+    def request(self, method, path, body=None, headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+            headers = {"Content-Type": "application/json", **(headers or {})}
+        self.conn.request(method, path, body=body, headers=headers or {})
+        response = self.conn.getresponse()
+        data = response.read()
+        is_json = response.getheader("Content-Type", "").startswith("application/json")
+        return response.status, json.loads(data) if is_json else data
+
+    def wait(self, job_id, interval=0.005):
+        while True:
+            status, job = self.request("GET", f"/v1/jobs/{job_id}")
+            assert status == 200, job
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(interval)
+
+    def stream(self, job_id):
+        """(event name, payload) pairs of a job's event stream."""
+        self.conn.request("GET", f"/v1/jobs/{job_id}/stream")
+        response = self.conn.getresponse()
+        assert response.status == 200 and response.getheader("Transfer-Encoding") == "chunked"
+        events = []
+        for block in response.read().decode("utf-8").split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if "event" in lines:
+                events.append((lines["event"], json.loads(lines["data"])))
+        return events
+
+    def close(self):
+        self.conn.close()
+
+
+def start_server(latency=0.0, **kwargs):
+    server = create_server(StubBackend(latency=latency), port=0, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def build_cases():
+    server, port = start_server(workers=8, max_pending=JOBS)
+    keep_alive = Client(port)
+    status, job = keep_alive.request("POST", "/v1/jobs", {"text": MATERIAL, "num_questions": 5})
+    quiz_id = keep_alive.wait(job["id"])["quiz_id"]
+
+    def new_connection():
+        client = Client(port)
+        client.request("GET", "/healthz")
+        client.close()
+
+    def job_round_trip():
+        status, job = keep_alive.request("POST", "/v1/jobs", {"text": MATERIAL, "num_questions": 5})
+        keep_alive.wait(job["id"], interval=0)
+
+    def concurrent_jobs():
+        def one_client(n):
+            client = Client(port)
+            for _ in range(n):
+                status, job = client.request("POST", "/v1/jobs", {"text": MATERIAL, "num_questions": 5})
+                assert status == 202, job
+                client.wait(job["id"])
+            client.close()
+        with ThreadPoolExecutor(CLIENTS) as pool:
+            list(pool.map(one_client, [JOBS // CLIENTS] * CLIENTS))
+
+    return {
+        "healthz/keep_alive": lambda: keep_alive.request("GET", "/healthz"),
+        "healthz/new_connection": new_connection,
+        "quiz/fetch": lambda: keep_alive.request("GET", f"/v1/quizzes/{quiz_id}"),
+        "extract/md_2k_chars": lambda: keep_alive.request("POST", "/v1/extract?filename=a.md",
+                                                          MATERIAL.encode("utf-8")),
+        "job/submit_and_poll": job_round_trip,
+        f"jobs/{JOBS}_from_{CLIENTS}_clients": concurrent_jobs,
+    }
+
+
+def main(argv=None):
+    socket.setdefaulttimeout(10)
+    run_suite("api", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
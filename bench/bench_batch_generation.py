@@ -0,0 +1,119 @@
+"""
+Batched generation (quiz_core.run_batch_generation): easy/standard/hard
+quizzes, or several variants, from one LLM call, against one call per quiz
+for the same questions.
+
+How a batched response is split into sets is covered by
+tests/test_batch_generation.py.
+
+Tokens, illustrative cost and latency are compared on a backend whose
+latency follows a simple model of a hosted LLM (fixed overhead, prefill per
+input token, decode per output token; real values scaled down 100x):
+separate calls one after another (what starting each quiz does), separate
+calls at once, and one batched call.
+
+    python -m bench batch-generation
+    python -m bench batch-generation --save-baseline
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.harness import format_seconds, run_suite
+from llm_backends import StubBackend
+from model_router import estimate_tokens
+from quiz_core import difficulty_sets, generate_batch_prompt, run_batch_generation, run_generation, variant_sets
+
+
+# Latency model, scaled down 100x from a hosted model (~0.4 s overhead, ~10k
+# input tokens/s prefill, ~70 output tokens/s decode).
+OVERHEAD_S = 0.004
+PREFILL_S = 1e-6
+DECODE_S = 1.5e-4
+# Illustrative prices per million tokens; only the ratio between the strategies matters.
+INPUT_PRICE = 1.25
+OUTPUT_PRICE = 10.0
+
+
+class TimedBackend(StubBackend):
+    """The stub backend, sleeping as the latency model says and counting tokens."""
+
+    def __init__(self):
+        super().__init__()
+        self.input_tokens = self.output_tokens = self.calls = 0
+
+    def generate_questions(self, prompt, model="stub"):
+        response = super().generate_questions(prompt, model)
+        tokens_in, tokens_out = estimate_tokens(prompt), estimate_tokens(response)
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += tokens_in
+            self.output_tokens += tokens_out
+        time.sleep(OVERHEAD_S + tokens_in * PREFILL_S + tokens_out * DECODE_S)
+        return response
+
+
+def material(chars):
+    """Varied prose, so stub questions on different sentences are not near-duplicates."""
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "README.md"),
+              encoding="utf-8") as f:
+        text = f.read()
+    return (text * (chars // len(text) + 1))[:chars]
+
+
+def compare(chars, sets):
+    """Runs each strategy once on a TimedBackend; returns {strategy: (calls, input, output, seconds)}."""
+    text = material(chars)
+
+    def separate(backend):
+        for s in sets:
+            run_generation(backend, text, s.num_questions, "stub")
+
+    def concurrent(backend):
+        with ThreadPoolExecutor(len(sets)) as pool:
+            list(pool.map(lambda s: run_generation(backend, text, s.num_questions, "stub"), sets))
+
+    rows = {}
+    for name, strategy in (("separate, one after another", separate), ("separate, concurrent", concurrent),
+                           ("batched", lambda backend: run_batch_generation(backend, text, sets, "stub"))):
+        backend = TimedBackend()
+        started = time.perf_counter()
+        strategy(backend)
+        rows[name] = (backend.calls, backend.input_tokens, backend.output_tokens, time.perf_counter() - started)
+    return rows
+
+
+def print_comparison():
+    print(f"{'material / quizzes':<28}{'strategy':<30}{'calls':>6}{'in tok':>9}{'out tok':>9}"
+          f"{'cost':>9}{'latency':>12}")
+    for chars, label, sets in ((5_000, "5k chars / 3 tiers x 5", difficulty_sets(5)),
+                               (20_000, "20k chars / 3 tiers x 5", difficulty_sets(5)),
+                               (20_000, "20k chars / 2 variants x 10", variant_sets(10, 2))):
+        for strategy, (calls, tokens_in, tokens_out, seconds) in compare(chars, sets).items():
+            cost = (tokens_in * INPUT_PRICE + tokens_out * OUTPUT_PRICE) / 1e6
+            print(f"{label:<28}{strategy:<30}{calls:>6}{tokens_in:>9,}{tokens_out:>9,}"
+                  f"{'$%.4f' % cost:>9}{format_seconds(seconds):>12}")
+    print("(latency scaled down 100x; cost at illustrative per-token prices)\n")
+
+
+def build_cases():
+    text = material(20_000)
+    sets = difficulty_sets(5)
+    backend = StubBackend()
+    timed = TimedBackend()
+    return {
+        "prompt/batched_3x5/20k_chars": lambda: generate_batch_prompt(text, sets),
+        "generate/separate_3x5/20k_chars": lambda: [run_generation(backend, text, 5, "stub") for _ in sets],
+        "generate/batched_3x5/20k_chars": lambda: run_batch_generation(backend, text, sets, "stub"),
+        "modelled/separate_3x5/20k_chars": lambda: [run_generation(timed, text, 5, "stub") for _ in sets],
+        "modelled/batched_3x5/20k_chars": lambda: run_batch_generation(timed, text, sets, "stub"),
+    }
+
+
+def main(argv=None):
+    print_comparison()
+    run_suite("batch_generation", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
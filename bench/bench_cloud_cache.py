@@ -0,0 +1,204 @@
+"""
+Cloud source reads and writes under a simulated multi-user workload, against
+an in-memory stand-in for the Firebase Realtime Database.
+
+Compares the previous policy (the whole ``users`` tree read through
+st.cache_data(ttl=60) and written back whole) with cloud_store's per-user
+node access and bounded write-through cache. For each it reports the cache
+hit ratio, memory held by the cache, bytes moved to and from Firebase, and
+stale reads: reads that did not return what the same process had just
+written. The cache's own behaviour is covered by tests/test_cloud_store.py.
+
+    python -m bench cloud-cache
+    python -m bench cloud-cache --users 300 --ops 5000 --max-mb 2
+"""
+import argparse
+import json
+import random
+
+from cloud_store import CloudSourceStore, UserSourceCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeFirebase:
+    """The subset of pyrebase's database API the app uses, counting JSON bytes moved."""
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.requests = 0
+
+    def child(self, *path):
+        return _Ref(self, list(path))
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def child(self, name):
+        return _Ref(self.db, self.path + [name])
+
+    def _node(self, create=False):
+        node = self.db.data
+        for name in self.path:
+            if name not in node:
+                if not create:
+                    return None
+                node[name] = {}
+            node = node[name]
+        return node
+
+    def get(self):
+        self.db.requests += 1
+        value = self._node()
+        value = json.loads(json.dumps(value)) if value else None
+        self.db.bytes_read += len(json.dumps(value))
+        return _Result(value)
+
+    def update(self, data):
+        self.db.requests += 1
+        self.db.bytes_written += len(json.dumps(data))
+        node = self._node(create=True)
+        for key, value in data.items():
+            if value is None:
+                node.pop(key, None)
+            else:
+                node[key] = value
+
+    def remove(self):
+        self.db.requests += 1
+        parent = _Ref(self.db, self.path[:-1])._node()
+        if parent is not None:
+            parent.pop(self.path[-1], None)
+
+
+class _Result:
+    def __init__(self, value):
+        self._value = value
+
+    def val(self):
+        return self._value
+
+
+class WholeTreePolicy:
+    """The previous code path: one cached copy of every user's data, written back whole."""
+
+    def __init__(self, db, ttl, clock):
+        self.db, self.ttl, self.clock = db, ttl, clock
+        self.cached = None
+        self.loaded_at = 0.0
+        self.hits = self.misses = 0
+
+    def _tree(self):
+        if self.cached is not None and self.clock() - self.loaded_at <= self.ttl:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.cached = json.dumps(self.db.child("users").get().val() or {})
+            self.loaded_at = self.clock()
+        return json.loads(self.cached)  # st.cache_data returns a fresh copy per call
+
+    def get(self, user_id):
+        return self._tree().get(user_id) or {}
+
+    def save(self, user_id, sources):
+        tree = self._tree()
+        tree.setdefault(user_id, {}).update(sources)
+        self.db.child("users").update(tree)
+
+    def delete(self, user_id, names):
+        tree = self._tree()
+        user = tree.get(user_id) or {}
+        for name in names:
+            user.pop(name, None)
+        tree[user_id] = user
+        self.db.child("users").update(tree)
+
+    def cache_bytes(self):
+        return len(self.cached or "")
+
+    def hit_ratio(self):
+        return self.hits / max(1, self.hits + self.misses)
+
+
+def make_users(num_users, docs_per_user, doc_chars, seed):
+    rng = random.Random(seed)
+    return {f"user{u:04d}": {f"doc{d:03d}_txt": "x" * rng.randint(doc_chars // 2, doc_chars)
+                             for d in range(rng.randint(1, docs_per_user))}
+            for u in range(num_users)}
+
+
+def run_workload(policy, users, truth, ops, seed, clock, seconds_per_op=0.05):
+    """Zipf-like user popularity; 80% reads, 15% saves, 5% deletes."""
+    rng = random.Random(seed)
+    user_ids = sorted(users)
+    weights = [1 / (rank + 1) for rank in range(len(user_ids))]
+    stale = 0
+    for i in range(ops):
+        clock.now += seconds_per_op
+        user_id = rng.choices(user_ids, weights)[0]
+        roll = rng.random()
+        if roll < 0.8:
+            if policy.get(user_id) != truth.get(user_id, {}):
+                stale += 1
+        elif roll < 0.95:
+            name = f"new{i}_txt"
+            text = "y" * rng.randint(500, 5000)
+            policy.save(user_id, {name: text})
+            truth.setdefault(user_id, {})[name] = text
+        else:
+            names = sorted(truth.get(user_id, {}))[:1]
+            policy.delete(user_id, names)
+            for name in names:
+                truth[user_id].pop(name, None)
+    return stale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--docs", type=int, default=8, help="Maximum documents per user.")
+    parser.add_argument("--doc-chars", type=int, default=10_000, help="Maximum characters per document.")
+    parser.add_argument("--ops", type=int, default=3_000)
+    parser.add_argument("--ttl", type=float, default=60.0)
+    parser.add_argument("--max-mb", type=float, default=16.0, help="Bound of the per-user cache.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    users = make_users(args.users, args.docs, args.doc_chars, args.seed)
+    tree_bytes = len(json.dumps(users))
+    print(f"{args.users} users, {tree_bytes / 1e6:.1f} MB of sources, {args.ops} operations\n")
+    print(f"{'policy':<22}{'hit ratio':>10}{'cache MB':>10}{'read MB':>10}{'written MB':>12}"
+          f"{'requests':>10}{'stale reads':>13}")
+
+    for name in ("whole-tree ttl", "per-user write-through"):
+        clock = FakeClock()
+        db = FakeFirebase({"users": json.loads(json.dumps(users))})
+        truth = json.loads(json.dumps(users))
+        if name == "whole-tree ttl":
+            policy = WholeTreePolicy(db, args.ttl, clock)
+        else:
+            cache = UserSourceCache(max_bytes=int(args.max_mb * 1024 * 1024), ttl=args.ttl, clock=clock)
+            policy = CloudSourceStore(db, cache)
+        stale = run_workload(policy, users, truth, args.ops, args.seed, clock)
+        if name == "whole-tree ttl":
+            hit_ratio, cache_bytes = policy.hit_ratio(), policy.cache_bytes()
+        else:
+            stats = policy.cache.stats()
+            hit_ratio, cache_bytes = stats["hit_ratio"], stats["bytes"]
+        print(f"{name:<22}{hit_ratio:>10.1%}{cache_bytes / 1e6:>10.1f}{db.bytes_read / 1e6:>10.1f}"
+              f"{db.bytes_written / 1e6:>12.1f}{db.requests:>10}{stale:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+What the Text Collector writes to the browser's localStorage, measured on a
+real ``streamlit run`` server through bench.st_client, whose emulated
+localStorage component applies every write.
+
+The browser starts with N sources in the pre-manifest layout (one
+``all_texts`` JSON value). One session opens the collector, then a second
+session in the same browser adds a short note, deletes one source and
+clears everything; a third session checks what survived. For each step it
+reports the bytes written to localStorage, the bytes the server sent to the
+browser and whether the result was still there after reopening the app.
+
+    python -m bench local-storage
+    python -m bench local-storage --docs 20 --doc-chars 50000
+    python -m bench local-storage --app /path/to/other/checkout/streamlit_app.py
+"""
+import argparse
+import json
+
+from bench.st_client import StreamlitClient, StreamlitServer
+
+
+def source_names(client):
+    return sorted(e.label.split(" · ")[0] for e in client.find("checkbox"))
+
+
+def open_collector(base_url, storage):
+    client = StreamlitClient(base_url, local_storage=storage)
+    client.run()
+    client.click(client.find("button", label="Extract Text")[0])
+    return client
+
+
+def measure(client, action):
+    written = client.storage_bytes_written
+    result = action()
+    return client.storage_bytes_written - written, result.bytes_received
+
+
+def run(app_path, num_docs, doc_chars):
+    docs = {f"doc{i:03d}": f"text {i} " * (doc_chars // 7) for i in range(num_docs)}
+    storage = {"all_texts": json.dumps(docs)}
+    rows = []
+    with StreamlitServer(app_path=app_path, env={"LLM_BACKEND": "stub"}) as server:
+        client = open_collector(server.base_url, storage)
+        loaded = source_names(client) == sorted(docs)
+        rows.append(("open (migrate)", client.storage_bytes_written, None, loaded))
+        client.close()
+
+        client = open_collector(server.base_url, storage)
+        client.set_value(client.find("text_input", label="Source Name")[0], "note")
+        client.set_value(client.find("text_area", label="Paste Text")[0], "a short note")
+        written, received = measure(client, lambda: client.click(client.find("button", label="Save Pasted Text")[0]))
+        rows.append(("add short note", written, received, None))
+
+        victim = client.find("checkbox")[0]
+        client.set_value(victim, True)
+        client.run(fragment_id=victim.fragment_id)
+        written, received = measure(client, lambda: client.click(client.find("button", key="tc_bulk_delete_local")[0]))
+        rows.append(("delete one", written, received, None))
+        client.close()
+
+        client = open_collector(server.base_url, storage)
+        expected = sorted(set(docs) - {victim.label.split(" · ")[0]} | {"note"})
+        rows[1] = rows[1][:3] + ("note" in source_names(client),)
+        rows[2] = rows[2][:3] + (source_names(client) == expected,)
+        client.click(client.find("button", label="Clear All Local Data")[0])
+        written, received = measure(client, lambda: client.click(client.find("button", key="confirm_local_yes")[0]))
+        client.close()
+
+        client = open_collector(server.base_url, storage)
+        rows.append(("clear all", written, received, source_names(client) == []))
+        client.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default=None, help="Path of the streamlit_app.py to run.")
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--doc-chars", type=int, default=30_000)
+    args = parser.parse_args(argv)
+
+    rows = run(args.app, args.docs, args.doc_chars)
+    print(f"{args.docs} sources of ~{args.doc_chars:,} chars\n")
+    print(f"{'step':<18}{'written to storage':>20}{'sent to browser':>18}{'after reopen':>14}")
+    for step, written, received, survived in rows:
+        sent = "" if received is None else f"{received / 1024:.1f} KB"
+        check = "" if survived is None else ("ok" if survived else "LOST/STALE")
+        print(f"{step:<18}{written / 1024:>17.1f} KB{sent:>18}{check:>14}")
+
+
+if __name__ == "__main__":
+    main()
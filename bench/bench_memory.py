@@ -0,0 +1,91 @@
+"""
+Session memory accounting (memory_accounting): measuring a session's state key
+by key, the process-wide summary over many sessions, and where a heavy
+session's memory goes.
+
+What deep sizes follow, budgets, throttling, expiry, allocation diffs and
+the reporter are covered by tests/test_memory_accounting.py.
+
+    python -m bench memory
+    python -m bench memory --save-baseline
+"""
+import base64
+import os
+import random
+import time
+
+from bench.bench_question_bank import make_question
+from bench.bench_source_store import make_vocabulary
+from bench.harness import format_seconds, run_suite
+from blob_store import BlobStore
+from llm_backends import StubBackend
+from memory_accounting import AllocationTracker, MemoryAccountant, state_sizes
+from quiz_session import QuizSession
+from retrieval import BM25Index
+
+
+def session_state(sources, doc_chars, questions, audio_bytes, seed=0):
+    """A session state shaped like the app's after collecting sources and taking a quiz."""
+    rng = random.Random(seed)
+    vocab = make_vocabulary(2000, seed)
+    all_texts = {f"doc_{i}.pdf": " ".join(rng.choices(vocab, k=doc_chars // 7))[:doc_chars] for i in range(sources)}
+    blobs = BlobStore()
+    handle = blobs.put("\n\n".join(all_texts.values()))
+    blobs.pin(handle)
+    quiz = QuizSession.from_dicts([make_question(rng, vocab) for _ in range(questions)], rng=rng)
+    clip = "data:audio/mpeg;base64," + base64.b64encode(rng.randbytes(audio_bytes)).decode() if audio_bytes else ""
+    index = BM25Index()
+    index.sync(all_texts)
+    return {
+        'poe_client': StubBackend(), 'page': 'main', 'quiz_started': True, 'quiz': quiz,
+        'all_texts': all_texts, 'processed_files': set(all_texts), 'tc_persisted': dict(all_texts),
+        'blob_store': blobs, 'material_handle': handle, 'tc_topic_index': index,
+        'audio_urls': {'questions': {q.id: clip for q in quiz.questions} if clip else {},
+                       'answers': {q.id: clip for q in quiz.questions} if clip else {}},
+    }
+
+
+def print_report():
+    """Where a heavy session's memory goes, and what a tracemalloc diff costs."""
+    tracker = AllocationTracker()
+    tracker.start()
+    tracker.diff()
+    state = session_state(sources=20, doc_chars=30_000, questions=100, audio_bytes=30_000)
+    started = time.perf_counter()
+    growth = tracker.diff()
+    elapsed = time.perf_counter() - started
+    tracker.stop()
+    accountant = MemoryAccountant(exclude=('poe_client',))
+    memory = accountant.measure("heavy", state)
+    print(f"A session with 20 sources of 30k chars and a 100-question audio quiz: "
+          f"{memory.total / 1e6:.1f} MB of state")
+    for key, size in memory.top(6):
+        print(f"  {key:<18}{size / 1e6:>8.2f} MB")
+    location, size_diff = growth[0][:2]
+    print(f"Top allocation growth while building it: {size_diff / 1e6:.1f} MB at {os.path.relpath(location)}")
+    print(f"(that tracemalloc diff took {format_seconds(elapsed)}; tracing is for debugging)\n")
+
+
+def build_cases():
+    typical = session_state(sources=3, doc_chars=5_000, questions=20, audio_bytes=0)
+    heavy = session_state(sources=20, doc_chars=30_000, questions=100, audio_bytes=30_000)
+    throttled = MemoryAccountant(exclude=('poe_client',))
+    throttled.measure("s", heavy)
+    many = MemoryAccountant(ttl=1e9, min_interval=0)
+    for i in range(1000):
+        many.measure(f"s{i}", {'quiz': None, 'all_texts': {"a": "x" * i}, 'audio_urls': {}})
+    return {
+        "measure/typical_session": lambda: state_sizes(typical, exclude=('poe_client',)),
+        "measure/heavy_session": lambda: state_sizes(heavy, exclude=('poe_client',)),
+        "measure/heavy_session/throttled": lambda: throttled.measure("s", heavy),
+        "summary/1000_sessions": many.summary,
+    }
+
+
+def main(argv=None):
+    print_report()
+    run_suite("memory", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
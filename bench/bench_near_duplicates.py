@@ -0,0 +1,56 @@
+"""
+Near-duplicate question filtering (near_duplicates): the cost of filtering a
+parsed batch of generated questions, alone and against earlier generations.
+
+Which paraphrases are caught, that the filter's indexed Jaccard equals a
+pairwise computation, and the repeats run_generation drops are covered by
+tests/test_near_duplicates.py.
+
+    python -m bench near-duplicates
+    python -m bench near-duplicates --save-baseline
+"""
+import random
+
+from bench.bench_question_bank import make_question
+from bench.bench_source_store import make_vocabulary
+from bench.harness import run_suite
+from near_duplicates import NearDuplicateFilter, drop_near_duplicates, shingles
+
+
+class ScriptedBackend:
+    """Returns the given responses in turn."""
+
+    name = "scripted"
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def generate_questions(self, prompt, model):
+        return self.responses.pop(0)
+
+
+def build_cases():
+    rng = random.Random(1)
+    vocab = make_vocabulary()
+    batch = [make_question(rng, vocab) for _ in range(100)]
+    paraphrased = [dict(x, question="Which " + x["question"]) for x in batch[:50]] + batch[50:]
+    earlier = NearDuplicateFilter()
+    for question in [make_question(rng, vocab) for _ in range(1000)] + paraphrased:
+        earlier.check(question)
+
+    return {
+        "shingles/1_question": lambda: shingles(batch[0]),
+        "filter/100_questions": lambda: drop_near_duplicates(batch),
+        "filter/100_questions_half_duplicates": lambda: drop_near_duplicates(batch + paraphrased[:50]),
+        "filter/1000_questions": lambda: drop_near_duplicates(batch * 10),
+        # Every question repeats an earlier generation, so the filter is unchanged between rounds.
+        "filter/100_repeats_vs_1100_earlier": lambda: drop_near_duplicates(batch, earlier),
+    }
+
+
+def main(argv=None):
+    run_suite("near_duplicates", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
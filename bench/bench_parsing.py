@@ -0,0 +1,98 @@
+"""
+Micro-benchmarks for the parsing and validation hot paths in quiz_core:
+strip_markdown_fences, parse_partial_json_array, validate_questions_array and
+is_valid_json_input (which also runs on every edit of the main text area).
+
+Corpora are synthetic and seeded, so runs are reproducible:
+fenced vs bare arrays from 10 KB to 2 MB, a response truncated at every
+offset, and prose full of brackets that is not JSON at all.
+
+    python -m bench parsing
+    python -m bench parsing --save-baseline
+"""
+import json
+import random
+
+from bench.harness import run_suite
+from quiz_core import is_valid_json_input, parse_partial_json_array, strip_markdown_fences, validate_questions_array
+
+
+SIZES = {"10KB": 10_000, "100KB": 100_000, "500KB": 500_000, "2MB": 2_000_000}
+WORDS = ("cell", "energy", "membrane", "enzyme", "photosynthesis", "glucose", "ATP", "nucleus",
+         "\"quoted\"", "back\\slash", "naïve", "日本語")
+
+
+def make_question(rng, i):
+    options = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))) for _ in range(4)]
+    return {
+        "question": f"Q{i}: " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))) + "?",
+        "options": options,
+        "correct": rng.randrange(4),
+        "hint": " ".join(rng.choice(WORDS) for _ in range(6)),
+        "explanation": " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 30))),
+    }
+
+
+def make_array_text(size_chars, seed=0):
+    """A pretty-printed question array of roughly ``size_chars`` characters."""
+    rng = random.Random(seed)
+    questions = []
+    total = 2
+    while total < size_chars:
+        q = make_question(rng, len(questions))
+        questions.append(q)
+        total += len(json.dumps(q, ensure_ascii=False, indent=1)) + 2
+    return json.dumps(questions, ensure_ascii=False, indent=1), questions
+
+
+def make_fenced(array_text):
+    return "Here are your questions:\n\n```json\n" + array_text + "\n```\n\nGood luck!"
+
+
+def make_adversarial_prose(size_chars, seed=0):
+    """Study notes with brackets and braces everywhere, but no JSON."""
+    rng = random.Random(seed)
+    fragments = ["see [1]", "f(x) = {a, b}", "array[i]", "{note}", "[citation needed]", "set {1, 2, 3}",
+                 "the cell", "membrane potential", "(see figure 2)", "dict[key]", "}{", "]["]
+    parts = []
+    total = 0
+    while total < size_chars:
+        fragment = rng.choice(fragments)
+        parts.append(fragment)
+        total += len(fragment) + 1
+    return " ".join(parts)
+
+
+def build_cases():
+    cases = {}
+    for label, size in SIZES.items():
+        array_text, questions = make_array_text(size, seed=size)
+        fenced = make_fenced(array_text)
+        prose = make_adversarial_prose(size, seed=size)
+        cases[f"strip_fences/fenced/{label}"] = lambda t=fenced: strip_markdown_fences(t)
+        cases[f"strip_fences/bare/{label}"] = lambda t=array_text: strip_markdown_fences(t)
+        cases[f"strip_fences/prose/{label}"] = lambda t=prose: strip_markdown_fences(t)
+        cases[f"parse_partial/complete/{label}"] = lambda t=array_text: parse_partial_json_array(t)
+        cases[f"parse_partial/truncated_90pct/{label}"] = (
+            lambda t=array_text[:int(len(array_text) * 0.9)]: parse_partial_json_array(t))
+        cases[f"validate/{label}"] = lambda q=questions: validate_questions_array(q)
+        cases[f"is_valid_json_input/fenced/{label}"] = lambda t=fenced: is_valid_json_input(t)
+        cases[f"is_valid_json_input/prose/{label}"] = lambda t=prose: is_valid_json_input(t)
+
+    # A typical ~4 KB response cut at every possible offset, as a model hitting its limit would.
+    small_text, _ = make_array_text(4_000, seed=1)
+    prefixes = [small_text[:i] for i in range(1, len(small_text) + 1)]
+
+    def truncated_every_offset():
+        for prefix in prefixes:
+            parse_partial_json_array(prefix)
+    cases["parse_partial/every_offset/4KB"] = truncated_every_offset
+    return cases
+
+
+def main(argv=None):
+    run_suite("parsing", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
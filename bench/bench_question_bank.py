@@ -0,0 +1,69 @@
+"""
+Persistent question bank (question_bank.QuestionBank) with 10,000 questions
+from 500 materials: adding a generated quiz with its duplicate checks,
+counting and assembling a quiz by material or topic, and recording answers.
+
+Deduplication, answer statistics and how they steer which questions a quiz
+gets are covered by tests/test_question_bank.py.
+
+    python -m bench question-bank
+    python -m bench question-bank --save-baseline
+"""
+import os
+import random
+import tempfile
+
+from bench.bench_source_store import make_vocabulary
+from bench.harness import run_suite
+from question_bank import QuestionBank, source_hash
+
+
+MATERIALS = 500
+PER_MATERIAL = 20
+TOPICS = 50
+
+
+def make_question(rng, vocab):
+    return {
+        "question": " ".join(rng.choices(vocab, k=rng.randint(8, 16))).capitalize() + "?",
+        "options": [" ".join(rng.choices(vocab, k=rng.randint(1, 4))) for _ in range(4)],
+        "correct": rng.randrange(4),
+        "hint": " ".join(rng.choices(vocab, k=6)),
+        "explanation": " ".join(rng.choices(vocab, k=15)),
+    }
+
+
+def build_cases(tmp):
+    rng = random.Random(1)
+    vocab = make_vocabulary()
+    bank = QuestionBank(os.path.join(tmp, "bank.sqlite3"))
+    sources = [source_hash(f"material {i}") for i in range(MATERIALS)]
+    for i, source in enumerate(sources):
+        bank.add([make_question(rng, vocab) for _ in range(PER_MATERIAL)], source, model="GPT-5-mini",
+                 topic=f"topic {i % TOPICS}")
+    ids = [q.id for q in bank.find(source=sources[0])]
+    total = bank.count()
+    counter = iter(range(10**9))
+
+    def add_quiz():
+        bank.add([make_question(rng, vocab) for _ in range(PER_MATERIAL)], source_hash(f"new {next(counter)}"))
+
+    return {
+        f"add/{PER_MATERIAL}_questions/{total // 1000}k_bank": add_quiz,
+        f"add/{PER_MATERIAL}_duplicates/{total // 1000}k_bank": lambda: bank.add(
+            [q.question for q in bank.find(source=sources[1])], sources[1]),
+        "count/by_material": lambda: bank.count(source=sources[2]),
+        f"assemble/10_by_material/{total // 1000}k_bank": lambda: bank.assemble(10, source=sources[3]),
+        f"assemble/10_by_topic/{total // 1000}k_bank": lambda: bank.assemble(10, topic="topic 7"),
+        "topics": bank.topics,
+        "record_answer": lambda: bank.record_answer(rng.choice(ids), rng.random() < 0.7),
+    }
+
+
+def main(argv=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        run_suite("question_bank", build_cases(tmp), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
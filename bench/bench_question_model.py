@@ -0,0 +1,138 @@
+"""
+Memory and time of the quiz question model: the compact model in quiz_model
+(questions stored once, attempts as index permutations) against the previous
+dict-based one, which deep-copied the question list on setup and retry and
+stored a shuffled (index, text) option list inside every question.
+
+Memory is the deep size of the quiz-related session state after one full
+attempt, and after a retry plus a second full attempt, for 20- and
+500-question quizzes. Timings go through the usual suite harness.
+
+    python -m bench question-model
+    python -m bench question-model --save-baseline
+"""
+import json
+import random
+
+from bench.bench_parsing import make_question
+from bench.harness import run_suite
+from memory_accounting import deep_sizeof
+from quiz_core import stable_hash
+from quiz_model import Question, new_attempt
+
+
+QUIZ_SIZES = (20, 500)
+
+
+def make_quiz(num_questions, seed=0):
+    rng = random.Random(seed)
+    return [make_question(rng, i) for i in range(num_questions)]
+
+
+# --- Previous model, reproduced from streamlit_app.py before the compact model ---
+
+def legacy_setup(state, questions_data):
+    questions = json.loads(json.dumps(questions_data))
+    for q in questions:
+        q['id'] = stable_hash(f"{q['question']}|{'|'.join(map(str, q['options']))}|{q['correct']}")
+    random.shuffle(questions)
+    state['original_questions'] = json.loads(json.dumps(questions))
+    state['questions'] = questions
+
+
+def legacy_show_all(state):
+    """What render_answer_options left behind once every question had been shown."""
+    for q in state['questions']:
+        if 'shuffled_options' not in q:
+            options = list(enumerate(q['options']))
+            random.shuffle(options)
+            q['shuffled_options'] = options
+
+
+def legacy_retry(state):
+    questions = json.loads(json.dumps(state['original_questions']))
+    random.shuffle(questions)
+    state['questions'] = questions
+    for q in state['questions']:
+        q.pop('shuffled_options', None)
+
+
+def legacy_redo_wrong(state, incorrect_ids):
+    state['questions'] = [q for q in state['original_questions'] if q['id'] in incorrect_ids]
+    for q in state['questions']:
+        q.pop('shuffled_options', None)
+
+
+# --- Compact model, as used by streamlit_app.py ---
+
+def compact_setup(state, questions_data):
+    questions = [Question.from_dict(q) for q in questions_data]
+    random.shuffle(questions)
+    state['quiz_questions'] = tuple(questions)
+    state['question_order'], state['option_orders'] = new_attempt(
+        state['quiz_questions'], range(len(questions)), shuffle_questions=False)
+
+
+def compact_retry(state):
+    state['question_order'], state['option_orders'] = new_attempt(
+        state['quiz_questions'], range(len(state['quiz_questions'])))
+
+
+def compact_redo_wrong(state, incorrect_ids):
+    positions = [pos for pos, q in enumerate(state['quiz_questions']) if q.id in incorrect_ids]
+    state['question_order'], state['option_orders'] = new_attempt(
+        state['quiz_questions'], positions, shuffle_questions=False)
+
+
+def memory_report():
+    rows = []
+    for size in QUIZ_SIZES:
+        data = make_quiz(size, seed=size)
+        legacy, compact = {}, {}
+        legacy_setup(legacy, data)
+        legacy_show_all(legacy)
+        compact_setup(compact, data)
+        first = (deep_sizeof(legacy), deep_sizeof(compact))
+        legacy_retry(legacy)
+        legacy_show_all(legacy)
+        compact_retry(compact)
+        second = (deep_sizeof(legacy), deep_sizeof(compact))
+        rows.append((size, first, second))
+
+    print(f"{'questions':>10}{'after 1st attempt':>26}{'after retry':>26}")
+    print(f"{'':>10}{'legacy':>13}{'compact':>13}{'legacy':>13}{'compact':>13}")
+    for size, first, second in rows:
+        print(f"{size:>10}" + "".join(f"{n / 1024:>10.1f} KB" for n in first + second))
+    print()
+    return rows
+
+
+def build_cases():
+    cases = {}
+    for size in QUIZ_SIZES:
+        data = make_quiz(size, seed=size)
+        legacy, compact = {}, {}
+        legacy_setup(legacy, data)
+        compact_setup(compact, data)
+        incorrect = {q['id'] for q in legacy['original_questions'][::3]}
+
+        def legacy_attempt(d=data):
+            state = {}
+            legacy_setup(state, d)
+            legacy_show_all(state)
+        cases[f"setup_and_show/legacy/{size}"] = legacy_attempt
+        cases[f"setup_and_show/compact/{size}"] = lambda d=data: compact_setup({}, d)
+        cases[f"retry/legacy/{size}"] = lambda s=legacy: (legacy_retry(s), legacy_show_all(s))
+        cases[f"retry/compact/{size}"] = lambda s=compact: compact_retry(s)
+        cases[f"redo_wrong/legacy/{size}"] = lambda s=legacy, i=incorrect: (legacy_redo_wrong(s, i), legacy_show_all(s))
+        cases[f"redo_wrong/compact/{size}"] = lambda s=compact, i=incorrect: compact_redo_wrong(s, i)
+    return cases
+
+
+def main(argv=None):
+    memory_report()
+    run_suite("question_model", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
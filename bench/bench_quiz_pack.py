@@ -0,0 +1,116 @@
+"""
+Quiz packs (quiz_pack): writing a quiz with its audio to a pack, and opening
+one, against starting the same quiz from pasted JSON.
+
+Also prints the memory peak of streaming a pack with 40 MB of audio into a
+sink. Round trips, refusal of corrupted and truncated packs, and streaming
+are covered by tests/test_quiz_pack.py.
+
+    python -m bench quiz-pack
+    python -m bench quiz-pack --save-baseline
+"""
+import base64
+import io
+import json
+import random
+import tracemalloc
+
+from bench.bench_question_bank import make_question
+from bench.bench_source_store import make_vocabulary
+from bench.harness import run_suite
+from quiz_core import strip_markdown_fences, validate_questions_array
+from quiz_pack import read_pack, write_pack
+from quiz_session import QuizSession
+
+
+class Trickle(io.RawIOBase):
+    """A non-seekable stream returning at most ``step`` bytes per read, like a socket."""
+
+    def __init__(self, data, step=7):
+        self.data, self.pos, self.step = data, 0, step
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self.data[self.pos:self.pos + min(len(buffer), self.step)]
+        buffer[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+
+def make_quiz(n, seed=0):
+    rng = random.Random(seed)
+    vocab = make_vocabulary(500, seed)
+    return QuizSession.from_dicts([make_question(rng, vocab) for _ in range(n)], rng=rng)
+
+
+def audio_for(quiz, size, seed=0):
+    rng = random.Random(seed)
+    urls = {"questions": {}, "answers": {}}
+    clips = {}
+    for q in quiz.questions:
+        for kind in ("question", "answer"):
+            data = rng.randbytes(size)
+            clips[(q.id, kind)] = data
+            urls[kind + "s"][q.id] = "data:audio/mpeg;base64," + base64.b64encode(data).decode()
+    urls["answers"][quiz.questions[0].id] = "https://example.com/not-packed.mp3"
+    del clips[(quiz.questions[0].id, "answer")]
+    return urls, clips
+
+
+def pack_bytes(quiz, audio_urls=None):
+    buffer = io.BytesIO()
+    write_pack(buffer, quiz, audio_urls, title="Bench")
+    return buffer.getvalue()
+
+
+def streaming_memory():
+    """The size of a pack with 40 MB of audio and the memory peak of opening it into a sink."""
+    quiz = make_quiz(20)
+    urls, _ = audio_for(quiz, 1_000_000)
+    data = pack_bytes(quiz, urls)
+
+    class Discard:
+        def write(self, chunk):
+            pass
+
+    stream = io.BufferedReader(Trickle(data, step=1 << 20))
+    tracemalloc.start()
+    read_pack(stream, audio_sink=lambda *_: Discard())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(data), peak
+
+
+def build_cases():
+    cases = {}
+    for n in (20, 500):
+        quiz = make_quiz(n)
+        pasted = json.dumps([q.to_dict() for q in quiz.questions], indent=1)
+        data = pack_bytes(quiz)
+
+        def from_json(text=pasted):
+            parsed = json.loads(strip_markdown_fences(text))
+            assert validate_questions_array(parsed)["valid"]
+            return QuizSession.from_dicts(parsed)
+
+        cases[f"open/{n}_questions/pasted_json"] = from_json
+        cases[f"open/{n}_questions/pack"] = lambda data=data: read_pack(io.BytesIO(data)).session()
+        cases[f"write/{n}_questions/pack"] = lambda quiz=quiz: pack_bytes(quiz)
+    quiz = make_quiz(20)
+    urls, _ = audio_for(quiz, 40_000)
+    data = pack_bytes(quiz, urls)
+    cases["open/20_questions_with_1.6MB_audio/pack"] = lambda: read_pack(io.BytesIO(data)).session()
+    cases["write/20_questions_with_1.6MB_audio/pack"] = lambda: pack_bytes(quiz, urls)
+    return cases
+
+
+def main(argv=None):
+    size, peak = streaming_memory()
+    print(f"A {size / 1e6:.0f} MB pack streamed with a {peak / 1e6:.2f} MB memory peak.\n")
+    run_suite("quiz_pack", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
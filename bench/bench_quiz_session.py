@@ -0,0 +1,85 @@
+"""
+QuizSession engine at 10k-question scale, next to the list/set scans the
+Streamlit layer used before it: a linear search per revision lookup, a
+recount of every answer for the summary and a full filter for redo-wrong.
+
+The engine's behaviour is covered by tests/test_quiz_session.py.
+
+    python -m bench quiz-session
+    python -m bench quiz-session --save-baseline
+"""
+import random
+
+from bench.bench_parsing import make_question
+from bench.harness import run_suite
+from quiz_model import Question
+from quiz_session import QuizSession
+
+
+SIZE = 10_000
+
+
+def make_questions(num_questions, seed=0):
+    rng = random.Random(seed)
+    return [Question.from_dict(make_question(rng, i)) for i in range(num_questions)]
+
+
+def play(quiz, rng, wrong_rate=0.5):
+    """Answers every question of the current attempt, missing about ``wrong_rate`` of them."""
+    for _ in range(quiz.total):
+        q = quiz.current_question
+        wrong = rng.random() < wrong_rate
+        quiz.answer(q.id, (q.correct + 1) % len(q.options) if wrong else q.correct)
+        quiz.go_next()
+    quiz.finish()
+
+
+def build_cases():
+    questions = make_questions(SIZE)
+    finished = QuizSession(questions, rng=random.Random(1))
+    play(finished, random.Random(1))
+    as_dicts = [q._asdict() for q in finished.questions]
+    legacy_answers = {q_id: {"is_correct": a.is_correct} for q_id, a in finished.answers.items()}
+    incorrect_set = set(finished.incorrect)
+    lookup_ids = finished.incorrect[::max(1, len(finished.incorrect) // 100)][:100]
+
+    def answer_all():
+        play(QuizSession(questions, rng=random.Random(2)), random.Random(2))
+
+    def revision_lookup_linear():
+        for q_id in lookup_ids:
+            next((q for q in as_dicts if q['id'] == q_id), None)
+
+    def revision_lookup_indexed():
+        for q_id in lookup_ids:
+            finished.question_by_id(q_id)
+
+    def redo_filter():
+        return [q for q in as_dicts if q['id'] in incorrect_set]
+
+    redo_quiz = QuizSession(questions, rng=random.Random(3), shuffle=False)
+
+    def redo_engine():
+        redo_quiz.incorrect = list(finished.incorrect)
+        redo_quiz.redo_incorrect()
+
+    return {
+        f"build/{SIZE}": lambda: QuizSession(questions, rng=random.Random(0)),
+        f"answer_all/{SIZE}": answer_all,
+        f"summary_score/recount/{SIZE}": lambda: len([a for a in legacy_answers.values() if a["is_correct"]]),
+        f"summary_score/engine/{SIZE}": finished.score,
+        f"revision_100_lookups/linear/{SIZE}": revision_lookup_linear,
+        f"revision_100_lookups/indexed/{SIZE}": revision_lookup_indexed,
+        f"revision_order/set_to_list/{SIZE}": lambda: list(incorrect_set),
+        f"revision_order/engine_step/{SIZE}": lambda: finished.incorrect_question(len(finished.incorrect) // 2),
+        f"redo_wrong/filter/{SIZE}": redo_filter,
+        f"redo_wrong/engine_incl_option_orders/{SIZE}": redo_engine,
+    }
+
+
+def main(argv=None):
+    run_suite("quiz_session", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
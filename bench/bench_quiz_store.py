@@ -0,0 +1,96 @@
+"""
+Cost of checkpointing quiz progress (quiz_store) after every answer and
+navigation, and of restoring a session from a checkpoint, for the memory and
+SQLite backends. The ``full_state`` cases write the whole quiz state as one
+JSON value per checkpoint, the simple alternative to incremental rows.
+
+Restore correctness, including from a second process, is covered by
+tests/test_quiz_store.py.
+
+    python -m bench quiz-store
+    python -m bench quiz-store --save-baseline
+"""
+import json
+import os
+import random
+import tempfile
+
+from bench.bench_quiz_session import make_questions
+from bench.harness import run_suite
+from quiz_session import QuizSession
+from quiz_store import MemoryQuizStore, QuizCheckpoint, SQLiteQuizStore, attempt_state
+
+
+SIZE = 500
+ANSWERS = 100
+
+
+def build_cases(tmp):
+    questions = make_questions(SIZE)
+    sqlite_store = SQLiteQuizStore(os.path.join(tmp, "bench.sqlite3"))
+
+    def answer_run(store, name):
+        quiz = QuizSession(questions, rng=random.Random(1))
+        checkpoint = QuizCheckpoint(name)
+        checkpoint.save(store, quiz)
+
+        def run():
+            quiz.retry()
+            checkpoint.save(store, quiz)
+            for _ in range(ANSWERS):
+                q = quiz.current_question
+                quiz.answer(q.id, q.correct)
+                checkpoint.save(store, quiz)
+                quiz.go_next()
+                checkpoint.save(store, quiz)
+        return run
+
+    def full_state_run():
+        quiz = QuizSession(questions, rng=random.Random(1))
+        conn = sqlite_store._conn
+        conn.execute("CREATE TABLE IF NOT EXISTS full_state (session_key TEXT PRIMARY KEY, state TEXT)")
+
+        def save():
+            state = dict(attempt_state(quiz), questions=[list(q) for q in quiz.questions],
+                         answers=[[q_id, a.selected] for q_id, a in quiz.answers.items()], current=quiz.current)
+            conn.execute("INSERT OR REPLACE INTO full_state VALUES (?, ?)", ("full", json.dumps(state)))
+
+        def run():
+            quiz.retry()
+            save()
+            for _ in range(ANSWERS):
+                q = quiz.current_question
+                quiz.answer(q.id, q.correct)
+                save()
+                quiz.go_next()
+                save()
+        return run
+
+    restore_store = MemoryQuizStore()
+    answer_run(restore_store, "restore")()
+    answer_run(sqlite_store, "restore")()
+
+    return {
+        f"{ANSWERS}_answers_checkpointed/none/{SIZE}": answer_run(_NoStore(), "none"),
+        f"{ANSWERS}_answers_checkpointed/memory/{SIZE}": answer_run(MemoryQuizStore(), "memory"),
+        f"{ANSWERS}_answers_checkpointed/sqlite/{SIZE}": answer_run(sqlite_store, "sqlite"),
+        f"{ANSWERS}_answers_checkpointed/sqlite_full_state/{SIZE}": full_state_run(),
+        f"restore/memory/{SIZE}": lambda: restore_store.load("restore").to_session(),
+        f"restore/sqlite/{SIZE}": lambda: sqlite_store.load("restore").to_session(),
+    }
+
+
+class _NoStore:
+    """Discards every write: the QuizSession and QuizCheckpoint bookkeeping alone."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def main(argv=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        run_suite("quiz_store", build_cases(tmp), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
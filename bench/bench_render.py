@@ -0,0 +1,137 @@
+"""
+Per-interaction server cost of the quiz question loop, measured against a real
+``streamlit run`` server through the browser websocket protocol
+(bench.st_client), with the stub LLM backend.
+
+For each material size a fresh session pastes the material, starts a quiz and
+then answers and moves on through every question. For every click it records:
+
+  server ms   time spent running the script, read back from the server's own
+              script_run / fragment_run spans (METRICS_LOG_PATH)
+  client ms   rerun request to final script_finished, which also includes
+              Streamlit's fixed websocket and scheduling overhead
+  full/frag   how many full script runs and fragment runs the click caused
+  deltas, KB  what was sent back to the browser
+
+Growing the pasted material grows session state; a fragment-scoped question
+loop should cost the same at every size.
+
+    python -m bench render
+    python -m bench render --sizes 1000,300000 --questions 10 --json render.json
+    python -m bench render --app /path/to/other/checkout/streamlit_app.py
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from bench.load_test import make_material, percentile
+from bench.st_client import StreamlitClient, StreamlitServer
+
+
+class SpanLog:
+    """Tails the server's METRICS_LOG_PATH file to attribute script time to each click."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+
+    def server_seconds(self, result):
+        with open(self.path, encoding="utf-8") as f:
+            f.seek(self.offset)
+            records = [json.loads(line) for line in f if line.strip()]
+            self.offset = f.tell()
+        full = [r["seconds"] for r in records if r["phase"] == "script_run"]
+        # A fragment that renders inside a full run is already part of script_run.
+        result.server_seconds = sum(full) if full else \
+            sum(r["seconds"] for r in records if r["phase"] == "fragment_run")
+        return result
+
+
+def run_session(base_url, span_log, material, num_questions):
+    client = StreamlitClient(base_url)
+    samples = {"answer": [], "navigate": []}
+    try:
+        span_log.server_seconds(client.run())
+        text_area = client.find("text_area", key="question_input")[0]
+        client.set_value(text_area, material)
+        client.set_value(client.find("number_input", key="num_questions")[0], num_questions)
+        start = span_log.server_seconds(client.click(client.find("button", label="Start Quiz")[0]))
+        for _ in range(num_questions):
+            options = client.find("button", key_prefix="option_", enabled_only=True)
+            if not options:
+                raise RuntimeError("No answer options rendered; did the quiz start?")
+            samples["answer"].append(span_log.server_seconds(client.click(options[0])))
+            nav = client.find("button", label="Next", enabled_only=True) or \
+                client.find("button", label="Finish Quiz", enabled_only=True)
+            samples["navigate"].append(span_log.server_seconds(client.click(nav[0])))
+        if not client.find("button", label="Retry All"):
+            raise RuntimeError("Quiz summary was not reached.")
+    finally:
+        client.close()
+    return start, samples
+
+
+def summarize(runs):
+    seconds = [r.seconds for r in runs]
+    server = [r.server_seconds for r in runs]
+    return {
+        "count": len(runs),
+        "server_p50_ms": round(percentile(server, 50) * 1000, 2),
+        "server_p95_ms": round(percentile(server, 95) * 1000, 2),
+        "client_p50_ms": round(percentile(seconds, 50) * 1000, 2),
+        "client_p95_ms": round(percentile(seconds, 95) * 1000, 2),
+        "full_runs": sum(r.script_runs for r in runs),
+        "fragment_runs": sum(r.fragment_runs for r in runs),
+        "deltas_per_click": round(sum(r.deltas for r in runs) / len(runs), 1),
+        "kb_per_click": round(sum(r.bytes_received for r in runs) / len(runs) / 1024, 2),
+    }
+
+
+def print_report(report):
+    print(f"App: {report['app']}")
+    print(f"{'':>22}{'server ms':^18}{'client ms':^18}")
+    print(f"{'material':>10} {'step':<9}{'count':>3}{'p50':>9}{'p95':>9}{'p50':>9}{'p95':>9}"
+          f"{'full':>6}{'frag':>6}{'deltas':>8}{'KB':>8}")
+    for size, steps in report["sizes"].items():
+        for step, s in steps.items():
+            print(f"{size:>10} {step:<9}{s['count']:>3}{s['server_p50_ms']:>9}{s['server_p95_ms']:>9}"
+                  f"{s['client_p50_ms']:>9}{s['client_p95_ms']:>9}"
+                  f"{s['full_runs']:>6}{s['fragment_runs']:>6}{s['deltas_per_click']:>8}{s['kb_per_click']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-click cost of the quiz question loop on a real server.")
+    parser.add_argument("--app", help="streamlit_app.py to serve (default: this checkout).")
+    parser.add_argument("--sizes", default="1000,100000,300000", help="Comma-separated material sizes in characters.")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--sessions", type=int, default=2, help="Sessions per size.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args(argv)
+
+    report = {"app": args.app or "streamlit_app.py", "questions": args.questions, "sizes": {}}
+    log_fd, log_path = tempfile.mkstemp(suffix=".jsonl", prefix="render-spans-")
+    os.close(log_fd)
+    span_log = SpanLog(log_path)
+    env = {"LLM_BACKEND": "stub", "METRICS_LOG_PATH": log_path, "METRICS_PORT": ""}
+    with StreamlitServer(args.app, env=env) as server:
+        for size in (int(s) for s in args.sizes.split(",")):
+            steps = {"start": [], "answer": [], "navigate": []}
+            for i in range(args.sessions):
+                material = make_material(size, args.seed + i)
+                start, samples = run_session(server.base_url, span_log, material, args.questions)
+                steps["start"].append(start)
+                steps["answer"] += samples["answer"]
+                steps["navigate"] += samples["navigate"]
+            report["sizes"][str(size)] = {step: summarize(runs) for step, runs in steps.items()}
+    os.unlink(log_path)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
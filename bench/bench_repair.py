@@ -0,0 +1,58 @@
+"""
+Validation with repair (quiz_core.repair_questions): what it costs next to
+the all-or-nothing validate_questions_array on the same arrays.
+
+Which items are repaired, which are set aside and how run_generation keeps
+the rest of a batch are covered by tests/test_repair.py.
+
+    python -m bench repair
+    python -m bench repair --save-baseline
+"""
+import copy
+import random
+
+from bench.bench_parsing import SIZES, make_array_text
+from bench.harness import run_suite
+from quiz_core import repair_questions, validate_questions_array
+
+
+def good(i=0):
+    return {"question": f"Which option is number {i}?", "options": ["zero", "one", "two", "three"],
+            "correct": 1, "hint": "Count.", "explanation": "It is the second one."}
+
+
+# (item, expected correct index, fields counted as repaired)
+FIXABLE = [
+    (dict(good(), correct="1"), 1, {"correct"}),
+    (dict(good(), correct=" 2 "), 2, {"correct"}),
+    (dict(good(), correct=3.0), 3, {"correct"}),
+    (dict(good(), correct="b"), 1, {"correct"}),
+    (dict(good(), correct="Three"), 3, {"correct"}),
+    ({k: v for k, v in dict(good(), answer="two").items() if k != "correct"}, 2, {"correct"}),
+    ({k: v for k, v in dict(good(), correct_answer=0).items() if k != "correct"}, 0, {"correct"}),
+    ({k: v for k, v in good().items() if k != "explanation"}, 1, {"explanation"}),
+    (dict(good(), explanation=None, hint=None), 1, {"explanation"}),
+    (dict(good(), hint=7), 1, {"hint"}),
+    (dict(good(), question=1789), 1, {"question"}),
+    (dict(good(), options={"A": "zero", "B": "one", "C": "two"}), 1, {"options"}),
+    (dict(good(), options=[0, 1, 2, 3.5]), 1, {"options"}),
+    ({k: v for k, v in good().items() if k != "hint"}, 1, set()),
+]
+def build_cases():
+    cases = {}
+    for label, size in SIZES.items():
+        _, questions = make_array_text(size, seed=size)
+        cases[f"validate/{label}"] = lambda q=questions: validate_questions_array(q)
+        cases[f"repair/{label}"] = lambda q=questions: repair_questions(q)
+    rng = random.Random(1)
+    messy = [copy.deepcopy(rng.choice(FIXABLE)[0]) if rng.random() < 0.3 else good(i) for i in range(100)]
+    cases["repair/100_questions_30pct_fixable"] = lambda: repair_questions(messy)
+    return cases
+
+
+def main(argv=None):
+    run_suite("repair", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+BM25 topic retrieval (retrieval.BM25Index) over 10 MB of sources: building
+the index, keeping it in sync when one source is added or deleted, ranking
+passages for a topic and filling a 30,000-character prompt budget.
+
+Scoring, incremental updates and the context budget are covered by
+tests/test_retrieval.py.
+
+    python -m bench retrieval
+    python -m bench retrieval --save-baseline
+"""
+from bench.bench_source_store import make_corpus, make_vocabulary
+from bench.harness import run_suite
+from retrieval import BM25Index
+
+
+DOCS = 500
+DOC_CHARS = 20_000
+BUDGET = 30_000
+
+
+def build_cases():
+    vocab = make_vocabulary()
+    docs = make_corpus(DOCS, DOC_CHARS, vocab)
+    mb = sum(map(len, docs.values())) / 1e6
+    index = BM25Index()
+    index.sync(docs)
+    extra = make_corpus(1, DOC_CHARS, vocab, seed=1)["doc0000.pdf"]
+
+    def add_one():
+        index.add("extra.pdf", extra)
+
+    def delete_one():
+        index.add("extra.pdf", extra)
+        index.remove("extra.pdf")
+
+    return {
+        f"build/{mb:.0f}MB": lambda: BM25Index().sync(docs),
+        f"sync_unchanged/{mb:.0f}MB": lambda: index.sync(docs),
+        f"add_one_source/{DOC_CHARS // 1000}k_chars": add_one,
+        f"add_then_delete_one_source/{DOC_CHARS // 1000}k_chars": delete_one,
+        f"search/most_common_word/{mb:.0f}MB": lambda: index.search(vocab[0]),
+        f"search/rare_word/{mb:.0f}MB": lambda: index.search(vocab[3000]),
+        f"search/three_words/{mb:.0f}MB": lambda: index.search(f"{vocab[5]} {vocab[20]} {vocab[400]}"),
+        f"build_context/{BUDGET // 1000}k_chars/{mb:.0f}MB": lambda: index.build_context(
+            f"{vocab[400]} {vocab[900]}", BUDGET),
+    }
+
+
+def main(argv=None):
+    run_suite("retrieval", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
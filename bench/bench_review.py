@@ -0,0 +1,79 @@
+"""
+Spaced-repetition review scheduler (review_scheduler.ReviewScheduler) for a
+learner with 50,000 cards: recording an answer, taking the next due
+questions from the heap, and, for comparison, finding them by scanning every
+card.
+
+SM-2 intervals and that the heap returns exactly what a full scan finds are
+covered by tests/test_review_scheduler.py.
+
+    python -m bench review
+    python -m bench review --save-baseline
+"""
+import os
+import random
+import tempfile
+
+from bench.harness import run_suite
+from quiz_model import Question
+from review_scheduler import DAY, ReviewScheduler
+
+
+CARDS = 50_000
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_question(i):
+    return Question.from_dict({"question": f"Question number {i}?", "options": ["a", "b", "c", "d"],
+                               "correct": i % 4, "hint": "", "explanation": ""})
+
+
+def scan_due(scheduler, learner, now, limit):
+    """The reference: every card read and sorted."""
+    rows = scheduler._conn.execute("SELECT q_id, due FROM review_cards WHERE learner = ?", (learner,)).fetchall()
+    return [q_id for due, q_id in sorted((due, q_id) for q_id, due in rows if due <= now)[:limit]]
+
+
+def build_cases(tmp):
+    clock = Clock()
+    scheduler = ReviewScheduler(os.path.join(tmp, "review.sqlite3"), clock=clock)
+    rng = random.Random(1)
+    questions = [make_question(i) for i in range(CARDS)]
+    for start in range(0, CARDS, 5000):
+        for question in questions[start:start + 5000]:
+            clock.now += 60
+            scheduler.record("ann", question, correct=rng.random() < 0.7)
+    # Two weeks on, all of the failed and some of the passed cards are due.
+    clock.now += 2 * DAY
+    scheduler.due("ann")  # Loads the heap.
+
+    def answer():
+        scheduler.record("ann", rng.choice(questions), correct=rng.random() < 0.7)
+
+    def reload_heap():
+        scheduler._queues.clear()
+        scheduler.due("ann", limit=1)
+
+    return {
+        f"record/{CARDS // 1000}k_cards": answer,
+        f"due/20_of_{CARDS // 1000}k_cards/heap": lambda: scheduler.due("ann", limit=20),
+        f"due/20_of_{CARDS // 1000}k_cards/full_scan": lambda: scan_due(scheduler, "ann", clock.now, 20),
+        f"due_count/{CARDS // 1000}k_cards": lambda: scheduler.due_count("ann"),
+        f"load_heap/{CARDS // 1000}k_cards": reload_heap,
+    }
+
+
+def main(argv=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        run_suite("review", build_cases(tmp), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
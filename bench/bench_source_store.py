@@ -0,0 +1,79 @@
+"""
+SQLite source store (source_store) with its FTS5 passage index: saving
+sources, and searching all of a user's sources, next to what finding a
+passage costs without an index (loading every source and scanning it).
+
+Search behaviour is covered by tests/test_source_store.py.
+
+    python -m bench source-store
+    python -m bench source-store --save-baseline
+"""
+import os
+import random
+import tempfile
+
+from bench.harness import run_suite
+from source_store import SQLiteSourceStore
+
+
+DOCS = 200
+DOC_CHARS = 20_000
+
+
+def make_vocabulary(size=5000, seed=0):
+    """Random lowercase words, most frequent first when used with Zipf weights."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def make_corpus(num_docs, doc_chars, vocab, seed=0):
+    """Documents of Zipf-distributed words from ``vocab``, in paragraphs of 60 words."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    docs = {}
+    for d in range(num_docs):
+        words = rng.choices(vocab, weights, k=doc_chars // 7)
+        paragraphs = [" ".join(words[i:i + 60]) + "." for i in range(0, len(words), 60)]
+        docs[f"doc{d:04d}.pdf"] = "\n\n".join(paragraphs)
+    return docs
+
+
+def build_cases(tmp):
+    vocab = make_vocabulary()
+    corpus = make_corpus(DOCS, DOC_CHARS, vocab)
+    store = SQLiteSourceStore(os.path.join(tmp, "sources.sqlite3"))
+    store.save("bench", corpus)
+    mb = sum(map(len, corpus.values())) / 1e6
+    small = dict(list(corpus.items())[:50])
+    save_store = SQLiteSourceStore(os.path.join(tmp, "save.sqlite3"))
+
+    def scan(word):
+        # The unindexed path: every source is loaded and scanned for the word.
+        found = []
+        for name, text in store.get("bench").items():
+            if word in text:
+                found.append(name)
+        return found
+
+    return {
+        f"save/50_docs/{50 * DOC_CHARS // 1000}k_chars": lambda: save_store.save("bench", small),
+        f"search/most_common_word/{mb:.0f}MB": lambda: store.search("bench", vocab[0]),
+        f"search/rare_word/{mb:.0f}MB": lambda: store.search("bench", vocab[3000]),
+        f"search/two_words/{mb:.0f}MB": lambda: store.search("bench", f"{vocab[5]} {vocab[20]}"),
+        f"search/2_letter_prefix/{mb:.0f}MB": lambda: store.search("bench", vocab[100][:2]),
+        f"scan_all_sources/rare_word/{mb:.0f}MB": lambda: scan(f" {vocab[3000]} "),
+    }
+
+
+def main(argv=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        run_suite("source_store", build_cases(tmp), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Cold-start and per-rerun cost of streamlit_app.py, per page.
+
+Each page is measured in a fresh interpreter started with ``-X importtime``,
+driven through Streamlit's AppTest with the stub backend:
+
+  first run    wall time of the first script run in a new process
+  app imports  import time spent during that run (top-level modules the app
+               pulled in that Streamlit itself had not already loaded)
+  rerun p50    median script time of the following reruns, which re-execute
+               all module-level code; read from the app's own script_run spans
+               so AppTest's fixed overhead is left out
+
+It also lists the slowest packages imported by the first run, so a heavy
+library loaded by a page that never uses it shows up by name.
+
+    python -m bench startup
+    python -m bench startup --reruns 50 --json startup.json
+    python -m bench startup --app /path/to/other/checkout/streamlit_app.py
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# The probe child must not import bench.load_test: it would preload the app's own
+# modules (llm_backends, quiz_core, ...) and hide their import cost.
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+
+PAGES = ("main", "text_collector")
+MARKER = "@@bench-startup app-run"
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def probe(app_path, page, reruns, secrets):
+    """Runs inside the ``-X importtime`` child and prints its timings as JSON."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=120)
+    for section, values in secrets.items():
+        at.secrets[section] = values
+    at.session_state["storage_init"] = {}  # What the localStorage component returns for an empty browser.
+    at.session_state["page"] = page
+
+    sys.stderr.write(MARKER + "\n")
+    sys.stderr.flush()
+    started = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - started
+    sys.stderr.write(MARKER + " done\n")
+    sys.stderr.flush()
+
+    for _ in range(reruns):
+        at.run()
+    print(json.dumps({"first_run": first_run, "exception": bool(at.exception)}))
+
+
+def app_imports(stderr):
+    """Top-level imports logged between the probe's markers: {package: cumulative seconds}."""
+    imports, inside = {}, False
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            inside = not line.endswith("done")
+            continue
+        match = IMPORT_LINE.match(line)
+        if inside and match and not match.group(3):
+            package = match.group(4).split(".")[0]
+            imports[package] = imports.get(package, 0.0) + int(match.group(2)) / 1e6
+    return imports
+
+
+def script_run_seconds(metrics_path):
+    with open(metrics_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r["seconds"] for r in records if r["phase"] == "script_run"]
+
+
+def measure_page(app_path, page, reruns):
+    from bench.load_test import FAKE_SECRETS, percentile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics_path = os.path.join(tmp, "metrics.jsonl")
+        env = dict(os.environ, LLM_BACKEND="stub", PYTHONPATH=os.getcwd(), METRICS_LOG_PATH=metrics_path,
+                   ROUTER_LOG_PATH=os.path.join(tmp, "routing.jsonl"))
+        code = f"from bench.bench_startup import probe; probe({app_path!r}, {page!r}, {reruns}, {FAKE_SECRETS!r})"
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              capture_output=True, text=True, env=env, check=True)
+        script_runs = script_run_seconds(metrics_path)[1:]
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    imports = app_imports(proc.stderr)
+    return {
+        "page": page,
+        "first_run": timings["first_run"],
+        "app_imports": sum(imports.values()),
+        "rerun_p50": percentile(script_runs, 50),
+        "rerun_p95": percentile(script_runs, 95),
+        "exception": timings["exception"],
+        "slowest_imports": sorted(imports.items(), key=lambda item: -item[1])[:8],
+    }
+
+
+def print_report(rows):
+    print(f"{'page':<16}{'first run':>12}{'app imports':>14}{'rerun p50':>12}{'rerun p95':>12}")
+    for row in rows:
+        print(f"{row['page']:<16}{row['first_run'] * 1000:>9.0f} ms{row['app_imports'] * 1000:>11.0f} ms"
+              f"{row['rerun_p50'] * 1000:>9.1f} ms{row['rerun_p95'] * 1000:>9.1f} ms"
+              + ("  (script raised)" if row["exception"] else ""))
+    print()
+    for row in rows:
+        slowest = ", ".join(f"{name} {seconds * 1000:.0f}" for name, seconds in row["slowest_imports"])
+        print(f"slowest imports on {row['page']} (ms): {slowest}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default=APP_PATH, help="Path of the streamlit_app.py to measure.")
+    parser.add_argument("--pages", default=",".join(PAGES), help="Comma-separated pages to measure.")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns timed after the first run.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    rows = [measure_page(os.path.abspath(args.app), page, args.reruns) for page in args.pages.split(",")]
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
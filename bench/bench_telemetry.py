@@ -0,0 +1,36 @@
+"""
+Overhead of telemetry spans, disabled (the default) and enabled.
+
+    python -m bench telemetry
+"""
+import telemetry
+from bench.harness import run_suite
+
+
+def build_cases():
+    def no_span():
+        pass
+
+    def with_span():
+        with telemetry.span("bench", model="m", input_size="<10KB"):
+            pass
+
+    def enabled():
+        telemetry.configure(enabled=True)
+        with_span()
+        telemetry.configure(enabled=False)
+
+    return {
+        "baseline/empty_call": no_span,
+        "span/disabled": with_span,  # telemetry is off unless a case turns it on
+        "span/enabled": enabled,
+        "render_prometheus/1_series": telemetry.registry.render_prometheus,
+    }
+
+
+def main(argv=None):
+    run_suite("telemetry", build_cases(), argv, description=__doc__.strip().splitlines()[0])
+
+
+if __name__ == "__main__":
+    main()
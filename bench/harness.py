@@ -0,0 +1,110 @@
+"""
+Shared timing and baseline helpers for the micro-benchmark suites.
+
+A suite is a function returning ``{case_name: callable}``. Each case is timed
+with ``timeit`` auto-ranging (best of ``repeat`` rounds, reported per call),
+then compared with the stored baseline in ``bench/baselines/<suite>.json``.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def measure(func, repeat=5, min_time=0.05):
+    """Best and median per-call time in seconds of ``func()``."""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    # autorange targets ~0.2 s; scale down for slow cases, up for very fast ones.
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    rounds = sorted(t / number for t in timer.repeat(repeat=repeat, number=number))
+    return {"best_s": rounds[0], "median_s": rounds[len(rounds) // 2], "loops": number}
+
+
+def baseline_path(suite):
+    return os.path.join(BASELINE_DIR, f"{suite}.json")
+
+
+def load_baseline(suite):
+    path = baseline_path(suite)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(suite, results):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    payload = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor() or platform.machine()},
+        "results": {name: {"best_s": r["best_s"]} for name, r in results.items()},
+    }
+    with open(baseline_path(suite), "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.2f} µs"
+
+
+def run_suite(suite, cases, argv=None, description=None):
+    """
+    Times ``cases`` and compares them with the stored baseline.
+    Exits with status 1 when a case regressed by more than ``--threshold``.
+    """
+    parser = argparse.ArgumentParser(prog=f"python -m bench {suite}", description=description)
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="Regression if best time exceeds baseline by this factor (default 1.5).")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(suite)
+    baseline_results = baseline["results"] if baseline else {}
+    results = {}
+    regressions = []
+    print(f"{'case':<48}{'best':>14}{'median':>14}{'vs baseline':>14}")
+    for name, func in cases.items():
+        if args.filter and args.filter not in name:
+            continue
+        result = measure(func, repeat=args.repeat)
+        results[name] = result
+        ratio = ""
+        if name in baseline_results:
+            factor = result["best_s"] / baseline_results[name]["best_s"]
+            ratio = f"{factor:.2f}x"
+            if factor > args.threshold:
+                regressions.append((name, factor))
+                ratio += " !"
+        print(f"{name:<48}{format_seconds(result['best_s']):>14}{format_seconds(result['median_s']):>14}{ratio:>14}")
+        sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        if args.filter and baseline:
+            merged = {name: {"best_s": r["best_s"]} for name, r in baseline_results.items()}
+            merged.update({name: {"best_s": r["best_s"]} for name, r in results.items()})
+            results = merged
+        save_baseline(suite, results)
+        print(f"Baseline saved to {baseline_path(suite)}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold}x baseline:")
+        for name, factor in regressions:
+            print(f"  {name}: {factor:.2f}x")
+        sys.exit(1)
+    return results
@@ -0,0 +1,300 @@
+"""
+Concurrent-session load test for Knowledge Quest, run against the local mock
+Poe server so no real API calls are made.
+
+Two session drivers are available:
+
+  headless  Each session runs the Streamlit-free pipeline
+            (quiz_core.run_generation over OpenAICompatibleBackend) and then
+            answers every question through the app's QuizSession engine.
+            Cheap enough for hundreds of sessions.
+  apptest   Each session drives streamlit_app.py through Streamlit's AppTest
+            in its own worker process: paste material, Start Quiz, then pick
+            an option and press Next/Finish for every question. Measures real
+            script reruns.
+
+    python -m bench.load_test --sessions 50 --concurrency 10 --latency lognormal:0.5,0.4
+    python -m bench.load_test --driver apptest --sessions 8 --concurrency 4
+
+Reports throughput, p50/p95/p99 latency per step and per-session memory.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from bench.mock_poe_server import MockConfig, start_in_background
+from llm_backends import OpenAICompatibleBackend
+from memory_accounting import deep_sizeof
+from quiz_core import run_generation
+from quiz_session import QuizSession
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+
+FAKE_SECRETS = {
+    "jsonbin": {"api_key": "load-test", "bin_id": "load-test"},
+    "firebase": {
+        "firebase_apiKey": "load-test",
+        "firebase_authDomain": "load-test.firebaseapp.com",
+        "firebase_databaseURL": "https://load-test.firebaseio.com",
+        "firebase_projectId": "load-test",
+        "firebase_storageBucket": "load-test.appspot.com",
+    },
+}
+
+
+def make_material(size_chars, seed):
+    rng = random.Random(seed)
+    words = ["cell", "energy", "protein", "membrane", "light", "enzyme", "water", "carbon",
+             "oxygen", "glucose", "nucleus", "gene", "plant", "reaction", "structure"]
+    sentences = []
+    total = 0
+    while total < size_chars:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 14))).capitalize() + "."
+        sentences.append(sentence)
+        total += len(sentence) + 1
+    return " ".join(sentences)
+
+
+class SessionRecorder:
+    """Step latencies, errors and memory of one session; merged into a Recorder."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.memory = None
+
+    def timing(self, step, seconds):
+        self.latencies[step].append(seconds)
+
+    def error(self, kind):
+        self.errors[kind] += 1
+
+    def session_done(self, memory_bytes):
+        self.memory = memory_bytes
+
+    def to_dict(self):
+        return {"latencies": dict(self.latencies), "errors": dict(self.errors), "memory": self.memory}
+
+
+class Recorder:
+    """Aggregate over all sessions. Thread-safe so sessions can report as they finish."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.memory = []
+        self.completed = 0
+
+    def merge(self, session):
+        with self.lock:
+            for step, values in session["latencies"].items():
+                self.latencies[step].extend(values)
+            for kind, count in session["errors"].items():
+                self.errors[kind] += count
+            if session["memory"] is not None:
+                self.completed += 1
+                self.memory.append(session["memory"])
+
+
+def run_headless_session(base_url, material, num_questions, seed):
+    recorder = SessionRecorder()
+    rng = random.Random(seed)
+    backend = OpenAICompatibleBackend(base_url, api_key="load-test", on_error=lambda msg: recorder.error("api"))
+    started = time.perf_counter()
+    result = run_generation(backend, material, num_questions, "GPT-5-mini")
+    recorder.timing("generate", time.perf_counter() - started)
+    if not result.ok:
+        recorder.error(result.error)
+        return recorder.to_dict()
+    if result.truncated:
+        recorder.error("truncated")
+
+    quiz = QuizSession.from_dicts(result.questions, rng=rng)
+    for _ in range(quiz.total):
+        q = quiz.current_question
+        started = time.perf_counter()
+        quiz.answer(q.id, rng.randrange(len(q.options)))
+        quiz.go_next()
+        recorder.timing("answer", time.perf_counter() - started)
+    quiz.finish()
+    recorder.session_done(deep_sizeof(quiz))
+    return recorder.to_dict()
+
+
+def run_apptest_session(base_url, material, num_questions, seed, timeout):
+    """
+    Runs in a worker process: AppTest keeps process-global runtime state, so
+    concurrent AppTest sessions cannot share one interpreter.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["LLM_BACKEND"] = "openai"
+    os.environ["LLM_BASE_URL"] = base_url
+    os.environ.setdefault("ROUTER_LOG_PATH", os.path.join(tempfile.gettempdir(), "kq_load_test_routing.jsonl"))
+
+    recorder = SessionRecorder()
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for section, values in FAKE_SECRETS.items():
+        at.secrets[section] = values
+    at.session_state["storage_init"] = {}  # What the localStorage component returns for an empty browser.
+
+    started = time.perf_counter()
+    at.run()
+    recorder.timing("first_render", time.perf_counter() - started)
+
+    at.text_area(key="question_input").set_value(material)
+    at.number_input(key="num_questions").set_value(num_questions)
+    start_button = next(b for b in at.button if "Start Quiz" in b.label)
+    started = time.perf_counter()
+    start_button.click().run()
+    recorder.timing("generate", time.perf_counter() - started)
+    if not at.session_state["quiz_started"]:
+        recorder.error("quiz_not_started")
+        return recorder.to_dict()
+
+    for _ in range(at.session_state["quiz"].total):
+        options = [b for b in at.button if (b.key or "").startswith("option_") and not b.disabled]
+        if not options:
+            recorder.error("no_options")
+            return recorder.to_dict()
+        started = time.perf_counter()
+        rng.choice(options).click().run()
+        recorder.timing("answer", time.perf_counter() - started)
+
+        nav = next((b for b in at.button if b.label in ("Next →", "🏁 Finish Quiz") and not b.disabled), None)
+        if nav is None:
+            recorder.error("no_navigation")
+            return recorder.to_dict()
+        started = time.perf_counter()
+        nav.click().run()
+        recorder.timing("navigate", time.perf_counter() - started)
+
+    if at.exception:
+        recorder.error("exception")
+    recorder.session_done(deep_sizeof(at.session_state.to_dict()))
+    return recorder.to_dict()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(recorder, wall_seconds, sessions):
+    steps = {}
+    for step, values in recorder.latencies.items():
+        steps[step] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(max(values) * 1000, 2),
+        }
+    memory = recorder.memory
+    return {
+        "sessions": sessions,
+        "completed": recorder.completed,
+        "wall_s": round(wall_seconds, 3),
+        "sessions_per_s": round(recorder.completed / wall_seconds, 3) if wall_seconds else None,
+        "answers_per_s": round(len(recorder.latencies.get("answer", [])) / wall_seconds, 3) if wall_seconds else None,
+        "steps": steps,
+        "errors": dict(recorder.errors),
+        "session_memory_kb": {
+            "mean": round(sum(memory) / len(memory) / 1024, 1) if memory else None,
+            "max": round(max(memory) / 1024, 1) if memory else None,
+        },
+    }
+
+
+def print_report(report):
+    print(f"Sessions: {report['completed']}/{report['sessions']} completed in {report['wall_s']} s "
+          f"({report['sessions_per_s']} sessions/s, {report['answers_per_s']} answers/s)")
+    print(f"{'step':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, s in sorted(report["steps"].items()):
+        print(f"{step:<14}{s['count']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+    mem = report["session_memory_kb"]
+    print(f"Session memory: mean {mem['mean']} KB, max {mem['max']} KB")
+    if report["errors"]:
+        print("Errors: " + ", ".join(f"{k}={v}" for k, v in sorted(report["errors"].items())))
+    if report.get("server"):
+        print("Mock server: " + ", ".join(f"{k}={v}" for k, v in sorted(report["server"].items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive N concurrent quiz sessions against the mock Poe API.")
+    parser.add_argument("--driver", choices=["headless", "apptest"], default="headless")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--material-chars", type=int, default=5000)
+    parser.add_argument("--base-url", help="Use an already running server instead of starting the mock.")
+    parser.add_argument("--latency", default="const:0.05", help="Mock latency distribution (see bench.mock_poe_server).")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=120, help="AppTest per-run timeout in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args(argv)
+
+    server = None
+    mock_config = None
+    base_url = args.base_url
+    if not base_url:
+        mock_config = MockConfig(args.latency, args.rate_429, args.truncate_rate, seed=args.seed)
+        server, base_url = start_in_background(mock_config)
+
+    recorder = Recorder()
+
+    # Submit through the importable module: AppTest swaps out __main__ in the workers.
+    from bench import load_test
+
+    def one_session(i):
+        material = make_material(args.material_chars, args.seed + i)
+        if args.driver == "apptest":
+            return executor.submit(load_test.run_apptest_session, base_url, material, args.questions,
+                                   args.seed + i, args.timeout)
+        return executor.submit(run_headless_session, base_url, material, args.questions, args.seed + i)
+
+    if args.driver == "apptest":
+        # One fresh process per session keeps runtimes isolated and memory figures honest.
+        executor = ProcessPoolExecutor(max_workers=args.concurrency, max_tasks_per_child=1)
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    started = time.perf_counter()
+    with executor:
+        futures = [one_session(i) for i in range(args.sessions)]
+        for future in futures:
+            try:
+                recorder.merge(future.result())
+            except Exception as e:  # A crashed session is a result, not a reason to stop the run.
+                recorder.merge({"latencies": {}, "errors": {type(e).__name__: 1}, "memory": None})
+    wall = time.perf_counter() - started
+
+    report = summarize(recorder, wall, args.sessions)
+    report["driver"] = args.driver
+    report["concurrency"] = args.concurrency
+    if mock_config is not None:
+        report["server"] = dict(mock_config.counters)
+    if server is not None:
+        server.shutdown()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
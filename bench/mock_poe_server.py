@@ -0,0 +1,211 @@
+"""
+Local stand-in for Poe's ``/v1/chat/completions`` endpoint.
+
+Questions are produced by the same deterministic generator as the stub
+backend. Latency, rate limiting (429) and truncated JSON can be injected, and
+both streaming (SSE) and non-streaming responses are supported. Calls to a TTS
+model answer with an audio attachment served by the mock itself.
+
+    python -m bench.mock_poe_server --port 8765 --latency lognormal:0.5,0.4 --rate-429 0.05 --truncate-rate 0.1
+
+Point the app at it with LLM_BACKEND=openai and LLM_BASE_URL=http://127.0.0.1:8765/v1.
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backends import stub_questions_json
+
+
+TTS_MODEL_PREFIXES = ("ElevenLabs", "tts")
+FAKE_MP3 = b"ID3" + b"\x00" * 1021
+
+
+def parse_latency(spec):
+    """
+    Builds a latency sampler (returning seconds) from a spec string:
+    'const:0.5', 'uniform:0.2,1.5', 'normal:1.0,0.3' or 'lognormal:mu,sigma'
+    (the latter parameterised by the median in seconds and the log-space sigma).
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "const":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+class MockConfig:
+    def __init__(self, latency="const:0", rate_429=0.0, truncate_rate=0.0, stream_chunk=256, seed=0):
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.truncate_rate = truncate_rate
+        self.stream_chunk = stream_chunk
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "chat": 0, "tts": 0, "stream": 0, "rate_limited": 0, "truncated": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def draw(self):
+        """Latency, 429 and truncation decisions for one request."""
+        with self.lock:
+            latency = self.sample_latency(self.rng)
+            limited = self.rng.random() < self.rate_429
+            truncate = self.rng.uniform(0.3, 0.9) if self.rng.random() < self.truncate_rate else None
+        return latency, limited, truncate
+
+
+class MockPoeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    config = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.config.lock:
+                self._send_json(200, dict(self.config.counters))
+        elif self.path.startswith("/audio/"):
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Content-Length", str(len(FAKE_MP3)))
+            self.end_headers()
+            self.wfile.write(FAKE_MP3)
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+
+        config = self.config
+        config.count("requests")
+        latency, limited, truncate = config.draw()
+        if limited:
+            config.count("rate_limited")
+            self._send_json(429, {"error": {"message": "rate limited"}}, headers={"Retry-After": "1"})
+            return
+        time.sleep(latency)
+
+        model = request.get("model", "")
+        messages = request.get("messages") or [{}]
+        prompt = messages[-1].get("content", "")
+        if model.startswith(TTS_MODEL_PREFIXES):
+            config.count("tts")
+            audio_id = hashlib.md5(prompt.encode()).hexdigest()[:12]
+            host = self.headers.get("Host", "127.0.0.1")
+            message = {
+                "role": "assistant",
+                "content": "",
+                "attachments": [{"content_type": "audio/mpeg", "url": f"http://{host}/audio/{audio_id}.mp3"}],
+            }
+            self._send_json(200, self._completion(model, message))
+            return
+
+        config.count("chat")
+        content = stub_questions_json(prompt)
+        if truncate is not None:
+            config.count("truncated")
+            content = content[:int(len(content) * truncate)]
+        if request.get("stream"):
+            config.count("stream")
+            self._stream(model, content)
+        else:
+            self._send_json(200, self._completion(model, {"role": "assistant", "content": content}))
+
+    def _completion(self, model, message):
+        return {
+            "id": f"chatcmpl-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+        }
+
+    def _stream(self, model, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        step = self.config.stream_chunk
+        for i in range(0, len(content), step):
+            event = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": content[i:i + step]}}]}
+            write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def make_server(host="127.0.0.1", port=0, config=None):
+    """Creates (but does not start) a mock server; port 0 picks a free port."""
+    handler = type("ConfiguredMockPoeHandler", (MockPoeHandler,), {"config": config or MockConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(config=None, host="127.0.0.1", port=0):
+    """Starts a mock server on a daemon thread and returns (server, base_url)."""
+    server = make_server(host, port, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the Poe chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="const:0", help="const:S | uniform:A,B | normal:MEAN,SD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of responses cut mid-JSON.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = MockConfig(args.latency, args.rate_429, args.truncate_rate, seed=args.seed)
+    server = make_server(args.host, args.port, config)
+    print(f"Mock Poe API listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
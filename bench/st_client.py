@@ -0,0 +1,267 @@
+"""
+Minimal headless Streamlit client speaking the browser's websocket protocol.
+
+Unlike AppTest, it talks to a real ``streamlit run`` server, so fragment-scoped
+reruns, ``st.rerun()`` round trips and the bytes sent per interaction are
+exactly what a browser would see. Only what the benchmarks need is
+implemented: buttons, text/number inputs and an emulated localStorage
+component (empty, or seeded with a dict of items).
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from websockets.sync.client import connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINISHED_EARLY_FOR_RERUN = ForwardMsg.FINISHED_EARLY_FOR_RERUN
+FINISHED_FRAGMENT_RUN_SUCCESSFULLY = ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY
+
+FAKE_SECRETS_TOML = """
+[jsonbin]
+api_key = "bench"
+bin_id = "bench"
+
+[firebase]
+firebase_apiKey = "bench"
+firebase_authDomain = "bench.firebaseapp.com"
+firebase_databaseURL = "https://bench.firebaseio.com"
+firebase_projectId = "bench"
+firebase_storageBucket = "bench.appspot.com"
+"""
+
+
+class Element:
+    __slots__ = ("kind", "id", "label", "disabled", "fragment_id", "proto")
+
+    def __init__(self, kind, proto, fragment_id):
+        self.kind = kind
+        self.proto = proto
+        self.id = getattr(proto, "id", "")
+        self.label = getattr(proto, "label", "")
+        self.disabled = getattr(proto, "disabled", False)
+        self.fragment_id = fragment_id
+
+    @property
+    def key(self):
+        # Widget ids look like "$$ID-<hash>-<user key or None>".
+        parts = self.id.split("-", 2)
+        return parts[2] if len(parts) == 3 and parts[2] != "None" else None
+
+    def __repr__(self):
+        return f"<{self.kind} {self.label!r} key={self.key!r}>"
+
+
+class RunResult:
+    def __init__(self):
+        self.seconds = 0.0
+        self.server_seconds = None
+        self.script_runs = 0
+        self.fragment_runs = 0
+        self.deltas = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+
+class StreamlitClient:
+    def __init__(self, base_url, timeout=120, local_storage=None):
+        ws_url = base_url.replace("http://", "ws://").rstrip("/") + "/_stcore/stream"
+        self.ws = connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout)
+        self.timeout = timeout
+        self.widget_values = {}  # id -> WidgetState kept across runs, like the browser does
+        self.elements = {}  # delta path -> Element
+        self._cache = {}  # ForwardMsg hash -> message, to resolve ref_hash messages
+        # The browser's localStorage as the component's getAll returns it; pass the same
+        # dict to a second client to emulate reopening the app in the same browser.
+        self.local_storage = local_storage if local_storage is not None else {}
+        self.storage_writes = 0
+        self.storage_bytes_written = 0
+
+    def close(self):
+        self.ws.close()
+
+    def _send_rerun(self, triggers=(), fragment_id="", result=None):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.fragment_id = fragment_id
+        for state in self.widget_values.values():
+            msg.rerun_script.widget_states.widgets.add().CopyFrom(state)
+        for widget_id in triggers:
+            trigger = msg.rerun_script.widget_states.widgets.add()
+            trigger.id = widget_id
+            trigger.trigger_value = True
+        payload = msg.SerializeToString()
+        if result is not None:
+            result.bytes_sent += len(payload)
+        self.ws.send(payload)
+
+    def run(self, triggers=(), fragment_id=""):
+        """Requests a rerun and blocks until the final (non-rerun) script_finished."""
+        result = RunResult()
+        started = time.perf_counter()
+        self._send_rerun(triggers, fragment_id, result)
+        touched = set()
+        while True:
+            raw = self.ws.recv(timeout=self.timeout)
+            result.bytes_received += len(raw)
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            if msg.hash:
+                self._cache[msg.hash] = msg
+            kind = msg.WhichOneof("type")
+            if kind == "ref_hash":
+                cached = self._cache.get(msg.ref_hash)
+                if cached is None:
+                    continue
+                path = tuple(msg.metadata.delta_path)
+                msg = cached
+                kind = msg.WhichOneof("type")
+            else:
+                path = tuple(msg.metadata.delta_path)
+            if kind == "delta":
+                result.deltas += 1
+                touched.add(path)
+                delta = msg.delta
+                if delta.WhichOneof("type") == "new_element":
+                    element_kind = delta.new_element.WhichOneof("type")
+                    element = Element(element_kind, getattr(delta.new_element, element_kind), delta.fragment_id)
+                    replaced = self.elements.get(path)
+                    if replaced is not None and replaced.id != element.id:
+                        self.widget_values.pop(replaced.id, None)
+                    self.elements[path] = element
+                    if element_kind == "component_instance" and element.id not in self.widget_values:
+                        self._run_component(element)
+            elif kind == "script_finished":
+                status = msg.script_finished
+                if status == FINISHED_EARLY_FOR_RERUN:
+                    result.script_runs += 1
+                    continue
+                if status == FINISHED_FRAGMENT_RUN_SUCCESSFULLY:
+                    result.fragment_runs += 1
+                    stale = [p for p, e in self.elements.items() if e.fragment_id == fragment_id and p not in touched]
+                else:
+                    result.script_runs += 1
+                    stale = [p for p in self.elements if p not in touched]
+                for p in stale:
+                    # Like the browser, forget the values of widgets that are no longer shown.
+                    self.widget_values.pop(self.elements.pop(p).id, None)
+                break
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def _run_component(self, element):
+        """
+        Emulates streamlit-local-storage. Writes change ``local_storage``; getAll
+        blocks the script until its value arrives, so the answer is sent while the
+        run is still in progress, as the browser does.
+        """
+        args = json.loads(element.proto.json_args or "{}")
+        method = args.get("method")
+        if method == "setItem":
+            self.local_storage[args["itemKey"]] = args["itemValue"]
+            self.storage_writes += 1
+            self.storage_bytes_written += len(json.dumps({args["itemKey"]: args["itemValue"]}))
+        elif method in ("eraseItem", "deleteItem"):
+            self.local_storage.pop(args.get("itemKey"), None)
+            self.storage_writes += 1
+        elif method == "deleteAll":
+            self.local_storage.clear()
+        elif method == "getAll":
+            state = WidgetState(id=element.id, json_value=json.dumps(self.local_storage))
+            self.widget_values[element.id] = state
+            self._send_rerun()
+
+    def find(self, kind="button", label=None, key=None, key_prefix=None, enabled_only=False):
+        matches = []
+        for path in sorted(self.elements):
+            element = self.elements[path]
+            if element.kind != kind:
+                continue
+            if label is not None and label not in element.label:
+                continue
+            if key is not None and element.key != key:
+                continue
+            if key_prefix is not None and not (element.key or "").startswith(key_prefix):
+                continue
+            if enabled_only and element.disabled:
+                continue
+            matches.append(element)
+        return matches
+
+    def click(self, element):
+        return self.run(triggers=[element.id], fragment_id=element.fragment_id)
+
+    def set_value(self, element, value):
+        """Stores a new widget value; it is sent with the next rerun."""
+        state = WidgetState(id=element.id)
+        if isinstance(value, bool):
+            state.bool_value = value
+        elif isinstance(value, int):
+            state.int_value = value
+        elif isinstance(value, float):
+            state.double_value = value
+        else:
+            state.string_value = value
+        self.widget_values[element.id] = state
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StreamlitServer:
+    """Runs ``streamlit run`` headless on a free port with fake secrets and extra env."""
+
+    def __init__(self, app_path=None, env=None, startup_timeout=60):
+        self.app_path = app_path or os.path.join(REPO_ROOT, "streamlit_app.py")
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._secrets = tempfile.NamedTemporaryFile("w", suffix=".toml", delete=False)
+        self._secrets.write(FAKE_SECRETS_TOML)
+        self._secrets.close()
+        process_env = dict(os.environ)
+        process_env.update(env or {})
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", self.app_path,
+             "--server.headless", "true", "--server.port", str(self.port),
+             "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+             "--secrets.files", self._secrets.name],
+            cwd=os.path.dirname(self.app_path), env=process_env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + startup_timeout
+        while time.time() < deadline:
+            try:
+                with urllib.request.urlopen(f"{self.base_url}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("Streamlit server did not become healthy in time.")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        os.unlink(self._secrets.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,94 @@
+"""
+Per-session store for large text (pasted or combined study material).
+
+Widgets only ever see a short preview; the full text stays on the server and
+is looked up by handle when a quiz is generated. Size, token estimate and
+whether the text is a ready-made question array are computed once per blob,
+not on every rerun.
+"""
+import hashlib
+from collections import OrderedDict
+
+from model_router import estimate_tokens
+from quiz_core import is_valid_json_input
+
+
+PREVIEW_CHARS = 1500
+# Pasted text longer than this is moved out of the text area into the session's blob
+# store, so it is not sent back and forth over the websocket on every rerun.
+LARGE_INPUT_CHARS = 20000
+
+
+def is_large(text):
+    return len(text) > LARGE_INPUT_CHARS
+
+
+class Blob:
+    __slots__ = ("handle", "text", "chars", "tokens", "_is_json")
+
+    def __init__(self, handle, text):
+        self.handle = handle
+        self.text = text
+        self.chars = len(text)
+        self.tokens = estimate_tokens(text)
+        self._is_json = None
+
+    @property
+    def is_json(self):
+        """True if the text is a valid question array; parsed at most once."""
+        if self._is_json is None:
+            self._is_json = is_valid_json_input(self.text)
+        return self._is_json
+
+    def preview(self, limit=PREVIEW_CHARS):
+        if self.chars <= limit:
+            return self.text
+        return self.text[:limit] + f"\n\n… [{self.chars - limit:,} more characters not shown]"
+
+
+class BlobStore:
+    """
+    Content-addressed, so storing the same text twice returns the same handle.
+    Least recently used blobs are evicted beyond ``max_blobs``, except the
+    pinned one (the material a quiz will be generated from).
+    """
+
+    def __init__(self, max_blobs=4):
+        self.max_blobs = max_blobs
+        self.pinned = None
+        self._blobs = OrderedDict()
+
+    def put(self, text):
+        handle = "blob_" + hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+        if handle in self._blobs:
+            self._blobs.move_to_end(handle)
+        else:
+            self._blobs[handle] = Blob(handle, text)
+            evictable = [h for h in self._blobs if h not in (self.pinned, handle)]
+            for old in evictable[:max(0, len(self._blobs) - self.max_blobs)]:
+                del self._blobs[old]
+        return handle
+
+    def pin(self, handle):
+        self.pinned = handle
+
+    def get(self, handle):
+        blob = self._blobs.get(handle)
+        if blob is not None:
+            self._blobs.move_to_end(handle)
+        return blob
+
+    def discard(self, handle):
+        self._blobs.pop(handle, None)
+        if self.pinned == handle:
+            self.pinned = None
+
+    def trim(self):
+        """Drops every blob but the pinned one; returns how many were dropped."""
+        dropped = [h for h in self._blobs if h != self.pinned]
+        for handle in dropped:
+            del self._blobs[handle]
+        return len(dropped)
+
+    def __len__(self):
+        return len(self._blobs)
@@ -0,0 +1,180 @@
+"""
+Per-user access to the sources saved in Firebase, with a bounded read cache.
+
+Each Resources ID is read from and written to its own ``users/<id>`` node,
+never the whole ``users`` tree. Reads go through a process-wide LRU cache
+bounded by total size; writes go to Firebase first and then update that one
+user's cached entry (write-through), so a user always reads back their own
+changes. Entries also expire after ``ttl`` seconds, which bounds staleness for
+changes made from another device.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from telemetry import span
+
+
+def sources_size(sources):
+    """Approximate memory held by a {name: text} dict, in bytes."""
+    return sys.getsizeof(sources) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in sources.items())
+
+
+class _Entry:
+    __slots__ = ("sources", "size", "loaded_at")
+
+    def __init__(self, sources, loaded_at):
+        self.sources = sources
+        self.size = sources_size(sources)
+        self.loaded_at = loaded_at
+
+
+class UserSourceCache:
+    """
+    LRU of {user_id: sources} bounded by ``max_bytes``; a user whose sources
+    alone exceed the bound is not cached. Entries are replaced, never mutated,
+    and ``get`` hands out copies, so callers may edit what they receive.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=60.0, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # Bumped on every write, so a read that raced with a write cannot cache
+        # what it fetched before the write landed.
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """A copy of the cached sources, or None on a miss (counted)."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and self.clock() - entry.loaded_at > self.ttl:
+                self._remove(user_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry.sources)
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def put(self, user_id, sources, version=None):
+        """Caches freshly read sources, unless a write happened since ``version`` was taken."""
+        with self._lock:
+            if version is not None and self._versions.get(user_id, 0) != version:
+                return
+            self._store(user_id, dict(sources))
+
+    def apply(self, user_id, changes=None, removed=(), replace=False):
+        """
+        Write-through after a successful write: ``changes`` are merged in and
+        ``removed`` names dropped, or with ``replace`` the entry becomes exactly
+        ``changes``. Users who are not cached stay uncached.
+        """
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            if replace:
+                self._store(user_id, dict(changes or {}))
+                return
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            sources = dict(entry.sources)
+            sources.update(changes or {})
+            for name in removed:
+                sources.pop(name, None)
+            self._store(user_id, sources, loaded_at=entry.loaded_at)
+
+    def _store(self, user_id, sources, loaded_at=None):
+        self._remove(user_id)
+        entry = _Entry(sources, self.clock() if loaded_at is None else loaded_at)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[user_id] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.bytes -= old.size
+            self.evictions += 1
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CloudSourceStore:
+    """
+    Reads and writes one user's sources under ``users/<user_id>`` of a
+    pyrebase database handle (or anything with the same ``child()`` API).
+    Firebase errors propagate; the cache is only touched after a write succeeds.
+    """
+
+    def __init__(self, db, cache=None):
+        self.db = db
+        self.cache = cache if cache is not None else UserSourceCache()
+
+    def _node(self, user_id):
+        return self.db.child("users").child(user_id)
+
+    def get(self, user_id):
+        """A copy of the user's {name: text} sources; {} if they have none."""
+        with span("cloud_read") as s:
+            sources = self.cache.get(user_id)
+            if sources is not None:
+                s.tag(cache="hit")
+                return sources
+            s.tag(cache="miss")
+            version = self.cache.version(user_id)
+            sources = self._node(user_id).get().val() or {}
+            self.cache.put(user_id, sources, version)
+            return dict(sources)
+
+    def save(self, user_id, sources):
+        """Adds or overwrites the given sources, leaving the user's other sources alone."""
+        if not sources:
+            return
+        with span("cloud_write"):
+            self._node(user_id).update(dict(sources))
+        self.cache.apply(user_id, sources)
+
+    def delete(self, user_id, names):
+        """Removes the named sources (a null value deletes a key in Firebase)."""
+        names = list(names)
+        if not names:
+            return
+        with span("cloud_write"):
+            self._node(user_id).update({name: None for name in names})
+        self.cache.apply(user_id, removed=names)
+
+    def clear(self, user_id):
+        with span("cloud_write"):
+            self._node(user_id).remove()
+        self.cache.apply(user_id, replace=True)
@@ -0,0 +1,83 @@
+"""
+Text extraction from uploaded documents, shared by the Text Collector, the
+batch CLI (quiz_batch) and the HTTP API.
+
+The document libraries (PyMuPDF, python-docx, python-pptx) are imported on
+first use. Unreadable or unsupported files raise ExtractionError with a
+message fit to show the user.
+"""
+import csv
+import io
+import json
+import os
+
+from telemetry import size_bucket, span
+
+
+EXTENSIONS = (".pdf", ".docx", ".pptx", ".txt", ".csv", ".json", ".md")
+
+
+class ExtractionError(ValueError):
+    pass
+
+
+def extract_file(path):
+    """Text of the document at ``path``, chosen by its extension."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return extract_text(data, os.path.splitext(path)[1])
+
+
+def extract_text(data, extension):
+    """Text of a document given as bytes; ``extension`` is e.g. '.pdf'."""
+    extension = extension.lower()
+    with span("extract", doc_type=extension.lstrip('.'), input_size=size_bucket(len(data))):
+        return _extract(data, extension)
+
+
+def _extract(data, extension):
+    if extension == ".pdf":
+        import fitz
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            return "".join(page.get_text() for page in doc)
+    if extension == ".docx":
+        import docx
+        doc = docx.Document(io.BytesIO(data))
+        return "\n".join(para.text for para in doc.paragraphs)
+    if extension == ".pptx":
+        # Text of every run in every shape on each slide.
+        try:
+            import pptx
+            prs = pptx.Presentation(io.BytesIO(data))
+            text_runs = []
+            for slide in prs.slides:
+                for shape in slide.shapes:
+                    if not shape.has_text_frame:
+                        continue
+                    for paragraph in shape.text_frame.paragraphs:
+                        for run in paragraph.runs:
+                            text_runs.append(run.text)
+            return "\n".join(text_runs)
+        except Exception as e:
+            raise ExtractionError(f"Error processing PPTX file: {e}") from e
+    if extension == ".csv":
+        # Cells joined with a space, rows with a newline.
+        try:
+            reader = csv.reader(io.StringIO(data.decode("utf-8")))
+            return "\n".join(" ".join(row) for row in reader)
+        except Exception as e:
+            raise ExtractionError(f"Error processing CSV file: {e}") from e
+    if extension == ".json":
+        # Pretty-printed for readability.
+        try:
+            return json.dumps(json.loads(data.decode("utf-8")), indent=4)
+        except json.JSONDecodeError as e:
+            raise ExtractionError("The uploaded JSON file is not correctly formatted.") from e
+        except Exception as e:
+            raise ExtractionError(f"Error processing JSON file: {e}") from e
+    if extension in (".txt", ".md"):
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise ExtractionError(f"The file is not UTF-8 text: {e}") from e
+    raise ExtractionError(f"Unsupported file type: {extension}")
@@ -0,0 +1,327 @@
+"""
+LLM backends used by Knowledge Quest.
+
+Every backend exposes the same two calls the app has always used on its
+client object: ``generate_questions(prompt, model)`` returning the raw text of
+the completion (or None on failure) and ``generate_tts(text, voice)`` returning
+a playable audio URL (or None). Errors are reported through an ``on_error``
+callback so this module stays free of Streamlit.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+import wave
+
+import requests
+
+
+POE_BASE_URL = "https://api.poe.com/v1"
+
+
+class LLMBackend:
+    """Interface shared by all chat/TTS backends."""
+
+    name = "base"
+
+    def __init__(self, on_error=None):
+        self.on_error = on_error
+
+    def _report_error(self, message):
+        if self.on_error:
+            self.on_error(message)
+
+    def generate_questions(self, prompt, model="Gemini-3-Flash"):
+        raise NotImplementedError
+
+    def generate_tts(self, text, voice="default"):
+        raise NotImplementedError
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Talks to any server implementing the OpenAI ``/chat/completions`` API,
+    e.g. a self-hosted vLLM/llama.cpp/Ollama inference server.
+    A single ``requests.Session`` is reused so connections are kept alive.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url, api_key="", tts_model=None, max_tokens=20000,
+                 timeout=120, tts_timeout=30, max_retries=2, on_error=None):
+        super().__init__(on_error)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.tts_model = tts_model
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.tts_timeout = tts_timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _chat(self, data, timeout):
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=data,
+                timeout=timeout
+            )
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            # Rate limited: honour Retry-After (capped) before trying again.
+            try:
+                delay = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                delay = 1.0
+            time.sleep(min(max(delay, 0.1), 10.0) * (attempt + 1))
+        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+        return response.json()
+
+    def generate_questions(self, prompt, model="Gemini-3-Flash"):
+        data = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": self.max_tokens,
+            "stream": False
+        }
+        try:
+            result = self._chat(data, self.timeout)
+            return result['choices'][0]['message']['content']
+        except requests.exceptions.RequestException as e:
+            self._report_error(f"API Request failed: {str(e)}")
+            return None
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            self._report_error(f"API returned an unexpected response: {e}")
+            return None
+
+    def generate_tts(self, text, voice="default"):
+        """
+        Generate TTS audio through a chat completion call to ``tts_model``.
+        The audio URL is read from an 'attachments' field on the message, or
+        from the first URL found in the message content.
+        """
+        if not self.tts_model:
+            return None
+        data = {
+            "model": self.tts_model,
+            "messages": [{"role": "user", "content": text.strip()}],
+            "stream": False
+        }
+        try:
+            result = self._chat(data, self.tts_timeout)
+            message = result.get('choices', [{}])[0].get('message', {})
+            if 'attachments' in message:
+                for attachment in message['attachments']:
+                    if attachment.get('content_type', '').startswith('audio/'):
+                        return attachment.get('url')
+            # Fallback if the structure is different but URL is in content
+            content = message.get('content', '')
+            url_match = re.search(r'https?://[^\s]+', content)
+            if url_match:
+                return url_match.group(0)
+            return None
+        except requests.exceptions.RequestException as e:
+            self._report_error(f"TTS Generation failed: {e}")
+            return None
+
+
+class PoeBackend(OpenAICompatibleBackend):
+    """
+    Poe's OpenAI-compatible endpoint.
+    NOTE: TTS assumes Poe returns an audio URL in an 'attachments' field for a
+    chat completion call to a model like 'ElevenLabs-v3'. This is an
+    unconventional way to get TTS and may be fragile depending on the actual
+    Poe API specification.
+    """
+
+    name = "poe"
+
+    def __init__(self, api_key, base_url=POE_BASE_URL, on_error=None, **kwargs):
+        kwargs.setdefault("tts_model", "ElevenLabs-v3")  # This model name is hypothetical
+        super().__init__(base_url, api_key=api_key, on_error=on_error, **kwargs)
+
+
+class StubBackend(LLMBackend):
+    """
+    In-process deterministic backend for offline runs and load tests.
+
+    The same prompt always produces the same questions, built from sentences of
+    the material between the prompt's ``---`` markers.
+
+    latency:     seconds to sleep per call, or a (low, high) tuple for a
+                 uniform range drawn from a seeded RNG.
+    truncate_at: if set, the response is cut to this many characters (int) or
+                 to this fraction of its length (float in (0, 1)), to mimic a
+                 model hitting its output limit.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, truncate_at=None, seed=0, on_error=None):
+        super().__init__(on_error)
+        self.latency = latency
+        self.truncate_at = truncate_at
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        if isinstance(self.latency, (tuple, list)):
+            with self._lock:
+                delay = self._rng.uniform(*self.latency)
+        else:
+            delay = self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def _truncate(self, text):
+        if self.truncate_at is None:
+            return text
+        if isinstance(self.truncate_at, float) and 0 < self.truncate_at < 1:
+            return text[:int(len(text) * self.truncate_at)]
+        return text[:int(self.truncate_at)]
+
+    def generate_questions(self, prompt, model="stub"):
+        self._sleep()
+        return self._truncate(stub_questions_json(prompt))
+
+    def generate_tts(self, text, voice="default"):
+        self._sleep()
+        return silent_wav_data_url()
+
+
+def stub_questions_json(prompt):
+    """
+    Deterministic question JSON for a prompt built by ``generate_ai_prompt``,
+    or by ``generate_batch_prompt``, in which case each question names its set.
+    """
+    sets = [(label, int(count)) for label, count in re.findall(r'^- set "([^"]+)": (\d+) questions', prompt, re.M)]
+    if not sets:
+        count_match = re.search(r"create (\d+) multiple-choice", prompt)
+        sets = [(None, int(count_match.group(1)) if count_match else 3)]
+    parts = prompt.split("\n---\n")
+    material = parts[1] if len(parts) >= 3 else prompt
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", material) if len(s.strip()) > 3]
+    if not sentences:
+        sentences = ["The material was empty."]
+
+    questions = []
+    labels = [label for label, count in sets for _ in range(count)]
+    for i, label in enumerate(labels):
+        sentence = sentences[i % len(sentences)]
+        digest = hashlib.md5(f"{i}|{sentence}".encode()).hexdigest()
+        correct = int(digest[:2], 16) % 4
+        options = [f"Distractor {chr(65 + j)} for item {i + 1}" for j in range(4)]
+        options[correct] = sentence[:80]
+        questions.append({
+            "question": f"Question {i + 1}: which statement appears in the material?",
+            "options": options,
+            "correct": correct,
+            "hint": "Re-read the material.",
+            "explanation": f"The material states: {sentence[:200]}"
+        })
+        if label is not None:
+            questions[-1]["set"] = label
+    return json.dumps(questions, ensure_ascii=False, indent=1)
+
+
+_SILENT_WAV = None
+
+
+def silent_wav_data_url():
+    """A tiny silent WAV clip as a data URL, used as stub TTS output."""
+    global _SILENT_WAV
+    if _SILENT_WAV is None:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(b"\x00\x00" * 800)
+        _SILENT_WAV = "data:audio/wav;base64," + base64.b64encode(buffer.getvalue()).decode()
+    return _SILENT_WAV
+
+
+BACKENDS = {
+    "poe": PoeBackend,
+    "openai": OpenAICompatibleBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(kind, **kwargs):
+    """Builds a backend by name ('poe', 'openai' or 'stub')."""
+    try:
+        backend_cls = BACKENDS[kind]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend: {kind!r}. Expected one of {sorted(BACKENDS)}.")
+    return backend_cls(**kwargs)
+
+
+def env_setting(name, default=""):
+    """Settings lookup for tools run outside Streamlit: the environment only."""
+    return os.getenv(name) or default
+
+
+def backend_from_settings(get_setting=env_setting, on_error=None):
+    """
+    Builds the backend selected by the LLM_BACKEND setting: 'poe' (default),
+    'openai' for any OpenAI-compatible server at LLM_BASE_URL, or 'stub' for the
+    offline deterministic generator. ``get_setting(name, default)`` looks settings
+    up: the app reads the environment, then st.secrets; tools use env_setting.
+    Returns None if the selected backend is not configured, or after reporting
+    an unknown backend or a malformed setting through ``on_error``.
+    """
+    kind = str(get_setting("LLM_BACKEND", "poe")).strip().lower()
+    if kind == "stub":
+        # STUB_TRUNCATE_AT: a character count ("1500") or a fraction of the response ("0.6")
+        truncate_at = str(get_setting("STUB_TRUNCATE_AT", "")).strip()
+        latency = str(get_setting("STUB_LATENCY", "")).strip()
+        try:
+            if truncate_at == "":
+                truncate_at = None
+            elif "." in truncate_at:
+                truncate_at = float(truncate_at)
+                if not 0 < truncate_at < 1:
+                    raise ValueError
+            else:
+                truncate_at = int(truncate_at)
+            latency = 0.0 if latency == "" else float(latency)
+            if (truncate_at is not None and truncate_at < 0) or latency < 0:
+                raise ValueError
+        except ValueError:
+            if on_error:
+                on_error("STUB_TRUNCATE_AT must be a character count or a fraction between 0 and 1, "
+                         "and STUB_LATENCY a non-negative number of seconds.")
+            return None
+        return StubBackend(latency=latency, truncate_at=truncate_at, on_error=on_error)
+    if kind == "openai":
+        base_url = get_setting("LLM_BASE_URL", "")
+        if not base_url:
+            return None
+        return OpenAICompatibleBackend(
+            base_url,
+            api_key=get_setting("LLM_API_KEY", ""),
+            tts_model=get_setting("LLM_TTS_MODEL", "") or None,
+            on_error=on_error
+        )
+    if kind != "poe":
+        if on_error:
+            on_error(f"Unknown LLM_BACKEND {kind!r}: use 'poe', 'openai' or 'stub'.")
+        return None
+    api_key = get_setting("POE_API_KEY", "")
+    if not api_key:
+        return None
+    return PoeBackend(api_key, on_error=on_error)
@@ -0,0 +1,80 @@
+"""
+Layout of the Text Collector's sources in the browser's localStorage.
+
+Each document is stored under its own key, next to a small manifest that
+lists the document names. Saving after an add or delete writes only the
+documents that changed plus the manifest, instead of re-serialising every
+source into one ``all_texts`` value. Sources saved by older versions under
+``all_texts`` are migrated on first load.
+
+All functions work on the storage snapshot the localStorage component returns
+({key: value}) and are free of Streamlit.
+"""
+import hashlib
+import json
+
+
+MANIFEST_KEY = "kq_sources"
+DOC_KEY_PREFIX = "kq_doc_"
+LEGACY_KEY = "all_texts"
+MANIFEST_VERSION = 1
+
+
+def doc_key(name):
+    return DOC_KEY_PREFIX + hashlib.sha1(name.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def manifest_value(names):
+    return json.dumps({"version": MANIFEST_VERSION, "docs": sorted(names)}, ensure_ascii=False)
+
+
+def read_manifest(snapshot):
+    """Document names listed in the snapshot's manifest, or None if there is no (readable) manifest."""
+    raw = snapshot.get(MANIFEST_KEY)
+    if not raw:
+        return None
+    try:
+        manifest = json.loads(raw) if isinstance(raw, str) else raw
+        return list(manifest["docs"])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def load_sources(snapshot):
+    """
+    Returns ``(sources, migrated, missing)``. Document texts are taken from the
+    snapshot as they are, without parsing; ``migrated`` is True when the sources
+    came from the legacy ``all_texts`` key and still have to be written in the
+    new layout. ``missing`` lists the manifest's names whose document is not in
+    storage (cleared by the browser, or a save that never landed); they are
+    left out of ``sources``.
+    """
+    names = read_manifest(snapshot)
+    if names is not None:
+        sources, missing = {}, []
+        for name in names:
+            key = doc_key(name)
+            if key in snapshot:
+                sources[name] = snapshot[key] or ""
+            else:
+                missing.append(name)
+        return sources, False, missing
+    legacy = snapshot.get(LEGACY_KEY)
+    if legacy:
+        try:
+            sources = json.loads(legacy) if isinstance(legacy, str) else dict(legacy)
+        except (ValueError, TypeError):
+            sources = {}
+        return sources, bool(sources), []
+    return {}, False, []
+
+
+def plan_writes(persisted, current):
+    """
+    Names to write and names to erase so the browser matches ``current``.
+    ``persisted`` maps names to the text objects last written; a text that is
+    still the same object is unchanged, so nothing is hashed or compared by value.
+    """
+    changed = [name for name, text in current.items() if persisted.get(name) is not text]
+    removed = [name for name in persisted if name not in current]
+    return changed, removed
@@ -0,0 +1,267 @@
+"""
+Memory accounting for long-lived sessions.
+
+A session's state is measured key by key with ``deep_sizeof``, checked
+against a per-session budget, and kept by a process-wide MemoryAccountant
+that summarises every session seen recently: total and largest sessions, and
+which state keys hold the most across all of them. A reporter thread can
+append that summary to a JSON-lines log at a fixed interval. To find what
+keeps growing, an AllocationTracker diffs tracemalloc snapshots taken between
+measurements and reports the source lines that allocated the growth.
+
+Sizes are approximate: they follow containers and instance attributes, count
+an object reached twice once (under the first key that reaches it), and do
+not follow classes, modules or functions. Objects shared by every session,
+such as a cached backend, should be excluded by key.
+
+Free of Streamlit.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import NamedTuple
+
+
+# Followed neither into nor counted: shared by the whole process.
+_NOT_OWNED = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+# Counted, with nothing inside to follow.
+_LEAVES = frozenset((str, bytes, int, float, bool, complex, type(None)))
+_SEQUENCES = frozenset((list, tuple, set, frozenset, deque))
+
+
+@functools.lru_cache(maxsize=None)
+def _slots(cls):
+    names = []
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get("__slots__", ())
+        names += [slots] if isinstance(slots, str) else slots
+    return tuple(name for name in names if name not in ("__dict__", "__weakref__"))
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Approximate retained size of an object graph in bytes. ``seen`` (a set of
+    ids) is updated, so objects already counted by an earlier call are skipped.
+    """
+    if seen is None:
+        seen = set()
+    getsizeof, leaves, sequences = sys.getsizeof, _LEAVES, _SEQUENCES
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        cls = type(obj)
+        if cls in leaves:
+            seen.add(id(obj))
+            size += getsizeof(obj)
+            continue
+        if isinstance(obj, _NOT_OWNED):
+            continue
+        seen.add(id(obj))
+        size += getsizeof(obj)
+        if cls is dict or isinstance(obj, dict):
+            stack += obj.keys()
+            stack += obj.values()
+        elif cls in sequences or isinstance(obj, tuple):
+            stack += obj
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for name in _slots(cls):
+                value = getattr(obj, name, None)
+                if value is not None:
+                    stack.append(value)
+    return size
+
+
+def state_sizes(state, exclude=()):
+    """{key: bytes} for a mapping such as a session's state, largest first."""
+    seen = set()
+    sizes = {key: deep_sizeof(value, seen) for key, value in list(state.items()) if key not in exclude}
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def process_rss():
+    """Resident set size of this process in bytes, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class SessionMemory(NamedTuple):
+    session: str
+    total: int
+    keys: dict        # state key -> bytes, largest first
+    measured: float   # timestamp
+    over_budget: bool
+    growth: list      # AllocationTracker.diff() lines at this measurement, if tracing
+
+    def top(self, n=5):
+        """The ``n`` keys holding the most, as (key, bytes)."""
+        return list(self.keys.items())[:n]
+
+
+class AllocationTracker:
+    """
+    Diffs of tracemalloc snapshots: each ``diff`` compares a new snapshot with
+    the one taken by the previous call. Tracing is process-wide, so with several
+    sessions active a diff includes what the others allocated meanwhile.
+    """
+
+    def __init__(self, frames=1, limit=10):
+        self.frames = frames
+        self.limit = limit
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        with self._lock:
+            self._previous = None
+        tracemalloc.stop()
+
+    def diff(self):
+        """
+        The source lines whose allocations grew most since the previous call,
+        as (location, size_diff, size, count_diff); empty on the first call.
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            tracemalloc.Filter(False, __file__),
+        ))
+        with self._lock:
+            previous, self._previous = self._previous, snapshot
+        if previous is None:
+            return []
+        stats = snapshot.compare_to(previous, "lineno")
+        return [(f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size_diff, stat.size,
+                 stat.count_diff) for stat in stats[:self.limit] if stat.size_diff > 0]
+
+
+class MemoryAccountant:
+    """
+    The latest measurement of every session seen in the last ``ttl`` seconds.
+    A session is measured at most once per ``min_interval`` seconds, since a
+    large state takes tens of milliseconds to walk; ``budget`` (bytes, 0 for
+    none) is the size over which a session is flagged. Safe to share between
+    threads.
+    """
+
+    def __init__(self, budget=0, ttl=3600.0, min_interval=30.0, exclude=(), tracker=None, clock=time.time):
+        self.budget = budget
+        self.ttl = ttl
+        self.min_interval = min_interval
+        self.exclude = frozenset(exclude)
+        self.tracker = tracker
+        self.clock = clock
+        self._sessions = {}
+        self._expired_at = 0.0
+        self._reporter_stop = None
+        self._lock = threading.Lock()
+
+    def measure(self, session, state, force=False):
+        """
+        Measures ``state`` (a mapping) as ``session``'s and returns its
+        SessionMemory; within ``min_interval`` of the last measurement the
+        previous one is returned unless ``force`` is given.
+        """
+        now = self.clock()
+        with self._lock:
+            last = self._sessions.get(session)
+        if last is not None and not force and now - last.measured < self.min_interval:
+            return last
+        keys = state_sizes(state, self.exclude)
+        total = sum(keys.values())
+        growth = self.tracker.diff() if self.tracker is not None else []
+        memory = SessionMemory(session, total, keys, now, bool(self.budget) and total > self.budget, growth)
+        with self._lock:
+            self._sessions[session] = memory
+            if now - self._expired_at > self.min_interval:
+                self._expire(now)
+        return memory
+
+    def _expire(self, now):
+        """Call with the lock held."""
+        self._expired_at = now
+        stale = [s for s, memory in self._sessions.items() if now - memory.measured > self.ttl]
+        for session in stale:
+            del self._sessions[session]
+
+    def forget(self, session):
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def sessions(self):
+        """Every session's latest SessionMemory, largest first."""
+        with self._lock:
+            self._expire(self.clock())
+            sessions = list(self._sessions.values())
+        return sorted(sessions, key=lambda memory: memory.total, reverse=True)
+
+    def summary(self, top=5):
+        """Process-wide totals, the largest sessions and the keys holding the most across sessions."""
+        sessions = self.sessions()
+        by_key = {}
+        for memory in sessions:
+            for key, size in memory.keys.items():
+                by_key[key] = by_key.get(key, 0) + size
+        return {
+            "sessions": len(sessions),
+            "bytes": sum(memory.total for memory in sessions),
+            "max_session_bytes": sessions[0].total if sessions else 0,
+            "over_budget": sum(memory.over_budget for memory in sessions),
+            "budget": self.budget,
+            "rss": process_rss(),
+            "top_sessions": [(memory.session, memory.total) for memory in sessions[:top]],
+            "top_keys": sorted(by_key.items(), key=lambda item: item[1], reverse=True)[:top],
+        }
+
+    def start_reporter(self, log_path, interval=300.0):
+        """
+        Appends ``summary()`` as a JSON line to ``log_path`` every ``interval``
+        seconds from a daemon thread, with the allocation growth since the
+        previous report when tracing, until ``stop_reporter``. A report that
+        cannot be written is skipped.
+        """
+        tracker = AllocationTracker(self.tracker.frames) if self.tracker is not None else None
+        directory = os.path.dirname(log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stop = self._reporter_stop = threading.Event()
+
+        def report():
+            while True:
+                record = {"ts": round(time.time(), 3), **self.summary()}
+                if tracker is not None:
+                    record["growth"] = tracker.diff()
+                try:
+                    with open(log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError:
+                    pass
+                if stop.wait(interval):
+                    return
+
+        thread = threading.Thread(target=report, daemon=True, name="memory-reporter")
+        thread.start()
+        return thread
+
+    def stop_reporter(self):
+        if self._reporter_stop is not None:
+            self._reporter_stop.set()
@@ -0,0 +1,209 @@
+"""
+"Auto" model routing for question generation.
+
+The router picks a model per request from the input size, the number of
+requested questions and rolling latency/truncation statistics gathered from
+past generations. Every decision and every outcome is appended to a JSON-lines
+log so the policy can be replayed and evaluated offline.
+"""
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+from collections import deque
+
+
+AUTO_MODEL = "Auto"
+
+# Static priors used until a model has enough observed samples.
+# latency_s is a rough median for a ~5 question generation, and
+# max_questions is how many questions fit comfortably in the output limit.
+MODEL_PROFILES = {
+    "Gemini-3-Flash": {"latency_s": 25.0, "max_questions": 20, "max_input_tokens": 1_000_000, "reasoning": False},
+    "Grok-4.1-Fast-Reasoning": {"latency_s": 40.0, "max_questions": 15, "max_input_tokens": 2_000_000, "reasoning": True},
+    "GPT-5-mini": {"latency_s": 60.0, "max_questions": 20, "max_input_tokens": 400_000, "reasoning": True},
+}
+DEFAULT_PROFILE = {"latency_s": 45.0, "max_questions": 10, "max_input_tokens": 128_000, "reasoning": False}
+
+SMALL_INPUT_TOKENS = 4_000
+SMALL_QUESTION_COUNT = 5
+MIN_SAMPLES = 5
+WINDOW = 50
+TRUNCATION_PENALTY = 3.0
+EXPLORE_RATE = 0.05
+
+
+def estimate_tokens(text):
+    """Cheap token estimate: ~4 ASCII characters per token, ~1.5 other characters per token."""
+    if not text:
+        return 0
+    if text.isascii():
+        return int(len(text) / 4)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return int(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5)
+
+
+def size_class(input_tokens, num_questions):
+    if input_tokens <= SMALL_INPUT_TOKENS and num_questions <= SMALL_QUESTION_COUNT:
+        return "small"
+    return "large"
+
+
+class ModelStats:
+    """Rolling window of outcomes for one (model, size class) pair."""
+
+    def __init__(self, window=WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.truncations = deque(maxlen=window)
+
+    def add(self, latency, truncated):
+        if latency is not None:
+            self.latencies.append(latency)
+        self.truncations.append(1 if truncated else 0)
+
+    @property
+    def samples(self):
+        return len(self.truncations)
+
+    def latency_p50(self):
+        return statistics.median(self.latencies) if self.latencies else None
+
+    def truncation_rate(self):
+        # Beta(1, 4) prior keeps a single truncation from dominating a cold model.
+        return (sum(self.truncations) + 1) / (len(self.truncations) + 5)
+
+
+class RoutingDecision:
+    def __init__(self, decision_id, model, reason, input_tokens, num_questions, scores):
+        self.decision_id = decision_id
+        self.model = model
+        self.reason = reason
+        self.input_tokens = input_tokens
+        self.num_questions = num_questions
+        self.scores = scores
+
+
+class ModelRouter:
+    """
+    Thread-safe, process-wide router. ``choose`` returns a RoutingDecision;
+    ``record_outcome`` must be called after every generation (routed or not)
+    so the rolling statistics stay current.
+    """
+
+    def __init__(self, models, log_path=None, explore_rate=EXPLORE_RATE, seed=None):
+        self.models = [m for m in models if m != AUTO_MODEL]
+        self.log_path = log_path
+        self.explore_rate = explore_rate
+        self._rng = random.Random(seed)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def _get_stats(self, model, klass):
+        key = (model, klass)
+        if key not in self._stats:
+            self._stats[key] = ModelStats()
+        return self._stats[key]
+
+    def _log(self, record):
+        if not self.log_path:
+            return
+        record["ts"] = time.time()
+        line = json.dumps(record, ensure_ascii=False)
+        # Its own lock, so routing never waits on the disk; a record that cannot be written is dropped.
+        with self._log_lock:
+            try:
+                directory = os.path.dirname(self.log_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError:
+                pass
+
+    def _score(self, model, klass, input_tokens, num_questions):
+        """Expected seconds to a complete quiz; lower is better. None if ineligible."""
+        profile = MODEL_PROFILES.get(model, DEFAULT_PROFILE)
+        if input_tokens > profile["max_input_tokens"]:
+            return None
+        stats = self._get_stats(model, klass)
+        if stats.samples >= MIN_SAMPLES and stats.latency_p50() is not None:
+            latency = stats.latency_p50()
+        else:
+            latency = profile["latency_s"] * max(num_questions, 1) / 5
+            # Reasoning models spend most of their time thinking on small inputs.
+            if klass == "small" and profile["reasoning"]:
+                latency *= 1.5
+        truncation = stats.truncation_rate()
+        if num_questions > profile["max_questions"]:
+            truncation = max(truncation, 0.5)
+        return {
+            "score": round(latency * (1 + TRUNCATION_PENALTY * truncation), 3),
+            "latency_p50": round(latency, 3),
+            "truncation_rate": round(truncation, 3),
+            "samples": stats.samples,
+        }
+
+    def choose(self, input_tokens, num_questions):
+        klass = size_class(input_tokens, num_questions)
+        with self._lock:
+            scores = {}
+            for model in self.models:
+                result = self._score(model, klass, input_tokens, num_questions)
+                if result is not None:
+                    scores[model] = result
+            candidates = scores or {m: {"score": 0.0} for m in self.models}
+            ranked = sorted(candidates, key=lambda m: candidates[m]["score"])
+            if len(ranked) > 1 and self._rng.random() < self.explore_rate:
+                model, reason = self._rng.choice(ranked[1:]), "explore"
+            else:
+                model, reason = ranked[0], "lowest_expected_latency" if scores else "no_eligible_model"
+
+        decision = RoutingDecision(uuid.uuid4().hex[:12], model, reason, input_tokens, num_questions, scores)
+        self._log({
+            "event": "decision",
+            "decision_id": decision.decision_id,
+            "input_tokens": input_tokens,
+            "num_questions": num_questions,
+            "size_class": klass,
+            "chosen": model,
+            "reason": reason,
+            "candidates": scores,
+        })
+        return decision
+
+    def record_outcome(self, model, input_tokens, num_questions, latency, parsed_count,
+                       truncated, ok, decision_id=None, repairs=None, quarantined=0):
+        """``repairs`` ({field: count}) and ``quarantined`` come from validation; logged to track model quality."""
+        klass = size_class(input_tokens, num_questions)
+        with self._lock:
+            self._get_stats(model, klass).add(latency if ok else None, truncated or not ok)
+        self._log({
+            "event": "outcome",
+            "decision_id": decision_id,
+            "model": model,
+            "input_tokens": input_tokens,
+            "num_questions": num_questions,
+            "size_class": klass,
+            "latency_s": round(latency, 3) if latency is not None else None,
+            "parsed": parsed_count,
+            "truncated": truncated,
+            "ok": ok,
+            "repairs": repairs or {},
+            "quarantined": quarantined,
+        })
+
+    def snapshot(self):
+        """Current statistics per (model, size class), for display or debugging."""
+        with self._lock:
+            return {
+                f"{model}/{klass}": {
+                    "samples": stats.samples,
+                    "latency_p50": stats.latency_p50(),
+                    "truncation_rate": round(stats.truncation_rate(), 3),
+                }
+                for (model, klass), stats in self._stats.items()
+            }
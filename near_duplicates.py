@@ -0,0 +1,126 @@
+"""
+Near-duplicate questions: paraphrases of a question an LLM has already
+written, which ``stable_hash`` cannot see because it only matches identical
+question, options and answer.
+
+A question is reduced to a set of shingles: the words of its stem, lower-cased,
+without stopwords, question words or plural endings, taken one and two at a
+time, plus the words of its correct answer. Two questions are near-duplicates
+when the Jaccard similarity of their sets reaches a threshold and their correct
+answers share a word (so "capital of France?" and "capital of Spain?" differ).
+
+Stems are short (a dozen shingles), so the exact Jaccard is cheaper here than a
+MinHash estimate: NearDuplicateFilter keeps an inverted index from shingle to
+the questions containing it, and the postings of a new question's shingles give
+its overlap with every earlier question at once. Only questions sharing a
+shingle are ever compared.
+
+Free of Streamlit.
+"""
+import re
+
+from retrieval import STOPWORDS
+
+
+THRESHOLD = 0.4
+
+_WORD = re.compile(r"\w+")
+# Words that phrase a question rather than say what it is about.
+QUESTION_WORDS = frozenset(
+    "what which who whom whose when where why how does do did can could would should may might "
+    "known called considered following best most likely describes statement true".split())
+_IGNORED = (STOPWORDS - {"i"}) | QUESTION_WORDS  # "i" stays: World War I is not World War II.
+
+
+def _words(text):
+    return [word[:-1] if len(word) > 3 and word[-1] == "s" and word[-2] != "s" else word
+            for word in _WORD.findall(str(text).lower()) if word not in _IGNORED]
+
+
+def shingles(question):
+    """The shingle set of a question dict: stem words and word pairs, and the correct answer's words."""
+    return _shingles(question)[0]
+
+
+def _shingles(question):
+    """(all shingles, the correct answer's shingles)."""
+    stem = _words(question.get("question", ""))
+    found = set(stem)
+    found.update(zip(stem, stem[1:]))  # Word pairs as tuples: cheaper than joined strings.
+    answer = set()
+    options, correct = question.get("options"), question.get("correct")
+    if isinstance(options, list) and isinstance(correct, int) and 0 <= correct < len(options):
+        answer = {"=" + word for word in _words(options[correct])}
+        found |= answer
+    return found, answer
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class NearDuplicateFilter:
+    """
+    Remembers the questions it has accepted; ``check`` tells whether a new
+    question nearly duplicates one of them. Keep one filter across several
+    generations (continuations, chunks of one document) to filter across them.
+    """
+
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.questions = []  # accepted questions, by position
+        self.sizes = []      # their shingle counts
+        self.answers = []    # their correct answers' shingles
+        self.postings = {}   # shingle -> positions of the accepted questions containing it
+
+    def __len__(self):
+        return len(self.questions)
+
+    def check(self, question):
+        """
+        The accepted question that ``question`` nearly duplicates, or None, in
+        which case ``question`` is accepted.
+        """
+        found, answer = _shingles(question)
+        postings = self.postings
+        hits = [(shingle, postings.get(shingle)) for shingle in found]
+        overlaps = {}
+        for _, positions in hits:
+            if positions:
+                for pos in positions:
+                    overlaps[pos] = overlaps.get(pos, 0) + 1
+        best, best_score = None, self.threshold
+        for pos, shared in overlaps.items():
+            score = shared / (len(found) + self.sizes[pos] - shared)
+            if score >= best_score and (not answer or not self.answers[pos] or answer & self.answers[pos]):
+                best, best_score = pos, score
+        if best is not None:
+            return self.questions[best]
+        pos = len(self.questions)
+        self.questions.append(question)
+        self.sizes.append(len(found))
+        self.answers.append(answer)
+        for shingle, positions in hits:
+            if positions is None:
+                postings[shingle] = [pos]
+            else:
+                positions.append(pos)
+        return None
+
+
+def drop_near_duplicates(questions, seen=None, threshold=THRESHOLD):
+    """
+    Splits ``questions`` into (kept, dropped); ``dropped`` holds (question, the
+    earlier question it repeats) pairs. ``seen`` is a NearDuplicateFilter
+    holding earlier generations: questions repeating those are dropped too, and
+    the kept ones are added to it.
+    """
+    dedup = seen if seen is not None else NearDuplicateFilter(threshold)
+    kept, dropped = [], []
+    for question in questions:
+        original = dedup.check(question)
+        if original is None:
+            kept.append(question)
+        else:
+            dropped.append((question, original))
+    return kept, dropped
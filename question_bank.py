@@ -0,0 +1,241 @@
+"""
+Persistent question bank: every generated question, kept across sessions in
+one SQLite file, so a quiz on material or a topic seen before can be assembled
+instantly instead of calling the LLM again.
+
+Each question is stored once, under the same id the quiz uses (the
+``stable_hash`` of its text, options and answer), with the model that wrote
+it, when it was added and how often it has been answered and answered
+correctly. Questions are linked to the hash of the material they were
+generated from and, when the material was built for a topic, to that topic;
+both links are indexed. A question that is already in the bank is not added
+again: neither an identical one (same id) nor a near-duplicate. Among the
+questions of the same material that is one whose stem normalises to the same
+text or that near_duplicates finds similar; across materials the options and
+the correct answer must normalise to the same text too, since generic stems
+("Which of the following is true?") are shared by unrelated questions. A duplicate is still linked
+to the new material and topic, so lookups find it.
+
+Free of Streamlit.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+from near_duplicates import NearDuplicateFilter
+from quiz_model import Question
+from telemetry import span
+
+
+_WORD = re.compile(r"\w+")
+
+
+def source_hash(text):
+    """Key of the material a quiz was generated from."""
+    return hashlib.sha1(text.strip().encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def normalize_topic(topic):
+    return " ".join(_WORD.findall((topic or "").lower()))
+
+
+def stem_key(question_text):
+    """The question's words, lower-cased: stems differing only in case, spacing or punctuation share a key."""
+    return " ".join(_WORD.findall(question_text.lower()))
+
+
+def answer_key(question):
+    """The options, in any order, and the correct one, normalised like stems."""
+    options = [stem_key(str(option)) for option in question["options"]]
+    return tuple(sorted(options)), options[question["correct"]]
+
+
+class BankQuestion(NamedTuple):
+    id: str
+    question: dict
+    model: str
+    created: float
+    asked: int
+    answered_correctly: int
+
+    @property
+    def accuracy(self):
+        return self.answered_correctly / self.asked if self.asked else None
+
+
+class AddResult(NamedTuple):
+    added: list       # ids of the questions stored
+    duplicates: dict  # id of each question not stored -> id of the bank question it duplicates
+
+
+class QuestionBank:
+    """
+    Questions, their statistics and their source/topic links in one SQLite
+    database (WAL mode), safe to share between threads and processes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS bank_questions (
+            id TEXT PRIMARY KEY,
+            stem_key TEXT NOT NULL,
+            question TEXT NOT NULL,
+            model TEXT NOT NULL,
+            created REAL NOT NULL,
+            asked INTEGER NOT NULL DEFAULT 0,
+            answered_correctly INTEGER NOT NULL DEFAULT 0,
+            last_answered REAL
+        );
+        CREATE INDEX IF NOT EXISTS bank_questions_stem ON bank_questions (stem_key);
+        CREATE TABLE IF NOT EXISTS bank_sources (
+            source TEXT NOT NULL,
+            q_id TEXT NOT NULL,
+            PRIMARY KEY (source, q_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS bank_topics (
+            topic TEXT NOT NULL,
+            q_id TEXT NOT NULL,
+            PRIMARY KEY (topic, q_id)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def _transaction(self, work):
+        with self._lock, span("question_bank_write"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return result
+
+    def add(self, questions, source, model="", topic=""):
+        """
+        Stores validated questions (dicts in the JSON question format) generated
+        from the material ``source`` (see source_hash). Returns an AddResult.
+        """
+        topic = normalize_topic(topic)
+        now = self.clock()
+
+        def work(conn):
+            # The questions already linked to this material, for the near-duplicate check.
+            seen, seen_ids = NearDuplicateFilter(), {}
+            for q_id, data in conn.execute(
+                    "SELECT q.id, q.question FROM bank_sources s JOIN bank_questions q ON q.id = s.q_id "
+                    "WHERE s.source = ?", (source,)):
+                data = json.loads(data)
+                if seen.check(data) is None:
+                    seen_ids[id(data)] = q_id  # The filter keeps the dict alive, so its id() stays unique.
+            added, duplicates = [], {}
+            for data in questions:
+                q_id = Question.from_dict(data).id
+                key = stem_key(data["question"])
+                existing = self._find_duplicate(conn, q_id, key, data, source)
+                if existing is None:
+                    original = seen.check(data)
+                    existing = None if original is None else seen_ids[id(original)]
+                if existing is None:
+                    seen_ids[id(data)] = q_id
+                    conn.execute("INSERT INTO bank_questions (id, stem_key, question, model, created) "
+                                 "VALUES (?, ?, ?, ?, ?)",
+                                 (q_id, key, json.dumps(data, ensure_ascii=False), model, now))
+                    added.append(q_id)
+                else:
+                    duplicates[q_id] = existing
+                    q_id = existing
+                conn.execute("INSERT OR IGNORE INTO bank_sources (source, q_id) VALUES (?, ?)", (source, q_id))
+                if topic:
+                    conn.execute("INSERT OR IGNORE INTO bank_topics (topic, q_id) VALUES (?, ?)", (topic, q_id))
+            return AddResult(added, duplicates)
+        return self._transaction(work)
+
+    @staticmethod
+    def _find_duplicate(conn, q_id, key, data, source):
+        if conn.execute("SELECT 1 FROM bank_questions WHERE id = ?", (q_id,)).fetchone():
+            return q_id
+        answer = None
+        for other_id, other, same_source in conn.execute(
+                "SELECT q.id, q.question, EXISTS (SELECT 1 FROM bank_sources s WHERE s.q_id = q.id AND s.source = ?) "
+                "FROM bank_questions q WHERE q.stem_key = ?", (source, key)):
+            if same_source:
+                return other_id
+            answer = answer or answer_key(data)
+            if answer_key(json.loads(other)) == answer:
+                return other_id
+        return None
+
+    def record_answer(self, q_id, correct):
+        """Counts a first answer to a bank question; unknown ids are ignored."""
+        self._transaction(lambda conn: conn.execute(
+            "UPDATE bank_questions SET asked = asked + 1, answered_correctly = answered_correctly + ?, "
+            "last_answered = ? WHERE id = ?", (int(bool(correct)), self.clock(), q_id)))
+
+    @staticmethod
+    def _filter(source, topic):
+        joins, params = [], []
+        if source is not None:
+            joins.append("JOIN bank_sources s ON s.q_id = q.id AND s.source = ?")
+            params.append(source)
+        if topic is not None:
+            joins.append("JOIN bank_topics t ON t.q_id = q.id AND t.topic = ?")
+            params.append(normalize_topic(topic))
+        return " ".join(joins), params
+
+    def count(self, source=None, topic=None):
+        joins, params = self._filter(source, topic)
+        with self._lock, span("question_bank_read"):
+            return self._conn.execute(f"SELECT count(*) FROM bank_questions q {joins}", params).fetchone()[0]
+
+    def find(self, source=None, topic=None, limit=None):
+        """Bank questions for a material and/or topic (all if neither is given), oldest first."""
+        joins, params = self._filter(source, topic)
+        sql = (f"SELECT q.id, q.question, q.model, q.created, q.asked, q.answered_correctly "
+               f"FROM bank_questions q {joins} ORDER BY q.created, q.id")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock, span("question_bank_read"):
+            rows = self._conn.execute(sql, params).fetchall()
+        return [BankQuestion(q_id, json.loads(data), *rest) for q_id, data, *rest in rows]
+
+    def topics(self, limit=100):
+        """[(topic, number of questions)], largest first."""
+        with self._lock:
+            return self._conn.execute("SELECT topic, count(*) FROM bank_topics GROUP BY topic "
+                                      "ORDER BY count(*) DESC, topic LIMIT ?", (limit,)).fetchall()
+
+    def assemble(self, num_questions, source=None, topic=None, rng=random):
+        """
+        Up to ``num_questions`` questions for a quiz, as question dicts: those
+        asked least often first, then those most often answered wrongly, ties
+        broken at random.
+        """
+        joins, params = self._filter(source, topic)
+        with self._lock, span("question_bank_read"):
+            rows = self._conn.execute(
+                f"SELECT q.question, q.asked, q.answered_correctly FROM bank_questions q {joins}", params).fetchall()
+        keyed = [(asked, correct / asked if asked else 0.0, rng.random(), data) for data, asked, correct in rows]
+        keyed.sort(key=lambda row: row[:3])
+        return [json.loads(row[3]) for row in keyed[:num_questions]]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,457 @@
+"""
+Small HTTP API over the quiz generation pipeline, for tools that cannot drive
+the Streamlit UI. Standard library only.
+
+    GET  /healthz                  liveness and job counts
+    POST /v1/extract?filename=f    raw document bytes -> {"text", "chars"}
+    POST /v1/jobs                  {"text", "num_questions", "model"} -> 202 {"id", "status", ...}
+    GET  /v1/jobs/<id>             job status; finished jobs include "quiz_id"
+    GET  /v1/jobs/<id>/stream      Server-Sent Events: "status" on every change,
+                                   then "result" (the job with its questions)
+    GET  /v1/quizzes/<id>          a generated quiz: {"id", "questions", "model", "created"}
+
+Jobs run quiz_core.run_generation, the same prompt, parse and validation code
+as the app, on a bounded worker pool; at most ``max_pending`` jobs may wait,
+beyond that a submit gets 429. Connections are HTTP/1.1 keep-alive, at most
+``max_connections`` at once (further ones get 503), and idle connections are
+closed after ``idle_timeout`` seconds. Quizzes are kept in memory (bounded) and,
+with ``--quiz-dir``, also written to disk so they survive a restart.
+
+    LLM_BACKEND=stub python quiz_api.py --port 8080
+    python quiz_api.py --port 8080 --workers 8 --quiz-dir data/quizzes
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from extraction import ExtractionError, extract_text
+from llm_backends import backend_from_settings, env_setting
+from model_router import AUTO_MODEL, ModelRouter
+from quiz_core import run_generation
+from telemetry import span
+
+
+MAX_QUESTIONS = 20
+QUIZ_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    __slots__ = ("id", "text", "num_questions", "model", "status", "error", "quiz_id", "questions",
+                 "repairs", "quarantined", "created", "started", "finished", "version")
+
+    def __init__(self, text, num_questions, model):
+        self.id = secrets.token_hex(8)
+        self.text = text
+        self.num_questions = num_questions
+        self.model = model
+        self.status = "queued"
+        self.error = None
+        self.quiz_id = None
+        self.questions = None
+        self.repairs = {}
+        self.quarantined = []  # Reasons malformed questions were set aside.
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0  # Bumped on every status change, for streaming clients.
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self, with_questions=False):
+        data = {"id": self.id, "status": self.status, "model": self.model, "num_questions": self.num_questions,
+                "error": self.error, "quiz_id": self.quiz_id, "repairs": self.repairs,
+                "quarantined": self.quarantined, "created": self.created, "started": self.started,
+                "finished": self.finished}
+        if with_questions:
+            data["questions"] = self.questions
+        return data
+
+
+class QuizArchive:
+    """
+    Generated quizzes by id, a hash of their questions. The most recent
+    ``max_quizzes`` are kept in memory; with a ``directory`` every quiz is also
+    written there and read back on a miss.
+    """
+
+    def __init__(self, max_quizzes=1000, directory=None):
+        self.max_quizzes = max_quizzes
+        self.directory = directory
+        self._quizzes = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def put(self, questions, model):
+        text = json.dumps(questions, ensure_ascii=False, sort_keys=True)
+        quiz = {"id": hashlib.sha1(text.encode("utf-8")).hexdigest()[:16], "questions": questions, "model": model, "created": time.time()}
+        if self.directory:
+            path = os.path.join(self.directory, quiz["id"] + ".json")
+            tmp = f"{path}.tmp{threading.get_ident()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(quiz, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        self._remember(quiz)
+        return quiz["id"]
+
+    def get(self, quiz_id):
+        with self._lock:
+            quiz = self._quizzes.get(quiz_id)
+            if quiz is not None:
+                self._quizzes.move_to_end(quiz_id)
+                return quiz
+        if not self.directory or not QUIZ_ID.match(quiz_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, quiz_id + ".json"), encoding="utf-8") as f:
+                quiz = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(quiz)
+        return quiz
+
+    def _remember(self, quiz):
+        with self._lock:
+            self._quizzes[quiz["id"]] = quiz
+            self._quizzes.move_to_end(quiz["id"])
+            while len(self._quizzes) > self.max_quizzes:
+                self._quizzes.popitem(last=False)
+
+
+class JobManager:
+    """Runs generation jobs on ``workers`` threads; finished jobs beyond ``max_jobs`` are forgotten."""
+
+    def __init__(self, backend, archive, workers=4, max_pending=32, max_jobs=1000, char_limit=30000,
+                 default_model="GPT-5-mini", router=None):
+        self.backend = backend
+        self.archive = archive
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.char_limit = char_limit
+        self.default_model = default_model
+        self.router = router
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quiz-job")
+        self._jobs = OrderedDict()
+        self._changed = threading.Condition()
+
+    def counts(self):
+        with self._changed:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def submit(self, text, num_questions, model=None):
+        model = model or self.default_model
+        if model == AUTO_MODEL and self.router is None:
+            raise ValueError(f"Model {AUTO_MODEL!r} needs the LLM_MODELS setting on the server.")
+        job = Job(text[:self.char_limit], num_questions, model)
+        with self._changed:
+            waiting = sum(1 for j in self._jobs.values() if not j.done)
+            if waiting >= self.max_pending:
+                raise QueueFull(f"{waiting} jobs are already waiting; try again later.")
+            self._jobs[job.id] = job
+            finished = [j.id for j in self._jobs.values() if j.done]
+            for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[job_id]
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def _update(self, job, **changes):
+        with self._changed:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+
+    def _run(self, job):
+        self._update(job, status="running", started=time.time())
+        try:
+            result = run_generation(self.backend, job.text, job.num_questions, job.model, router=self.router)
+            quality = {"model": result.model, "repairs": result.repairs,
+                       "quarantined": [reason for _, _, reason in result.quarantined]}
+            if not result.ok:
+                detail = f": {result.validation_error}" if result.validation_error else ""
+                self._update(job, status="failed", error=f"{result.error}{detail}", finished=time.time(), **quality)
+                return
+            quiz_id = self.archive.put(result.questions, result.model)
+            self._update(job, status="done", questions=result.questions, quiz_id=quiz_id, finished=time.time(),
+                         **quality)
+        except Exception as e:
+            self._update(job, status="failed", error=str(e) or type(e).__name__, finished=time.time())
+        finally:
+            job.text = None  # The material is not needed once the job has run.
+
+    def wait_for_change(self, job, version, timeout):
+        """Blocks until ``job.version`` differs from ``version`` or ``timeout`` passes."""
+        with self._changed:
+            self._changed.wait_for(lambda: job.version != version, timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class QuizAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive: every response carries a length or is chunked.
+    server_version = "KnowledgeQuestAPI/1"
+    disable_nagle_algorithm = True  # Headers and body are separate writes; without this keep-alive stalls 40 ms.
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # --- Responses ---
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {"error": message})
+
+    def read_body(self, limit):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.send_error_json(411, "Content-Length is required.")
+            return None
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # Where the body ends is unknown.
+            self.send_error_json(400, "Content-Length must be a non-negative integer.")
+            return None
+        if length > limit:
+            self.close_connection = True  # The unread body would be taken for the next request.
+            self.send_error_json(413, f"Body larger than {limit:,} bytes.")
+            return None
+        return self.rfile.read(length)
+
+    # --- Routing ---
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        parts = path.split("/")
+        with span("api_request", method="GET", route=_route_name(parts)):
+            if path == "/healthz":
+                self.send_json(200, {"ok": True, "jobs": self.server.jobs.counts()})
+            elif len(parts) == 4 and parts[1:3] == ["v1", "jobs"]:
+                job = self.server.jobs.get(parts[3])
+                if job is None:
+                    self.send_error_json(404, "No such job.")
+                else:
+                    self.send_json(200, job.to_dict(with_questions=job.status == "done"))
+            elif len(parts) == 5 and parts[1:3] == ["v1", "jobs"] and parts[4] == "stream":
+                self.stream_job(parts[3])
+            elif len(parts) == 4 and parts[1:3] == ["v1", "quizzes"]:
+                quiz = self.server.archive.get(parts[3])
+                if quiz is None:
+                    self.send_error_json(404, "No such quiz.")
+                else:
+                    self.send_json(200, quiz)
+            else:
+                self.send_error_json(404, "Not found.")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        parts = path.split("/")
+        with span("api_request", method="POST", route=_route_name(parts)):
+            if path == "/v1/jobs":
+                self.submit_job()
+            elif path == "/v1/extract":
+                self.extract(parse_qs(url.query))
+            else:
+                self.send_error_json(404, "Not found.")
+
+    # --- Endpoints ---
+
+    def submit_job(self):
+        body = self.read_body(self.server.max_body_bytes)
+        if body is None:
+            return
+        try:
+            request = json.loads(body)
+            text = request["text"]
+            num_questions = int(request.get("num_questions", 5))
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("'text' must be a non-empty string.")
+            if not 1 <= num_questions <= MAX_QUESTIONS:
+                raise ValueError(f"'num_questions' must be between 1 and {MAX_QUESTIONS}.")
+            model = request.get("model")
+            if model is not None and not isinstance(model, str):
+                raise ValueError("'model' must be a string.")
+            job = self.server.jobs.submit(text.strip(), num_questions, model)
+        except QueueFull as e:
+            self.send_error_json(429, str(e))
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            message = f"Missing field {e}." if isinstance(e, KeyError) else str(e)
+            self.send_error_json(400, message)
+            return
+        self.send_json(202, job.to_dict())
+
+    def extract(self, query):
+        filename = (query.get("filename") or [self.headers.get("X-Filename", "")])[0]
+        data = self.read_body(self.server.max_upload_bytes)
+        if data is None:
+            return
+        extension = os.path.splitext(filename)[1]
+        if not extension:
+            self.send_error_json(400, "Pass the document's file name as ?filename=, e.g. notes.pdf.")
+            return
+        try:
+            text = extract_text(data, extension) or ""
+        except ExtractionError as e:
+            self.send_error_json(422, str(e))
+            return
+        except Exception as e:
+            self.send_error_json(422, f"Could not read the document: {e}")
+            return
+        self.send_json(200, {"filename": filename, "chars": len(text), "text": text})
+
+    def stream_job(self, job_id):
+        job = self.server.jobs.get(job_id)
+        if job is None:
+            self.send_error_json(404, "No such job.")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                self.write_chunk(_event("status", job.to_dict()))
+                if job.done:
+                    self.write_chunk(_event("result", job.to_dict(with_questions=True)))
+                    break
+            else:
+                self.write_chunk(b": keep-alive\n\n")
+            self.server.jobs.wait_for_change(job, version, self.server.stream_heartbeat)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def _event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _route_name(parts):
+    """Low-cardinality route label for telemetry: ids are replaced by placeholders."""
+    if len(parts) >= 4 and parts[1] == "v1" and parts[2] in ("jobs", "quizzes"):
+        return "/".join(parts[:3] + ["{id}"] + parts[4:])
+    return "/".join(parts) or "/"
+
+
+_BUSY_BODY = b'{"error": "Too many open connections."}'
+_BUSY_RESPONSE = (b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                  b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(_BUSY_BODY)) + _BUSY_BODY
+
+
+class QuizAPIServer(ThreadingHTTPServer):
+    """One thread per connection, at most ``max_connections`` at once."""
+
+    daemon_threads = True
+
+    def __init__(self, address, jobs, archive, max_connections=64, idle_timeout=15.0, max_body_bytes=2_000_000,
+                 max_upload_bytes=50_000_000, stream_heartbeat=15.0, verbose=False):
+        self.jobs = jobs
+        self.archive = archive
+        self.max_body_bytes = max_body_bytes
+        self.max_upload_bytes = max_upload_bytes
+        self.stream_heartbeat = stream_heartbeat
+        self.verbose = verbose
+        self._slots = threading.BoundedSemaphore(max_connections)
+        handler = type("Handler", (QuizAPIHandler,), {"timeout": idle_timeout})
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(_BUSY_RESPONSE)
+            except OSError:
+                pass
+            finally:
+                self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.jobs.shutdown()
+
+
+def create_server(backend, host="127.0.0.1", port=8080, workers=4, max_pending=32, max_connections=64,
+                  quiz_dir=None, router=None, **kwargs):
+    archive = QuizArchive(directory=quiz_dir)
+    jobs = JobManager(backend, archive, workers=workers, max_pending=max_pending, router=router)
+    return QuizAPIServer((host, port), jobs, archive, max_connections=max_connections, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Generation jobs run at once.")
+    parser.add_argument("--max-pending", type=int, default=32, help="Jobs allowed to wait; more get 429.")
+    parser.add_argument("--max-connections", type=int, default=64, help="Open connections; more get 503.")
+    parser.add_argument("--quiz-dir", help="Also keep generated quizzes in this directory.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args(argv)
+
+    backend = backend_from_settings(env_setting, on_error=lambda message: print(message, file=sys.stderr))
+    if backend is None:
+        sys.exit("No LLM backend configured: set LLM_BACKEND and its settings (e.g. POE_API_KEY).")
+    models = [m.strip() for m in env_setting("LLM_MODELS").split(",") if m.strip()]
+    router = ModelRouter(models, log_path=env_setting("ROUTER_LOG_PATH") or None) if models else None
+    server = create_server(backend, args.host, args.port, workers=args.workers, max_pending=args.max_pending,
+                           max_connections=args.max_connections, quiz_dir=args.quiz_dir, router=router,
+                           verbose=args.verbose)
+    print(f"Serving the quiz API on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Headless batch generation: one quiz per document in a directory, without the
+Streamlit UI.
+
+Each document goes through the app's pipeline: extraction, truncation to the
+character limit, prompt, LLM call, fence stripping, partial JSON recovery and
+validation (quiz_core.run_generation). Documents are processed concurrently by
+a bounded pool of workers. Every quiz is written as ``<out>/<relative
+path>.json``, a validated question array the app's JSON-paste path accepts.
+
+Progress is appended to ``<out>/manifest.jsonl``, one line per finished
+document with the hash of its content. A rerun skips documents whose content
+is unchanged since they last succeeded, so an interrupted batch resumes where
+it stopped; failed documents are retried.
+
+The backend is chosen by the same settings as the app (LLM_BACKEND,
+POE_API_KEY, LLM_BASE_URL, ...), read from the environment.
+
+    python quiz_batch.py course/ --out quizzes/ --questions 10 --workers 8
+    LLM_BACKEND=stub python quiz_batch.py course/ --out /tmp/quizzes
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from extraction import EXTENSIONS, extract_file
+from llm_backends import backend_from_settings, env_setting
+from model_router import AUTO_MODEL, ModelRouter
+from quiz_core import run_generation
+
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def find_documents(source_dir, skip_dir=None):
+    """
+    Supported documents under ``source_dir``, as sorted relative paths. The
+    ``skip_dir`` tree (the output directory, when it lies inside the source)
+    and manifest files are left out, so a rerun does not take its own quizzes
+    for documents.
+    """
+    skip = os.path.abspath(skip_dir) if skip_dir else None
+    found = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip)
+        for name in files:
+            if name != MANIFEST_NAME and os.path.splitext(name)[1].lower() in EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(root, name), source_dir))
+    return sorted(found)
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Append-only record of finished documents; the last line for a document wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash.
+                    self.entries[entry["file"]] = entry
+
+    def is_done(self, rel_path, digest, out_dir):
+        entry = self.entries.get(rel_path)
+        return (entry is not None and entry["status"] == "ok" and entry["sha1"] == digest
+                and os.path.exists(os.path.join(out_dir, entry["output"])))
+
+    def record(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[entry["file"]] = entry
+
+
+def write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def process_document(rel_path, args, backend, router, digest):
+    """Extracts, generates and writes one quiz. Returns its manifest entry."""
+    entry = {"file": rel_path, "sha1": digest, "output": rel_path + ".json", "questions": 0,
+             "chars": 0, "model": None, "error": None}
+    started = time.perf_counter()
+    try:
+        text = (extract_file(os.path.join(args.source, rel_path)) or "").strip()
+        entry["chars"] = len(text)
+        if not text:
+            raise ValueError("no text extracted")
+        entry["extract_s"] = round(time.perf_counter() - started, 3)
+        result = run_generation(backend, text[:args.char_limit], args.questions, args.model, router=router)
+        entry["model"] = result.model
+        entry["repairs"] = result.repairs
+        entry["quarantined"] = [reason for _, _, reason in result.quarantined]
+        if not result.ok:
+            detail = f": {result.validation_error}" if result.validation_error else ""
+            raise ValueError(f"generation failed ({result.error}{detail})")
+        write_json_atomic(os.path.join(args.out, entry["output"]), result.questions)
+        entry["questions"] = len(result.questions)
+        entry["status"] = "ok"
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = str(e) or type(e).__name__
+    entry["seconds"] = round(time.perf_counter() - started, 3)
+    entry["ts"] = time.time()
+    return entry
+
+
+def run_batch(args, backend, router=None, log=print):
+    """Processes every pending document; returns (entries of this run, number skipped)."""
+    os.makedirs(args.out, exist_ok=True)
+    manifest = Manifest(os.path.join(args.out, MANIFEST_NAME))
+    pending, skipped = [], 0
+    for rel_path in find_documents(args.source, skip_dir=args.out):
+        digest = file_digest(os.path.join(args.source, rel_path))
+        if manifest.is_done(rel_path, digest, args.out):
+            skipped += 1
+        else:
+            pending.append((rel_path, digest))
+    log(f"{len(pending)} document(s) to process, {skipped} already done, {args.workers} worker(s)")
+
+    entries = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(process_document, rel_path, args, backend, router, digest)
+                   for rel_path, digest in pending]
+        for future in as_completed(futures):
+            entry = future.result()
+            manifest.record(entry)
+            entries.append(entry)
+            outcome = f"{entry['questions']} question(s)" if entry["status"] == "ok" else entry["error"]
+            log(f"[{len(entries)}/{len(pending)}] {entry['status']:<6} {entry['file']} "
+                f"({entry['seconds']:.1f} s): {outcome}")
+    return entries, skipped
+
+
+def print_report(entries, skipped, elapsed, out=None):
+    out = out or sys.stdout
+    ok = [e for e in entries if e["status"] == "ok"]
+    failed = [e for e in entries if e["status"] != "ok"]
+    questions = sum(e["questions"] for e in ok)
+    chars = sum(e["chars"] for e in entries)
+    rate = elapsed or 1e-9
+    print(f"\n{len(ok)} succeeded, {len(failed)} failed, {skipped} skipped (already done) in {elapsed:.1f} s", file=out)
+    print(f"throughput: {len(entries) / rate:.2f} documents/s, {questions / rate:.2f} questions/s, "
+          f"{chars / rate / 1000:.1f}k chars/s", file=out)
+    if failed:
+        print("\nfailures:", file=out)
+        for e in sorted(failed, key=lambda e: e["file"]):
+            print(f"  {e['file']}: {e['error']}", file=out)
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="Directory of documents (searched recursively).")
+    parser.add_argument("--out", required=True, help="Directory for the quiz files and manifest.")
+    parser.add_argument("--questions", type=positive_int, default=5, help="Questions per document.")
+    parser.add_argument("--model", default="GPT-5-mini",
+                        help=f"Model to use, or {AUTO_MODEL!r} to route between the LLM_MODELS setting's models.")
+    parser.add_argument("--workers", type=positive_int, default=4, help="Documents processed at once.")
+    parser.add_argument("--char-limit", type=positive_int, default=30000,
+                        help="Characters of each document sent to the model, as in the app.")
+    parser.add_argument("--json", help="Also write this run's per-document results to this file.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.source):
+        sys.exit(f"Not a directory: {args.source}")
+    source, out = os.path.abspath(args.source), os.path.abspath(args.out)
+    if os.path.commonpath([source, out]) == out:
+        sys.exit("--out must not be the source directory or contain it: its quizzes would be read as documents.")
+    backend = backend_from_settings(env_setting, on_error=lambda message: print(message, file=sys.stderr))
+    if backend is None:
+        sys.exit("No LLM backend configured: set LLM_BACKEND and its settings (e.g. POE_API_KEY).")
+    router = None
+    if args.model == AUTO_MODEL:
+        models = [m.strip() for m in env_setting("LLM_MODELS").split(",") if m.strip()]
+        if not models:
+            sys.exit(f"--model {AUTO_MODEL} needs the LLM_MODELS setting (comma-separated models).")
+        router = ModelRouter(models, log_path=env_setting("ROUTER_LOG_PATH") or None)
+
+    started = time.perf_counter()
+    entries, skipped = run_batch(args, backend, router)
+    print_report(entries, skipped, time.perf_counter() - started)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+    return 1 if any(e["status"] != "ok" for e in entries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
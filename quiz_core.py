@@ -0,0 +1,630 @@
+"""
+Streamlit-free core of the quiz pipeline: prompt construction, extraction of
+JSON from model output, partial-array recovery, validation and repair,
+near-duplicate filtering and the end-to-end generation call, alone or batched
+(several quizzes from one request). Shared by the app and the offline tools.
+"""
+import hashlib
+import json
+import re
+import time
+from typing import NamedTuple
+
+from model_router import AUTO_MODEL, estimate_tokens
+from near_duplicates import NearDuplicateFilter, drop_near_duplicates
+from telemetry import size_bucket, span
+
+
+def stable_hash(text):
+    return 'q_' + hashlib.md5(text.encode()).hexdigest()[:8]
+
+
+def strip_markdown_fences(text):
+    """
+    Extracts content from markdown code fences (```json ... ```) or
+    the largest apparent JSON array/object from a string.
+    Does NOT validate JSON completeness, just extracts the raw string.
+    """
+    # 1. Prioritize markdown code fences
+    match = re.search(r"```(?:json)?\s*\n(.*?)\n\s*```", text, flags=re.DOTALL)
+    if match:
+        return match.group(1).strip()
+
+    # 2. Fallback Strategy: Look for a bare JSON array or object
+    # We need to find the outermost array or object if no fences are present.
+    # This is trickier because the text might contain other prose.
+
+    best_json_candidate = None
+
+    # Try array first
+    start_bracket = text.find('[')
+    end_bracket = text.rfind(']')
+    if start_bracket != -1 and end_bracket > start_bracket:
+        candidate = text[start_bracket: end_bracket + 1]
+        # Heuristic: does it look like an array of objects?
+        if candidate.count('{') > 0 and candidate.count('}') > 0:
+            best_json_candidate = candidate
+
+    # Then try object (only if no good array candidate or if object is more prominent)
+    start_brace = text.find('{')
+    end_brace = text.rfind('}')
+    if start_brace != -1 and end_brace > start_brace:
+        candidate = text[start_brace: end_brace + 1]
+        # If we have an array candidate, and this object is not the *entire* content,
+        # we stick with the array. This is a heuristic.
+        if best_json_candidate is None or (
+                len(candidate) > len(best_json_candidate) and not best_json_candidate.startswith('[')):
+            best_json_candidate = candidate
+
+    return best_json_candidate
+
+
+def parse_partial_json_array(json_string):
+    """
+    Attempts to parse a JSON string, potentially truncated, to extract as many
+    complete JSON objects from an array as possible.
+    Returns a list of parsed objects.
+    """
+    if not json_string:
+        return []
+
+    json_string = json_string.strip()
+
+    # If it's a complete, valid JSON array, parse it directly
+    try:
+        data = json.loads(json_string)
+        if isinstance(data, list):
+            return data
+    except json.JSONDecodeError:
+        pass  # It's partial or malformed, proceed to recovery logic
+
+    # If it doesn't start with an array, it's not what we expect for questions.
+    # Or if it's a single object, we can try to wrap it, but for a list of questions,
+    # we primarily expect an array.
+    if not json_string.startswith('['):
+        return []
+
+    recovered_objects = []
+    balance = 0
+    in_string = False
+    escape_char = False
+    start_obj_index = -1
+
+    # Iterate through the string to find complete top-level objects within the array
+    # We need to handle nested structures and strings correctly to avoid misinterpreting '}'
+    for i, char in enumerate(json_string):
+        if in_string:
+            if char == '\\':
+                escape_char = not escape_char
+            elif char == '"' and not escape_char:
+                in_string = False
+            else:
+                escape_char = False
+        elif char == '"':
+            in_string = True
+            escape_char = False
+        elif char == '{':
+            if balance == 0:  # Start of a new top-level object in the array
+                start_obj_index = i
+            balance += 1
+        elif char == '}':
+            balance -= 1
+            # If balance returns to 0 and we had a starting object index,
+            # it means we've found a complete top-level object.
+            if balance == 0 and start_obj_index != -1:
+                try:
+                    obj_str = json_string[start_obj_index: i + 1]
+                    obj = json.loads(obj_str)
+                    recovered_objects.append(obj)
+                    start_obj_index = -1  # Reset for the next object
+                except json.JSONDecodeError:
+                    # This specific object might be malformed despite balanced braces,
+                    # or the truncation happened within it. We skip it.
+                    pass
+    return recovered_objects
+
+def is_valid_json_input(text):
+    try:
+        parsed = json.loads(strip_markdown_fences(text.strip()))
+        return validate_questions_array(parsed)['valid']
+    except (json.JSONDecodeError, TypeError):
+        return False
+
+
+def validate_questions_array(data):
+    if not isinstance(data, list) or not data:
+        return {'valid': False, 'error': 'Input must be a non-empty JSON array.'}
+    for i, q in enumerate(data):
+        if not isinstance(q, dict):
+            return {'valid': False, 'error': f'Item {i + 1} is not an object.'}
+        required = ['question', 'options', 'correct', 'explanation']
+        for field in required:
+            if field not in q:
+                return {'valid': False, 'error': f'Item {i + 1} is missing field: "{field}".'}
+        if not (isinstance(q['question'], str) and q['question'].strip()):
+            return {'valid': False, 'error': f'Item {i + 1}: "question" must be a non-empty string.'}
+        if not (isinstance(q['options'], list) and len(q['options']) >= 2):
+            return {'valid': False, 'error': f'Item {i + 1}: "options" must be an array with at least 2 items.'}
+        if not (isinstance(q['correct'], int) and 0 <= q['correct'] < len(q['options'])):
+            return {'valid': False, 'error': f'Item {i + 1}: "correct" index is invalid.'}
+        if 'hint' not in q: q['hint'] = ""
+    return {'valid': True}
+
+
+class RepairReport:
+    """
+    Outcome of ``repair_questions``: the usable ``questions``, the items set
+    aside as (position, item, reason) in ``quarantined``, and ``repairs``,
+    the number of fixes made per field.
+    """
+
+    def __init__(self):
+        self.questions = []
+        self.quarantined = []
+        self.repairs = {}
+
+    def count(self, field):
+        self.repairs[field] = self.repairs.get(field, 0) + 1
+
+
+_OPTION_LETTERS = "ABCDEFGH"
+
+
+def repair_questions(items):
+    """
+    Validates generated questions one by one, fixing what can be fixed
+    unambiguously and setting aside only the items that cannot be:
+
+      question     numbers become text; missing or blank -> quarantined
+      options      an object's values become the list, numbers become text;
+                   fewer than 2, or an empty/null option -> quarantined
+      correct      "1" and 1.0 -> 1, a letter "B" -> 1, the text of an option
+                   -> its index; also read from "answer"/"correct_answer";
+                   anything else, or out of range -> quarantined
+      explanation  missing or null -> "", other values become text
+      hint         missing or null -> "" (not counted: it is optional), other
+                   values become text
+
+    Items are copied, not modified; other keys are kept as they are.
+    """
+    report = RepairReport()
+    if not isinstance(items, list):
+        items = [items]
+    for position, item in enumerate(items):
+        _repair_into(report, position, item)
+    return report
+
+
+def _repair_into(report, position, item):
+    """Adds ``item`` (at ``position`` in the response) to ``report``, repaired or set aside."""
+    if not isinstance(item, dict):
+        report.quarantined.append((position, item, f'Item {position + 1} is not an object.'))
+        return
+    fixed, reason = _repair_question(item, report)
+    if reason:
+        report.quarantined.append((position, item, f'Item {position + 1}: {reason}'))
+    else:
+        report.questions.append(fixed)
+
+
+def _repair_question(item, report):
+    """(repaired copy, None) or (None, reason). Fixes are counted on ``report`` only for kept items."""
+    fixed = dict(item)
+    repaired = []
+
+    question = item.get('question')
+    if isinstance(question, (int, float)) and not isinstance(question, bool):
+        question = str(question)
+        repaired.append('question')
+    if not (isinstance(question, str) and question.strip()):
+        return None, '"question" must be a non-empty string.'
+    fixed['question'] = question
+
+    options = item.get('options')
+    if isinstance(options, dict):
+        options = list(options.values())
+        repaired.append('options')
+    if not (isinstance(options, list) and len(options) >= 2):
+        return None, '"options" must be an array with at least 2 items.'
+    if any(not isinstance(o, str) for o in options):
+        if any(o is None or isinstance(o, (bool, dict, list)) for o in options):
+            return None, '"options" must all be text.'
+        options = [str(o) for o in options]
+        repaired.append('options')
+    if any(not o.strip() for o in options):
+        return None, '"options" must not be empty.'
+    fixed['options'] = options
+
+    key = next((k for k in ('correct', 'answer', 'correct_answer') if k in item), None)
+    if key is None:
+        return None, 'missing field: "correct".'
+    correct = _correct_index(item[key], options)
+    if correct is None:
+        return None, '"correct" index is invalid.'
+    if key != 'correct' or type(item[key]) is not int:
+        repaired.append('correct')
+        fixed.pop('answer', None)
+        fixed.pop('correct_answer', None)
+    fixed['correct'] = correct
+
+    for field, counted in (('explanation', True), ('hint', False)):
+        value = item.get(field)
+        if isinstance(value, str):
+            continue
+        if value is not None:
+            fixed[field] = str(value)
+            repaired.append(field)
+        else:
+            fixed[field] = ""
+            if counted:
+                repaired.append(field)
+
+    for field in repaired:
+        report.count(field)
+    return fixed, None
+
+
+def _correct_index(value, options):
+    """The option index ``value`` denotes, or None if it does not denote exactly one."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int):
+        return value if 0 <= value < len(options) else None
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    # A string may be an index, a letter or an option's text; with options like
+    # "1", "2", "3" it can be more than one of those, and then it is ambiguous.
+    candidates = {i for i, o in enumerate(options) if o.strip().casefold() == text.casefold()}
+    if text.isdigit() and int(text) < len(options):
+        candidates.add(int(text))
+    elif len(text) == 1 and text.upper() in _OPTION_LETTERS[:len(options)]:
+        candidates.add(_OPTION_LETTERS.index(text.upper()))
+    return candidates.pop() if len(candidates) == 1 else None
+
+
+_PROMPT_INTRO = """You are a teacher creating educational assessments. You are Usage from Chiikawa, the very cute crazy rabbit character. Let's learn something new!
+
+When questions are asked, you give constructive step by step hints to lead the student to get to the answer, before giving the direct answers but you make sure the student can get to the point at the end. The style of teaching is concise and get to the point, but keep it friendly. When giving compliments and acting like the character, you can use Japanese for non technical related sentence. When you are talking on technical items, please always use English.
+
+You are given the following materials. As images may not be included, you may need to guess what could be related in the materials.
+
+You are a teacher creating educational assessments. Based on the following materials, create {num_questions} multiple-choice questions.{sets_note}
+
+---
+{input_text}
+---
+
+Based on these materials, do the following:
+1) Guess the educational level of the topic (e.g., primary P.2, secondary, tertiary, professional, postgraduate).
+2) {task}
+3) For each question, write plausible distractors that are GENERALLY INCORRECT (not just wrong relative to this passage). Distractors should represent common misconceptions or confusable alternatives that would be wrong in most contexts.
+4) The "explanation" field should be concise and help memorization (shown after correct).
+5) The "hint" field must be present (can be short) and should guide reflection after a wrong attempt.
+6) Ensure no distractor is a case/spacing variant of the correct answer with similar length.
+7) Distractors must be substantively different from the correct answer
+8) Use the same language as of the materials given. Only when the materials is about language learning, supplement with English so user get understood everything even user cannot understand the language materials.
+9) Note markdowns or codes or mathematical formulas are not rendered on the question (but rendered in options), so the question must be readable in plain text
+
+Important formatting rules:
+- Output ONLY pure JSON. No thoughts. No preface. No prose, no markdown, no code fences.
+- The JSON must be an array of objects with exactly these keys per item:
+question (string), options (array of 3-6 strings), correct (integer index within options), hint (string), explanation (string){set_key}.
+- Do NOT include any extra wrapper objects or metadata. No backticks. No comments.
+
+Example JSON:
+[
+{{{set_example}
+"question": "What is the capital city of France?",
+"options": [
+"London",
+"Paris", 
+"Berlin",
+"Madrid"
+],
+"correct": 1,
+"hint": "Think about the most famous city in France.",
+"explanation": "Paris is the capital and largest city of France."
+}}
+]
+
+Provide ONLY the JSON array.
+"""
+
+# How hard each difficulty tier's questions should be, relative to the level the model guesses.
+DIFFICULTIES = {
+    'easy': "at the guessed level: recall and understanding of the main points. Keep them clear and fair",
+    'standard': "one level harder than the guessed level (e.g., guessed P.2 -> produce P.3-level difficulty or "
+                "slightly higher). Make them slightly tricky but fair",
+    'hard': "two levels harder than the guessed level: applying and combining ideas from different parts of the "
+            "materials. Make them tricky but fair",
+}
+
+
+def generate_ai_prompt(input_text, num_questions):
+    task = f"Create {num_questions} multiple-choice questions whose difficulty is {DIFFICULTIES['standard']}."
+    return _PROMPT_INTRO.format(num_questions=num_questions, sets_note="", input_text=input_text, task=task,
+                                set_key="", set_example="")
+
+
+class QuestionSet(NamedTuple):
+    """One quiz of a batched generation: its label, size and difficulty (a key of DIFFICULTIES)."""
+    label: str
+    num_questions: int
+    difficulty: str = 'standard'
+
+
+def difficulty_sets(num_questions, difficulties=('easy', 'standard', 'hard')):
+    return [QuestionSet(difficulty, num_questions, difficulty) for difficulty in difficulties]
+
+
+def variant_sets(num_questions, count, difficulty='standard'):
+    return [QuestionSet(f'variant {i + 1}', num_questions, difficulty) for i in range(count)]
+
+
+def generate_batch_prompt(input_text, sets):
+    """
+    One prompt asking for several quizzes on the same material (a list of
+    QuestionSet): the material and instructions are sent once, and every
+    question names its quiz in a "set" key.
+    """
+    total = sum(s.num_questions for s in sets)
+    listing = "\n".join(f'- set "{s.label}": {s.num_questions} questions whose difficulty is '
+                        f'{DIFFICULTIES[s.difficulty]}.' for s in sets)
+    task = (f"Create {len(sets)} separate quizzes, listed below, each covering the materials on its own. "
+            f"No question may repeat or rephrase a question of another quiz. Output the questions of "
+            f"each quiz together, in the order listed.\n{listing}")
+    labels = ", ".join(f'"{s.label}"' for s in sets)
+    return _PROMPT_INTRO.format(
+        num_questions=total, sets_note=f" They form {len(sets)} separate quizzes.", input_text=input_text,
+        task=task, set_key=f", set (string, the quiz the question belongs to: one of {labels})",
+        set_example=f'\n"set": "{sets[0].label}",')
+
+
+def get_demo_questions():
+    return [
+        {"question": "What is the capital city of France?", "options": ["London", "Paris", "Berlin", "Madrid"],
+         "correct": 1, "hint": "Think about the most famous city in France.",
+         "explanation": "Paris is the capital and largest city of France, known for landmarks like the Eiffel Tower."},
+        {"question": "Which continent is Brazil located in?",
+         "options": ["North America", "South America", "Africa", "Asia"], "correct": 1,
+         "hint": "Brazil is the largest country in its continent.",
+         "explanation": "Brazil is located in South America and is the continent's largest country by both area and population."},
+        {"question": "What is the longest river in the world?",
+         "options": ["Amazon River", "Nile River", "Mississippi River", "Yangtze River"], "correct": 1,
+         "hint": "This river flows through northeastern Africa.",
+         "explanation": "The Nile River is traditionally considered the longest river in the world, flowing through northeastern Africa."}
+    ]
+
+
+class GenerationResult:
+    """
+    Outcome of one generation call.
+    ``error`` is None on success, otherwise one of 'no_response', 'no_json',
+    'no_questions', 'invalid' (see ``validation_error`` for the reason) or,
+    for a set of a batched call, 'all_duplicates' when every question repeated
+    one of an earlier set. ``duplicates`` holds (question, earlier question) pairs for the
+    near-duplicates removed from ``questions``; ``quarantined`` and
+    ``repairs`` come from repair_questions.
+    """
+
+    def __init__(self, model, num_questions, input_tokens):
+        self.model = model
+        self.num_questions = num_questions
+        self.input_tokens = input_tokens
+        self.decision_id = None
+        self.response = None
+        self.cleaned = None
+        self.questions = None
+        self.duplicates = []
+        self.quarantined = []
+        self.repairs = {}
+        self.error = None
+        self.validation_error = None
+        self.latency = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def truncated(self):
+        if self.error in ('no_json', 'no_questions'):
+            return True
+        if self.questions is None:
+            return False
+        generated = len(self.questions) + len(self.duplicates) + len(self.quarantined)
+        return generated < self.num_questions
+
+
+def run_generation(backend, input_text, num_questions, model, router=None, seen=None):
+    """
+    Prompt -> LLM -> fence stripping -> partial JSON recovery -> validation and
+    repair -> near-duplicate removal. ``model`` may be AUTO_MODEL when a ModelRouter is
+    given; every call's outcome is recorded on the router so its statistics
+    stay current. ``seen`` is a near_duplicates.NearDuplicateFilter holding the
+    questions of earlier generations, to drop repeats of those as well.
+    """
+    input_size = size_bucket(len(input_text))
+    with span("prompt", input_size=input_size):
+        prompt = generate_ai_prompt(input_text, num_questions)
+        result = GenerationResult(model, num_questions, estimate_tokens(prompt))
+    if model == AUTO_MODEL:
+        if router is None:
+            raise ValueError("Auto model selection requires a ModelRouter.")
+        decision = router.choose(result.input_tokens, num_questions)
+        result.model, result.decision_id = decision.model, decision.decision_id
+
+    with span("llm_call", model=result.model, input_size=input_size):
+        started = time.perf_counter()
+        result.response = backend.generate_questions(prompt, result.model)
+        result.latency = time.perf_counter() - started
+
+    if not result.response:
+        result.error = 'no_response'
+    else:
+        with span("parse", model=result.model):
+            _parse_response(result)
+        if result.ok:
+            with span("dedup", model=result.model):
+                result.questions, result.duplicates = drop_near_duplicates(result.questions, seen)
+
+    if router is not None:
+        router.record_outcome(result.model, result.input_tokens, num_questions, result.latency,
+                              len(result.questions or []) + len(result.duplicates) + len(result.quarantined),
+                              result.truncated, result.ok, decision_id=result.decision_id,
+                              repairs=result.repairs, quarantined=len(result.quarantined))
+    return result
+
+
+def _parse_response(result):
+    """Fills cleaned/questions/error on ``result`` from its raw response."""
+    result.cleaned = strip_markdown_fences(result.response.strip())
+    if result.cleaned is None:
+        result.error = 'no_json'
+    else:
+        questions = parse_partial_json_array(result.cleaned)
+        if not questions:
+            result.error = 'no_questions'
+        else:
+            report = repair_questions(questions)
+            result.questions = report.questions
+            result.quarantined = report.quarantined
+            result.repairs = report.repairs
+            if not report.questions:
+                result.error = 'invalid'
+                result.validation_error = report.quarantined[0][2]
+
+
+
+class BatchGenerationResult:
+    """
+    Outcome of one batched generation call (run_batch_generation).
+    ``results`` maps each set's label to a GenerationResult, in the order the
+    sets were requested; those results share this call's model, prompt,
+    response and latency. ``error`` is set when the call as a whole failed
+    ('no_response', 'no_json' or 'no_questions'), and then every set carries
+    it too. ``unassigned`` holds (position, item, reason) for items that named
+    no requested set.
+    """
+
+    def __init__(self, model, sets, input_tokens):
+        self.model = model
+        self.sets = sets
+        self.input_tokens = input_tokens
+        self.decision_id = None
+        self.response = None
+        self.cleaned = None
+        self.results = {}
+        self.unassigned = []
+        self.error = None
+        self.latency = None
+
+    @property
+    def ok(self):
+        return self.error is None and all(result.ok for result in self.results.values())
+
+    @property
+    def num_questions(self):
+        return sum(s.num_questions for s in self.sets)
+
+
+def run_batch_generation(backend, input_text, sets, model, router=None, seen=None):
+    """
+    Several quizzes on the same material from one LLM call: ``sets`` is a list
+    of QuestionSet (see difficulty_sets and variant_sets). The prompt and the
+    material are sent once instead of once per quiz, and the response is split
+    into one GenerationResult per set, each repaired and filtered as in
+    run_generation. Near-duplicates are dropped across the sets as well as
+    against ``seen``. The router records the call once, for all its questions;
+    a set emptied by that filtering is not held against the model.
+    """
+    sets = list(sets)
+    labels = {s.label.strip().casefold(): s.label for s in sets}
+    if not sets or len(labels) != len(sets):
+        raise ValueError("A batched generation needs at least one set, with distinct labels.")
+    input_size = size_bucket(len(input_text))
+    with span("prompt", input_size=input_size):
+        prompt = generate_batch_prompt(input_text, sets)
+        batch = BatchGenerationResult(model, sets, estimate_tokens(prompt))
+    if model == AUTO_MODEL:
+        if router is None:
+            raise ValueError("Auto model selection requires a ModelRouter.")
+        decision = router.choose(batch.input_tokens, batch.num_questions)
+        batch.model, batch.decision_id = decision.model, decision.decision_id
+
+    with span("llm_call", model=batch.model, input_size=input_size):
+        started = time.perf_counter()
+        batch.response = backend.generate_questions(prompt, batch.model)
+        batch.latency = time.perf_counter() - started
+
+    reports = {s.label: RepairReport() for s in sets}
+    if not batch.response:
+        batch.error = 'no_response'
+    else:
+        with span("parse", model=batch.model):
+            batch.cleaned = strip_markdown_fences(batch.response.strip())
+            items = parse_partial_json_array(batch.cleaned) if batch.cleaned is not None else None
+            if batch.cleaned is None:
+                batch.error = 'no_json'
+            elif not items:
+                batch.error = 'no_questions'
+            else:
+                _split_sets(items, sets, labels, reports, batch.unassigned)
+
+    dedup = seen if seen is not None else NearDuplicateFilter()
+    for s in sets:
+        result = GenerationResult(batch.model, s.num_questions, batch.input_tokens)
+        result.decision_id, result.response, result.cleaned = batch.decision_id, batch.response, batch.cleaned
+        result.latency = batch.latency
+        report = reports[s.label]
+        result.quarantined, result.repairs = report.quarantined, report.repairs
+        if batch.error:
+            result.error = batch.error
+        elif report.questions:
+            with span("dedup", model=batch.model):
+                result.questions, result.duplicates = drop_near_duplicates(report.questions, dedup)
+            if not result.questions:
+                result.error = 'all_duplicates'
+        elif report.quarantined:
+            result.error = 'invalid'
+            result.validation_error = report.quarantined[0][2]
+        else:
+            result.error = 'no_questions'
+        batch.results[s.label] = result
+
+    if router is not None:
+        results = batch.results.values()
+        repairs = {}
+        for result in results:
+            for field, count in result.repairs.items():
+                repairs[field] = repairs.get(field, 0) + count
+        parsed = sum(len(r.questions or []) + len(r.duplicates) + len(r.quarantined) for r in results)
+        router.record_outcome(batch.model, batch.input_tokens, batch.num_questions, batch.latency,
+                              parsed + len(batch.unassigned), any(r.truncated for r in results),
+                              any(r.ok or r.error == 'all_duplicates' for r in results),
+                              decision_id=batch.decision_id, repairs=repairs,
+                              quarantined=sum(len(r.quarantined) for r in results) + len(batch.unassigned))
+    return batch
+
+
+def _split_sets(items, sets, labels, reports, unassigned):
+    """Repairs each parsed item into the report of the set its "set" key names."""
+    only = sets[0].label if len(sets) == 1 else None
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            label = only
+            reason = f'Item {position + 1} is not an object.'
+        else:
+            label = labels.get(str(item.get('set', '')).strip().casefold()) or only
+            reason = f'Item {position + 1}: "set" must name one of the requested quizzes.'
+        if label is None:
+            unassigned.append((position, item, reason))
+            continue
+        report = reports[label]
+        kept = len(report.questions)
+        _repair_into(report, position, item)
+        if len(report.questions) > kept:
+            report.questions[-1].pop('set', None)
@@ -0,0 +1,70 @@
+"""
+Compact question model.
+
+A quiz is parsed once into a tuple of immutable ``Question`` records. Each
+attempt (first try, retry, redo-wrong) is only a permutation of question
+positions plus an option permutation per question, so starting a new attempt
+or opening revision mode never copies question text.
+"""
+import itertools
+import random
+from typing import NamedTuple
+
+from quiz_core import stable_hash
+
+
+class Question(NamedTuple):
+    id: str
+    text: str
+    options: tuple
+    correct: int
+    hint: str = ""
+    explanation: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a question from a validated dict in the JSON question format."""
+        options = tuple(data['options'])
+        q_id = stable_hash(f"{data['question']}|{'|'.join(map(str, options))}|{data['correct']}")
+        return cls(q_id, data['question'], options, data['correct'],
+                   data.get('hint') or "", data.get('explanation') or "")
+
+    def to_dict(self):
+        """The question in the JSON question format; ``from_dict`` gives it back with the same id."""
+        return {"question": self.text, "options": list(self.options), "correct": self.correct,
+                "hint": self.hint, "explanation": self.explanation}
+
+
+# Option permutations are shared between questions: a 4-option quiz only ever
+# needs the 24 permutations of (0, 1, 2, 3), however many questions it has.
+_PERMUTATIONS = {}
+
+
+def _shared_permutations(n):
+    perms = _PERMUTATIONS.get(n)
+    if perms is None:
+        perms = list(itertools.permutations(range(n))) if n <= 6 else None
+        _PERMUTATIONS[n] = perms
+    return perms
+
+
+def shuffled_option_order(num_options, rng=random):
+    perms = _shared_permutations(num_options)
+    if perms is not None:
+        return rng.choice(perms)
+    order = list(range(num_options))
+    rng.shuffle(order)
+    return tuple(order)
+
+
+def new_attempt(questions, positions, shuffle_questions=True, rng=random):
+    """
+    Returns ``(question_order, option_orders)`` for one pass over ``positions``
+    (indexes into ``questions``): the order questions are asked in, and for each
+    of them the order its options are shown in.
+    """
+    order = list(positions)
+    if shuffle_questions:
+        rng.shuffle(order)
+    option_orders = tuple(shuffled_option_order(len(questions[pos].options), rng) for pos in order)
+    return tuple(order), option_orders
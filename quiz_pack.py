@@ -0,0 +1,265 @@
+"""
+Quiz packs: a quiz in one portable file, ready to play on load.
+
+A pack holds the questions with their ids, in the order they are asked, each
+with the order its options are shown in, plus optional audio clips for the
+questions and answers, so a recipient starts the same quiz with no parsing,
+validation, hashing or TTS call. The file is a sequence of framed records,
+written and read front to back, so a pack can be streamed and neither side
+ever holds more than one record:
+
+    QUIZPACK/1\\n                                        magic and format version
+    meta <length>\\n<JSON>\\n                            title, creation time
+    question <length>\\n<JSON>\\n                        one per question, in order: [id, question,
+                                                        options, correct, hint, explanation, option order]
+    audio <length> <q_id> <question|answer> <mime>\\n<bytes>\\n
+    end <length>\\n<JSON>\\n                             counts and the SHA-256 of
+                                                        every byte before "end"
+
+Readers skip record kinds they do not know, so later versions can add some;
+a higher format version is refused. The checksum catches a truncated or
+corrupted file; nothing from a pack is used until it has been verified. It
+does not catch a hand-edited one, so each question is then checked as pasted
+JSON would be, and its option order must be a permutation of its options.
+
+Free of Streamlit.
+"""
+import base64
+import hashlib
+import json
+import time
+from typing import NamedTuple
+
+from quiz_core import validate_questions_array
+from quiz_model import Question
+from quiz_session import QuizSession
+
+
+FORMAT_VERSION = 1
+MAGIC = b"QUIZPACK/"
+EXTENSION = ".quizpack"
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER = 1024
+AUDIO_KINDS = ("question", "answer")
+
+
+class PackError(ValueError):
+    """The file is not a quiz pack this version can read, or it is damaged."""
+
+
+class QuizPack(NamedTuple):
+    title: str
+    created: float
+    questions: list      # Question records, in the order they are asked
+    option_orders: list  # for each question, the order its options are shown in
+    audio: dict          # (q_id, "question" | "answer") -> (mime type, bytes)
+
+    def session(self, rng=None):
+        """A QuizSession on its first attempt, asking the questions in the pack's order."""
+        return QuizSession.restore(self.questions, 1, QuizSession.FIRST, range(len(self.questions)),
+                                   self.option_orders, rng=rng)
+
+    def audio_urls(self):
+        """The audio as data URLs, in the app's ``audio_urls`` layout."""
+        urls = {"questions": {}, "answers": {}}
+        for (q_id, kind), (mime, data) in self.audio.items():
+            urls[kind + "s"][q_id] = f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+        return urls
+
+
+class PackWriter:
+    """
+    Writes a pack to a binary stream record by record; ``close`` (or leaving
+    the ``with`` block without an error) writes the checksum.
+    """
+
+    def __init__(self, stream, title=""):
+        self.stream = stream
+        self._hash = hashlib.sha256()
+        self.questions = 0
+        self.audio = 0
+        self._write(MAGIC + str(FORMAT_VERSION).encode() + b"\n")
+        self._record("meta", json.dumps({"title": title, "created": time.time()}).encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def _write(self, data):
+        self._hash.update(data)
+        self.stream.write(data)
+
+    def _record(self, kind, payload, *fields):
+        self._write(" ".join([kind, str(len(payload)), *fields]).encode() + b"\n")
+        self._write(payload)
+        self._write(b"\n")
+
+    def add_question(self, question, option_order):
+        """``question`` is a quiz_model.Question; ``option_order`` the order its options are shown in."""
+        q_id, text, options, correct, hint, explanation = question
+        self._record("question", json.dumps([q_id, text, list(options), correct, hint, explanation,
+                                             list(option_order)], ensure_ascii=False).encode())
+        self.questions += 1
+
+    def add_audio(self, q_id, kind, data, mime="audio/mpeg"):
+        if kind not in AUDIO_KINDS:
+            raise ValueError(f"Audio kind must be one of {AUDIO_KINDS}, not {kind!r}")
+        if not q_id or any(c.isspace() for c in q_id + mime):
+            raise ValueError("Question ids and mime types in a pack cannot contain spaces.")
+        self._record("audio", data, q_id, kind, mime)
+        self.audio += 1
+
+    def close(self):
+        counts = {"questions": self.questions, "audio": self.audio}
+        payload = json.dumps(dict(counts, sha256=self._hash.hexdigest())).encode()
+        self.stream.write(f"end {len(payload)}\n".encode() + payload + b"\n")
+
+
+def write_pack(stream, quiz, audio_urls=None, title=""):
+    """
+    Writes the current attempt of ``quiz`` (a QuizSession): its questions in the
+    order asked, with their option orders, and every clip in ``audio_urls``
+    that is a data URL. Returns the PackWriter, whose counts say what was written.
+    """
+    with PackWriter(stream, title) as writer:
+        for pos, option_order in zip(quiz.order, quiz.option_orders):
+            writer.add_question(quiz.questions[pos], option_order)
+        for kind in AUDIO_KINDS:
+            for q_id, url in ((audio_urls or {}).get(kind + "s") or {}).items():
+                clip = decode_data_url(url)
+                if clip is not None and q_id in quiz.index:
+                    writer.add_audio(q_id, kind, clip[1], clip[0])
+    return writer
+
+
+def decode_data_url(url):
+    """(mime type, bytes) of a base64 data URL, or None for any other URL."""
+    if not isinstance(url, str) or not url.startswith("data:"):
+        return None
+    header, _, data = url.partition(",")
+    if not header.endswith(";base64"):
+        return None
+    return header[5:-7] or "application/octet-stream", base64.b64decode(data)
+
+
+class _Reader:
+    """Reads a stream while hashing every byte, so the checksum needs no second pass."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.hash = hashlib.sha256()
+
+    def line(self, hashed=True):
+        line = self.stream.readline(MAX_HEADER)
+        if not line.endswith(b"\n"):
+            raise PackError("The quiz pack is truncated or is not a quiz pack.")
+        if hashed:
+            self.hash.update(line)
+        return line[:-1].decode("utf-8", "replace")
+
+    def payload(self, length, hashed=True, out=None):
+        """The record's bytes, or None after copying them to ``out`` chunk by chunk."""
+        chunks = []
+        remaining = length
+        while remaining:
+            chunk = self.stream.read(min(remaining, CHUNK_SIZE))
+            if not chunk:
+                raise PackError("The quiz pack is truncated.")
+            if hashed:
+                self.hash.update(chunk)
+            if out is None:
+                chunks.append(chunk)
+            else:
+                out.write(chunk)
+            remaining -= len(chunk)
+        if self.stream.read(1) != b"\n":
+            raise PackError("The quiz pack is damaged: a record is longer than its header says.")
+        if hashed:
+            self.hash.update(b"\n")
+        return None if out is not None else b"".join(chunks)
+
+
+def read_pack(stream, audio_sink=None):
+    """
+    Reads a pack from a binary stream (a file, an upload, a response body) and
+    returns a QuizPack once its checksum has been verified. Raises PackError.
+
+    Audio is kept in memory unless ``audio_sink(q_id, kind, mime)`` is given:
+    it returns a writable object that receives the clip in chunks, and then
+    QuizPack.audio maps to (mime, that object). The sink sees clips before the
+    checksum is verified; discard them if PackError is raised.
+    """
+    reader = _Reader(stream)
+    first = reader.line()
+    if not first.startswith(MAGIC.decode()):
+        raise PackError("This file is not a quiz pack.")
+    version = first[len(MAGIC):]
+    if not version.isdigit() or int(version) > FORMAT_VERSION:
+        raise PackError(f"This quiz pack has format version {version}; this app reads up to {FORMAT_VERSION}.")
+
+    meta, questions, option_orders, audio = {}, [], [], {}
+    while True:
+        kind, *fields = reader.line(hashed=False).split(" ")
+        try:
+            length = int(fields[0])
+        except (IndexError, ValueError):
+            raise PackError("The quiz pack is damaged: a record header is unreadable.") from None
+        if kind == "end":
+            end = reader.payload(length, hashed=False)
+            break
+        reader.hash.update(" ".join([kind, *fields]).encode() + b"\n")
+        if kind == "audio" and len(fields) == 4 and fields[2] in AUDIO_KINDS:
+            out = audio_sink(fields[1], fields[2], fields[3]) if audio_sink else None
+            payload = reader.payload(length, out=out)
+            audio[(fields[1], fields[2])] = (fields[3], payload if out is None else out)
+            continue
+        payload = reader.payload(length)
+        if kind == "meta":
+            meta = payload
+        elif kind == "question":
+            questions.append(payload)
+
+    try:
+        end = json.loads(end)
+    except ValueError:
+        raise PackError("The quiz pack is damaged: its checksum record is unreadable.") from None
+    if not isinstance(end, dict):
+        raise PackError("The quiz pack is damaged: its checksum record is unreadable.")
+    if end.get("sha256") != reader.hash.hexdigest():
+        raise PackError("The quiz pack is damaged: its checksum does not match.")
+    if end.get("questions") != len(questions) or end.get("audio") != len(audio):
+        raise PackError("The quiz pack is damaged: it does not hold what its checksum record lists.")
+
+    # One JSON decode for all the questions, and no id hashing: ids are kept as stored.
+    try:
+        meta = json.loads(meta) if meta else {}
+        records, items, ids = [], [], set()
+        for q_id, text, options, correct, hint, explanation, option_order in json.loads(
+                b"[" + b",".join(questions) + b"]"):
+            if not (isinstance(options, list) and isinstance(option_order, list)):
+                raise TypeError
+            if not isinstance(q_id, str) or not q_id or q_id in ids:
+                raise PackError(f"The quiz pack holds an invalid question: item {len(records) + 1} has a "
+                                f"missing or repeated id.")
+            if sorted(option_order) != list(range(len(options))):
+                raise PackError(f"The quiz pack holds an invalid question: item {len(records) + 1}'s option "
+                                f"order does not match its options.")
+            ids.add(q_id)
+            items.append({"question": text, "options": options, "correct": correct, "hint": hint,
+                          "explanation": explanation})
+            records.append(Question(q_id, text, tuple(options), correct, hint, explanation))
+            option_orders.append(tuple(option_order))
+    except PackError:
+        raise
+    except (ValueError, TypeError):
+        raise PackError("The quiz pack is damaged: a record is unreadable.") from None
+    if not isinstance(meta, dict):
+        raise PackError("The quiz pack is damaged: its title record is unreadable.")
+    # The checksum does not catch a hand-edited pack: questions are checked as pasted JSON is.
+    validation = validate_questions_array(items) if items else {"valid": True}
+    if not validation["valid"]:
+        raise PackError(f"The quiz pack holds an invalid question. {validation['error']}")
+    return QuizPack(meta.get("title", ""), meta.get("created", 0.0), records, option_orders, audio)
@@ -0,0 +1,170 @@
+"""
+QuizSession: the quiz engine behind the Streamlit views, with no Streamlit
+dependency.
+
+It holds the quiz's questions once (see quiz_model), an id -> position index,
+the current attempt (question order, option orders, answers, cursor) and the
+history of finished attempts. Answering updates the score counters and the
+incorrect list incrementally; incorrect questions are kept in the order they
+were missed, so revision mode is stable across reruns.
+"""
+import random
+from typing import NamedTuple
+
+from quiz_model import Question, new_attempt
+
+
+class Answer(NamedTuple):
+    selected: int
+    is_correct: bool
+
+
+class AttemptSummary(NamedTuple):
+    kind: str
+    total: int
+    correct: int
+    incorrect_ids: tuple
+
+
+class QuizSession:
+    FIRST = "first"
+    RETRY = "retry"
+    REDO_WRONG = "redo_wrong"
+
+    def __init__(self, questions, rng=None, shuffle=True, orders=None):
+        """
+        ``questions`` are Question records; with ``shuffle`` they are stored in a
+        random order once. ``orders`` is the first attempt's (question order,
+        option orders) when they are known already, instead of random ones.
+        """
+        self.rng = rng or random.Random()
+        questions = list(questions)
+        if shuffle:
+            self.rng.shuffle(questions)
+        self.questions = tuple(questions)
+        self.index = {}
+        for pos, q in enumerate(self.questions):
+            self.index.setdefault(q.id, pos)
+        self.history = []
+        self.attempt = 0
+        self._start(self.FIRST, range(len(self.questions)), shuffle_questions=False, orders=orders)
+
+    @classmethod
+    def from_dicts(cls, questions_data, rng=None, shuffle=True):
+        return cls([Question.from_dict(q) for q in questions_data], rng=rng, shuffle=shuffle)
+
+    @classmethod
+    def restore(cls, questions, attempt, kind, order, option_orders, answers=(), current=0, finished=False,
+                history=(), rng=None):
+        """
+        Rebuilds a session from a checkpoint (see quiz_store): ``questions`` in stored
+        order, the attempt's question and option orders, and its answers as
+        ``(q_id, selected)`` pairs in the order they were given.
+        """
+        quiz = cls(questions, rng=rng, shuffle=False,
+                   orders=(tuple(order), tuple(tuple(o) for o in option_orders)))
+        quiz.attempt = attempt
+        quiz.kind = kind
+        for q_id, selected in answers:
+            quiz.answer(q_id, selected)
+        quiz.current = current
+        quiz.finished = finished
+        quiz.history = [AttemptSummary(h[0], h[1], h[2], tuple(h[3])) for h in history]
+        return quiz
+
+    def _start(self, kind, positions, shuffle_questions, orders=None):
+        self.attempt += 1
+        self.kind = kind
+        self.order, self.option_orders = orders or new_attempt(self.questions, positions, shuffle_questions, self.rng)
+        self.current = 0
+        self.answers = {}
+        self.correct_count = 0
+        # Ids of missed questions in the order they were missed. Only the first answer
+        # counts, so an id is appended at most once and the list never needs a scan.
+        self.incorrect = []
+        self.finished = False
+
+    # --- Lookups ---
+
+    def question_by_id(self, q_id):
+        pos = self.index.get(q_id)
+        return None if pos is None else self.questions[pos]
+
+    @property
+    def total(self):
+        return len(self.order)
+
+    @property
+    def answered_count(self):
+        return len(self.answers)
+
+    @property
+    def current_question(self):
+        return self.questions[self.order[self.current]]
+
+    @property
+    def current_option_order(self):
+        return self.option_orders[self.current]
+
+    @property
+    def is_last(self):
+        return self.current == len(self.order) - 1
+
+    def answer_for(self, q_id):
+        return self.answers.get(q_id)
+
+    def incorrect_question(self, i):
+        return self.questions[self.index[self.incorrect[i]]]
+
+    def incorrect_questions(self):
+        return [self.questions[self.index[q_id]] for q_id in self.incorrect]
+
+    def score(self):
+        """(correct, total, percent) for the current attempt."""
+        total = len(self.order)
+        percent = round(self.correct_count / total * 100) if total else 0
+        return self.correct_count, total, percent
+
+    # --- Actions ---
+
+    def answer(self, q_id, selected):
+        """Records the first answer to a question; later answers are ignored. Returns the Answer."""
+        existing = self.answers.get(q_id)
+        if existing is not None:
+            return existing
+        record = Answer(selected, selected == self.questions[self.index[q_id]].correct)
+        self.answers[q_id] = record
+        if record.is_correct:
+            self.correct_count += 1
+        else:
+            self.incorrect.append(q_id)
+        return record
+
+    def go_back(self):
+        if self.current > 0:
+            self.current -= 1
+            return True
+        return False
+
+    def go_next(self):
+        if self.current < len(self.order) - 1:
+            self.current += 1
+            return True
+        return False
+
+    def finish(self):
+        if not self.finished:
+            self.finished = True
+            self.history.append(AttemptSummary(self.kind, len(self.order), self.correct_count, tuple(self.incorrect)))
+
+    def retry(self):
+        """All questions again, in a new order."""
+        self._start(self.RETRY, range(len(self.questions)), shuffle_questions=True)
+
+    def redo_incorrect(self):
+        """Only the questions missed in this attempt, in quiz order. Returns False if there are none."""
+        if not self.incorrect:
+            return False
+        positions = sorted(self.index[q_id] for q_id in self.incorrect)
+        self._start(self.REDO_WRONG, positions, shuffle_questions=False)
+        return True
@@ -0,0 +1,303 @@
+"""
+Quiz progress kept outside the Streamlit process, so a session can be resumed
+by any replica behind a load balancer, or after a reconnect.
+
+A quiz is checkpointed under a random session key (the ``?quiz=`` query
+parameter in the app). Checkpoints are incremental: the questions and audio
+URLs are written once when the quiz starts, the attempt's question and option
+orders when an attempt starts or finishes, and afterwards each answer is one
+appended row and each navigation one small update. ``QuizCheckpoint`` works
+out which of these a change needs by comparing the QuizSession with what it
+last wrote.
+
+Two backends share one interface:
+
+  MemoryQuizStore  per-process dicts; survives reruns and reconnects to the
+                   same process only (the default)
+  SQLiteQuizStore  one SQLite file in WAL mode, shared by every process that
+                   can open it (replicas on one host or a shared volume)
+
+Neither depends on Streamlit.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from quiz_model import Question
+from quiz_session import QuizSession
+from telemetry import span
+
+
+class QuizRecord(NamedTuple):
+    questions: list
+    audio_urls: dict
+    attempt: dict
+    answers: list
+    current: int
+
+    def to_session(self, rng=None):
+        a = self.attempt
+        return QuizSession.restore([_question(q) for q in self.questions], a["attempt"], a["kind"], a["order"],
+                                   a["option_orders"], self.answers, self.current, a["finished"], a["history"],
+                                   rng=rng)
+
+
+def _question(row):
+    q_id, text, options, *rest = row
+    return Question(q_id, text, tuple(options), *rest)
+
+
+def attempt_state(quiz):
+    return {
+        "attempt": quiz.attempt,
+        "kind": quiz.kind,
+        "order": list(quiz.order),
+        "option_orders": [list(o) for o in quiz.option_orders],
+        "finished": quiz.finished,
+        "history": [[h.kind, h.total, h.correct, list(h.incorrect_ids)] for h in quiz.history],
+    }
+
+
+class MemoryQuizStore:
+    """Checkpoints in this process's memory, least recently written dropped beyond ``max_sessions``."""
+
+    def __init__(self, max_sessions=10_000):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, key):
+        self._sessions.move_to_end(key)
+        return self._sessions[key]
+
+    def save_quiz(self, key, questions, audio_urls):
+        with self._lock:
+            self._sessions[key] = {"questions": [list(q) for q in questions], "audio": json.dumps(audio_urls),
+                                   "attempt": None, "answers": [], "current": 0}
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def save_audio(self, key, audio_urls):
+        with self._lock:
+            if key in self._sessions:
+                self._touch(key)["audio"] = json.dumps(audio_urls)
+
+    def save_attempt(self, key, attempt):
+        with self._lock:
+            if key in self._sessions:
+                session = self._touch(key)
+                if session["attempt"] is None or session["attempt"]["attempt"] != attempt["attempt"]:
+                    session["answers"] = []
+                session["attempt"] = json.loads(json.dumps(attempt))
+
+    def add_answers(self, key, attempt_no, first_seq, answers):
+        """Stores answers ``first_seq``, ``first_seq + 1``, ... of the attempt, in the order given."""
+        with self._lock:
+            if key in self._sessions:
+                session = self._touch(key)
+                if session["attempt"] is not None and session["attempt"]["attempt"] == attempt_no:
+                    del session["answers"][first_seq:]
+                    session["answers"].extend((q_id, selected) for q_id, selected in answers)
+
+    def save_cursor(self, key, current):
+        with self._lock:
+            if key in self._sessions:
+                self._touch(key)["current"] = current
+
+    def load(self, key):
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or session["attempt"] is None:
+                return None
+            return QuizRecord([list(q) for q in session["questions"]], json.loads(session["audio"]),
+                              json.loads(json.dumps(session["attempt"])), list(session["answers"]),
+                              session["current"])
+
+    def delete(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteQuizStore:
+    """
+    Checkpoints in a SQLite database. WAL mode lets readers in other processes
+    proceed while one writes; ``synchronous=NORMAL`` keeps an answer to a single
+    short transaction without an fsync per commit. Sessions not written for
+    ``max_age`` seconds are purged whenever a new quiz is saved.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS quiz_sessions (
+            session_key TEXT PRIMARY KEY,
+            questions TEXT NOT NULL,
+            audio TEXT NOT NULL,
+            attempt TEXT,
+            current INTEGER NOT NULL DEFAULT 0,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS quiz_sessions_updated ON quiz_sessions (updated);
+        CREATE TABLE IF NOT EXISTS quiz_answers (
+            session_key TEXT NOT NULL,
+            attempt INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            q_id TEXT NOT NULL,
+            selected INTEGER NOT NULL,
+            PRIMARY KEY (session_key, attempt, seq)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path, max_age=7 * 24 * 3600, clock=time.time):
+        self.path = path
+        self.max_age = max_age
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def _write(self, *statements):
+        with self._lock, span("quiz_checkpoint"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def save_quiz(self, key, questions, audio_urls):
+        now = self.clock()
+        self._write(
+            ("DELETE FROM quiz_answers WHERE session_key IN "
+             "(SELECT session_key FROM quiz_sessions WHERE updated < ?) OR session_key = ?",
+             (now - self.max_age, key)),
+            ("DELETE FROM quiz_sessions WHERE updated < ?", (now - self.max_age,)),
+            ("INSERT OR REPLACE INTO quiz_sessions (session_key, questions, audio, attempt, current, updated) "
+             "VALUES (?, ?, ?, NULL, 0, ?)",
+             (key, json.dumps([list(q) for q in questions]), json.dumps(audio_urls), now)),
+        )
+
+    def save_audio(self, key, audio_urls):
+        self._write(("UPDATE quiz_sessions SET audio = ?, updated = ? WHERE session_key = ?",
+                     (json.dumps(audio_urls), self.clock(), key)))
+
+    def save_attempt(self, key, attempt):
+        self._write(
+            ("DELETE FROM quiz_answers WHERE session_key = ? AND attempt != ?", (key, attempt["attempt"])),
+            ("UPDATE quiz_sessions SET attempt = ?, updated = ? WHERE session_key = ?",
+             (json.dumps(attempt), self.clock(), key)),
+        )
+
+    def add_answers(self, key, attempt_no, first_seq, answers):
+        statements = [("INSERT OR REPLACE INTO quiz_answers (session_key, attempt, seq, q_id, selected) "
+                       "VALUES (?, ?, ?, ?, ?)", (key, attempt_no, first_seq + i, q_id, selected))
+                      for i, (q_id, selected) in enumerate(answers)]
+        statements.append(("UPDATE quiz_sessions SET updated = ? WHERE session_key = ?", (self.clock(), key)))
+        self._write(*statements)
+
+    def save_cursor(self, key, current):
+        self._write(("UPDATE quiz_sessions SET current = ?, updated = ? WHERE session_key = ?",
+                     (current, self.clock(), key)))
+
+    def load(self, key):
+        with self._lock, span("quiz_restore"):
+            row = self._conn.execute("SELECT questions, audio, attempt, current FROM quiz_sessions "
+                                     "WHERE session_key = ?", (key,)).fetchone()
+            if row is None or row[2] is None:
+                return None
+            attempt = json.loads(row[2])
+            answers = self._conn.execute("SELECT q_id, selected FROM quiz_answers "
+                                         "WHERE session_key = ? AND attempt = ? ORDER BY seq",
+                                         (key, attempt["attempt"])).fetchall()
+        return QuizRecord(json.loads(row[0]), json.loads(row[1]), attempt, answers, row[3])
+
+    def delete(self, key):
+        self._write(("DELETE FROM quiz_answers WHERE session_key = ?", (key,)),
+                    ("DELETE FROM quiz_sessions WHERE session_key = ?", (key,)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_quiz_store(kind="memory", path=None):
+    """``kind`` is ``memory`` or ``sqlite`` (``path`` is the database file)."""
+    if kind == "memory":
+        return MemoryQuizStore()
+    if kind == "sqlite":
+        return SQLiteQuizStore(path or "data/quiz_sessions.sqlite3")
+    raise ValueError(f"Unknown quiz store {kind!r}; expected 'memory' or 'sqlite'")
+
+
+class QuizCheckpoint:
+    """
+    What has been written for one session key. ``save`` compares the quiz with
+    that and writes only the difference; it holds no reference to the store, so
+    it can live in st.session_state.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self._quiz = None
+        self._audio = None
+        self._attempt = None
+        self._answers = 0
+        self._current = None
+
+    @classmethod
+    def restored(cls, key, quiz, record):
+        """Marks a quiz rebuilt from ``record`` as already written."""
+        checkpoint = cls(key)
+        checkpoint._quiz = quiz
+        checkpoint._audio = _audio_count(record.audio_urls)
+        checkpoint._attempt = (quiz.attempt, quiz.finished)
+        checkpoint._answers = len(quiz.answers)
+        checkpoint._current = quiz.current
+        return checkpoint
+
+    def save(self, store, quiz, audio_urls=None):
+        audio_urls = audio_urls or {}
+        if quiz is not self._quiz:
+            store.save_quiz(self.key, quiz.questions, audio_urls)
+            self._quiz, self._audio = quiz, _audio_count(audio_urls)
+            self._attempt, self._answers, self._current = None, 0, None
+        elif _audio_count(audio_urls) != self._audio:
+            store.save_audio(self.key, audio_urls)
+            self._audio = _audio_count(audio_urls)
+
+        if (quiz.attempt, quiz.finished) != self._attempt:
+            if self._attempt is None or self._attempt[0] != quiz.attempt:
+                self._answers, self._current = 0, None
+            store.save_attempt(self.key, attempt_state(quiz))
+            self._attempt = (quiz.attempt, quiz.finished)
+
+        new = len(quiz.answers) - self._answers
+        if new > 0:
+            latest = []
+            for q_id, answer in reversed(quiz.answers.items()):
+                latest.append((q_id, answer.selected))
+                if len(latest) == new:
+                    break
+            store.add_answers(self.key, quiz.attempt, self._answers, latest[::-1])
+            self._answers = len(quiz.answers)
+
+        if quiz.current != self._current:
+            store.save_cursor(self.key, quiz.current)
+            self._current = quiz.current
+
+
+def _audio_count(audio_urls):
+    return sum(len(v) for v in audio_urls.values() if isinstance(v, dict))
@@ -0,0 +1,154 @@
+"""
+Topic-focused retrieval over the Text Collector's sources.
+
+BM25Index splits every source into passages (see text_chunks) and keeps an
+inverted index of them. ``sync`` updates it incrementally: only sources that
+were added, replaced or deleted since the last sync are (re)indexed, using the
+same text-identity check as local_sources.plan_writes. ``build_context`` then
+fills a prompt budget with the passages that best match a topic, so a quiz can
+be generated from everything a user has uploaded, not only what fits when
+whole documents are concatenated.
+
+Pure Python and free of Streamlit.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from typing import NamedTuple
+
+from model_router import estimate_tokens
+from text_chunks import CHUNK_CHARS, chunk_text
+
+
+_WORD = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from had has have he her his i in is it its of on or she so that the "
+    "their them there these they this to was we were which who will with you your".split())
+
+
+def tokenize(text):
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+class Passage(NamedTuple):
+    name: str
+    seq: int
+    text: str
+
+
+class BM25Index:
+    """
+    Okapi BM25 over passages. Postings map term -> {passage id: term frequency};
+    removing a source deletes only its own passages' postings, and the corpus
+    statistics (passage count, total length) are kept as running sums.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, chunk_chars=CHUNK_CHARS):
+        self.k1 = k1
+        self.b = b
+        self.chunk_chars = chunk_chars
+        self.postings = {}
+        self.passages = {}   # id -> (Passage, length in terms, distinct terms)
+        self.sources = {}    # name -> (text, [passage ids])
+        self.total_length = 0
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.passages)
+
+    def add(self, name, text):
+        """Indexes a source, replacing any earlier text under the same name."""
+        if name in self.sources:
+            self.remove(name)
+        ids = []
+        for seq, chunk in enumerate(chunk_text(text, self.chunk_chars)):
+            counts = Counter(tokenize(chunk))
+            if not counts:
+                continue
+            pid = self._next_id
+            self._next_id += 1
+            length = sum(counts.values())
+            self.passages[pid] = (Passage(name, seq, chunk), length, tuple(counts))
+            self.total_length += length
+            for term, tf in counts.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    self.postings[term] = {pid: tf}
+                else:
+                    postings[pid] = tf
+            ids.append(pid)
+        self.sources[name] = (text, ids)
+
+    def remove(self, name):
+        _, ids = self.sources.pop(name, (None, ()))
+        for pid in ids:
+            _, length, terms = self.passages.pop(pid)
+            self.total_length -= length
+            for term in terms:
+                postings = self.postings[term]
+                del postings[pid]
+                if not postings:
+                    del self.postings[term]
+
+    def sync(self, sources):
+        """
+        Brings the index in line with ``sources`` ({name: text}). A source whose
+        text is still the same object is not touched. Returns (added, removed) counts.
+        """
+        removed = [name for name in self.sources if name not in sources]
+        for name in removed:
+            self.remove(name)
+        added = 0
+        for name, text in sources.items():
+            indexed = self.sources.get(name)
+            if indexed is None or indexed[0] is not text:
+                self.add(name, text)
+                added += 1
+        return added, len(removed)
+
+    def search(self, query, limit=10):
+        """The ``limit`` best (score, Passage) pairs for ``query``, best first."""
+        terms = set(tokenize(query))
+        if not terms or not self.passages:
+            return []
+        n = len(self.passages)
+        avg_length = self.total_length / n
+        k1, b = self.k1, self.b
+        scores = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pid, tf in postings.items():
+                length = self.passages[pid][1]
+                score = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+                scores[pid] = scores.get(pid, 0.0) + score
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, self.passages[pid][0]) for pid, score in best]
+
+    def build_context(self, query, max_chars, max_tokens=None):
+        """
+        Material for a quiz on ``query``: the best passages that fit in ``max_chars``
+        (and ``max_tokens``, if given), each under a header naming its source, in
+        source and passage order so neighbouring passages read continuously.
+        Returns (text, passages); text is "" if nothing matches.
+        """
+        chosen, used_chars, used_tokens = [], 0, 0
+        # Enough candidates to fill the budget even if some are too long to fit.
+        for _, passage in self.search(query, limit=max(10, 2 * max_chars // max(1, self.chunk_chars))):
+            block = _passage_block(passage)
+            chars = len(block) + (2 if chosen else 0)
+            tokens = estimate_tokens(block)
+            if used_chars + chars > max_chars or (max_tokens is not None and used_tokens + tokens > max_tokens):
+                continue
+            chosen.append(passage)
+            used_chars += chars
+            used_tokens += tokens
+        chosen.sort(key=lambda p: (p.name, p.seq))
+        return "\n\n".join(_passage_block(p) for p in chosen), chosen
+
+
+def _passage_block(passage):
+    return f"--- {passage.name} (passage {passage.seq + 1}) ---\n\n{passage.text}"
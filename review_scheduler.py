@@ -0,0 +1,241 @@
+"""
+Spaced repetition over answer history: every answered question gets a card
+saying when it is next due for review, per learner, scheduled with SM-2.
+
+An answer updates the question's card (repetitions, interval, ease factor,
+due time) and is appended to the learner's answer log. Cards and the log live
+in SQLite: one file shared by sessions and processes, or an in-memory database
+that lasts as long as the process. Which questions are due is answered by a
+heap of (due time, question id) per learner, loaded from the cards once and
+then kept up to date by every answer, so taking the next due question costs
+O(log n) in the learner's number of cards instead of a scan of their history.
+A heap only sees the answers recorded through its own scheduler after it was
+loaded; another process's answers show up when the learner's heap is next
+loaded.
+
+Free of Streamlit.
+"""
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from telemetry import span
+
+
+DAY = 86400.0
+START_EASE = 2.5
+MIN_EASE = 1.3
+# SM-2 grades answers 0-5, 3 or more being a pass. A quiz only knows right or wrong.
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+MAX_CACHED_LEARNERS = 256
+
+
+class Card(NamedTuple):
+    q_id: str
+    repetitions: int  # passes in a row
+    interval: float   # days until the next review
+    ease: float
+    due: float        # timestamp
+    lapses: int       # failed answers
+
+
+def new_card(q_id, now):
+    return Card(q_id, 0, 0.0, START_EASE, now, 0)
+
+
+def sm2(card, quality, now):
+    """
+    The card after an answer of ``quality`` (0-5) at ``now``. A pass is due
+    again after 1 day, then 6, then the previous interval times the ease
+    factor; a failure starts the repetitions again at 1 day. The ease factor
+    is adjusted after every answer, failures included, and never drops below
+    MIN_EASE.
+    """
+    if quality >= 3:
+        interval = 1.0 if card.repetitions == 0 else 6.0 if card.repetitions == 1 else card.interval * card.ease
+        repetitions, lapses = card.repetitions + 1, card.lapses
+    else:
+        interval, repetitions, lapses = 1.0, 0, card.lapses + 1
+    miss = 5 - quality
+    ease = max(MIN_EASE, card.ease + 0.1 - miss * (0.08 + miss * 0.02))
+    return Card(card.q_id, repetitions, interval, ease, now + interval * DAY, lapses)
+
+
+class _DueQueue:
+    """
+    A learner's (due, q_id) min-heap. Rescheduling pushes a new entry; the old
+    one stays in the heap and is skipped when it reaches the top (``due`` holds
+    each question's current due time), and the heap is rebuilt once stale
+    entries outnumber live ones.
+    """
+
+    def __init__(self, cards):
+        self.due = dict(cards)
+        self.heap = [(due, q_id) for q_id, due in self.due.items()]
+        heapq.heapify(self.heap)
+
+    def push(self, q_id, due):
+        self.due[q_id] = due
+        heapq.heappush(self.heap, (due, q_id))
+        if len(self.heap) > 2 * len(self.due) + 64:
+            self.heap = [(due, q_id) for q_id, due in self.due.items()]
+            heapq.heapify(self.heap)
+
+    def take(self, now, limit):
+        """Up to ``limit`` ids due at ``now``, most overdue first. They stay due until answered."""
+        taken = []
+        heap = self.heap
+        while heap and len(taken) < limit:
+            due, q_id = heap[0]
+            if self.due.get(q_id) != due:
+                heapq.heappop(heap)
+            elif due > now:
+                break
+            else:
+                taken.append(heapq.heappop(heap))
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return [q_id for _, q_id in taken]
+
+
+class ReviewScheduler:
+    """
+    Cards and answer log in one SQLite database (WAL mode when on disk), safe
+    to share between threads; ``path`` may be ``:memory:``.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS review_cards (
+            learner TEXT NOT NULL,
+            q_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            repetitions INTEGER NOT NULL,
+            interval REAL NOT NULL,
+            ease REAL NOT NULL,
+            due REAL NOT NULL,
+            lapses INTEGER NOT NULL,
+            PRIMARY KEY (learner, q_id)
+        );
+        CREATE INDEX IF NOT EXISTS review_cards_due ON review_cards (learner, due);
+        CREATE TABLE IF NOT EXISTS review_log (
+            learner TEXT NOT NULL,
+            q_id TEXT NOT NULL,
+            correct INTEGER NOT NULL,
+            quality INTEGER NOT NULL,
+            answered REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS review_log_learner ON review_log (learner, answered);
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()  # learner -> _DueQueue, least recently used first
+
+    def _transaction(self, work):
+        with self._lock, span("review_write"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return result
+
+    def _queue(self, learner):
+        """The learner's heap, loaded on first use. Call with the lock held."""
+        queue = self._queues.get(learner)
+        if queue is None:
+            with span("review_load"):
+                queue = _DueQueue(self._conn.execute(
+                    "SELECT q_id, due FROM review_cards WHERE learner = ?", (learner,)))
+            self._queues[learner] = queue
+            if len(self._queues) > MAX_CACHED_LEARNERS:
+                self._queues.popitem(last=False)
+        else:
+            self._queues.move_to_end(learner)
+        return queue
+
+    def record(self, learner, question, correct, now=None):
+        """Reschedules ``question`` (a quiz_model.Question) after an answer; returns its new Card."""
+        now = self.clock() if now is None else now
+        quality = QUALITY_CORRECT if correct else QUALITY_WRONG
+
+        def work(conn):
+            row = conn.execute("SELECT repetitions, interval, ease, due, lapses FROM review_cards "
+                               "WHERE learner = ? AND q_id = ?", (learner, question.id)).fetchone()
+            card = sm2(Card(question.id, *row) if row else new_card(question.id, now), quality, now)
+            if row:
+                conn.execute("UPDATE review_cards SET repetitions = ?, interval = ?, ease = ?, due = ?, lapses = ? "
+                             "WHERE learner = ? AND q_id = ?", (*card[1:], learner, question.id))
+            else:
+                conn.execute("INSERT INTO review_cards VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (learner, question.id, json.dumps(question.to_dict(), ensure_ascii=False), *card[1:]))
+            conn.execute("INSERT INTO review_log VALUES (?, ?, ?, ?, ?)",
+                         (learner, question.id, int(bool(correct)), quality, now))
+            return card
+        card = self._transaction(work)
+        with self._lock:
+            queue = self._queues.get(learner)
+            if queue is not None:  # Otherwise it is loaded, with this card, when first needed.
+                queue.push(card.q_id, card.due)
+        return card
+
+    def due(self, learner, limit=20, now=None):
+        """Up to ``limit`` due questions as question dicts, most overdue first."""
+        now = self.clock() if now is None else now
+        with self._lock, span("review_due"):
+            q_ids = self._queue(learner).take(now, limit)
+            if not q_ids:
+                return []
+            rows = dict(self._conn.execute(
+                f"SELECT q_id, question FROM review_cards WHERE learner = ? AND q_id IN ({','.join('?' * len(q_ids))})",
+                (learner, *q_ids)))
+        return [json.loads(rows[q_id]) for q_id in q_ids if q_id in rows]
+
+    def due_count(self, learner, now=None):
+        now = self.clock() if now is None else now
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM review_cards WHERE learner = ? AND due <= ?",
+                                      (learner, now)).fetchone()[0]
+
+    def card(self, learner, q_id):
+        with self._lock:
+            row = self._conn.execute("SELECT repetitions, interval, ease, due, lapses FROM review_cards "
+                                     "WHERE learner = ? AND q_id = ?", (learner, q_id)).fetchone()
+        return Card(q_id, *row) if row else None
+
+    def history(self, learner, limit=100):
+        """The learner's latest answers as (q_id, correct, answered), newest first."""
+        with self._lock:
+            rows = self._conn.execute("SELECT q_id, correct, answered FROM review_log WHERE learner = ? "
+                                      "ORDER BY answered DESC, rowid DESC LIMIT ?", (learner, limit)).fetchall()
+        return [(q_id, bool(correct), answered) for q_id, correct, answered in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_review_scheduler(kind="memory", path=None):
+    """``kind`` is ``memory`` (kept by this process) or ``sqlite`` (``path`` is the database file)."""
+    if kind == "memory":
+        return ReviewScheduler(":memory:")
+    if kind == "sqlite":
+        return ReviewScheduler(path or "data/review.sqlite3")
+    raise ValueError(f"Unknown review store {kind!r}; expected 'memory' or 'sqlite'")
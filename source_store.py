@@ -0,0 +1,158 @@
+"""
+Self-hosted storage for the Text Collector's sources: one SQLite file, no
+external services.
+
+SQLiteSourceStore has the same get/save/delete/clear operations as
+cloud_store.CloudSourceStore, keyed by the same Resources ID, so the app can
+use either. Every saved source is also split into passages (see text_chunks)
+and indexed with FTS5, so ``search`` finds passages across all of a user's
+sources, ranked by BM25, without loading any source into memory.
+"""
+import os
+import re
+import sqlite3
+import threading
+from typing import NamedTuple
+
+from telemetry import span
+from text_chunks import chunk_text
+
+
+class Passage(NamedTuple):
+    name: str
+    seq: int
+    text: str
+    snippet: str
+    score: float
+
+
+def match_query(query):
+    """
+    An FTS5 query matching every word of free text, the last one as a prefix
+    so results follow the user's typing. Words are quoted, so FTS5 operators
+    and punctuation in the input are taken literally. None if there are no words.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+class SQLiteSourceStore:
+    """
+    Sources and their passage index in one SQLite database. A save replaces a
+    source's passages in the same transaction as its text, so the index never
+    lags the sources.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sources (
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (user_id, name)
+        );
+        CREATE TABLE IF NOT EXISTS source_chunks (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            seq INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS source_chunks_doc ON source_chunks (user_id, name);
+        CREATE VIRTUAL TABLE IF NOT EXISTS source_chunks_fts USING fts5(text, tokenize = 'unicode61 remove_diacritics 2');
+    """
+
+    def __init__(self, path, chunk_chars=1000):
+        self.path = path
+        self.chunk_chars = chunk_chars
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def _transaction(self, work):
+        with self._lock, span("source_store_write"):
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                work(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _drop_chunks(conn, user_id, names=None):
+        where, params = "user_id = ?", [user_id]
+        if names is not None:
+            where += f" AND name IN ({', '.join('?' * len(names))})"
+            params += list(names)
+        conn.execute(f"DELETE FROM source_chunks_fts WHERE rowid IN (SELECT id FROM source_chunks WHERE {where})",
+                     params)
+        conn.execute(f"DELETE FROM source_chunks WHERE {where}", params)
+
+    def get(self, user_id):
+        """The user's {name: text} sources; {} if they have none."""
+        with self._lock, span("source_store_read"):
+            rows = self._conn.execute("SELECT name, text FROM sources WHERE user_id = ?", (user_id,)).fetchall()
+        return dict(rows)
+
+    def names(self, user_id):
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM sources WHERE user_id = ? ORDER BY name", (user_id,))
+            return [name for (name,) in rows]
+
+    def save(self, user_id, sources):
+        """Adds or overwrites the given sources, leaving the user's other sources alone."""
+        if not sources:
+            return
+        chunked = {name: chunk_text(text, self.chunk_chars) for name, text in sources.items()}
+
+        def work(conn):
+            self._drop_chunks(conn, user_id, list(sources))
+            conn.executemany("INSERT OR REPLACE INTO sources (user_id, name, text) VALUES (?, ?, ?)",
+                             [(user_id, name, text) for name, text in sources.items()])
+            for name, chunks in chunked.items():
+                for seq, chunk in enumerate(chunks):
+                    rowid = conn.execute("INSERT INTO source_chunks (user_id, name, seq) VALUES (?, ?, ?)",
+                                         (user_id, name, seq)).lastrowid
+                    conn.execute("INSERT INTO source_chunks_fts (rowid, text) VALUES (?, ?)", (rowid, chunk))
+        self._transaction(work)
+
+    def delete(self, user_id, names):
+        names = list(names)
+        if not names:
+            return
+
+        def work(conn):
+            self._drop_chunks(conn, user_id, names)
+            conn.execute(f"DELETE FROM sources WHERE user_id = ? AND name IN ({', '.join('?' * len(names))})",
+                         [user_id] + names)
+        self._transaction(work)
+
+    def clear(self, user_id):
+        def work(conn):
+            self._drop_chunks(conn, user_id)
+            conn.execute("DELETE FROM sources WHERE user_id = ?", (user_id,))
+        self._transaction(work)
+
+    def search(self, user_id, query, limit=20):
+        """The user's passages best matching ``query``, best first, as Passage records."""
+        match = match_query(query)
+        if match is None:
+            return []
+        with self._lock, span("source_search"):
+            rows = self._conn.execute(
+                "SELECT c.name, c.seq, source_chunks_fts.text, "
+                "snippet(source_chunks_fts, 0, '**', '**', '…', 16), bm25(source_chunks_fts) "
+                "FROM source_chunks_fts JOIN source_chunks c ON c.id = source_chunks_fts.rowid "
+                "WHERE source_chunks_fts MATCH ? AND c.user_id = ? ORDER BY bm25(source_chunks_fts) LIMIT ?",
+                (match, user_id, limit)).fetchall()
+        return [Passage(name, seq, text, snippet, -score) for name, seq, text, snippet, score in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,26 +1,39 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import io
 import json
-import random
-import hashlib
 import os
 import re
 import time
-import requests
 from datetime import datetime
 from contextlib import contextmanager
 
-
-from streamlit_local_storage import LocalStorage
-import fitz
-import docx
-import pptx
-import csv
-import io
+import secrets
 from concurrent.futures import ThreadPoolExecutor
 
-import pyrebase
 import re
 
+SCRIPT_STARTED = time.perf_counter()
+
+from llm_backends import backend_from_settings
+from model_router import AUTO_MODEL, ModelRouter
+from telemetry import (configure as configure_telemetry, record as record_phase, register_gauge, size_bucket, span,
+                       start_metrics_server)
+from blob_store import BlobStore, is_large
+from cloud_store import CloudSourceStore, UserSourceCache
+from extraction import extract_text
+from source_store import SQLiteSourceStore
+import local_sources
+from retrieval import BM25Index
+from quiz_session import QuizSession
+from quiz_store import QuizCheckpoint, create_quiz_store
+from question_bank import QuestionBank, source_hash
+from review_scheduler import create_review_scheduler
+from memory_accounting import AllocationTracker, MemoryAccountant, process_rss
+from quiz_pack import EXTENSION as QUIZ_PACK_EXTENSION, PackError, read_pack, write_pack
+from quiz_core import (difficulty_sets, get_demo_questions, is_valid_json_input, run_batch_generation,
+                       run_generation, strip_markdown_fences, validate_questions_array, variant_sets)
+
 try:
     API_KEY = st.secrets["jsonbin"]["api_key"]
     BIN_ID = st.secrets["jsonbin"]["bin_id"]
@@ -43,17 +56,6 @@ config = {
     "storageBucket": st.secrets["firebase"]["firebase_storageBucket"],
 }
 
-# --- Initialize Firebase ---
-# We use a try-except block to prevent re-initialization on every rerun
-try:
-    firebase = pyrebase.initialize_app(config)
-    db = firebase.database()
-except ValueError:
-    # If the app is already initialized, just get the instance
-    # This is a workaround for Streamlit's execution model
-    app = firebase.get_app()
-    db = firebase.database(app)
-
 # Configure page
 st.set_page_config(
     page_title="Knowledge Quest",
@@ -62,83 +64,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-localS = LocalStorage()
-
-# Poe API Client
-class PoeAPIClient:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.base_url = "https://api.poe.com/v1"
-
-    def generate_questions(self, prompt, model="Gemini-3-Flash"):
-        """Generate questions using Poe API"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.7,
-            "max_tokens": 20000,
-            "stream": False
-        }
-        try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=120
-            )
-            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-            result = response.json()
-            return result['choices'][0]['message']['content']
-        except requests.exceptions.RequestException as e:
-            st.error(f"API Request failed: {str(e)}")
-            return None
-
-    def generate_tts(self, text, voice="default"):
-        """
-        Generate TTS audio using Poe API.
-        NOTE: This function assumes the Poe API returns an audio URL in an 'attachments'
-        field for a chat completion call to a model like 'ElevenLabs-v3'. This is an
-        unconventional way to get TTS and may be fragile or incorrect depending on the
-        actual Poe API specification.
-        """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        data = {
-            "model": "ElevenLabs-v3",  # This model name is hypothetical
-            "messages": [{"role": "user", "content": text.strip()}],
-            "stream": False
-        }
-        try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            response.raise_for_status()
-            result = response.json()
-            message = result.get('choices', [{}])[0].get('message', {})
-            if 'attachments' in message:
-                for attachment in message['attachments']:
-                    if attachment.get('content_type', '').startswith('audio/'):
-                        return attachment.get('url')
-            # Fallback if the structure is different but URL is in content
-            content = message.get('content', '')
-            url_match = re.search(r'https?://[^\s]+', content)
-            if url_match:
-                return url_match.group(0)
-            return None
-        except requests.exceptions.RequestException as e:
-            st.error(f"TTS Generation failed: {e}")
-            return None
-
-
 # --- Improved Horizontal Layout CSS and Context Manager ---
 # --- Improved Horizontal Layout CSS and Context Manager ---
 # --- Improved Horizontal Layout CSS and Context Manager ---
@@ -217,12 +142,10 @@ st.markdown("""
 # Initialize session state
 def init_session_state():
     defaults = {
-        'questions': [], 'original_questions': [], 'current_question_index': 0,
-        'questions_completed': 0, 'incorrect_question_ids': set(), 'quiz_started': False,
-        'quiz_finished': False, 'user_answers': {}, 'score_history': [],
+        'quiz': None, 'quiz_started': False, 'score_history': [],
         'revision_mode': False, 'revision_index': 0, 'audio_urls': {'questions': {}, 'answers': {}},
         'generating_questions': False, 'poe_client': None, 'show_ai_settings': False,
-        'audio_generated': False, 'is_redoing_wrong': False, 'quiz_generation_in_progress': False,
+        'audio_generated': False, 'quiz_generation_in_progress': False,
         'uploader_key': 0, 'confirm_clear_local': False, 'confirm_clear_cloud': False, 'char_limit': 30000
     }
     for key, default_value in defaults.items():
@@ -231,230 +154,313 @@ def init_session_state():
 
 
 # Utility functions
-def get_poe_api_key():
-    api_key = os.getenv("POE_API_KEY")
-    if not api_key:
+def get_setting(name, default=""):
+    """Reads a setting from the environment first, then from st.secrets."""
+    value = os.getenv(name)
+    if not value:
         try:
-            api_key = st.secrets.get("POE_API_KEY", "")
+            value = st.secrets.get(name, default)
         except Exception:
-            api_key = ""
-    return api_key
+            value = default
+    return value
 
 
-def init_poe_client():
-    if st.session_state.poe_client is None:
-        api_key = get_poe_api_key()
-        if api_key:
-            st.session_state.poe_client = PoeAPIClient(api_key)
-            return True
-        return False
-    return True
+def create_llm_backend():
+    """The chat/TTS backend selected by LLM_BACKEND (see llm_backends.backend_from_settings), or None."""
+    return backend_from_settings(get_setting, on_error=st.error)
+
 
+def get_model_options():
+    """Models offered in the AI settings; LLM_MODELS (comma-separated) overrides the Poe defaults."""
+    configured = get_setting("LLM_MODELS", "")
+    if configured:
+        return [m.strip() for m in str(configured).split(",") if m.strip()]
+    return ["Gemini-3-Flash",
+            'Grok-4.1-Fast-Reasoning',
+            # "Gemini-2.5-Pro",
+            # "GPT-5",
+            "GPT-5-mini"]
 
-def stable_hash(text):
-    return 'q_' + hashlib.md5(text.encode()).hexdigest()[:8]
 
+@st.cache_resource
+def get_model_router():
+    """One router per process so latency/truncation statistics are shared across sessions."""
+    return ModelRouter(get_model_options(), log_path=get_setting("ROUTER_LOG_PATH", "") or None)
 
-def strip_markdown_fences(text):
+
+@st.cache_resource
+def init_telemetry():
     """
-    Extracts content from markdown code fences (```json ... ```) or
-    the largest apparent JSON array/object from a string.
-    Does NOT validate JSON completeness, just extracts the raw string.
+    Configures phase timing once per process. Enabled by METRICS_ENABLED, or implicitly by
+    METRICS_LOG_PATH (JSON lines) or METRICS_PORT (Prometheus text at /metrics).
     """
-    # 1. Prioritize markdown code fences
-    match = re.search(r"```(?:json)?\s*\n(.*?)\n\s*```", text, flags=re.DOTALL)
-    if match:
-        return match.group(1).strip()
-
-    # 2. Fallback Strategy: Look for a bare JSON array or object
-    # We need to find the outermost array or object if no fences are present.
-    # This is trickier because the text might contain other prose.
-
-    best_json_candidate = None
-
-    # Try array first
-    start_bracket = text.find('[')
-    end_bracket = text.rfind(']')
-    if start_bracket != -1 and end_bracket > start_bracket:
-        candidate = text[start_bracket: end_bracket + 1]
-        # Heuristic: does it look like an array of objects?
-        if candidate.count('{') > 0 and candidate.count('}') > 0:
-            best_json_candidate = candidate
-
-    # Then try object (only if no good array candidate or if object is more prominent)
-    start_brace = text.find('{')
-    end_brace = text.rfind('}')
-    if start_brace != -1 and end_brace > start_brace:
-        candidate = text[start_brace: end_brace + 1]
-        # If we have an array candidate, and this object is not the *entire* content,
-        # we stick with the array. This is a heuristic.
-        if best_json_candidate is None or (
-                len(candidate) > len(best_json_candidate) and not best_json_candidate.startswith('[')):
-            best_json_candidate = candidate
-
-    return best_json_candidate
-
-
-def parse_partial_json_array(json_string):
+    log_path = get_setting("METRICS_LOG_PATH", "")
+    port = get_setting("METRICS_PORT", "")
+    enabled = str(get_setting("METRICS_ENABLED", "")).lower() in ("1", "true", "yes") or bool(log_path or port)
+    configure_telemetry(enabled=enabled, log_path=log_path)
+    if enabled and port:
+        start_metrics_server(int(port))
+    return enabled
+
+
+@st.cache_resource
+def get_firebase_db():
     """
-    Attempts to parse a JSON string, potentially truncated, to extract as many
-    complete JSON objects from an array as possible.
-    Returns a list of parsed objects.
+    One Firebase app per process: pyrebase (slow to import) is loaded on first
+    cloud access, and its HTTP session keeps connections alive across reruns.
     """
-    if not json_string:
-        return []
+    import pyrebase
+    return pyrebase.initialize_app(config).database()
 
-    json_string = json_string.strip()
 
-    # If it's a complete, valid JSON array, parse it directly
-    try:
-        data = json.loads(json_string)
-        if isinstance(data, list):
-            return data
-    except json.JSONDecodeError:
-        pass  # It's partial or malformed, proceed to recovery logic
+def source_search_enabled():
+    """Passage search needs the SQLite source store; checked without creating the store."""
+    return str(get_setting("SOURCE_STORE", "firebase")).lower() == "sqlite"
 
-    # If it doesn't start with an array, it's not what we expect for questions.
-    # Or if it's a single object, we can try to wrap it, but for a list of questions,
-    # we primarily expect an array.
-    if not json_string.startswith('['):
-        return []
 
-    recovered_objects = []
-    balance = 0
-    in_string = False
-    escape_char = False
-    start_obj_index = -1
-
-    # Iterate through the string to find complete top-level objects within the array
-    # We need to handle nested structures and strings correctly to avoid misinterpreting '}'
-    for i, char in enumerate(json_string):
-        if in_string:
-            if char == '\\':
-                escape_char = not escape_char
-            elif char == '"' and not escape_char:
-                in_string = False
-            else:
-                escape_char = False
-        elif char == '"':
-            in_string = True
-            escape_char = False
-        elif char == '{':
-            if balance == 0:  # Start of a new top-level object in the array
-                start_obj_index = i
-            balance += 1
-        elif char == '}':
-            balance -= 1
-            # If balance returns to 0 and we had a starting object index,
-            # it means we've found a complete top-level object.
-            if balance == 0 and start_obj_index != -1:
-                try:
-                    obj_str = json_string[start_obj_index: i + 1]
-                    obj = json.loads(obj_str)
-                    recovered_objects.append(obj)
-                    start_obj_index = -1  # Reset for the next object
-                except json.JSONDecodeError:
-                    # This specific object might be malformed despite balanced braces,
-                    # or the truncation happened within it. We skip it.
-                    pass
-    return recovered_objects
-
-def is_valid_json_input(text):
-    try:
-        parsed = json.loads(strip_markdown_fences(text.strip()))
-        return validate_questions_array(parsed)['valid']
-    except (json.JSONDecodeError, TypeError):
+@st.cache_resource
+def get_cloud_store():
+    """
+    Where sources saved under a Resources ID live, selected by SOURCE_STORE.
+    'firebase' (default): per-user cloud reads and writes with one read cache shared
+    by all sessions, bounded by CLOUD_CACHE_MAX_MB; entries expire after
+    CLOUD_CACHE_TTL seconds, and the cache's size and hit ratio are exported as gauges.
+    'sqlite': a local SQLite file at SOURCE_STORE_PATH with a full-text passage index.
+    """
+    if source_search_enabled():
+        return SQLiteSourceStore(get_setting("SOURCE_STORE_PATH", "data/sources.sqlite3"))
+    cache = UserSourceCache(max_bytes=int(float(get_setting("CLOUD_CACHE_MAX_MB", 64)) * 1024 * 1024),
+                            ttl=float(get_setting("CLOUD_CACHE_TTL", 60)))
+    register_gauge("knowledge_quest_cloud_cache_bytes", "Memory held by the cloud read cache.",
+                   lambda: cache.stats()["bytes"])
+    register_gauge("knowledge_quest_cloud_cache_entries", "Users held in the cloud read cache.", lambda: len(cache))
+    register_gauge("knowledge_quest_cloud_cache_hit_ratio", "Share of cloud reads served from the cache.",
+                   lambda: round(cache.stats()["hit_ratio"], 4))
+    return CloudSourceStore(get_firebase_db(), cache)
+
+
+# Session state shared by every session (the cached backend), left out of its memory.
+SHARED_STATE_KEYS = ('poe_client',)
+# Session state that is rebuilt on demand, dropped when a session is over its memory budget.
+RECLAIMABLE_STATE_KEYS = ('tc_topic_index',)
+
+
+def setting_enabled(name):
+    return str(get_setting(name, "")).lower() in ("1", "true", "yes")
+
+
+@st.cache_resource
+def get_memory_accountant():
+    """
+    Session memory accounting, off unless one of these is set. MEMORY_SESSION_BUDGET_MB
+    flags sessions whose state grows past it and drops what can be rebuilt;
+    MEMORY_LOG_PATH appends a process-wide summary every MEMORY_REPORT_INTERVAL seconds;
+    MEMORY_TRACEMALLOC (traceback frames, e.g. 1) diffs allocations between measurements;
+    MEMORY_PANEL shows the session's own figures under the page; MEMORY_ACCOUNTING measures
+    with none of these. A session is measured at most every MEMORY_MEASURE_INTERVAL seconds.
+    Totals are exported as gauges. Returns None when off.
+    """
+    budget_mb = float(get_setting("MEMORY_SESSION_BUDGET_MB", 0) or 0)
+    log_path = get_setting("MEMORY_LOG_PATH", "")
+    frames = int(get_setting("MEMORY_TRACEMALLOC", 0) or 0)
+    if not (budget_mb or log_path or frames or setting_enabled("MEMORY_PANEL") or setting_enabled("MEMORY_ACCOUNTING")):
+        return None
+    tracker = None
+    if frames:
+        tracker = AllocationTracker(frames)
+        tracker.start()
+    accountant = MemoryAccountant(budget=int(budget_mb * 1024 * 1024), exclude=SHARED_STATE_KEYS, tracker=tracker,
+                                  min_interval=float(get_setting("MEMORY_MEASURE_INTERVAL", 30)))
+    register_gauge("knowledge_quest_session_memory_bytes", "Approximate session state held by recent sessions.",
+                   lambda: accountant.summary()["bytes"])
+    register_gauge("knowledge_quest_session_memory_max_bytes", "Approximate session state of the largest session.",
+                   lambda: accountant.summary()["max_session_bytes"])
+    register_gauge("knowledge_quest_sessions_over_memory_budget", "Recent sessions over MEMORY_SESSION_BUDGET_MB.",
+                   lambda: accountant.summary()["over_budget"])
+    register_gauge("knowledge_quest_process_rss_bytes", "Resident memory of the Streamlit process.",
+                   lambda: process_rss() or 0)
+    if log_path:
+        accountant.start_reporter(log_path, interval=float(get_setting("MEMORY_REPORT_INTERVAL", 300)))
+    return accountant
+
+
+def account_session_memory():
+    """
+    Measures this session's state (at most every MEMORY_MEASURE_INTERVAL seconds), drops what can be rebuilt
+    when it is over budget, and shows the figures if MEMORY_PANEL is set.
+    """
+    accountant = get_memory_accountant()
+    ctx = get_script_run_ctx()
+    if accountant is None or ctx is None:
+        return
+    with span("memory_accounting"):
+        memory = accountant.measure(ctx.session_id, st.session_state)
+        if memory.over_budget:
+            dropped = [st.session_state.pop(key) for key in RECLAIMABLE_STATE_KEYS if key in st.session_state]
+            if 'blob_store' in st.session_state and st.session_state.blob_store.trim():
+                dropped.append('blob_store')
+            if dropped:
+                memory = accountant.measure(ctx.session_id, st.session_state, force=True)
+    if setting_enabled("MEMORY_PANEL"):
+        render_memory_panel(memory, accountant.budget)
+
+
+def render_memory_panel(memory, budget):
+    with st.expander("🧠 Session Memory"):
+        st.caption(f"About {memory.total / 1024:,.0f} KB of session state"
+                   + (f" (budget {budget / 1024:,.0f} KB)" if budget else ""))
+        st.table([{"key": key, "KB": round(size / 1024, 1)} for key, size in memory.top(10)])
+        if memory.growth:
+            st.caption("Allocation growth since the previous measurement")
+            st.table([{"line": location, "KB": round(size_diff / 1024, 1), "blocks": count_diff}
+                      for location, size_diff, _, count_diff in memory.growth])
+
+
+# Query parameter holding the quiz session key; see get_quiz_store.
+QUIZ_SESSION_PARAM = "quiz"
+
+
+@st.cache_resource
+def get_quiz_store():
+    """
+    Where quiz progress is checkpointed, selected by QUIZ_STORE: 'memory' (default)
+    keeps it in this process; 'sqlite' writes it to QUIZ_STORE_PATH, so any replica
+    that can open the file resumes a session from its ?quiz=<key> URL.
+    """
+    return create_quiz_store(str(get_setting("QUIZ_STORE", "memory")).lower(),
+                             get_setting("QUIZ_STORE_PATH", "data/quiz_sessions.sqlite3"))
+
+
+def question_bank_enabled():
+    return str(get_setting("QUESTION_BANK", "off")).lower() == "sqlite"
+
+
+@st.cache_resource
+def get_question_bank():
+    """
+    Every generated question, kept in QUESTION_BANK_PATH when QUESTION_BANK is
+    'sqlite', so later quizzes on the same material or topic need no LLM call.
+    """
+    return QuestionBank(get_setting("QUESTION_BANK_PATH", "data/question_bank.sqlite3"))
+
+
+@st.cache_resource
+def get_review_scheduler():
+    """
+    When each answered question is next due for review, per learner. REVIEW_STORE
+    'memory' (default) keeps the schedule in this process; 'sqlite' writes it to
+    REVIEW_STORE_PATH, so it outlives restarts and is shared by replicas.
+    """
+    return create_review_scheduler(str(get_setting("REVIEW_STORE", "memory")).lower(),
+                                   get_setting("REVIEW_STORE_PATH", "data/review.sqlite3"))
+
+
+# Query parameter naming the learner whose review schedule answers go to; it is
+# kept in the URL, so a bookmark brings the schedule back in a later session.
+LEARNER_PARAM = "learner"
+
+
+def learner_key():
+    key = st.query_params.get(LEARNER_PARAM)
+    if not key:
+        key = secrets.token_urlsafe(12)
+        st.query_params[LEARNER_PARAM] = key
+    return key
+
+
+@st.cache_resource
+def get_llm_backend():
+    """The configured backend, shared by all sessions so they reuse one connection pool."""
+    return create_llm_backend()
+
+
+LOCAL_STORAGE_KEY = "storage_init"
+
+
+def get_local_storage():
+    """
+    The browser localStorage bridge. Only the Text Collector uses it, so the
+    component is imported and mounted there rather than on every page.
+    """
+    from streamlit_local_storage import LocalStorage
+    return LocalStorage(key=LOCAL_STORAGE_KEY)
+
+
+def keep_local_storage_snapshot():
+    """
+    The component's snapshot of localStorage is widget state, which Streamlit drops
+    after a run that does not mount it. Carrying it over on the other pages avoids
+    a second browser round trip when the Text Collector is opened again.
+    """
+    if LOCAL_STORAGE_KEY in st.session_state:
+        st.session_state[LOCAL_STORAGE_KEY] = st.session_state[LOCAL_STORAGE_KEY]
+
+
+def init_poe_client():
+    if st.session_state.poe_client is None:
+        backend = get_llm_backend()
+        if backend:
+            st.session_state.poe_client = backend
+            return True
+        get_llm_backend.clear()  # Not configured yet; check the settings again next run.
         return False
+    return True
+
+
+def get_blob_store():
+    if 'blob_store' not in st.session_state:
+        st.session_state.blob_store = BlobStore()
+    return st.session_state.blob_store
+
+
+def get_material_blob():
+    """The large material currently loaded for the quiz, if any."""
+    handle = st.session_state.get('material_handle')
+    return get_blob_store().get(handle) if handle else None
+
+
+def set_material(handle, topic=""):
+    get_blob_store().pin(handle)
+    st.session_state.material_handle = handle
+    st.session_state.material_topic = topic
+    st.session_state.question_input = ""
+
+
+def clear_material():
+    handle = st.session_state.pop('material_handle', None)
+    if handle:
+        get_blob_store().discard(handle)
+    st.session_state.pop('material_topic', None)
+    st.session_state.show_ai_settings = False
+
+
+def material_text():
+    """The text a quiz is generated from: the loaded material or the pasted input, cut to the character limit."""
+    blob = get_material_blob()
+    input_text = (blob.text if blob else st.session_state.get('question_input', '')).strip()
+    return input_text[:st.session_state.get('char_limit', 20000)]
 
 
 def check_input_and_show_ai_settings():
-    input_text = st.session_state.get('question_input', '').strip()
+    input_text = st.session_state.get('question_input', '')
+    if is_large(input_text):
+        set_material(get_blob_store().put(input_text))
+    blob = get_material_blob()
+    if blob is not None:
+        st.session_state.show_ai_settings = not blob.is_json
+        return
+    input_text = input_text.strip()
     st.session_state.show_ai_settings = bool(input_text and not is_valid_json_input(input_text))
 
 
-def validate_questions_array(data):
-    if not isinstance(data, list) or not data:
-        return {'valid': False, 'error': 'Input must be a non-empty JSON array.'}
-    for i, q in enumerate(data):
-        if not isinstance(q, dict):
-            return {'valid': False, 'error': f'Item {i + 1} is not an object.'}
-        required = ['question', 'options', 'correct', 'explanation']
-        for field in required:
-            if field not in q:
-                return {'valid': False, 'error': f'Item {i + 1} is missing field: "{field}".'}
-        if not (isinstance(q['question'], str) and q['question'].strip()):
-            return {'valid': False, 'error': f'Item {i + 1}: "question" must be a non-empty string.'}
-        if not (isinstance(q['options'], list) and len(q['options']) >= 2):
-            return {'valid': False, 'error': f'Item {i + 1}: "options" must be an array with at least 2 items.'}
-        if not (isinstance(q['correct'], int) and 0 <= q['correct'] < len(q['options'])):
-            return {'valid': False, 'error': f'Item {i + 1}: "correct" index is invalid.'}
-        if 'hint' not in q: q['hint'] = ""
-    return {'valid': True}
-
-
-def generate_ai_prompt(input_text, num_questions):
-    return f"""You are a teacher creating educational assessments. You are Usage from Chiikawa, the very cute crazy rabbit character. Let's learn something new!
-
-When questions are asked, you give constructive step by step hints to lead the student to get to the answer, before giving the direct answers but you make sure the student can get to the point at the end. The style of teaching is concise and get to the point, but keep it friendly. When giving compliments and acting like the character, you can use Japanese for non technical related sentence. When you are talking on technical items, please always use English.
-
-You are given the following materials. As images may not be included, you may need to guess what could be related in the materials.
-
-You are a teacher creating educational assessments. Based on the following materials, create {num_questions} multiple-choice questions.
-
----
-{input_text}
----
-
-Based on these materials, do the following:
-1) Guess the educational level of the topic (e.g., primary P.2, secondary, tertiary, professional, postgraduate).
-2) Create {num_questions} multiple-choice questions whose difficulty is one level harder than the guessed level (e.g., guessed P.2 -> produce P.3-level difficulty or slightly higher). Make them slightly tricky but fair.
-3) For each question, write plausible distractors that are GENERALLY INCORRECT (not just wrong relative to this passage). Distractors should represent common misconceptions or confusable alternatives that would be wrong in most contexts.
-4) The "explanation" field should be concise and help memorization (shown after correct).
-5) The "hint" field must be present (can be short) and should guide reflection after a wrong attempt.
-6) Ensure no distractor is a case/spacing variant of the correct answer with similar length.
-7) Distractors must be substantively different from the correct answer
-8) Use the same language as of the materials given. Only when the materials is about language learning, supplement with English so user get understood everything even user cannot understand the language materials.
-9) Note markdowns or codes or mathematical formulas are not rendered on the question (but rendered in options), so the question must be readable in plain text
-
-Important formatting rules:
-- Output ONLY pure JSON. No thoughts. No preface. No prose, no markdown, no code fences.
-- The JSON must be an array of objects with exactly these keys per item:
-question (string), options (array of 3-6 strings), correct (integer index within options), hint (string), explanation (string).
-- Do NOT include any extra wrapper objects or metadata. No backticks. No comments.
-
-Example JSON:
-[
-{{
-"question": "What is the capital city of France?",
-"options": [
-"London",
-"Paris", 
-"Berlin",
-"Madrid"
-],
-"correct": 1,
-"hint": "Think about the most famous city in France.",
-"explanation": "Paris is the capital and largest city of France."
-}}
-]
-
-Provide ONLY the JSON array.
-"""
-
-def get_demo_questions():
-    return [
-        {"question": "What is the capital city of France?", "options": ["London", "Paris", "Berlin", "Madrid"],
-         "correct": 1, "hint": "Think about the most famous city in France.",
-         "explanation": "Paris is the capital and largest city of France, known for landmarks like the Eiffel Tower."},
-        {"question": "Which continent is Brazil located in?",
-         "options": ["North America", "South America", "Africa", "Asia"], "correct": 1,
-         "hint": "Brazil is the largest country in its continent.",
-         "explanation": "Brazil is located in South America and is the continent's largest country by both area and population."},
-        {"question": "What is the longest river in the world?",
-         "options": ["Amazon River", "Nile River", "Mississippi River", "Yangtze River"], "correct": 1,
-         "hint": "This river flows through northeastern Africa.",
-         "explanation": "The Nile River is traditionally considered the longest river in the world, flowing through northeastern Africa."}
-    ]
+# Quizzes generated from one request: the first is started, the others wait in
+# st.session_state.prepared_quizzes (see render_prepared_quizzes_panel).
+QUIZ_SET_CHOICES = {
+    "One quiz": None,
+    "Easy, standard and hard quizzes": difficulty_sets,
+    "2 variants": lambda n: variant_sets(n, 2),
+    "3 variants": lambda n: variant_sets(n, 3),
+}
 
 
 # Main quiz functions
@@ -463,41 +469,112 @@ def generate_questions_with_ai(input_text, num_questions, model):
         st.error("Poe API client not initialized. Please check your API key.")
         return None
 
-    prompt = generate_ai_prompt(input_text, num_questions)
-    with st.spinner(f"🤖 Generating {num_questions} questions with {model}..."):
-        response = st.session_state.poe_client.generate_questions(prompt, model)
-        if not response:
-            st.error("No response received from AI.")
-            return None
-
-        # --- FIX: Robust JSON extraction and partial parsing ---
-        cleaned_response_str = strip_markdown_fences(response.strip())
-
-        if cleaned_response_str is None:
-            st.error("AI response did not contain a recognizable JSON structure.")
-            with st.expander("Raw AI Response"): st.text(response)
-            return None
-
-        # Use the new function to parse potentially partial JSON
-        questions = parse_partial_json_array(cleaned_response_str)
-
-        if not questions:
-            st.error("Failed to parse any complete questions from AI response.")
-            with st.expander("Cleaned AI Response (potentially partial)"):
-                st.text(cleaned_response_str)
-            return None
-
-        validation = validate_questions_array(questions)
-        if validation['valid']:
-            # If the number of parsed questions is less than requested, inform the user.
-            if len(questions) < num_questions:
-                st.warning(f"💡 Only {len(questions)} out of {num_questions} questions were successfully generated and parsed due to an incomplete AI response. Consider reducing the requested number of questions.")
-            return questions
-        else:
-            st.error(f"Generated questions validation failed for parsed questions: {validation['error']}")
-            with st.expander("Parsed (but invalid) Questions"):
-                st.json(questions)  # Show the partially parsed questions for debugging
-            return None
+    model_label = "Auto routing" if model == AUTO_MODEL else model
+    with st.spinner(f"🤖 Generating {num_questions} questions with {model_label}..."), \
+            span("generate", input_size=size_bucket(len(input_text))) as generate_span:
+        result = run_generation(st.session_state.poe_client, input_text, num_questions, model,
+                                router=get_model_router())
+        generate_span.tag(model=result.model, outcome=result.error or "ok")
+
+    if result.decision_id:
+        st.caption(f"🧭 Auto routing selected **{result.model}** for ~{result.input_tokens:,} input tokens.")
+    questions = show_generation_result(result)
+    if questions:
+        add_to_question_bank(questions, input_text, result.model)
+    return questions
+
+
+def generate_question_sets_with_ai(input_text, sets, model):
+    """
+    Several quizzes on the material from one request (a list of
+    quiz_core.QuestionSet). Returns {label: questions} for the quizzes that
+    were generated, in the order requested.
+    """
+    if not st.session_state.poe_client:
+        st.error("Poe API client not initialized. Please check your API key.")
+        return {}
+
+    model_label = "Auto routing" if model == AUTO_MODEL else model
+    total = sum(s.num_questions for s in sets)
+    with st.spinner(f"🤖 Generating {len(sets)} quizzes ({total} questions) with {model_label} in one request..."), \
+            span("generate", input_size=size_bucket(len(input_text)), sets=len(sets)) as generate_span:
+        batch = run_batch_generation(st.session_state.poe_client, input_text, sets, model,
+                                     router=get_model_router())
+        generate_span.tag(model=batch.model, outcome=batch.error or ("ok" if batch.ok else "partial"))
+
+    if batch.decision_id:
+        st.caption(f"🧭 Auto routing selected **{batch.model}** for ~{batch.input_tokens:,} input tokens.")
+    if batch.error:
+        show_generation_result(next(iter(batch.results.values())))
+        return {}
+    if batch.unassigned:
+        st.warning(f"⚠️ Set aside {len(batch.unassigned)} question(s) that did not say which quiz they belong to.")
+    quizzes = {}
+    for label, result in batch.results.items():
+        questions = show_generation_result(result, label)
+        if questions:
+            add_to_question_bank(questions, input_text, result.model)
+            quizzes[label] = questions
+    return quizzes
+
+
+def show_generation_result(result, label=""):
+    """Reports a GenerationResult's problems; returns its questions, or None if there are none."""
+    quiz = f" for the {label} quiz" if label else ""
+    # --- FIX: Robust JSON extraction and partial parsing ---
+    if result.error == 'no_response':
+        st.error("No response received from AI.")
+        return None
+    if result.error == 'no_json':
+        st.error("AI response did not contain a recognizable JSON structure.")
+        with st.expander("Raw AI Response"): st.text(result.response)
+        return None
+    if result.error == 'no_questions':
+        st.error(f"Failed to parse any complete questions{quiz} from AI response.")
+        with st.expander("Cleaned AI Response (potentially partial)"):
+            st.text(result.cleaned)
+        return None
+    if result.error == 'all_duplicates':
+        st.warning(f"⚠️ All {len(result.duplicates)} question(s){quiz} repeated questions already generated, "
+                   f"so none were kept.")
+        return None
+    if result.error == 'invalid':
+        st.error(f"Generated questions{quiz} validation failed for parsed questions: {result.validation_error}")
+        with st.expander("Parsed (but invalid) Questions"):
+            st.json([item for _, item, _ in result.quarantined])  # Show the parsed items for debugging
+        return None
+
+    if result.quarantined:
+        st.warning(f"⚠️ Set aside {len(result.quarantined)} malformed question(s){quiz} from the AI response; "
+                   f"the other {len(result.questions) + len(result.duplicates)} are kept.")
+        with st.expander("Set-aside Questions"):
+            for _, item, reason in result.quarantined:
+                st.markdown(f"- {reason}")
+                st.json(item, expanded=False)
+    if result.repairs:
+        fixes = ", ".join(f"{field} ×{count}" for field, count in sorted(result.repairs.items()))
+        st.caption(f"🔧 Fixed fields in the AI response{quiz}: {fixes}")
+
+    if result.duplicates:
+        st.info(f"🧹 Removed {len(result.duplicates)} question(s){quiz} that repeated another question.")
+        with st.expander("Removed near-duplicates"):
+            for question, original in result.duplicates:
+                st.markdown(f"- {question['question']}  \n  ↳ repeats: {original['question']}")
+
+    # If the number of parsed questions is less than requested, inform the user.
+    if result.truncated:
+        st.warning(f"💡 Only {len(result.questions)} out of {result.num_questions} questions{quiz} were successfully generated and parsed due to an incomplete AI response. Consider reducing the requested number of questions.")
+    return result.questions
+
+
+def add_to_question_bank(questions, input_text, model):
+    if not question_bank_enabled():
+        return
+    try:
+        get_question_bank().add(questions, source_hash(input_text), model,
+                                topic=st.session_state.get('material_topic', ''))
+    except Exception as e:
+        st.warning(f"Could not save the questions to the question bank: {e}")
 
 
 def generate_audio_for_questions():
@@ -512,12 +589,12 @@ def generate_audio_for_questions():
         return
 
     tasks = []
-    for q in st.session_state.questions:
-        if speak_q and q['id'] not in st.session_state.audio_urls['questions']:
-            tasks.append(('question', q['id'], q['question']))
-        if speak_a and q['id'] not in st.session_state.audio_urls['answers']:
-            correct_answer = q['options'][q['correct']]
-            tasks.append(('answer', q['id'], f"The correct answer is: {correct_answer}"))
+    for q in st.session_state.quiz.questions:
+        if speak_q and q.id not in st.session_state.audio_urls['questions']:
+            tasks.append(('question', q.id, q.text))
+        if speak_a and q.id not in st.session_state.audio_urls['answers']:
+            correct_answer = q.options[q.correct]
+            tasks.append(('answer', q.id, f"The correct answer is: {correct_answer}"))
 
     if not tasks:
         st.session_state.audio_generated = True
@@ -526,7 +603,8 @@ def generate_audio_for_questions():
     progress_bar = st.progress(0, text="🎵 Generating audio...")
     for i, (audio_type, q_id, text) in enumerate(tasks):
         url_key = 'questions' if audio_type == 'question' else 'answers'
-        audio_url = st.session_state.poe_client.generate_tts(text)
+        with span("tts", backend=st.session_state.poe_client.name):
+            audio_url = st.session_state.poe_client.generate_tts(text)
         if audio_url:
             st.session_state.audio_urls[url_key][q_id] = audio_url
         progress_bar.progress((i + 1) / len(tasks), text=f"🎵 Generating audio... ({i + 1}/{len(tasks)})")
@@ -536,7 +614,8 @@ def generate_audio_for_questions():
 
 
 def start_quiz():
-    input_text = st.session_state.get('question_input', '').strip()
+    blob = get_material_blob()
+    input_text = (blob.text if blob else st.session_state.get('question_input', '')).strip()
 
     # --- MODIFICATION START ---
     # Define a character limit for the text to be processed by the AI.
@@ -578,14 +657,22 @@ def start_quiz():
     # If not valid JSON, generate with AI
     if questions is None:
         if not init_poe_client():
-            st.error("❌ Poe API key not found. Cannot generate questions.")
+            st.error("❌ No LLM backend configured (Poe API key not found). Cannot generate questions.")
             st.info("💡 Using demo geography questions instead.")
             questions = get_demo_questions()
         else:
             num_q = st.session_state.get('num_questions', 3)
             model = st.session_state.get('llm_model', 'GPT-5-mini')
+            make_sets = QUIZ_SET_CHOICES.get(st.session_state.get('quiz_sets'))
             # The (potentially truncated) 'input_text' is used here.
-            questions = generate_questions_with_ai(input_text, num_q, model)
+            if make_sets:
+                quizzes = generate_question_sets_with_ai(input_text, make_sets(num_q), model)
+                questions = None
+                if quizzes:
+                    questions = quizzes.pop(next(iter(quizzes)))
+                    st.session_state.prepared_quizzes = quizzes
+            else:
+                questions = generate_questions_with_ai(input_text, num_q, model)
             if not questions:
                 st.error("Failed to generate questions. Using demo questions instead.")
                 questions = get_demo_questions()
@@ -594,85 +681,120 @@ def start_quiz():
         setup_quiz_with_questions(questions)
 
 
-def setup_quiz_with_questions(questions_data):
-    questions = json.loads(json.dumps(questions_data))  # Deep copy
-    for q in questions:
-        q['id'] = stable_hash(f"{q['question']}|{'|'.join(map(str, q['options']))}|{q['correct']}")
-
-    if not st.session_state.get('is_redoing_wrong', False):
-        random.shuffle(questions)
-        st.session_state.original_questions = json.loads(json.dumps(questions))
-
-    st.session_state.questions = questions
+def setup_quiz_with_questions(questions_data, quiz=None, audio_urls=None):
+    # The QuizSession owns questions, attempts and scoring; the views below only read it.
+    # A quiz pack brings its session ready-made (ids and orders included) and its audio.
+    st.session_state.quiz = quiz if quiz is not None else QuizSession.from_dicts(questions_data)
+    if audio_urls is not None:
+        st.session_state.audio_urls = audio_urls
     st.session_state.quiz_started = True
-    st.session_state.quiz_finished = False
-    st.session_state.current_question_index = 0
-    st.session_state.questions_completed = 0
-    st.session_state.user_answers = {}
     st.session_state.audio_generated = False
+    # A new key per quiz; the URL carries it so a reconnect can resume (restore_quiz_from_url).
+    key = secrets.token_urlsafe(16)
+    st.session_state.quiz_checkpoint = QuizCheckpoint(key)
+    st.query_params[QUIZ_SESSION_PARAM] = key
 
-    if st.session_state.get('quiz_mode') == 'audio':
+    if st.session_state.get('quiz_mode') == 'audio' and audio_urls is None:
         generate_audio_for_questions()
     else:
         st.session_state.audio_generated = True
+    checkpoint_quiz()
     st.rerun()
 
 
+def checkpoint_quiz():
+    """Writes what changed in the quiz since its last checkpoint (usually one row)."""
+    checkpoint = st.session_state.get('quiz_checkpoint')
+    if checkpoint is None or st.session_state.quiz is None:
+        return
+    try:
+        checkpoint.save(get_quiz_store(), st.session_state.quiz, st.session_state.audio_urls)
+    except Exception as e:
+        # The quiz goes on; whatever was not written is retried at the next checkpoint.
+        st.warning(f"Could not save quiz progress: {e}")
+
+
+def restore_quiz_from_url():
+    """Resumes the quiz named by the ?quiz= parameter when this session has none (new tab, reconnect, other replica)."""
+    key = st.query_params.get(QUIZ_SESSION_PARAM)
+    if not key or st.session_state.quiz is not None:
+        return
+    try:
+        record = get_quiz_store().load(key)
+    except Exception as e:
+        st.warning(f"Could not restore quiz progress: {e}")
+        return
+    if record is None:
+        del st.query_params[QUIZ_SESSION_PARAM]
+        return
+    quiz = record.to_session()
+    st.session_state.quiz = quiz
+    st.session_state.quiz_started = True
+    st.session_state.audio_urls = record.audio_urls
+    st.session_state.audio_generated = True
+    st.session_state.quiz_checkpoint = QuizCheckpoint.restored(key, quiz, record)
+
+
 def play_audio(key):
     st.session_state.audio_to_play = key
 
 
 def render_quiz_question():
-    if not st.session_state.questions or not st.session_state.audio_generated:
+    if st.session_state.quiz is None or not st.session_state.audio_generated:
         st.info("Please wait, preparing quiz...")
         st.rerun()
 
-    idx = st.session_state.current_question_index
-    if idx >= len(st.session_state.questions):
-        show_quiz_summary()
-        return
-
-    question = st.session_state.questions[idx]
-    total_q = len(st.session_state.questions)
-    progress = st.session_state.questions_completed / total_q
+    render_question_region()
 
-    st.markdown(
-        f'<div class="progress-container"><div class="progress-bar" style="width: {progress * 100}%"></div></div>',
-        unsafe_allow_html=True)
 
-    # Navigation and question counter
-    with st_horizontal():
-        # "Back" button
-        if st.button("← Back", disabled=idx == 0):
-            go_back()
+@st.fragment
+def render_question_region():
+    """
+    The question loop runs as a fragment: answering and moving between questions
+    rerun only this region, not the whole script (secrets, CSS and the rest of
+    session state). Only finishing the quiz reruns the app.
+    """
+    with span("fragment_run", view='question'):
+        quiz = st.session_state.quiz
+        idx = quiz.current
+        question = quiz.current_question
+        total_q = quiz.total
+        progress = quiz.answered_count / total_q
 
-        # Question counter
         st.markdown(
-            f"<div style='text-align: center; font-weight: 600; padding-top: 0.5rem;'>Question {idx + 1} of {total_q}</div>",
+            f'<div class="progress-container"><div class="progress-bar" style="width: {progress * 100}%"></div></div>',
             unsafe_allow_html=True)
 
-        # "Next" or "Finish" button logic
-        is_last_question = (idx == total_q - 1)
-        answered = question['id'] in st.session_state.user_answers
+        # Navigation and question counter
+        with st_horizontal():
+            # "Back" button
+            st.button("← Back", disabled=idx == 0, on_click=go_back)
 
-        if is_last_question:
-            if st.button("🏁 Finish Quiz", type="primary", disabled=not answered):
-                finish_quiz()
-        else:
-            if st.button("Next →", disabled=not answered):
-                go_next()
+            # Question counter
+            st.markdown(
+                f"<div style='text-align: center; font-weight: 600; padding-top: 0.5rem;'>Question {idx + 1} of {total_q}</div>",
+                unsafe_allow_html=True)
 
-    # Question and audio
-    st.markdown(f"<div class='question-text'>{question['question']}</div>", unsafe_allow_html=True)
-    if st.session_state.get('quiz_mode') == 'audio':
-        render_audio_controls(question)
+            # "Next" or "Finish" button logic
+            answered = quiz.answer_for(question.id) is not None
 
-    # Answer options
-    render_answer_options(question)
+            if quiz.is_last:
+                if st.button("🏁 Finish Quiz", type="primary", disabled=not answered):
+                    finish_quiz()
+            else:
+                st.button("Next →", disabled=not answered, on_click=go_next)
+
+        # Question and audio
+        st.markdown(f"<div class='question-text'>{question.text}</div>", unsafe_allow_html=True)
+        if st.session_state.get('quiz_mode') == 'audio':
+            render_audio_controls(question)
 
-    # Explanation if answered
-    if answered:
-        show_answer_result(question)
+        # Answer options
+        render_answer_options(question, quiz.current_option_order)
+
+        # Explanation if answered
+        if answered:
+            show_answer_result(question)
 
 
 def render_audio_controls(question):
@@ -686,38 +808,33 @@ def render_audio_controls(question):
         st.session_state.audio_to_play = None
 
     c1, c2 = st.columns(2)
-    q_audio_url = st.session_state.audio_urls['questions'].get(question['id'])
+    q_audio_url = st.session_state.audio_urls['questions'].get(question.id)
     if st.session_state.get('speak_question') and q_audio_url:
-        if c1.button("🔊 Play Question"):
-            play_audio(q_audio_url)
+        c1.button("🔊 Play Question", on_click=play_audio, args=(q_audio_url,))
 
-    answered = question['id'] in st.session_state.user_answers
-    a_audio_url = st.session_state.audio_urls['answers'].get(question['id'])
+    answered = st.session_state.quiz.answer_for(question.id) is not None
+    a_audio_url = st.session_state.audio_urls['answers'].get(question.id)
     if answered and st.session_state.get('speak_answer') and a_audio_url:
-        if c2.button("🔊 Play Answer"):
-            play_audio(a_audio_url)
+        c2.button("🔊 Play Answer", on_click=play_audio, args=(a_audio_url,))
 
 
-def render_answer_options(question):
-    q_id = question['id']
-    # Shuffle options once per question and store in the question object itself
-    if 'shuffled_options' not in question:
-        original_options = list(enumerate(question['options']))
-        random.shuffle(original_options)
-        st.session_state.questions[st.session_state.current_question_index]['shuffled_options'] = original_options
+def render_answer_options(question, option_order):
+    q_id = question.id
+    # Options are shown in this attempt's permutation; indexes always refer to question.options.
+    answer_record = st.session_state.quiz.answer_for(q_id)
+    answered = answer_record is not None
+    user_selection = answer_record.selected if answered else None
 
-    shuffled_options = question['shuffled_options']
-    answered = q_id in st.session_state.user_answers
-    user_selection = st.session_state.user_answers.get(q_id, {}).get('selected')
-
-    for original_idx, option_text in shuffled_options:
-        is_correct = (original_idx == question['correct'])
+    for original_idx in option_order:
+        option_text = question.options[original_idx]
+        is_correct = (original_idx == question.correct)
         is_selected = (original_idx == user_selection)
 
+        # The callback records the answer before the fragment reruns, so the
+        # result is drawn in the same run without a second st.rerun().
         button_key = f"option_{q_id}_{original_idx}"
-        if st.button(option_text, key=button_key, disabled=answered, use_container_width=True):
-            handle_answer_selection(q_id, original_idx)
-            st.rerun()
+        st.button(option_text, key=button_key, disabled=answered, use_container_width=True,
+                  on_click=handle_answer_selection, args=(q_id, original_idx))
 
         # --- FIX: Clearer visual feedback after answering ---
         if answered:
@@ -727,60 +844,65 @@ def render_answer_options(question):
                 st.error(f"❌ Your Choice: {option_text}")
 
 
+@contextmanager
+def side_write(phase, failure):
+    """
+    A write the quiz does not depend on, made after an answer: timed as ``phase``. If it
+    fails, the error is tagged on that span and shown as a toast, and the answer stands.
+    """
+    try:
+        with span(phase):
+            yield
+    except Exception as e:
+        st.toast(f"{failure}: {e}", icon="⚠️")
+
+
 def handle_answer_selection(q_id, selected_option_idx):
-    idx = st.session_state.current_question_index
-    question = st.session_state.questions[idx]
-    is_correct = (selected_option_idx == question['correct'])
-
-    if q_id not in st.session_state.user_answers:
-        st.session_state.user_answers[q_id] = {
-            'selected': selected_option_idx,
-            'is_correct': is_correct,
-            'first_try': True
-        }
-        if is_correct:
-            st.session_state.questions_completed += 1
-        else:
-            # --- FIX: Robust incorrect question tracking ---
-            st.session_state.incorrect_question_ids.add(q_id)
-            st.session_state.questions_completed += 1
-    # This function is now simpler; visual feedback is handled in render_answer_options
+    # Only the first answer counts; the engine updates score and incorrect list incrementally.
+    first_answer = st.session_state.quiz.answer_for(q_id) is None
+    record = st.session_state.quiz.answer(q_id, selected_option_idx)
+    checkpoint_quiz()
+    with side_write("review_record", "Could not schedule this question for review"):
+        get_review_scheduler().record(learner_key(), st.session_state.quiz.question_by_id(q_id), record.is_correct)
+    if first_answer and question_bank_enabled():
+        with side_write("question_bank_record", "Could not record this answer in the question bank"):
+            get_question_bank().record_answer(q_id, record.is_correct)
 
 
 def show_answer_result(question):
-    answer_record = st.session_state.user_answers.get(question['id'])
-    if answer_record and answer_record['is_correct']:
-        if question.get('explanation'):
+    answer_record = st.session_state.quiz.answer_for(question.id)
+    if answer_record and answer_record.is_correct:
+        if question.explanation:
             st.markdown(
-                f'<div class="explanation-box"><strong>Explanation:</strong><br>{question["explanation"]}</div>',
+                f'<div class="explanation-box"><strong>Explanation:</strong><br>{question.explanation}</div>',
                 unsafe_allow_html=True)
     elif answer_record:  # Incorrect answer
-        if question.get('hint'):
-            st.warning(f"💡 **Hint:** {question['hint']}")
+        if question.hint:
+            st.warning(f"💡 **Hint:** {question.hint}")
 
 
+# Navigation callbacks run before the question fragment reruns, so no st.rerun() is needed.
 def go_back():
-    if st.session_state.current_question_index > 0:
-        st.session_state.current_question_index -= 1
-        st.rerun()
+    st.session_state.quiz.go_back()
+    checkpoint_quiz()
 
 
 def go_next():
-    if st.session_state.current_question_index < len(st.session_state.questions) - 1:
-        st.session_state.current_question_index += 1
-        st.rerun()
+    st.session_state.quiz.go_next()
+    checkpoint_quiz()
 
 
 def finish_quiz():
-    st.session_state.quiz_finished = True
-    st.rerun()
+    st.session_state.quiz.finish()
+    checkpoint_quiz()
+    # Leaving the question loop swaps the whole page, so rerun the app, not just the fragment.
+    st.rerun(scope="app")
 
 
 def show_quiz_summary():
     st.markdown("<div class='main-title'>✨ Quiz Complete! ✨</div>", unsafe_allow_html=True)
-    total_q = len(st.session_state.questions)
-    correct_answers = len([ans for ans in st.session_state.user_answers.values() if ans['is_correct']])
-    score = round((correct_answers / total_q) * 100) if total_q > 0 else 0
+    quiz = st.session_state.quiz
+    correct_answers, total_q, score = quiz.score()
 
     emoji, message = ("🎉", "Perfect score!") if score == 100 else \
         ("🌟", "Excellent work!") if score >= 80 else \
@@ -798,52 +920,47 @@ def show_quiz_summary():
     c1, c2, c3, c4 = st.columns(4)
     c1.button("🔄 Retry All", on_click=retry_quiz, use_container_width=True)
     c2.button("❌ Redo Wrong", on_click=redo_incorrect_questions, use_container_width=True,
-              disabled=not st.session_state.incorrect_question_ids)
+              disabled=not quiz.incorrect)
     c3.button("📚 Review", on_click=start_revision_mode, use_container_width=True,
-              disabled=not st.session_state.incorrect_question_ids)
+              disabled=not quiz.incorrect)
     c4.button("🆕 New Quiz", on_click=clear_quiz, use_container_width=True)
 
+    # The pack is built on request, once per attempt, rather than on every rerun of this page.
+    prepared = st.session_state.get('quiz_pack')
+    if prepared is not None and (prepared[0] is not quiz or prepared[1] != quiz.attempt):
+        del st.session_state['quiz_pack']
+        prepared = None
+    if prepared is None:
+        st.button("📦 Prepare Quiz Pack", on_click=prepare_quiz_pack, use_container_width=True,
+                  help="This quiz, with its question and option order and any audio, in one file that "
+                       "opens instantly on the setup page.")
+    else:
+        st.download_button("📦 Download Quiz Pack", prepared[2], file_name=f"quiz{QUIZ_PACK_EXTENSION}",
+                           mime="application/octet-stream", use_container_width=True)
+
 
-def reset_quiz_state():
-    """Helper to reset common state variables for a new quiz attempt."""
-    st.session_state.current_question_index = 0
-    st.session_state.questions_completed = 0
-    st.session_state.user_answers = {}
-    st.session_state.quiz_finished = False
-    st.session_state.is_redoing_wrong = False  # --- FIX: Ensure this is always reset ---
-    st.session_state.incorrect_question_ids = set()
+def prepare_quiz_pack():
+    """Writes the current attempt's pack; kept with the quiz and attempt it was written for."""
+    quiz = st.session_state.quiz
+    pack = io.BytesIO()
+    with span("quiz_pack_write"):
+        write_pack(pack, quiz, st.session_state.audio_urls)
+    st.session_state.quiz_pack = (quiz, quiz.attempt, pack.getvalue())
 
 
 def retry_quiz():
-    reset_quiz_state()
-    # Reshuffle the original set of questions
-    questions = json.loads(json.dumps(st.session_state.original_questions))
-    random.shuffle(questions)
-    st.session_state.questions = questions
-    # Clear shuffled options from previous attempts
-    for q in st.session_state.questions:
-        q.pop('shuffled_options', None)
+    st.session_state.quiz.retry()
+    checkpoint_quiz()
 
 
 def redo_incorrect_questions():
-    if not st.session_state.incorrect_question_ids:
+    if not st.session_state.quiz.redo_incorrect():
         st.warning("No incorrect questions to redo!")
-        return
-
-    # Filter original questions to get only the incorrect ones
-    incorrect_q_ids = st.session_state.incorrect_question_ids
-    wrong_questions = [q for q in st.session_state.original_questions if q['id'] in incorrect_q_ids]
-
-    reset_quiz_state()
-    st.session_state.is_redoing_wrong = True
-    st.session_state.questions = wrong_questions
-    # Clear shuffled options from previous attempts
-    for q in st.session_state.questions:
-        q.pop('shuffled_options', None)
+    checkpoint_quiz()
 
 
 def start_revision_mode():
-    if not st.session_state.incorrect_question_ids:
+    if not st.session_state.quiz.incorrect:
         st.warning("No incorrect questions to review!")
         return
     st.session_state.revision_mode = True
@@ -851,34 +968,39 @@ def start_revision_mode():
 
 
 def clear_quiz():
-    # Preserve API client and key
+    checkpoint = st.session_state.get('quiz_checkpoint')
+    if checkpoint is not None:
+        try:
+            get_quiz_store().delete(checkpoint.key)
+        except Exception:
+            pass  # Unreachable store: the checkpoint expires on its own.
+    st.query_params.pop(QUIZ_SESSION_PARAM, None)
+    # Preserve API client and key, and the quizzes prepared with this one
     client = st.session_state.get('poe_client')
+    prepared = st.session_state.get('prepared_quizzes')
     # Clear all other session state keys
     keys_to_clear = [k for k in st.session_state.keys() if k != 'poe_client']
     for key in keys_to_clear:
         del st.session_state[key]
     init_session_state()
     st.session_state.poe_client = client  # Restore client
+    if prepared:
+        st.session_state.prepared_quizzes = prepared
 
 
 def render_revision_mode():
     st.markdown("<div class='main-title'>📚 Revision Mode</div>", unsafe_allow_html=True)
 
-    incorrect_q_ids = list(st.session_state.incorrect_question_ids)
-    if not incorrect_q_ids:
+    # Missed questions in the order they were missed, so the sequence is stable across reruns.
+    quiz = st.session_state.quiz
+    incorrect_count = len(quiz.incorrect)
+    if not incorrect_count:
         st.session_state.revision_mode = False
         st.rerun()
         return
 
-    idx = st.session_state.revision_index
-    q_id = incorrect_q_ids[idx]
-    # Find the question from the original list
-    question = next((q for q in st.session_state.original_questions if q['id'] == q_id), None)
-
-    if not question:
-        st.error("Error: Could not find question to review.")
-        st.session_state.revision_mode = False
-        return
+    idx = min(st.session_state.revision_index, incorrect_count - 1)
+    question = quiz.incorrect_question(idx)
 
     # --- MODIFIED: Use st_horizontal for revision navigation with full width ---
     with st_horizontal():
@@ -887,18 +1009,18 @@ def render_revision_mode():
             st.rerun()
 
         st.markdown(
-            f"<div style='text-align: center; font-weight: 600; padding-top: 0.5rem;'>Reviewing {idx + 1} of {len(incorrect_q_ids)}</div>",
+            f"<div style='text-align: center; font-weight: 600; padding-top: 0.5rem;'>Reviewing {idx + 1} of {incorrect_count}</div>",
             unsafe_allow_html=True)
 
-        if st.button("Next →", disabled=idx >= len(incorrect_q_ids) - 1):
+        if st.button("Next →", disabled=idx >= incorrect_count - 1):
             st.session_state.revision_index += 1
             st.rerun()
 
-    st.markdown(f"<div class='question-text'>{question['question']}</div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='question-text'>{question.text}</div>", unsafe_allow_html=True)
     st.markdown("**Correct Answer:**")
-    st.success(f"✅ {question['options'][question['correct']]}")
-    if question.get('explanation'):
-        st.markdown(f'<div class="explanation-box"><strong>Explanation:</strong><br>{question["explanation"]}</div>',
+    st.success(f"✅ {question.options[question.correct]}")
+    if question.explanation:
+        st.markdown(f'<div class="explanation-box"><strong>Explanation:</strong><br>{question.explanation}</div>',
                     unsafe_allow_html=True)
 
     if st.button("✅ Finish Revision", use_container_width=True, type="primary"):
@@ -914,96 +1036,281 @@ def tc_initialize_state():
     This function is designed to handle the asynchronous nature of fetching data
     from the browser, which often requires more than one script run on initial load.
     """
-    # 1. Fetch the item from local storage. It might be None on the first run after a refresh.
-    persisted_json = localS.getItem("all_texts")
+    # 1. Mount the component every run, which also keeps its snapshot in session state.
+    # The snapshot might be empty on the first run after a refresh, so loading is
+    # retried until it has data or this session has written its own.
+    snapshot = get_local_storage().storedItems
+    if not st.session_state.get('tc_storage_loaded') and not st.session_state.get('all_texts'):
+        sources, migrated, missing = local_sources.load_sources(snapshot)
+        st.session_state.all_texts = sources
+        st.session_state.processed_files = set(sources.keys())
+        # What the browser already holds in the per-document layout; tc_save_data()
+        # writes only what differs from it. Migrated sources are all written once;
+        # names whose document is missing count as persisted, so the save drops
+        # them from the manifest.
+        st.session_state.tc_persisted = {} if migrated else {**sources, **dict.fromkeys(missing)}
+        if missing:
+            st.toast(f"{len(missing)} saved source(s) could not be found in this browser's storage and were "
+                     f"removed: {', '.join(missing[:5])}{'…' if len(missing) > 5 else ''}", icon="⚠️")
+        if sources or local_sources.read_manifest(snapshot) is not None:
+            st.session_state.tc_storage_loaded = True
+        if local_sources.LEGACY_KEY in snapshot and not migrated:
+            st.session_state.tc_erase_legacy = True
+        if migrated or missing or st.session_state.get('tc_erase_legacy'):
+            st.session_state.tc_save_pending = True
+
+    if 'tc_selected_sources' not in st.session_state:
+        st.session_state.tc_selected_sources = set()
+        st.session_state.tc_source_page = 0
 
-    if 'all_texts' not in st.session_state:
-        st.session_state.all_texts = json.loads(persisted_json) if persisted_json else {}
-        st.session_state.processed_files = set(st.session_state.all_texts.keys())
 
-    elif not st.session_state.all_texts and persisted_json:
-        st.session_state.all_texts = json.loads(persisted_json)
-        st.session_state.processed_files = set(st.session_state.all_texts.keys())
+def tc_save_data():
+    """
+    Saves the collected texts to local storage: one key per document plus a
+    manifest of names. Only documents added, changed or removed since the last
+    save are written, so adding a short note does not rewrite every source.
+    """
+    storage = get_local_storage()
+    current = st.session_state.all_texts
+    changed, removed = local_sources.plan_writes(st.session_state.get('tc_persisted', {}), current)
+    # Component keys carry a per-session save number, so two saves in one run never collide.
+    save = st.session_state.tc_save_count = st.session_state.get('tc_save_count', 0) + 1
+    for name in changed:
+        key = local_sources.doc_key(name)
+        storage.setItem(key, current[name], key=f"set_{key}_{save}")
+    for name in removed:
+        key = local_sources.doc_key(name)
+        storage.eraseItem(key, key=f"erase_{key}_{save}")
+        storage.storedItems.pop(key, None)
+    if changed or removed:
+        storage.setItem(local_sources.MANIFEST_KEY, local_sources.manifest_value(current), key=f"set_manifest_{save}")
+    if st.session_state.pop('tc_erase_legacy', False):
+        # The browser had the per-document layout when this session loaded, so the
+        # pre-manifest copy can go; it is kept until then in case a migration never landed.
+        storage.eraseItem(local_sources.LEGACY_KEY, key=f"erase_legacy_{save}")
+        storage.storedItems.pop(local_sources.LEGACY_KEY, None)
+    st.session_state.tc_persisted = dict(current)
+    st.session_state.tc_storage_loaded = True
+
+
+def tc_delete_local_sources(doc_names):
+    """Removes sources from the session; persist afterwards with tc_persist_after_delete()."""
+    for doc_name in doc_names:
+        st.session_state.all_texts.pop(doc_name, None)
+        st.session_state.processed_files.discard(doc_name)
+    st.session_state.tc_selected_sources.difference_update(doc_names)
+
+
+def tc_persist_after_delete(doc_names):
+    """
+    Writes the smaller source set to local storage without reloading the page.
+    If a deleted source is part of the combined text, the whole page is rerun so
+    the combined view drops it too; the write then happens in that full run, since
+    the localStorage component must be rendered to take effect.
+    """
+    if set(doc_names) & set(st.session_state.get('doc_multiselect', [])):
+        st.session_state.tc_save_pending = True
+        st.rerun(scope="app")
+    tc_save_data()
 
 
+TC_SOURCES_PER_PAGE = 20
 
-def tc_save_data():
-    """Saves the collected texts to local storage."""
-    localS.setItem("all_texts", json.dumps(st.session_state.all_texts))
 
+def tc_matching_sources():
+    query = st.session_state.get('tc_source_search', '').strip().lower()
+    doc_names = sorted(st.session_state.all_texts)
+    if not query:
+        return doc_names
+    return [doc_name for doc_name in doc_names if query in doc_name.lower()]
 
-def tc_extract_text_from_file(uploaded_file):
-    """Extracts text content from a supported file type."""
-    name, extension = os.path.splitext(uploaded_file.name)
-    extension = extension.lower()
-    if extension == ".pdf":
-        with fitz.open(stream=uploaded_file.getvalue(), filetype="pdf") as doc:
-            return "".join(page.get_text() for page in doc)
-    elif extension == ".docx":
-        doc = docx.Document(uploaded_file)
-        return "\n".join([para.text for para in doc.paragraphs])
-    elif extension == ".pptx":
-        """
-        Extracts text from a .pptx file.
-        This will extract text from all shapes on each slide.
-        """
-        try:
-            prs = pptx.Presentation(uploaded_file)
-            text_runs = []
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if not shape.has_text_frame:
-                        continue
-                    for paragraph in shape.text_frame.paragraphs:
-                        for run in paragraph.runs:
-                            text_runs.append(run.text)
-            return "\n".join(text_runs)
-        except Exception as e:
-            st.error(f"Error processing PPTX file: {e}")
-            return None
-    elif extension == ".csv":
-        """
-        Extracts text from a .csv file.
-        Converts rows and columns into a single block of text.
-        """
-        try:
-            # Read the file content and decode it
-            content = uploaded_file.getvalue().decode("utf-8")
-            # Use io.StringIO to allow the csv module to read a string
-            file_like_object = io.StringIO(content)
-            reader = csv.reader(file_like_object)
-            # Join cells with a space, and rows with a newline
-            return "\n".join([" ".join(row) for row in reader])
-        except Exception as e:
-            st.error(f"Error processing CSV file: {e}")
-            return None
-
-    elif extension == ".json":
-        """
-        Extracts and formats text from a .json file.
-        This will "pretty-print" the JSON for readability.
-        """
-        try:
-            # Read the file content and decode it
-            content = uploaded_file.getvalue().decode("utf-8")
-            # Parse the JSON data
-            data = json.loads(content)
-            # Convert it back to a formatted string with indentation
-            return json.dumps(data, indent=4)
-        except json.JSONDecodeError:
-            st.error("Error: The uploaded JSON file is not correctly formatted.")
-            return None
-        except Exception as e:
-            st.error(f"Error processing JSON file: {e}")
-            return None
-    elif extension in [".txt", ".md"]:
-        return uploaded_file.getvalue().decode("utf-8")
+
+def tc_toggle_source(doc_name):
+    if st.session_state.get(f"tc_select_{doc_name}"):
+        st.session_state.tc_selected_sources.add(doc_name)
     else:
-        st.error(f"Unsupported file type: {extension}")
-        return None
+        st.session_state.tc_selected_sources.discard(doc_name)
+
+
+def tc_select_all_matching():
+    st.session_state.tc_selected_sources.update(tc_matching_sources())
+
+
+def tc_clear_selection():
+    st.session_state.tc_selected_sources.clear()
+
+
+def tc_change_page(step):
+    st.session_state.tc_source_page = max(0, st.session_state.tc_source_page + step)
+
+
+def tc_reset_page():
+    st.session_state.tc_source_page = 0
+
+
+@st.fragment
+def render_source_manager(user_id):
+    """
+    "Manage Saved Sources" runs as a fragment: searching, paging, selecting and
+    deleting rerun only this list, and only one page of sources is rendered.
+    """
+    with span("fragment_run", view='source_manager'):
+        st.subheader("Manage Saved Sources")
+        selected = st.session_state.tc_selected_sources
+        st.text_input("Search sources", key="tc_source_search", placeholder="Filter by name",
+                      on_change=tc_reset_page)
+
+        c1, c2, c3, c4 = st.columns(4)
+        c1.button("☑️ Select All", key="tc_select_all", on_click=tc_select_all_matching,
+                  help="Select every source matching the search", use_container_width=True)
+        c2.button("✖️ Clear", key="tc_clear_selection", on_click=tc_clear_selection,
+                  disabled=not selected, use_container_width=True)
+
+        if c3.button("🗑️ Local", key="tc_bulk_delete_local", help="Delete selected sources from this browser's storage",
+                     disabled=not selected, use_container_width=True):
+            doc_names = sorted(selected)
+            tc_delete_local_sources(doc_names)
+            st.toast(f"Deleted {len(doc_names)} source(s) from local storage.")
+            tc_persist_after_delete(doc_names)
+
+        if c4.button("☁️ Cloud", key="tc_bulk_delete_cloud", help="Delete selected sources from your online cloud storage",
+                     disabled=not (selected and user_id), use_container_width=True):
+            doc_names = sorted(selected)
+            deleted = False
+            with st.spinner(f"Deleting {len(doc_names)} source(s) from cloud..."):
+                user_sources = get_cloud_sources(user_id)
+                if user_sources is not None:
+                    in_cloud = [doc_name for doc_name in doc_names if doc_name in user_sources]
+                    if not in_cloud:
+                        st.warning("Selected source(s) not found in cloud. Removing them locally.")
+                        deleted = True
+                    elif delete_cloud_sources(user_id, in_cloud):
+                        st.success(f"Deleted {len(in_cloud)} source(s) from the cloud.")
+                        # Also delete locally for consistency
+                        deleted = True
+                    else:
+                        st.error("Failed to delete from the cloud. Sources remain locally.")
+            if deleted:
+                tc_delete_local_sources(doc_names)
+                tc_persist_after_delete(doc_names)
+
+        matching = tc_matching_sources()
+        page_count = max(1, -(-len(matching) // TC_SOURCES_PER_PAGE))
+        page = st.session_state.tc_source_page = min(st.session_state.tc_source_page, page_count - 1)
+        first = page * TC_SOURCES_PER_PAGE
+        page_sources = matching[first:first + TC_SOURCES_PER_PAGE]
+
+        st.caption(f"{len(matching)} of {len(st.session_state.all_texts)} source(s) match · {len(selected)} selected")
+        if not page_sources:
+            st.info("No sources match your search.")
+
+        for doc_name in page_sources:
+            # Selection lives in tc_selected_sources so it survives paging; sync the checkbox to it.
+            select_key = f"tc_select_{doc_name}"
+            st.session_state[select_key] = doc_name in selected
+            st.checkbox(f"{doc_name} · {len(st.session_state.all_texts[doc_name]):,} chars", key=select_key,
+                        on_change=tc_toggle_source, args=(doc_name,))
+
+        if page_count > 1:
+            with st_horizontal():
+                st.button("← Prev", key="tc_prev_page", disabled=page == 0, on_click=tc_change_page, args=(-1,))
+                st.markdown(
+                    f"<div style='text-align: center; padding-top: 0.5rem;'>Page {page + 1} of {page_count}</div>",
+                    unsafe_allow_html=True)
+                st.button("Next →", key="tc_next_page", disabled=page >= page_count - 1,
+                          on_click=tc_change_page, args=(1,))
+
+
+def tc_topic_index():
+    """The session's BM25 index over its sources; only sources changed since the last use are reindexed."""
+    index = st.session_state.get('tc_topic_index')
+    if index is None:
+        index = st.session_state.tc_topic_index = BM25Index()
+    with span("retrieval_index"):
+        index.sync(st.session_state.all_texts)
+    return index
+
+
+@st.fragment
+def render_topic_builder():
+    """
+    Quiz material on a topic from all sources: the best-matching passages fill
+    the character limit a quiz is generated from. Typing a topic reruns only
+    this fragment.
+    """
+    with span("fragment_run", view='topic_builder'):
+        topic = st.text_input("Topic", key="tc_topic", placeholder="e.g., photosynthesis")
+        if not topic.strip():
+            st.caption("The passages that best match the topic are taken from all of your sources.")
+            return
+        budget = st.session_state.get('char_limit', 20000)
+        index = tc_topic_index()
+        input_size = size_bucket(sum(len(text) for text in st.session_state.all_texts.values()))
+        with span("retrieval", input_size=input_size):
+            text, passages = index.build_context(topic, budget)
+        if not passages:
+            st.info("No passages match this topic.")
+            return
+        material = get_blob_store().get(get_blob_store().put(text))
+        source_count = len({p.name for p in passages})
+        st.text_area(f"Topic Material ({len(passages)} passage(s) from {source_count} source(s))",
+                     material.preview(), height=250, disabled=True)
+        st.caption(f"{material.chars:,} of {budget:,} characters · ~{material.tokens:,} tokens")
+        if st.button("🚀 Use Topic Material for Quiz & Return Home", key="tc_use_topic", type="primary",
+                     use_container_width=True):
+            set_material(material.handle, topic=topic.strip())
+            st.session_state.show_ai_settings = not material.is_json
+            st.session_state.page = 'main'
+            st.rerun(scope="app")
+
+
+TC_SEARCH_RESULTS = 20
+
+
+def search_saved_passages(user_id, query):
+    try:
+        return get_cloud_store().search(user_id, query, limit=TC_SEARCH_RESULTS)
+    except Exception as e:
+        st.error(f"Search failed: {e}")
+        return []
+
+
+@st.fragment
+def render_passage_search(user_id):
+    """
+    Full-text search over every source saved under the Resources ID (SQLite
+    source store). Typing reruns only this fragment; the matching passages can
+    be used as quiz material directly.
+    """
+    with span("fragment_run", view='passage_search'):
+        st.subheader("🔎 Search Saved Sources")
+        query = st.text_input("Find passages across your saved sources", key="tc_passage_search",
+                              placeholder="e.g., photosynthesis")
+        if not query.strip():
+            return
+        passages = search_saved_passages(user_id, query)
+        if not passages:
+            st.info("No saved passages match your search.")
+            return
+        st.caption(f"Top {len(passages)} matching passage(s)")
+        for passage in passages:
+            st.markdown(f"**{passage.name}** · passage {passage.seq + 1}  \n{passage.snippet}")
+
+        if st.button(f"🚀 Use these {len(passages)} Passages for Quiz & Return Home", key="tc_use_passages",
+                     type="primary", use_container_width=True):
+            text = "\n\n".join(f"--- {p.name} (passage {p.seq + 1}) ---\n\n{p.text}" for p in passages)
+            material = get_blob_store().get(get_blob_store().put(text))
+            set_material(material.handle)
+            st.session_state.show_ai_settings = not material.is_json
+            st.session_state.page = 'main'
+            st.rerun(scope="app")
+
+
+def tc_extract_text_from_file(uploaded_file):
+    """Extracts text content from a supported file type; raises extraction.ExtractionError if it cannot."""
+    return extract_text(uploaded_file.getvalue(), os.path.splitext(uploaded_file.name)[1])
 
 
-@st.cache_data(ttl=60) # Cache for 1 minute to avoid hitting API rate limits
 # def get_all_cloud_data():
 #     """Reads the entire database (one JSON file) from JSONBin."""
 #     try:
@@ -1021,24 +1328,15 @@ def tc_extract_text_from_file(uploaded_file):
 #     except Exception as e:
 #         st.error(f"An unexpected error occurred while fetching data: {e}")
 #         return None
-def get_all_cloud_data():
+def get_cloud_sources(user_id):
     """
-    Fetches the entire dataset from Firebase Realtime Database.
-    The data is expected to be stored under a main 'users' node.
+    Fetches one user's sources ({name: text}) from the source store (Firebase
+    through the shared per-user read cache, or SQLite). Returns {} if the user has none.
     """
     try:
-        # db.child("users") points to the main data node.
-        # .get().val() fetches the value.
-        response = db.child("users").get().val()
-
-        # If the database is empty or the node doesn't exist, it returns None
-        if response is None:
-            return {}  # Return an empty dict to match the app's expectation
-
-        return response
-
+        return get_cloud_store().get(user_id)
     except Exception as e:
-        st.error(f"Failed to load cloud data from Firebase: {e}")
+        st.error(f"Failed to load your saved sources: {e}")
         # Return None to indicate a failure in the connection or rules
         return None
 
@@ -1054,23 +1352,38 @@ def get_all_cloud_data():
 #     except Exception as e:
 #         st.error(f"Failed to save data to JSONBin: {e}")
 #         return False
-def save_all_cloud_data(data):
+def save_cloud_sources(user_id, sources):
     """
-    Saves/Updates data to Firebase Realtime Database using the .update() method.
-    This is highly efficient as it only sends the changed data, not the whole object.
+    Adds or updates the given sources for the user. Only these documents are
+    sent (Firebase's update merges) and the user's others are kept.
     """
     try:
-        # .update() is the magic here. It merges the provided data with the
-        # existing data in the cloud. If you upload 5 new files, it only
-        # sends those 5 files, solving the "payload too big" 403 error.
-        db.child("users").update(data)
+        get_cloud_store().save(user_id, sources)
         return True
-
     except Exception as e:
-        st.error(f"Failed to save data to Firebase: {e}")
+        st.error(f"Failed to save your sources: {e}")
         # This might happen if security rules are wrong or network is down.
         return False
 
+
+def delete_cloud_sources(user_id, doc_names):
+    try:
+        get_cloud_store().delete(user_id, doc_names)
+        return True
+    except Exception as e:
+        st.error(f"Failed to delete your sources: {e}")
+        return False
+
+
+def clear_cloud_sources(user_id):
+    try:
+        get_cloud_store().clear(user_id)
+        return True
+    except Exception as e:
+        st.error(f"Failed to clear your sources: {e}")
+        return False
+
+
 def sanitize_firebase_key(key: str) -> str:
     """Replaces Firebase-invalid characters ('.', '$', '#', '[', ']', '/') with underscores."""
     if not isinstance(key, str):
@@ -1086,6 +1399,8 @@ def render_text_collector_page():
     state updates, eliminating the need for hard page reloads.
     """
     tc_initialize_state()
+    if st.session_state.pop('tc_save_pending', False):
+        tc_save_data()
 
     if st.button("⬅️ Back to Knowledge Quest"):
         st.session_state.page = 'main'
@@ -1104,9 +1419,8 @@ def render_text_collector_page():
 
     if st.button("🔄 Load My Sources from Cloud", disabled=not user_id):
         if user_id:
-            all_cloud_data = get_all_cloud_data()
-            if all_cloud_data is not None:
-                user_sources = all_cloud_data.get(user_id, {})
+            user_sources = get_cloud_sources(user_id)
+            if user_sources is not None:
                 if user_sources:
                     st.session_state.all_texts.update(user_sources)
                     st.session_state.processed_files.update(user_sources.keys())
@@ -1118,6 +1432,9 @@ def render_text_collector_page():
         else:
             st.warning("Please enter a Resources ID to load data from the cloud.")
 
+    if user_id and source_search_enabled():
+        render_passage_search(user_id)
+
     st.divider()
 
     col1, col2 = st.columns([1, 1.3])
@@ -1169,15 +1486,10 @@ def render_text_collector_page():
 
                     if user_id:
                         with st.spinner(f"Saving {len(success_results)} file(s) to the cloud..."):
-                            all_cloud_data = get_all_cloud_data()
-                            if all_cloud_data is not None:
-                                if user_id not in all_cloud_data:
-                                    all_cloud_data[user_id] = {}
-                                all_cloud_data[user_id].update(success_results)
-                                if save_all_cloud_data(all_cloud_data):
-                                    st.success(f"Successfully saved {len(success_results)} new file(s) to the cloud.")
-                                else:
-                                    st.error("Failed to save to the cloud due to size limits or network issues.")
+                            if save_cloud_sources(user_id, success_results):
+                                st.success(f"Successfully saved {len(success_results)} new file(s) to the cloud.")
+                            else:
+                                st.error("Failed to save to the cloud due to size limits or network issues.")
 
                 if failed_files:
                     for name, error_msg in failed_files.items():
@@ -1211,19 +1523,11 @@ def render_text_collector_page():
 
                             if user_id:
                                 with st.spinner("Saving to cloud..."):
-                                    all_cloud_data = get_all_cloud_data()
-                                    if all_cloud_data is not None:
-                                        # --- CORRECTED LOGIC ---
-                                        # Ensure user's data object exists, then add/update the single new item.
-                                        # This prevents overwriting all other cloud data.
-                                        if user_id not in all_cloud_data:
-                                            all_cloud_data[user_id] = {}
-                                        all_cloud_data[user_id][sanitized_name] = pasted_text
-
-                                        if save_all_cloud_data(all_cloud_data):
-                                            st.success(f"Successfully saved '{sanitized_name}' to the cloud.")
-                                        else:
-                                            st.error(f"Failed to save '{sanitized_name}' to the cloud.")
+                                    # Only the new item is sent; the user's other cloud sources are kept.
+                                    if save_cloud_sources(user_id, {sanitized_name: pasted_text}):
+                                        st.success(f"Successfully saved '{sanitized_name}' to the cloud.")
+                                    else:
+                                        st.error(f"Failed to save '{sanitized_name}' to the cloud.")
                             st.rerun()
                     else:
                         st.warning("Please provide both a unique source name and text content.")
@@ -1239,11 +1543,11 @@ def render_text_collector_page():
                 if c1.button("✅ Yes, Clear Local", use_container_width=True, key="confirm_local_yes"):
                     st.session_state.all_texts = {}
                     st.session_state.processed_files = set()
-                    tc_save_data()
+                    st.session_state.tc_selected_sources = set()
                     st.session_state.confirm_clear_local = False
-                    st.success("Local data has been cleared.")
-                    st.components.v1.html("<script>window.location.reload();</script>", height=0, width=0)
-                    # st.rerun() # CORRECT: Use st.rerun() instead of a hard reload.
+                    st.session_state.tc_save_pending = True
+                    st.toast("Local data has been cleared.")
+                    st.rerun()
                 if c2.button("❌ No, Cancel", use_container_width=True, key="confirm_local_no"):
                     st.session_state.confirm_clear_local = False
                     st.rerun()
@@ -1258,22 +1562,21 @@ def render_text_collector_page():
                 c1, c2 = st.columns(2)
                 if c1.button("✅ Yes, Clear Cloud", use_container_width=True, key="confirm_cloud_yes"):
                     with st.spinner(f"Clearing all cloud data for '{user_id}'..."):
-                        all_cloud_data = get_all_cloud_data()
-                        if all_cloud_data is not None and user_id in all_cloud_data:
-                            all_cloud_data[user_id] = {}
-                            if save_all_cloud_data(all_cloud_data):
+                        user_sources = get_cloud_sources(user_id)
+                        if user_sources:
+                            if clear_cloud_sources(user_id):
                                 # Also clear local data for consistency
                                 st.session_state.all_texts = {}
                                 st.session_state.processed_files = set()
-                                tc_save_data()
-                                st.success(f"Successfully cleared all cloud and local data for '{user_id}'.")
+                                st.session_state.tc_selected_sources = set()
+                                st.session_state.tc_save_pending = True
+                                st.toast(f"Successfully cleared all cloud and local data for '{user_id}'.")
                             else:
-                                st.error("Failed to clear cloud data. Local data remains untouched.")
+                                st.toast("Failed to clear cloud data. Local data remains untouched.", icon="❌")
                         else:
-                            st.warning("No cloud data found for this user to clear.")
+                            st.toast("No cloud data found for this user to clear.", icon="⚠️")
                     st.session_state.confirm_clear_cloud = False
-                    st.components.v1.html("<script>window.location.reload();</script>", height=0, width=0)
-                    # st.rerun() # CORRECT: Rerun to refresh the UI.
+                    st.rerun()
                 if c2.button("❌ No, Cancel", use_container_width=True, key="confirm_cloud_no"):
                     st.session_state.confirm_clear_cloud = False
                     st.rerun()
@@ -1288,161 +1591,264 @@ def render_text_collector_page():
         if not st.session_state.all_texts:
             st.info("No sources saved. Upload a file or load from the cloud to begin.")
         else:
+            with st.expander("🎯 Build a Quiz on a Topic"):
+                render_topic_builder()
+
             all_doc_names = sorted(list(st.session_state.all_texts.keys()))
+            if 'doc_multiselect' in st.session_state:
+                # Sources may have been deleted by the source manager since the last full run.
+                st.session_state.doc_multiselect = [
+                    doc for doc in st.session_state.doc_multiselect if doc in st.session_state.all_texts]
             selected_docs = st.multiselect("Choose sources to combine:", options=all_doc_names, key="doc_multiselect")
 
             # Sync selected sources to cloud (This logic was okay)
             if selected_docs and user_id:
                 if st.button(f"⬆️ Sync {len(selected_docs)} Selected Source(s) to Cloud", use_container_width=True):
-                    all_cloud_data = get_all_cloud_data()
-                    if all_cloud_data is not None:
-                        if user_id not in all_cloud_data: all_cloud_data[user_id] = {}
-                        for doc_name in selected_docs:
-                            all_cloud_data[user_id][doc_name] = st.session_state.all_texts[doc_name]
-                        if save_all_cloud_data(all_cloud_data):
-                            st.success(f"Successfully synced {len(selected_docs)} source(s) to the cloud.")
-                        else:
-                            st.error("Failed to sync sources to the cloud.")
+                    selected_sources = {doc_name: st.session_state.all_texts[doc_name] for doc_name in selected_docs}
+                    if save_cloud_sources(user_id, selected_sources):
+                        st.success(f"Successfully synced {len(selected_docs)} source(s) to the cloud.")
+                    else:
+                        st.error("Failed to sync sources to the cloud.")
 
             if selected_docs:
                 content_blocks = [f"--- Content of: {doc} ---\n\n{st.session_state.all_texts[doc]}" for doc in selected_docs]
                 appended_text = "\n\n".join(content_blocks)
-                st.text_area(f"Combined Content ({len(selected_docs)} Sources)", appended_text, height=250, key="combined_text_area")
+                # Only a preview goes to the browser; the full text stays in the session's blob store.
+                combined = get_blob_store().get(get_blob_store().put(appended_text))
+                st.text_area(f"Combined Content ({len(selected_docs)} Sources)", combined.preview(), height=250,
+                             disabled=True)
+                st.caption(f"{combined.chars:,} characters · ~{combined.tokens:,} tokens")
 
                 def use_text_for_quiz_and_switch_view():
-                    st.session_state.text_to_inject = st.session_state.combined_text_area
+                    set_material(combined.handle)
+                    st.session_state.show_ai_settings = not combined.is_json
                     st.session_state.page = 'main'
                 st.button("🚀 Use this Text for Quiz & Return Home", type="primary", on_click=use_text_for_quiz_and_switch_view, use_container_width=True)
 
             st.markdown("---")
-            st.subheader("Manage Saved Sources")
-
-            # Use a copy of the keys to prevent errors while iterating and deleting
-            for doc_name in list(st.session_state.all_texts.keys()):
-                c1, c2, c3 = st.columns([0.6, 0.2, 0.2])
-                c1.text(doc_name)
-
-                # --- CORRECTED INDIVIDUAL DELETE LOGIC ---
-                if c2.button("🗑️ Local", key=f"delete_local_{doc_name}", help="Delete from this browser's storage", use_container_width=True):
-                    if doc_name in st.session_state.all_texts:
-                        del st.session_state.all_texts[doc_name]
-                    st.session_state.processed_files.discard(doc_name)
-                    tc_save_data()
-                    st.toast(f"Deleted '{doc_name}' from local storage.")
-                    st.components.v1.html("<script>window.location.reload();</script>", height=0, width=0)
-                    # st.rerun()
-
-                if c3.button("☁️ Cloud", key=f"delete_cloud_{doc_name}", help="Delete from your online cloud storage", use_container_width=True, disabled=not user_id):
-                    with st.spinner(f"Deleting '{doc_name}' from cloud..."):
-                        all_cloud_data = get_all_cloud_data()
-                        if all_cloud_data is not None and user_id in all_cloud_data and doc_name in all_cloud_data[user_id]:
-                            del all_cloud_data[user_id][doc_name]
-                            if save_all_cloud_data(all_cloud_data):
-                                st.success(f"Deleted '{doc_name}' from the cloud.")
-                                # Also delete locally for consistency
-                                if doc_name in st.session_state.all_texts:
-                                    del st.session_state.all_texts[doc_name]
-                                    st.session_state.processed_files.discard(doc_name)
-                                    tc_save_data()
-                            else:
-                                st.error(f"Failed to delete '{doc_name}' from the cloud. It remains locally.")
-                        else:
-                            st.warning(f"'{doc_name}' not found in cloud. Removing it locally.")
-                            if doc_name in st.session_state.all_texts:
-                                del st.session_state.all_texts[doc_name]
-                                st.session_state.processed_files.discard(doc_name)
-                                tc_save_data()
-                    st.components.v1.html("<script>window.location.reload();</script>", height=0, width=0)
-                    # st.rerun()
-
-# Main app
-def main():
-    init_session_state()
-    init_poe_client()
-
-    # We default to the 'main' quiz page.
-    if 'page' not in st.session_state:
-        st.session_state.page = 'main'
-
-    # If the state is 'text_collector', render that page and stop.
-    if st.session_state.page == 'text_collector':
-        render_text_collector_page()
-        return  # This stops the rest of the main function from running
-
-    # --- Main Quiz App Logic (runs if page is not 'text_collector') ---
-
-    # Inject text from the collector if it exists
-    if 'text_to_inject' in st.session_state and st.session_state.text_to_inject:
-        st.session_state.question_input = st.session_state.text_to_inject
-        del st.session_state.text_to_inject
-
-    if st.session_state.get('revision_mode'):
-        render_revision_mode()
-    elif st.session_state.get('quiz_finished'):
-        show_quiz_summary()
-    elif st.session_state.get('quiz_started'):
-        render_quiz_question()
+            render_source_manager(user_id)
+
+
+def render_setup_page():
+    def set_quiz_generation_status():
+        st.session_state.quiz_generation_in_progress = True
+        st.session_state.start_quiz_requested = True
+    def reset_quiz_generation_status():
+        st.session_state.quiz_generation_in_progress = False
+    # Setup page
+    st.markdown("<div class='main-title'>✨ Knowledge Quest ✨</div>", unsafe_allow_html=True)
+
+    # --- FIX: Conditional AI Settings UI ---
+    material = get_material_blob()
+    if material is not None:
+        st.text_area("Loaded material (preview):", material.preview(), height=200, disabled=True)
+        kind = "question JSON" if material.is_json else "study material"
+        c1, c2 = st.columns([3, 1])
+        c1.caption(f"{material.chars:,} characters · ~{material.tokens:,} tokens · {kind}")
+        c2.button("✖️ Remove", on_click=clear_material, use_container_width=True)
+        char_count = material.chars
     else:
-        def set_quiz_generation_status():
-            st.session_state.quiz_generation_in_progress = True
-        def reset_quiz_generation_status():
-            st.session_state.quiz_generation_in_progress = False
-        # Setup page
-        st.markdown("<div class='main-title'>✨ Knowledge Quest ✨</div>", unsafe_allow_html=True)
-
-        # --- FIX: Conditional AI Settings UI ---
         st.text_area(
             "Paste your materials or pre-formatted JSON to begin:",
             placeholder="Paste any text for AI-generated questions, or paste a valid JSON array of questions.",
             height=200, key="question_input", on_change=check_input_and_show_ai_settings
         )
         char_count = len(st.session_state.get("question_input", ""))
-        MAX_CHAR_LIMIT = st.session_state.get("char_limit", 20000)
-        # Display the character counter. st.caption is ideal for small helper text.
-
-
-        # Display a warning if the character count exceeds the limit.
-        if char_count > MAX_CHAR_LIMIT:
-            st.caption(f"{char_count} / {MAX_CHAR_LIMIT} characters")
-            st.warning(
-                f"Warning: Your text exceeds the {MAX_CHAR_LIMIT} character limit. "
-                f"First {MAX_CHAR_LIMIT} characters is used for processing."
-            )
-
-
-        def go_to_text_collector():
-            st.session_state.page = 'text_collector'
-
-        st.button("Or, Extract Text from Documents", icon="📚", on_click=go_to_text_collector)
-
-        # show_ai_panel = st.session_state.get('show_ai_settings', False)
-        # if show_ai_panel:
-        with st.expander("🤖 AI Generation Settings", expanded=True):
-            c1, c2 = st.columns(2)
-            c1.selectbox("AI Model:", ["Gemini-3-Flash",
-                                       'Grok-4.1-Fast-Reasoning',
-                                       # "Gemini-2.5-Pro",
-                                       # "GPT-5",
-                                       "GPT-5-mini"],
-                         key="llm_model",
-                         on_change=reset_quiz_generation_status)
-            c2.number_input("Number of Questions:", min_value=1, max_value=20, value=3, key="num_questions", on_change=reset_quiz_generation_status)
-
-
-        st.session_state.quiz_mode = 'Silent Mode'
-        # with st.expander("⚙️ Quiz Settings"):
-        #     st.selectbox("Quiz Mode:", ["silent", "audio"],
-        #                  format_func=lambda x: "Silent Mode" if x == "silent" else "Audio Mode", key="quiz_mode")
-        #     if st.session_state.quiz_mode == 'audio':
-        #         st.checkbox("Speak question audio", value=True, key="speak_question")
-        #         st.checkbox("Speak correct answer audio", value=True, key="speak_answer")
-
-        if st.button("🚀 Start Quiz",
-                     type="primary",
-                     use_container_width=True,
-                     on_click=set_quiz_generation_status,
-                     disabled=st.session_state.get('quiz_generation_in_progress', False)):
-            start_quiz()
+    MAX_CHAR_LIMIT = st.session_state.get("char_limit", 20000)
+    # Display the character counter. st.caption is ideal for small helper text.
+
+
+    # Display a warning if the character count exceeds the limit.
+    if char_count > MAX_CHAR_LIMIT:
+        st.caption(f"{char_count} / {MAX_CHAR_LIMIT} characters")
+        st.warning(
+            f"Warning: Your text exceeds the {MAX_CHAR_LIMIT} character limit. "
+            f"First {MAX_CHAR_LIMIT} characters is used for processing."
+        )
+
+
+    def go_to_text_collector():
+        st.session_state.page = 'text_collector'
+
+    st.button("Or, Extract Text from Documents", icon="📚", on_click=go_to_text_collector)
+    st.file_uploader("Or open a quiz pack:", type=[QUIZ_PACK_EXTENSION.lstrip(".")], key="quiz_pack_upload",
+                     on_change=load_quiz_pack)
+    if st.session_state.get('quiz_pack_error'):
+        st.error(st.session_state.quiz_pack_error)
+    pack = st.session_state.pop('quiz_pack_loaded', None)
+    if pack is not None:
+        start_quiz_from_pack(pack)
+
+    # show_ai_panel = st.session_state.get('show_ai_settings', False)
+    # if show_ai_panel:
+    with st.expander("🤖 AI Generation Settings", expanded=True):
+        c1, c2 = st.columns(2)
+        c1.selectbox("AI Model:", get_model_options() + [AUTO_MODEL],
+                     key="llm_model",
+                     on_change=reset_quiz_generation_status)
+        c2.number_input("Number of Questions:", min_value=1, max_value=20, value=3, key="num_questions", on_change=reset_quiz_generation_status)
+        st.selectbox("Quizzes per request:", list(QUIZ_SET_CHOICES), key="quiz_sets",
+                     on_change=reset_quiz_generation_status,
+                     help="Several quizzes on the same material from one AI request, which sends the material "
+                          "once. The first quiz starts; the others wait under Prepared Quizzes.")
+
+    render_prepared_quizzes_panel()
+    render_review_panel()
+
+    if question_bank_enabled():
+        render_question_bank_panel()
+
+    st.session_state.quiz_mode = 'Silent Mode'
+    # with st.expander("⚙️ Quiz Settings"):
+    #     st.selectbox("Quiz Mode:", ["silent", "audio"],
+    #                  format_func=lambda x: "Silent Mode" if x == "silent" else "Audio Mode", key="quiz_mode")
+    #     if st.session_state.quiz_mode == 'audio':
+    #         st.checkbox("Speak question audio", value=True, key="speak_question")
+    #         st.checkbox("Speak correct answer audio", value=True, key="speak_answer")
+
+    st.button("🚀 Start Quiz",
+              type="primary",
+              use_container_width=True,
+              on_click=set_quiz_generation_status,
+              disabled=st.session_state.get('quiz_generation_in_progress', False))
+    # The click callback disables the button before it is rendered, and Streamlit ignores
+    # the value of a disabled widget, so the start request is carried in session state.
+    if st.session_state.pop('start_quiz_requested', False):
+        start_quiz()
+        # Only reached when no quiz was started (start_quiz reruns on success).
+        reset_quiz_generation_status()
+
+
+def load_quiz_pack():
+    """Upload callback: reads and verifies the pack; the setup page starts it (st.rerun is a no-op here)."""
+    upload = st.session_state.get('quiz_pack_upload')
+    st.session_state.quiz_pack_error = None
+    if upload is None:
+        return
+    try:
+        st.session_state.quiz_pack_loaded = read_pack(upload)
+    except PackError as e:
+        st.session_state.quiz_pack_error = f"Could not open the quiz pack: {e}"
+
+
+def start_quiz_from_pack(pack):
+    audio_urls = pack.audio_urls()
+    if pack.audio:
+        # Play the pack's clips; setup_quiz_with_questions synthesizes nothing for a pack.
+        st.session_state.quiz_mode = 'audio'
+        st.session_state.speak_question = bool(audio_urls['questions'])
+        st.session_state.speak_answer = bool(audio_urls['answers'])
+    setup_quiz_with_questions(None, quiz=pack.session(), audio_urls=audio_urls)
+
+
+def render_prepared_quizzes_panel():
+    """The other quizzes generated in the same request as the last one."""
+    prepared = st.session_state.get('prepared_quizzes')
+    if not prepared:
+        return
+    with st.expander("📦 Prepared Quizzes", expanded=True):
+        for label, questions in list(prepared.items()):
+            if st.button(f"▶️ Start the {label} quiz ({len(questions)} questions)", key=f"prepared_{label}",
+                         use_container_width=True):
+                setup_quiz_with_questions(prepared.pop(label))
+        st.caption("Generated in the same request as your last quiz, on the same material.")
+
+
+def render_review_panel():
+    """Questions answered in earlier quizzes that spaced repetition says are due again."""
+    key = st.query_params.get(LEARNER_PARAM)
+    if not key:
+        return  # Nothing answered yet in this browser session.
+    try:
+        due = get_review_scheduler().due_count(key)
+    except Exception as e:
+        st.warning(f"Could not read the review schedule: {e}")
+        return
+    if due and st.button(f"🔁 Review {due} Due Question(s)", key="review_due", use_container_width=True):
+        start_review_quiz(key)
+
+
+def start_review_quiz(key):
+    try:
+        questions = get_review_scheduler().due(key, limit=st.session_state.get('num_questions', 3))
+    except Exception as e:
+        st.error(f"Could not read the review schedule: {e}")
+        return
+    if questions:
+        setup_quiz_with_questions(questions)
+
+
+def render_question_bank_panel():
+    """Quizzes assembled from the question bank for material or a topic seen before, with no LLM call."""
+    text = material_text()
+    try:
+        bank = get_question_bank()
+        source = source_hash(text) if text else None
+        saved = bank.count(source=source) if source else 0
+        topics = dict(bank.topics())
+    except Exception as e:
+        st.warning(f"Could not read the question bank: {e}")
+        return
+    if not saved and not topics:
+        return
+    with st.expander("🏦 Question Bank"):
+        if saved and st.button(f"⚡ Quiz from {saved} Saved Question(s) on This Material", key="bank_use_material",
+                               use_container_width=True):
+            start_quiz_from_bank(source=source)
+        if topics:
+            topic = st.selectbox("Saved topics:", list(topics), key="bank_topic",
+                                 format_func=lambda t: f"{t} ({topics[t]} question(s))")
+            if st.button("⚡ Quiz from Saved Questions on This Topic", key="bank_use_topic", use_container_width=True):
+                start_quiz_from_bank(topic=topic)
+        st.caption("Questions asked least often, then those most often missed, are picked first.")
+
+
+def start_quiz_from_bank(source=None, topic=None):
+    try:
+        questions = get_question_bank().assemble(st.session_state.get('num_questions', 3), source=source, topic=topic)
+    except Exception as e:
+        st.error(f"Could not read the question bank: {e}")
+        return
+    if questions:
+        setup_quiz_with_questions(questions)
+
+
+# Main app
+def main():
+    init_telemetry()
+    try:
+        init_session_state()
+        init_poe_client()
+
+        # We default to the 'main' quiz page.
+        if 'page' not in st.session_state:
+            st.session_state.page = 'main'
+
+        # If the state is 'text_collector', render that page and stop.
+        if st.session_state.page == 'text_collector':
+            with span("render", view='text_collector'):
+                render_text_collector_page()
+            account_session_memory()
+            return  # This stops the rest of the main function from running
+        keep_local_storage_snapshot()
+
+        # --- Main Quiz App Logic (runs if page is not 'text_collector') ---
+        restore_quiz_from_url()
+
+        if st.session_state.get('revision_mode'):
+            view, render = 'revision', render_revision_mode
+        elif st.session_state.quiz is not None and st.session_state.quiz.finished:
+            view, render = 'summary', show_quiz_summary
+        elif st.session_state.get('quiz_started'):
+            view, render = 'question', render_quiz_question
+        else:
+            view, render = 'setup', render_setup_page
+        with span("render", view=view):
+            render()
+        account_session_memory()
+    finally:
+        # Whole script run, including module-level setup (secrets, CSS).
+        record_phase("script_run", time.perf_counter() - SCRIPT_STARTED, page=st.session_state.get('page'))
 
 
 if __name__ == "__main__":
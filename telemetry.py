@@ -0,0 +1,214 @@
+"""
+Lightweight phase-level timing.
+
+Code is wrapped in ``span("phase", model=..., doc_type=...)`` blocks. When
+telemetry is enabled each span is observed into a histogram keyed by phase and
+tags, and optionally appended to a JSON-lines log; the histograms can be
+served in Prometheus text format, together with any gauges registered with
+``register_gauge``. When disabled, ``span`` returns a shared
+no-op object, so the cost is one function call and an attribute check.
+"""
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf)
+METRIC_NAME = "knowledge_quest_phase_seconds"
+# Streamlit's st.rerun()/st.stop() unwind through spans; they are not failures.
+CONTROL_FLOW_EXCEPTIONS = {"RerunException", "StopException"}
+
+
+def size_bucket(num_chars):
+    """Coarse input-size label, so tags stay low-cardinality."""
+    if num_chars is None:
+        return "unknown"
+    if num_chars < 10_000:
+        return "<10KB"
+    if num_chars < 100_000:
+        return "10-100KB"
+    if num_chars < 1_000_000:
+        return "100KB-1MB"
+    return ">1MB"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self.log_path = None
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def observe(self, phase, seconds, tags):
+        key = (phase, tuple(sorted((k, str(v)) for k, v in tags.items() if v is not None)))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+        log_path = self.log_path
+        if log_path:
+            record = {"ts": round(time.time(), 3), "phase": phase, "seconds": round(seconds, 6)}
+            record.update(dict(key[1]))
+            line = json.dumps(record, ensure_ascii=False)
+            # Its own lock, so observing never waits on the disk; a record that cannot be written is dropped.
+            with self._log_lock:
+                try:
+                    with open(log_path, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+                except OSError:
+                    pass
+
+    def register_gauge(self, name, help_text, read):
+        """``read()`` is called at scrape time and returns the gauge's current value."""
+        with self._lock:
+            self._gauges[name] = (help_text, read)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self):
+        """{(phase, tags): (count, total_seconds)} for display or tests."""
+        with self._lock:
+            return {key: (h.count, h.total) for key, h in self._histograms.items()}
+
+    def render_prometheus(self):
+        lines = [f"# HELP {METRIC_NAME} Time spent per phase of the quiz pipeline.",
+                 f"# TYPE {METRIC_NAME} histogram"]
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (phase, tags), histogram in items:
+                labels = [("phase", phase)] + list(tags)
+                base = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{METRIC_NAME}_bucket{{{base},le="{le}"}} {cumulative}')
+                lines.append(f"{METRIC_NAME}_sum{{{base}}} {histogram.total:.6f}")
+                lines.append(f"{METRIC_NAME}_count{{{base}}} {histogram.count}")
+            gauges = sorted(self._gauges.items())
+        for name, (help_text, read) in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+class Span:
+    """Times a block; extra tags can be attached once known via ``tag()``."""
+
+    __slots__ = ("phase", "tags", "started")
+
+    def __init__(self, phase, tags):
+        self.phase = phase
+        self.tags = tags
+        self.started = 0.0
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and exc_type.__name__ not in CONTROL_FLOW_EXCEPTIONS:
+            self.tags["error"] = exc_type.__name__
+        registry.observe(self.phase, time.perf_counter() - self.started, self.tags)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def tag(self, **tags):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(phase, **tags):
+    if not registry.enabled:
+        return _NOOP_SPAN
+    return Span(phase, tags)
+
+
+def record(phase, seconds, **tags):
+    """Observes an externally measured duration."""
+    if registry.enabled:
+        registry.observe(phase, seconds, tags)
+
+
+def register_gauge(name, help_text, read):
+    registry.register_gauge(name, help_text, read)
+
+
+def configure(enabled=True, log_path=None):
+    """Turns spans on or off; ``log_path``'s directory is created if it does not exist."""
+    directory = os.path.dirname(log_path) if log_path else ""
+    if directory:
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            pass  # Every record is then dropped by observe.
+    registry.enabled = enabled
+    registry.log_path = log_path or None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serves ``/metrics`` in Prometheus text format from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
@@ -0,0 +1,78 @@
+"""Factories and fakes shared by the test modules."""
+import random
+
+from quiz_model import Question
+
+
+class Clock:
+    """A clock the test moves by hand: ``clock.now += 60``."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedBackend:
+    """Returns the given responses in turn."""
+
+    name = "scripted"
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def generate_questions(self, prompt, model):
+        return self.responses.pop(0)
+
+
+def q(stem, answer, correct=0, label=None):
+    """A question dict with ``answer`` at ``correct``; ``label`` names its set in a batched response."""
+    options = ["Other", "Another", "None of these"]
+    options.insert(correct, answer)
+    item = {"question": stem, "options": options, "correct": correct, "hint": "", "explanation": ""}
+    if label is not None:
+        item["set"] = label
+    return item
+
+
+def make_questions(n, seed=0):
+    """``n`` distinct Questions with four options and a random correct one."""
+    rng = random.Random(seed)
+    return [Question.from_dict({"question": f"Question {i}?", "options": [f"{i}-{j}" for j in range(4)],
+                                "correct": rng.randrange(4), "hint": "", "explanation": ""})
+            for i in range(n)]
+
+
+def make_vocabulary(size=5000, seed=0):
+    """Random lowercase words, most frequent first when used with Zipf weights."""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 10))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def make_question(rng, vocab):
+    """A question dict of random words from ``vocab``."""
+    return {
+        "question": " ".join(rng.choices(vocab, k=rng.randint(8, 16))).capitalize() + "?",
+        "options": [" ".join(rng.choices(vocab, k=rng.randint(1, 4))) for _ in range(4)],
+        "correct": rng.randrange(4),
+        "hint": " ".join(rng.choices(vocab, k=6)),
+        "explanation": " ".join(rng.choices(vocab, k=15)),
+    }
+
+
+def make_corpus(num_docs, doc_chars, vocab, seed=0):
+    """Documents of Zipf-distributed words from ``vocab``, in paragraphs of 60 words."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    docs = {}
+    for d in range(num_docs):
+        words = rng.choices(vocab, weights, k=doc_chars // 7)
+        paragraphs = [" ".join(words[i:i + 60]) + "." for i in range(0, len(words), 60)]
+        docs[f"doc{d:04d}.pdf"] = "\n\n".join(paragraphs)
+    return docs
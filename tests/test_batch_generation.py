@@ -0,0 +1,117 @@
+import json
+import os
+
+import pytest
+
+from llm_backends import StubBackend
+from near_duplicates import NearDuplicateFilter
+from quiz_core import (QuestionSet, difficulty_sets, generate_ai_prompt, generate_batch_prompt, run_batch_generation,
+                       validate_questions_array, variant_sets)
+from tests.helpers import ScriptedBackend, q
+
+
+class RecordingRouter:
+    def __init__(self):
+        self.outcomes = []
+
+    def record_outcome(self, *args, **kwargs):
+        self.outcomes.append((args, kwargs))
+
+
+def material(chars):
+    """Varied prose, so stub questions on different sentences are not near-duplicates."""
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "README.md"),
+              encoding="utf-8") as f:
+        text = f.read()
+    return (text * (chars // len(text) + 1))[:chars]
+
+
+def stems(result):
+    return [x["question"] for x in result.questions]
+
+
+def test_the_material_is_sent_once():
+    text = material(8000)
+    prompt = generate_batch_prompt(text, difficulty_sets(4))
+    assert prompt.count(text) == 1 and generate_ai_prompt(text, 4).count(text) == 1
+    assert len(prompt) < 2 * len(generate_ai_prompt(text, 4)), "the instructions are shared too"
+
+
+def test_every_set_gets_its_own_questions():
+    batch = run_batch_generation(StubBackend(), material(8000), difficulty_sets(4), "stub")
+    assert batch.ok and list(batch.results) == ["easy", "standard", "hard"]
+    seen = set()
+    for result in batch.results.values():
+        assert len(result.questions) == 4 and validate_questions_array(result.questions)["valid"]
+        assert all("set" not in question for question in result.questions)
+        assert not set(stems(result)) & seen
+        seen |= set(stems(result))
+
+
+def test_items_are_sorted_into_sets_by_label():
+    response = json.dumps([
+        q("What is the boiling point of water?", "100 °C", label=" Easy"),
+        q("Which planet is the largest?", "Jupiter", label="HARD"),
+        q("Who painted the Mona Lisa?", "Leonardo", correct=1, label="easy"),
+        q("What is the chemical symbol of gold?", "Au"),
+        q("Which ocean is the deepest?", "Pacific", label="medium"),
+        "not an object",
+        dict(q("How many legs does a spider have?", "Eight", label="standard"), correct=7),
+        q("What is the smallest prime number?", "Two", label="hard"),
+        # A rephrasing of an easy question in the hard set.
+        q("What is the boiling point of water at sea level?", "100 °C", label="hard"),
+    ])
+    router = RecordingRouter()
+    batch = run_batch_generation(ScriptedBackend(response), "material", difficulty_sets(2), "m", router=router)
+    easy, standard, hard = batch.results.values()
+    assert stems(easy) == ["What is the boiling point of water?", "Who painted the Mona Lisa?"]
+    assert easy.ok and not easy.truncated and easy.repairs == {}
+    assert standard.error == "invalid" and "correct" in standard.validation_error
+    assert stems(hard) == ["Which planet is the largest?", "What is the smallest prime number?"]
+    assert len(hard.duplicates) == 1 and not hard.truncated
+    # Unlabelled, unknown and non-object items are set aside.
+    assert [position for position, _, _ in batch.unassigned] == [3, 4, 5]
+    assert not batch.ok and batch.error is None
+    # The router records one outcome for the whole call.
+    (args, kwargs), = router.outcomes
+    assert args[2] == 6 and args[4] == 9 and kwargs["quarantined"] == 4
+
+
+def test_a_truncated_response_only_costs_the_last_sets():
+    full = json.dumps([q(f"Question {i} about topic {chr(97 + i)}{chr(98 + i)}?", f"Answer {chr(97 + i) * 3}",
+                         label=f"variant {i // 3 + 1}") for i in range(9)])
+    batch = run_batch_generation(ScriptedBackend(full[:len(full) // 2]), "material", variant_sets(3, 3), "m")
+    first, second, third = batch.results.values()
+    assert first.ok and len(first.questions) == 3 and not first.truncated
+    assert second.truncated and third.error == "no_questions" and third.truncated
+
+
+def test_a_set_of_only_repeats_is_not_a_model_failure():
+    response = json.dumps([q("What is the boiling point of water?", "100 °C", label="variant 1"),
+                           q("Which planet is the largest?", "Jupiter", label="variant 2")])
+    repeat = json.dumps([q("What is the boiling point of water at sea level?", "100 °C", label="variant 1"),
+                         q("Which planet is the largest?", "Jupiter", label="variant 1")])
+    seen, router = NearDuplicateFilter(), RecordingRouter()
+    run_batch_generation(ScriptedBackend(response), "material", variant_sets(1, 2), "m", seen=seen)
+    batch = run_batch_generation(ScriptedBackend(repeat), "material", [QuestionSet("variant 1", 2)], "m",
+                                 router=router, seen=seen)
+    result = batch.results["variant 1"]
+    assert result.error == "all_duplicates" and len(result.duplicates) == 2 and not result.truncated
+    (args, _), = router.outcomes
+    assert args[5:7] == (False, True), "recorded as neither truncated nor failed"
+
+
+def test_a_single_set_needs_no_labels():
+    batch = run_batch_generation(ScriptedBackend(json.dumps([q("What is 2 + 2?", "Four")])), "material",
+                                 [QuestionSet("only", 1)], "m")
+    assert batch.ok and len(batch.results["only"].questions) == 1
+
+
+def test_call_level_failures_reach_every_set():
+    batch = run_batch_generation(ScriptedBackend("Sorry, I cannot help."), "material", variant_sets(2, 2), "m")
+    assert batch.error == "no_json" and all(r.error == "no_json" for r in batch.results.values())
+
+
+def test_duplicate_labels_are_rejected():
+    with pytest.raises(ValueError):
+        run_batch_generation(ScriptedBackend(), "material", [QuestionSet("a", 1), QuestionSet("A", 1)], "m")
@@ -0,0 +1,56 @@
+import json
+
+from blob_store import LARGE_INPUT_CHARS, PREVIEW_CHARS, BlobStore, is_large
+from model_router import estimate_tokens
+from tests.helpers import q
+
+
+def test_a_blob_round_trips():
+    store = BlobStore()
+    text = "Mitochondria produce ATP. " * 2000 + "Ünïcode\ud800"
+    handle = store.put(text)
+    blob = store.get(handle)
+    assert blob.handle == handle and blob.text is text
+    assert blob.chars == len(text) and blob.tokens == estimate_tokens(text)
+    assert store.put(text) == handle and len(store) == 1, "the same text is stored once"
+    assert store.put(text + ".") != handle
+
+
+def test_the_large_input_threshold():
+    assert LARGE_INPUT_CHARS == 20_000
+    assert not is_large("x" * LARGE_INPUT_CHARS)
+    assert is_large("x" * (LARGE_INPUT_CHARS + 1))
+
+
+def test_a_missing_blob_is_none():
+    store = BlobStore()
+    assert store.get("blob_0123456789abcdef") is None
+    handle = store.put("text")
+    store.discard(handle)
+    store.discard(handle)
+    assert store.get(handle) is None and len(store) == 0
+
+
+def test_the_least_recently_used_blob_is_evicted_but_not_the_pinned_one():
+    store = BlobStore(max_blobs=3)
+    pinned, first, second = store.put("pinned"), store.put("first"), store.put("second")
+    store.pin(pinned)
+    store.get(first)
+    third = store.put("third")
+    assert store.get(second) is None, "the least recently used"
+    assert all(store.get(h) is not None for h in (pinned, first, third))
+    assert store.trim() == 2 and len(store) == 1 and store.get(pinned) is not None
+
+
+def test_the_preview_is_cut_and_says_how_much_is_hidden():
+    store = BlobStore()
+    short = store.get(store.put("x" * PREVIEW_CHARS))
+    assert short.preview() == short.text
+    long = store.get(store.put("y" * (PREVIEW_CHARS + 500)))
+    assert long.preview().startswith("y" * PREVIEW_CHARS) and "500 more characters" in long.preview()
+
+
+def test_is_json_recognises_a_question_array():
+    store = BlobStore()
+    assert store.get(store.put(json.dumps([q("What is 2 + 2?", "Four")]))).is_json
+    assert not store.get(store.put("Plain study notes.")).is_json
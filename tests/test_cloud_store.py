@@ -0,0 +1,140 @@
+import copy
+
+import pytest
+
+from cloud_store import CloudSourceStore, UserSourceCache, sources_size
+from tests.helpers import Clock
+
+
+class FakeFirebase:
+    """The subset of pyrebase's database API cloud_store uses, over a nested dict."""
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else {}
+        self.requests = 0
+
+    def child(self, *path):
+        return _Ref(self, list(path))
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+
+    def child(self, name):
+        return _Ref(self.db, self.path + [name])
+
+    def _node(self, create=False):
+        node = self.db.data
+        for name in self.path:
+            if name not in node:
+                if not create:
+                    return None
+                node[name] = {}
+            node = node[name]
+        return node
+
+    def get(self):
+        self.db.requests += 1
+        return _Result(copy.deepcopy(self._node()) or None)
+
+    def update(self, data):
+        self.db.requests += 1
+        node = self._node(create=True)
+        for key, value in data.items():
+            if value is None:
+                node.pop(key, None)
+            else:
+                node[key] = value
+
+    def remove(self):
+        self.db.requests += 1
+        parent = _Ref(self.db, self.path[:-1])._node()
+        if parent is not None:
+            parent.pop(self.path[-1], None)
+
+
+class _Result:
+    def __init__(self, value):
+        self._value = value
+
+    def val(self):
+        return self._value
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def db():
+    return FakeFirebase({"users": {"a": {"d1": "one"}}})
+
+
+@pytest.fixture
+def cache(clock):
+    return UserSourceCache(max_bytes=10_000, ttl=60, clock=clock)
+
+
+@pytest.fixture
+def store(db, cache):
+    return CloudSourceStore(db, cache)
+
+
+def test_a_second_read_is_a_cache_hit(store, cache, db):
+    assert store.get("a") == {"d1": "one"}
+    requests = db.requests
+    assert store.get("a") == {"d1": "one"}
+    assert cache.hits == 1 and cache.misses == 1 and db.requests == requests
+
+
+def test_callers_get_copies(store):
+    store.get("a")["d1"] = "edited"
+    assert store.get("a") == {"d1": "one"}
+
+
+def test_writes_update_the_cache_and_only_that_user_node(store, db):
+    store.get("a")
+    store.save("a", {"d2": "two"})
+    assert store.get("a") == {"d1": "one", "d2": "two"}, "read-your-writes through the cache"
+    assert db.data["users"]["a"] == {"d1": "one", "d2": "two"}
+    store.delete("a", ["d1"])
+    assert store.get("a") == {"d2": "two"} and db.data["users"]["a"] == {"d2": "two"}
+    store.clear("a")
+    assert store.get("a") == {} and "a" not in db.data["users"]
+
+
+def test_a_write_does_not_populate_a_cold_user(store, cache):
+    store.save("b", {"x": "1"})
+    assert len(cache) == 0
+
+
+def test_a_read_racing_a_write_is_not_cached(store, cache, db):
+    store.save("b", {"x": "1"})
+    version = cache.version("b")
+    stale_read = db.child("users").child("b").get().val()
+    store.save("b", {"y": "2"})
+    cache.put("b", stale_read, version)
+    assert store.get("b") == {"x": "1", "y": "2"}
+
+
+def test_entries_expire_after_the_ttl(store, db, clock):
+    store.get("a")
+    db.data["users"]["a"]["d2"] = "from another device"
+    clock.now += 59
+    assert "d2" not in store.get("a")
+    clock.now += 2
+    assert store.get("a")["d2"] == "from another device"
+
+
+def test_the_cache_is_bounded_by_size(clock):
+    small = UserSourceCache(max_bytes=sources_size({"k": "v" * 1000}) * 2 + 100, clock=clock)
+    for i in range(10):
+        small.put(f"u{i}", {"k": "v" * 1000})
+        assert small.bytes <= small.max_bytes
+    assert len(small) == 2 and small.evictions == 8
+    assert small.get("u9") is not None and small.get("u0") is None, "least recently used first"
+    small.put("huge", {"k": "v" * 100_000})
+    assert small.get("huge") is None, "an entry larger than the bound is not cached"
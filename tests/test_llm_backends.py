@@ -0,0 +1,46 @@
+from llm_backends import StubBackend, backend_from_settings
+
+
+def settings(**values):
+    return lambda name, default="": values.get(name, default)
+
+
+def test_stub_settings_are_parsed():
+    backend = backend_from_settings(settings(LLM_BACKEND="stub", STUB_TRUNCATE_AT="0.6", STUB_LATENCY="0.25"))
+    assert isinstance(backend, StubBackend)
+    assert backend.truncate_at == 0.6 and backend.latency == 0.25
+
+
+def test_stub_defaults_do_not_truncate():
+    backend = backend_from_settings(settings(LLM_BACKEND="stub"))
+    assert backend.truncate_at is None and backend.latency == 0.0
+
+
+def test_stub_truncate_at_zero_is_kept():
+    backend = backend_from_settings(settings(LLM_BACKEND="stub", STUB_TRUNCATE_AT="0"))
+    assert backend.truncate_at == 0
+    assert backend.generate_questions("Generate 2 questions about cells.") == ""
+
+
+def test_malformed_stub_settings_go_through_on_error():
+    for bad in ({"STUB_TRUNCATE_AT": "abc"}, {"STUB_LATENCY": "fast"}, {"STUB_TRUNCATE_AT": "-5"},
+                {"STUB_LATENCY": "-1"}, {"STUB_TRUNCATE_AT": "1.5"}, {"STUB_TRUNCATE_AT": "1.0"},
+                {"STUB_TRUNCATE_AT": "0.0"}, {"STUB_TRUNCATE_AT": "1e3"}):
+        errors = []
+        assert backend_from_settings(settings(LLM_BACKEND="stub", **bad), on_error=errors.append) is None
+        assert len(errors) == 1 and "STUB_" in errors[0]
+
+
+def test_unconfigured_backends_return_none():
+    assert backend_from_settings(settings(LLM_BACKEND="openai")) is None
+    assert backend_from_settings(settings()) is None
+
+
+def test_an_unknown_backend_goes_through_on_error():
+    errors = []
+    assert backend_from_settings(settings(LLM_BACKEND="openia", POE_API_KEY="key"), on_error=errors.append) is None
+    assert len(errors) == 1 and "openia" in errors[0]
+
+
+def test_the_backend_name_is_not_case_or_space_sensitive():
+    assert isinstance(backend_from_settings(settings(LLM_BACKEND=" Stub ")), StubBackend)
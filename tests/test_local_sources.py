@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from local_sources import (LEGACY_KEY, MANIFEST_KEY, doc_key, load_sources, manifest_value, plan_writes,
+                           read_manifest)
+
+
+def stored(sources):
+    """The snapshot the browser holds after sources were saved in the per-document layout."""
+    snapshot = {doc_key(name): text for name, text in sources.items()}
+    snapshot[MANIFEST_KEY] = manifest_value(sources)
+    return snapshot
+
+
+def test_read_manifest():
+    assert read_manifest(stored({"b": "", "a": ""})) == ["a", "b"]
+    assert read_manifest({MANIFEST_KEY: {"version": 1, "docs": ["a"]}}) == ["a"], "already parsed"
+    assert read_manifest({}) is None
+
+
+@pytest.mark.parametrize("raw", ["", "{not json", json.dumps({"version": 1}), json.dumps(["a"]), 7])
+def test_an_unreadable_manifest_is_none(raw):
+    assert read_manifest({MANIFEST_KEY: raw}) is None
+
+
+def test_sources_load_from_the_manifest():
+    sources = {"notes.md": "# Cells", "empty.txt": "", "ünïcode": "text"}
+    loaded, migrated, missing = load_sources(stored(sources))
+    assert loaded == sources and not migrated and not missing
+
+
+def test_a_missing_document_is_left_out_and_reported():
+    snapshot = stored({"kept": "text", "lost": "gone"})
+    del snapshot[doc_key("lost")]
+    assert load_sources(snapshot) == ({"kept": "text"}, False, ["lost"])
+
+
+def test_the_manifest_wins_over_the_legacy_key():
+    snapshot = dict(stored({"new": "text"}), **{LEGACY_KEY: json.dumps({"old": "text"})})
+    assert load_sources(snapshot) == ({"new": "text"}, False, [])
+
+
+@pytest.mark.parametrize("legacy", [json.dumps({"a": "one", "b": "two"}), {"a": "one", "b": "two"}])
+def test_legacy_sources_are_migrated(legacy):
+    assert load_sources({LEGACY_KEY: legacy}) == ({"a": "one", "b": "two"}, True, [])
+
+
+@pytest.mark.parametrize("legacy", ["{not json", "", json.dumps({}), 7])
+def test_unusable_legacy_sources_load_nothing(legacy):
+    assert load_sources({LEGACY_KEY: legacy}) == ({}, False, [])
+
+
+def test_nothing_stored_loads_nothing():
+    assert load_sources({}) == ({}, False, [])
+
+
+def test_plan_writes_compares_texts_by_identity():
+    kept, edited = "kept text", "old text"
+    persisted = {"kept": kept, "edited": edited, "deleted": "x"}
+    current = {"kept": kept, "edited": "".join(["old ", "text"]), "added": "new"}
+    changed, removed = plan_writes(persisted, current)
+    assert sorted(changed) == ["added", "edited"], "an equal but new text object is written again"
+    assert removed == ["deleted"]
+    assert plan_writes(current, dict(current)) == ([], [])
+
+
+def test_a_missing_document_is_dropped_from_the_manifest_on_the_next_save():
+    snapshot = stored({"kept": "text", "lost": "gone"})
+    del snapshot[doc_key("lost")]
+    sources, _, missing = load_sources(snapshot)
+    # As tc_initialize_state records it: the lost name counts as persisted, so it is removed.
+    assert plan_writes({**sources, **dict.fromkeys(missing)}, sources) == ([], ["lost"])
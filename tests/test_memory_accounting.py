@@ -0,0 +1,107 @@
+import json
+import sys
+import time
+
+import pytest
+
+from blob_store import BlobStore
+from llm_backends import StubBackend
+from memory_accounting import AllocationTracker, MemoryAccountant, deep_sizeof, state_sizes
+from tests.helpers import Clock
+
+
+TEXT = "x" * 10_000
+
+
+def test_shared_objects_are_counted_once():
+    pair = [TEXT, TEXT]
+    assert deep_sizeof(pair) == sys.getsizeof(pair) + sys.getsizeof(TEXT)
+
+
+def test_cycles_end():
+    cycle = []
+    cycle.append(cycle)
+    assert deep_sizeof(cycle) == sys.getsizeof(cycle)
+
+
+def test_classes_modules_and_functions_are_not_followed():
+    unowned = [json, BlobStore, test_cycles_end, len]
+    assert deep_sizeof(unowned) == sys.getsizeof(unowned)
+
+
+def test_slots_are_followed():
+    blobs = BlobStore()
+    blobs.put(TEXT)
+    assert deep_sizeof(blobs) > len(TEXT), "Blob uses __slots__"
+
+
+def test_state_sizes():
+    # Shared objects go to the first key, excluded keys are skipped, largest first.
+    state = {'small': [1], 'big': [TEXT], 'alias': TEXT, 'poe_client': StubBackend()}
+    sizes = state_sizes(state, exclude=('poe_client',))
+    assert list(sizes) == ['big', 'small', 'alias'] and sizes['alias'] == 0
+    assert sum(sizes.values()) == deep_sizeof([state['small'], state['big']]) - sys.getsizeof([None, None])
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def accountant(clock):
+    return MemoryAccountant(budget=50_000, ttl=600, min_interval=5, exclude=('poe_client',), clock=clock)
+
+
+def test_budget_and_throttling(accountant):
+    light = accountant.measure("a", {'x': "y" * 100})
+    heavy = accountant.measure("b", {'x': "y" * 100_000, 'z': [1]})
+    assert not light.over_budget and heavy.over_budget and heavy.top(1)[0][0] == 'x'
+    grown = {'x': "y" * 200}
+    assert accountant.measure("a", grown) is light, "throttled"
+    assert accountant.measure("a", grown, force=True).total > light.total
+
+
+def test_summary(accountant):
+    accountant.measure("a", {'x': "y" * 100})
+    accountant.measure("b", {'x': "y" * 100_000, 'z': [1]})
+    summary = accountant.summary()
+    assert summary["sessions"] == 2 and summary["over_budget"] == 1 and summary["top_sessions"][0][0] == "b"
+    assert summary["bytes"] == sum(m.total for m in accountant.sessions()) and summary["top_keys"][0][0] == 'x'
+
+
+def test_idle_sessions_expire_and_can_be_forgotten(accountant, clock):
+    accountant.measure("a", {})
+    clock.now += 300
+    accountant.measure("c", {})
+    clock.now += 400
+    assert [m.session for m in accountant.sessions()] == ["c"]
+    accountant.forget("c")
+    assert accountant.summary()["sessions"] == 0
+
+
+def test_allocation_diffs_name_the_line_that_grew():
+    tracker = AllocationTracker(limit=5)
+    tracker.start()
+    try:
+        assert tracker.diff() == []
+        kept = [bytes(1000) for _ in range(2000)]  # noqa: the growth
+        growth = tracker.diff()
+    finally:
+        tracker.stop()
+    location, size_diff, _, count_diff = growth[0]
+    assert location.startswith(__file__) and size_diff > 2_000_000 and count_diff >= 2000
+    del kept
+
+
+def test_the_reporter_appends_the_summary_as_json_lines(tmp_path):
+    path = tmp_path / "logs" / "memory.jsonl"
+    accountant = MemoryAccountant()
+    accountant.measure("a", {'x': TEXT})
+    accountant.start_reporter(str(path), interval=0.01)
+    deadline = time.time() + 5
+    while time.time() < deadline and not (path.exists() and path.read_text().count("\n") >= 2):
+        time.sleep(0.01)
+    accountant.stop_reporter()
+    record = json.loads(path.read_text().splitlines()[0])
+    assert record["sessions"] == 1 and record["top_keys"][0][0] == 'x' and "rss" in record
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from model_router import (MIN_SAMPLES, SMALL_INPUT_TOKENS, SMALL_QUESTION_COUNT, ModelRouter, estimate_tokens,
+                          size_class)
+
+
+def test_no_log_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    router = ModelRouter(["a", "b"], seed=0)
+    decision = router.choose(1000, 5)
+    router.record_outcome(decision.model, 1000, 5, 2.0, 5, False, True, decision_id=decision.decision_id)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_log_appends_decisions_and_outcomes(tmp_path):
+    path = tmp_path / "logs" / "routing.jsonl"
+    router = ModelRouter(["a", "b"], log_path=str(path), seed=0)
+    decision = router.choose(1000, 5)
+    router.record_outcome(decision.model, 1000, 5, 2.0, 5, False, True, decision_id=decision.decision_id)
+    events = [json.loads(line)["event"] for line in path.read_text().splitlines()]
+    assert events[-1] == "outcome" and len(events) == 2
+
+
+def test_unwritable_log_does_not_fail_routing(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    router = ModelRouter(["a", "b"], log_path=str(blocker / "routing.jsonl"), seed=0)
+    decision = router.choose(1000, 5)
+    router.record_outcome(decision.model, 1000, 5, 2.0, 5, False, True, decision_id=decision.decision_id)
+    assert decision.model in ("a", "b")
+
+
+FAST, REASONING, SLOW = "Gemini-3-Flash", "Grok-4.1-Fast-Reasoning", "GPT-5-mini"
+SMALL = (1000, 5)
+LARGE = (SMALL_INPUT_TOKENS + 1, 5)
+
+
+def router_for(*models):
+    return ModelRouter(list(models), explore_rate=0, seed=0)
+
+
+def record(router, model, size, times, latency=10.0, truncated=False, ok=True):
+    for _ in range(times):
+        router.record_outcome(model, *size, latency if ok else None, 0 if truncated else size[1], truncated, ok)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0 and estimate_tokens("a" * 400) == 100
+    assert estimate_tokens("字" * 300) == 200
+
+
+def test_a_few_non_ascii_characters_barely_change_the_estimate():
+    assert estimate_tokens("a" * 4000 + "é") == 1000
+    assert estimate_tokens("a" * 200 + "字" * 150) == 150
+
+
+def test_size_classes_split_at_the_thresholds():
+    assert size_class(SMALL_INPUT_TOKENS, SMALL_QUESTION_COUNT) == "small"
+    assert size_class(SMALL_INPUT_TOKENS + 1, SMALL_QUESTION_COUNT) == "large"
+    assert size_class(100, SMALL_QUESTION_COUNT + 1) == "large"
+
+
+def test_a_reasoning_model_is_only_preferred_for_large_requests():
+    # A cold model without a profile is a 45 s non-reasoning model; the reasoning one is 40 s,
+    # but spends half as long again thinking over a small input.
+    router = router_for(REASONING, "plain")
+    assert router.choose(*SMALL).model == "plain"
+    assert router.choose(*LARGE).model == REASONING
+
+
+def test_the_fastest_cold_model_is_chosen():
+    decision = router_for(SLOW, REASONING, FAST).choose(*LARGE)
+    assert decision.model == FAST and decision.reason == "lowest_expected_latency"
+    assert set(decision.scores) == {SLOW, REASONING, FAST}
+
+
+def test_models_whose_limits_a_request_exceeds_are_avoided():
+    assert router_for(SLOW, REASONING).choose(500_000, 5).model == REASONING, "input beyond the context window"
+    assert router_for("plain", REASONING).choose(1000, 12).model == REASONING, "more questions than fit the output"
+
+
+def test_no_eligible_model_falls_back_to_the_first():
+    decision = router_for("plain", "other").choose(200_000, 5)
+    assert decision.model == "plain" and decision.reason == "no_eligible_model" and decision.scores == {}
+
+
+@pytest.mark.parametrize("outcome", [{"truncated": True}, {"truncated": True, "ok": False}])
+def test_a_model_that_keeps_truncating_or_failing_is_passed_over(outcome):
+    router = router_for(FAST, REASONING)
+    record(router, FAST, LARGE, MIN_SAMPLES, latency=25.0, **outcome)
+    assert router.choose(*LARGE).model == REASONING
+    assert router.choose(*SMALL).model == FAST, "statistics are kept per size class"
+
+
+def test_observed_latency_replaces_the_prior():
+    router = router_for(FAST, SLOW)
+    record(router, SLOW, LARGE, MIN_SAMPLES - 1, latency=1.0)
+    assert router.choose(*LARGE).model == FAST, "too few samples to trust yet"
+    record(router, SLOW, LARGE, 1, latency=1.0)
+    decision = router.choose(*LARGE)
+    assert decision.model == SLOW and decision.scores[SLOW]["latency_p50"] == 1.0
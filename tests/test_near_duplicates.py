@@ -0,0 +1,91 @@
+import json
+import random
+
+import pytest
+
+from near_duplicates import NearDuplicateFilter, drop_near_duplicates, jaccard, shingles
+from quiz_core import run_generation
+from tests.helpers import ScriptedBackend, make_question, make_vocabulary, q
+
+
+PARAPHRASES = [
+    (q("What is the powerhouse of the cell?", "Mitochondria"),
+     q("Which organelle is known as the powerhouse of the cell?", "The mitochondria", 2)),
+    (q("In which year did World War II end?", "1945"), q("World War II ended in which year?", "In 1945", 1)),
+    (q("What is the capital of France?", "Paris"), q("What is the capital city of France?", "Paris")),
+    (q("What gas do plants absorb during photosynthesis?", "Carbon dioxide"),
+     q("During photosynthesis, which gas is absorbed by plants?", "Carbon dioxide (CO2)", 3)),
+    (q("Who wrote 'Pride and Prejudice'?", "Jane Austen"), q("Pride and Prejudice was written by whom?", "Austen")),
+]
+DIFFERENT = [
+    (q("In which year did World War I end?", "1918"), q("In which year did World War II end?", "1945")),
+    (q("What is the capital of France?", "Paris"), q("What is the capital of Spain?", "Madrid")),
+    (q("Which part of the cell contains DNA?", "Nucleus"), q("Which part of the cell makes proteins?", "Ribosomes")),
+    (q("What do mitochondria produce?", "ATP"), q("What is the powerhouse of the cell?", "Mitochondria")),
+    (q("Which is NOT a mammal?", "Shark"), q("Which of these is a mammal?", "Dolphin")),
+]
+
+
+def stems(questions):
+    return [x["question"] for x in questions]
+
+
+@pytest.mark.parametrize("a, b", PARAPHRASES, ids=[a["question"] for a, _ in PARAPHRASES])
+def test_paraphrases_are_dropped(a, b):
+    assert drop_near_duplicates([a, b]) == ([a], [(b, a)]), jaccard(shingles(a), shingles(b))
+
+
+@pytest.mark.parametrize("a, b", DIFFERENT, ids=[b["question"] for _, b in DIFFERENT])
+def test_look_alike_questions_are_kept(a, b):
+    kept, _ = drop_near_duplicates([a, b])
+    assert kept == [a, b], jaccard(shingles(a), shingles(b))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_indexed_overlaps_match_a_pairwise_comparison(seed):
+    rng = random.Random(seed)
+    vocab = make_vocabulary(200, seed)
+    questions = []
+    for _ in range(300):
+        if questions and rng.random() < 0.5:
+            # A variant of an earlier question: some stem words replaced, same options.
+            base = rng.choice(questions)
+            words = base["question"].split()
+            for _ in range(rng.randint(1, 6)):
+                words[rng.randrange(len(words))] = rng.choice(vocab)
+            questions.append(dict(base, question=" ".join(words)))
+        else:
+            questions.append(make_question(rng, vocab))
+    dedup = NearDuplicateFilter()
+    accepted = []
+    for question in questions:
+        expected = None
+        best = dedup.threshold
+        for earlier in accepted:
+            score = jaccard(shingles(question), shingles(earlier))
+            same_answer = {s for s in shingles(question) & shingles(earlier) if isinstance(s, str) and s[0] == "="}
+            if score >= best and same_answer:
+                expected, best = earlier, score
+        got = dedup.check(question)
+        assert (got is None) == (expected is None)
+        assert got is None or jaccard(shingles(question), shingles(got)) == best
+        if got is None:
+            accepted.append(question)
+    assert 0 < len(accepted) < len(questions)
+
+
+def test_run_generation_drops_repeats_within_and_across_generations():
+    a, b = PARAPHRASES[0]
+    c, d = PARAPHRASES[1]
+    e = PARAPHRASES[2][0]
+    seen = NearDuplicateFilter()
+    backend = ScriptedBackend(json.dumps([a, b, c]), json.dumps([d, e]))
+
+    first = run_generation(backend, "material", 3, "m", seen=seen)
+    assert first.ok and stems(first.questions) == stems([a, c])
+    assert [stems(pair) for pair in first.duplicates] == [stems([b, a])]
+    assert not first.truncated, "duplicates were generated, not cut off"
+
+    second = run_generation(backend, "material", 2, "m", seen=seen)
+    assert stems(second.questions) == stems([e])
+    assert [stems(pair) for pair in second.duplicates] == [stems([d, c])]
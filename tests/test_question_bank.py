@@ -0,0 +1,146 @@
+import random
+
+import pytest
+
+from question_bank import QuestionBank, source_hash
+from quiz_model import Question
+from quiz_session import QuizSession
+from tests.helpers import make_question, make_vocabulary
+
+
+SOURCE_A, SOURCE_B = source_hash("material a"), source_hash("  material b\n")
+
+
+@pytest.fixture
+def rng():
+    return random.Random(0)
+
+
+@pytest.fixture
+def vocab():
+    return make_vocabulary(2000, 0)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "bank.sqlite3")
+
+
+@pytest.fixture
+def bank(path):
+    bank = QuestionBank(path)
+    yield bank
+    bank.close()
+
+
+@pytest.fixture
+def first(bank, rng, vocab):
+    """Ten questions from material A on cell biology."""
+    questions = [make_question(rng, vocab) for _ in range(10)]
+    bank.add(questions, SOURCE_A, model="GPT-5-mini", topic="Cell Biology")
+    return questions
+
+
+def ids_of(questions):
+    return [Question.from_dict(q).id for q in questions]
+
+
+def test_source_hash_ignores_surrounding_whitespace():
+    assert SOURCE_B == source_hash("material b")
+
+
+def test_add_and_count(bank, rng, vocab):
+    questions = [make_question(rng, vocab) for _ in range(10)]
+    result = bank.add(questions, SOURCE_A, model="GPT-5-mini", topic="Cell Biology")
+    assert result.added == ids_of(questions) and not result.duplicates
+    assert bank.count() == bank.count(source=SOURCE_A) == bank.count(topic="cell   biology!") == 10
+
+
+def test_duplicates_in_the_same_material_are_not_stored_twice(bank, first, rng, vocab):
+    exact = dict(first[0])
+    variant = dict(first[1], question=first[1]["question"].upper().replace(" ", "  , "), correct=1,
+                   options=["a", "b", "c", "d"])
+    words = first[2]["question"].rstrip("?").split()
+    paraphrase = dict(first[2], question=" ".join(words + [words[0]]) + " exactly?")
+    fresh = make_question(rng, vocab)
+    result = bank.add([exact, variant, paraphrase, fresh], SOURCE_A, model="Claude")
+    assert result.added == ids_of([fresh])
+    assert len(result.duplicates) == 3 and bank.count() == 11
+
+
+def test_in_other_material_only_identical_stems_are_duplicates(bank, first):
+    words = first[2]["question"].rstrip("?").split()
+    paraphrase = dict(first[2], question=" ".join(words + [words[0]]) + " exactly?")
+    result = bank.add([dict(first[0]), paraphrase], SOURCE_B, topic="Genetics")
+    assert len(result.added) == 1 and len(result.duplicates) == 1
+    # The duplicate is linked to the new material and topic.
+    assert bank.count(source=SOURCE_B) == 2 and bank.count(topic="genetics") == 2
+    assert bank.count(source=SOURCE_A, topic="genetics") == 1
+    assert [t for t, _ in bank.topics()] == ["cell biology", "genetics"]
+
+
+def test_ids_match_the_quiz_question_ids(bank, first):
+    ids = ids_of(first)
+    assert {q.id for q in QuizSession.from_dicts(first).questions} == set(ids)
+    assert {q.id for q in bank.find(topic="cell biology")} == set(ids)
+
+
+def test_answer_statistics_add_up(bank, first):
+    ids = ids_of(first)
+    for i in range(4):
+        bank.record_answer(ids[i], correct=i == 0)
+    bank.record_answer(ids[0], correct=False)
+    bank.record_answer("q_unknown", correct=True)
+    stats = {q.id: (q.asked, q.answered_correctly) for q in bank.find(source=SOURCE_A)}
+    assert stats[ids[0]] == (2, 1) and stats[ids[1]] == (1, 0)
+    assert sum(asked for asked, _ in stats.values()) == 5
+
+
+def test_assemble_prefers_unasked_then_most_missed(bank, first, rng):
+    ids = ids_of(first)
+    for i in range(4):
+        bank.record_answer(ids[i], correct=i == 0)
+    bank.record_answer(ids[0], correct=False)
+
+    picked = ids_of(bank.assemble(6, source=SOURCE_A, rng=rng))
+    assert set(picked) == set(ids[4:]), "the 6 unasked questions are picked"
+    assert len(bank.assemble(7, source=SOURCE_A, rng=rng)) == 7
+    ranked = ids_of(bank.assemble(10, source=SOURCE_A, rng=rng))
+    assert set(ranked[6:9]) == set(ids[1:4]), "then the missed ones"
+    assert ranked[9] == ids[0], "the question asked twice comes last"
+
+
+def test_assemble_by_topic_and_for_unknown_material(bank, first, rng):
+    bank.add([first[0], first[1]], SOURCE_B, topic="Genetics")
+    assert bank.assemble(5, source=source_hash("unknown")) == []
+    assert QuizSession.from_dicts(bank.assemble(3, topic="genetics", rng=rng)).total == 2
+
+
+def test_the_bank_survives_being_reopened(bank, first, path):
+    bank.add([first[0]], SOURCE_B)
+    bank.close()
+    reopened = QuestionBank(path)
+    assert reopened.count() == 10 and reopened.count(source=SOURCE_B) == 1
+    reopened.close()
+
+
+def test_a_shared_generic_stem_in_other_material_is_not_a_duplicate(bank, rng):
+    biology = {"question": "Which of the following is TRUE?", "options": ["Cells divide", "Cells are square",
+                                                                         "DNA is a protein", "Ribosomes are lipids"],
+               "correct": 0, "hint": "", "explanation": ""}
+    physics = dict(biology, options=["Light has mass", "Sound travels in vacuum", "Energy is conserved",
+                                     "Heat flows from cold to hot"], correct=2)
+    physics_source = source_hash("physics")
+    bank.add([biology], SOURCE_A, topic="Biology")
+    result = bank.add([physics], physics_source, topic="Physics")
+    assert result.added == ids_of([physics]) and not result.duplicates
+    assert bank.assemble(5, source=physics_source, rng=rng) == [physics]
+
+
+def test_the_same_question_reworded_in_other_material_is_a_duplicate(bank, first):
+    reworded = dict(first[0], question=first[0]["question"].upper() + "!!",
+                    options=[o.upper() for o in reversed(first[0]["options"])],
+                    correct=len(first[0]["options"]) - 1 - first[0]["correct"])
+    result = bank.add([reworded], SOURCE_B)
+    assert not result.added and list(result.duplicates.values()) == ids_of([first[0]])
+    assert bank.count(source=SOURCE_B) == 1
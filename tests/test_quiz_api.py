@@ -0,0 +1,162 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from llm_backends import StubBackend
+from quiz_api import create_server
+
+
+MATERIAL = ("Photosynthesis converts light energy into chemical energy. Chlorophyll absorbs mostly blue and "
+            "red light. The Calvin cycle fixes carbon dioxide into sugars. Oxygen is released as a by-product. ") * 20
+
+
+class Client:
+    """A keep-alive JSON client on one connection."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+
+    def request(self, method, path, body=None, headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode("utf-8")
+            headers = {"Content-Type": "application/json", **(headers or {})}
+        self.conn.request(method, path, body=body, headers=headers or {})
+        response = self.conn.getresponse()
+        data = response.read()
+        is_json = response.getheader("Content-Type", "").startswith("application/json")
+        return response.status, json.loads(data) if is_json else data
+
+    def wait(self, job_id, interval=0.005):
+        while True:
+            status, job = self.request("GET", f"/v1/jobs/{job_id}")
+            assert status == 200, job
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(interval)
+
+    def stream(self, job_id):
+        """(event name, payload) pairs of a job's event stream."""
+        self.conn.request("GET", f"/v1/jobs/{job_id}/stream")
+        response = self.conn.getresponse()
+        assert response.status == 200 and response.getheader("Transfer-Encoding") == "chunked"
+        events = []
+        for block in response.read().decode("utf-8").split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if "event" in lines:
+                events.append((lines["event"], json.loads(lines["data"])))
+        return events
+
+    def close(self):
+        self.conn.close()
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = create_server(StubBackend(latency=0.05), port=0, workers=2, max_pending=4, max_connections=8,
+                           quiz_dir=str(tmp_path / "quizzes"), max_upload_bytes=100_000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    client = Client(server.server_address[1])
+    yield client
+    client.close()
+
+
+def raw_request(server, head):
+    """Sends a hand-written request head and returns the status line of the answer."""
+    with socket.create_connection(server.server_address, timeout=10) as sock:
+        sock.sendall(head.encode("latin-1"))
+        return sock.makefile("rb").readline().decode("latin-1")
+
+
+def test_healthz(client):
+    status, health = client.request("GET", "/healthz")
+    assert status == 200 and health["ok"]
+
+
+def test_extract(client):
+    status, extracted = client.request("POST", "/v1/extract?filename=notes.md", MATERIAL.encode("utf-8"))
+    assert status == 200 and extracted["text"] == MATERIAL
+    status, error = client.request("POST", "/v1/extract?filename=notes.json", b"{not json")
+    assert status == 422 and "not correctly formatted" in error["error"]
+    status, error = client.request("POST", "/v1/extract?filename=notes.exe", b"x")
+    assert status == 422 and "Unsupported" in error["error"]
+    assert client.request("POST", "/v1/extract", b"x")[0] == 400
+    assert client.request("POST", "/v1/extract?filename=big.txt", b"x" * 100_001)[0] == 413
+
+
+def test_job_to_quiz(server, client):
+    status, job = client.request("POST", "/v1/jobs", {"text": MATERIAL, "num_questions": 4})
+    assert status == 202 and job["status"] in ("queued", "running")
+    job = client.wait(job["id"])
+    assert job["status"] == "done" and len(job["questions"]) == 4
+    status, quiz = client.request("GET", f"/v1/quizzes/{job['quiz_id']}")
+    assert status == 200 and quiz["questions"] == job["questions"]
+
+    # The quiz outlives the server's memory when it is written to disk.
+    server.archive._quizzes.clear()
+    assert client.request("GET", f"/v1/quizzes/{job['quiz_id']}")[0] == 200
+
+
+def test_stream_ends_with_the_result(client):
+    status, job = client.request("POST", "/v1/jobs", {"text": MATERIAL, "num_questions": 3})
+    events = client.stream(job["id"])
+    assert [name for name, _ in events][-2:] == ["status", "result"]
+    assert events[-1][1]["status"] == "done" and len(events[-1][1]["questions"]) == 3
+    assert client.request("GET", "/healthz")[0] == 200, "the connection survives a stream"
+
+
+@pytest.mark.parametrize("path", ["/v1/jobs/nope", "/v1/jobs/nope/stream", "/v1/quizzes/0123456789abcdef",
+                                  "/v1/quizzes/../../etc"])
+def test_unknown_ids_are_404(client, path):
+    assert client.request("GET", path)[0] == 404
+
+
+@pytest.mark.parametrize("body", [{"text": ""}, {"text": "x", "num_questions": 99}, {"num_questions": 3},
+                                  b"not json", {"text": "x", "model": "Auto"}, {"text": "x", "model": [1]},
+                                  {"text": "x", "model": {"name": "stub"}}])
+def test_bad_job_requests_are_400(client, body):
+    status, error = client.request("POST", "/v1/jobs", body)
+    assert status == 400 and error["error"]
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1.5"])
+def test_malformed_content_length_is_400(server, length):
+    head = f"POST /v1/jobs HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\nContent-Length: {length}\r\n\r\n"
+    assert raw_request(server, head).split()[1] == "400"
+    port = server.server_address[1]
+    assert Client(port).request("GET", "/healthz")[0] == 200, "the server keeps serving"
+
+
+def test_a_full_queue_answers_429(client):
+    answers = [client.request("POST", "/v1/jobs", {"text": MATERIAL})[0] for _ in range(10)]
+    assert answers.count(202) >= 4 and answers[-1] == 429
+
+
+def test_keep_alive_serves_many_requests_on_one_socket(client):
+    client.request("GET", "/healthz")
+    sock = client.conn.sock
+    for _ in range(50):
+        client.request("GET", "/healthz")
+    assert client.conn.sock is sock
+
+
+def test_connections_beyond_the_limit_are_turned_away(server):
+    port = server.server_address[1]
+    held = [Client(port) for _ in range(8)]
+    for c in held:
+        c.request("GET", "/healthz")
+    assert Client(port).request("GET", "/healthz")[0] == 503
+    for c in held:
+        c.close()
+    time.sleep(0.1)
+    assert Client(port).request("GET", "/healthz")[0] == 200
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from llm_backends import StubBackend
+from quiz_batch import MANIFEST_NAME, Manifest, build_parser, find_documents, main, run_batch
+from quiz_core import validate_questions_array
+
+
+BIOLOGY = ("Photosynthesis converts light energy into chemical energy in chloroplasts. Mitochondria produce ATP "
+           "through cellular respiration. The nucleus stores genetic information in DNA. Ribosomes build proteins "
+           "from amino acids.")
+GEOGRAPHY = ("Rivers erode valleys over millions of years. Glaciers carve fjords along coastlines. Volcanoes form "
+             "where tectonic plates meet. Deserts receive less than 250 millimetres of rain a year.")
+
+
+class CountingBackend(StubBackend):
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def generate_questions(self, prompt, model="stub"):
+        self.prompts.append(prompt)
+        return super().generate_questions(prompt, model)
+
+
+@pytest.fixture
+def source(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "biology.txt").write_text(BIOLOGY)
+    (src / "sub" / "geography.md").write_text(GEOGRAPHY)
+    (src / "empty.txt").write_text("   ")
+    (src / "ignored.bin").write_bytes(b"\0\1")
+    return src
+
+
+def batch(source, out, backend):
+    args = build_parser().parse_args([str(source), "--out", str(out), "--questions", "3", "--workers", "2"])
+    entries, skipped = run_batch(args, backend, log=lambda message: None)
+    return {e["file"]: e for e in entries}, skipped
+
+
+def test_outputs_are_valid_question_arrays(source, tmp_path):
+    entries, _ = batch(source, tmp_path / "out", CountingBackend())
+    assert sorted(entries) == ["biology.txt", "empty.txt", "sub/geography.md"]
+    for name in ("biology.txt", "sub/geography.md"):
+        assert entries[name]["status"] == "ok" and entries[name]["questions"] == 3
+        questions = json.loads((tmp_path / "out" / (name + ".json")).read_text())
+        assert validate_questions_array(questions)["valid"] and len(questions) == 3
+
+
+def test_a_failed_document_is_recorded_and_does_not_stop_the_batch(source, tmp_path):
+    entries, _ = batch(source, tmp_path / "out", CountingBackend())
+    failed = entries["empty.txt"]
+    assert failed["status"] == "failed" and failed["error"] == "no text extracted"
+    assert not (tmp_path / "out" / "empty.txt.json").exists()
+    manifest = Manifest(str(tmp_path / "out" / MANIFEST_NAME))
+    assert {name: e["status"] for name, e in manifest.entries.items()} == \
+        {"biology.txt": "ok", "sub/geography.md": "ok", "empty.txt": "failed"}
+
+
+def test_rerun_skips_unchanged_documents_and_retries_failed_ones(source, tmp_path):
+    out = tmp_path / "out"
+    batch(source, out, CountingBackend())
+    backend = CountingBackend()
+    entries, skipped = batch(source, out, backend)
+    assert skipped == 2 and list(entries) == ["empty.txt"] and backend.prompts == []
+
+    (source / "empty.txt").write_text(BIOLOGY.replace("Ribosomes", "Lysosomes"))
+    (source / "sub" / "geography.md").write_text(GEOGRAPHY + " Oceans cover most of the planet.")
+    entries, skipped = batch(source, out, backend)
+    assert skipped == 1 and sorted(entries) == ["empty.txt", "sub/geography.md"]
+    assert all(e["status"] == "ok" for e in entries.values()) and len(backend.prompts) == 2
+
+
+def test_a_missing_output_is_regenerated(source, tmp_path):
+    out = tmp_path / "out"
+    batch(source, out, CountingBackend())
+    (out / "biology.txt.json").unlink()
+    entries, _ = batch(source, out, CountingBackend())
+    assert entries["biology.txt"]["status"] == "ok" and (out / "biology.txt.json").exists()
+
+
+def test_manifest_ignores_a_torn_line_and_keeps_the_last_entry(tmp_path):
+    path = tmp_path / MANIFEST_NAME
+    path.write_text(json.dumps({"file": "a", "status": "failed"}) + "\n"
+                    + json.dumps({"file": "a", "status": "ok"}) + "\n" + '{"file": "b", "sta')
+    assert Manifest(str(path)).entries == {"a": {"file": "a", "status": "ok"}}
+
+
+def test_exit_code(source, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    assert main([str(source), "--out", str(tmp_path / "out")]) == 1
+    assert "empty.txt: no text extracted" in capsys.readouterr().out
+    (source / "empty.txt").unlink()
+    assert main([str(source), "--out", str(tmp_path / "clean")]) == 0
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "missing"), "--out", str(tmp_path / "out")])
+
+
+def test_an_output_directory_inside_the_source_is_not_read_back(source, tmp_path):
+    out = source / "quizzes"
+    first, _ = batch(source, out, CountingBackend())
+    backend = CountingBackend()
+    entries, skipped = batch(source, out, backend)
+    assert skipped == 2 and list(entries) == ["empty.txt"] and backend.prompts == []
+    assert find_documents(str(source), skip_dir=str(out)) == sorted(first)
+
+
+def test_manifest_files_are_not_documents(source):
+    (source / "sub" / MANIFEST_NAME).write_text("{}\n")
+    assert MANIFEST_NAME not in {name.rsplit("/", 1)[-1] for name in find_documents(str(source))}
+
+
+@pytest.mark.parametrize("out", [".", ".."])
+def test_an_output_directory_holding_the_source_is_refused(source, out, monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    with pytest.raises(SystemExit) as exited:
+        main([str(source), "--out", str(source / out)])
+    assert "--out" in str(exited.value)
+
+
+@pytest.mark.parametrize("option", ["--questions", "--workers", "--char-limit"])
+@pytest.mark.parametrize("value", ["0", "-3", "two"])
+def test_counts_below_one_are_rejected(option, value, capsys):
+    with pytest.raises(SystemExit) as exited:
+        build_parser().parse_args(["src", "--out", "out", option, value])
+    assert exited.value.code == 2 and option in capsys.readouterr().err
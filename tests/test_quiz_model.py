@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from quiz_model import Question, new_attempt, shuffled_option_order
+from tests.helpers import make_questions, q
+
+
+def test_a_question_round_trips_with_the_same_id():
+    data = dict(q("Which organelle makes ATP?", "Mitochondria", correct=2), hint="Powerhouse.",
+                explanation="Cellular respiration happens there.")
+    question = Question.from_dict(data)
+    assert question.to_dict() == data
+    assert Question.from_dict(question.to_dict()) == question
+
+
+def test_missing_hint_and_explanation_become_empty():
+    data = {"question": "What is 2 + 2?", "options": ["3", "4"], "correct": 1, "hint": None}
+    question = Question.from_dict(data)
+    assert question.hint == question.explanation == ""
+    assert Question.from_dict(question.to_dict()).id == question.id
+
+
+def test_the_id_depends_on_the_question_options_and_answer_only():
+    data = q("What is 2 + 2?", "Four")
+    question = Question.from_dict(data)
+    assert Question.from_dict(dict(data, hint="Add.", explanation="Two and two.")).id == question.id
+    assert Question.from_dict(dict(data, correct=1)).id != question.id
+    assert Question.from_dict(dict(data, options=list(reversed(data["options"])))).id != question.id
+    assert Question.from_dict(dict(data, question="What is 2 + 3?")).id != question.id
+
+
+def test_questions_are_immutable():
+    question = Question.from_dict(q("What is 2 + 2?", "Four"))
+    with pytest.raises(AttributeError):
+        question.correct = 1
+    assert isinstance(question.options, tuple)
+
+
+@pytest.mark.parametrize("num_options", [2, 4, 6, 9])
+def test_an_option_order_is_a_permutation(num_options):
+    rng = random.Random(num_options)
+    orders = {shuffled_option_order(num_options, rng) for _ in range(500)}
+    assert all(sorted(order) == list(range(num_options)) for order in orders)
+    assert all(isinstance(order, tuple) for order in orders)
+    assert len(orders) > 1
+
+
+def test_option_orders_are_shared_between_questions():
+    rng = random.Random(0)
+    orders = [shuffled_option_order(4, rng) for _ in range(2000)]
+    assert len(set(orders)) == 24 and len({id(order) for order in orders}) == 24
+
+
+def test_a_seeded_attempt_is_reproducible():
+    questions = make_questions(30)
+    assert new_attempt(questions, range(30), rng=random.Random(5)) == \
+        new_attempt(questions, range(30), rng=random.Random(5))
+
+
+def test_an_attempt_orders_questions_and_their_options():
+    questions = make_questions(30) + [Question.from_dict({"question": "True?", "options": ["Yes", "No"],
+                                                           "correct": 0})]
+    order, option_orders = new_attempt(questions, range(31), rng=random.Random(0))
+    assert sorted(order) == list(range(31)) and order != tuple(range(31))
+    assert len(option_orders) == 31
+    for pos, option_order in zip(order, option_orders):
+        assert sorted(option_order) == list(range(len(questions[pos].options)))
+
+
+def test_an_attempt_over_some_questions_keeps_their_order_when_not_shuffled():
+    questions = make_questions(10)
+    wrong = [7, 2, 5]
+    order, option_orders = new_attempt(questions, wrong, shuffle_questions=False, rng=random.Random(0))
+    assert order == (7, 2, 5) and len(option_orders) == 3
@@ -0,0 +1,192 @@
+import base64
+import io
+import json
+import random
+import tracemalloc
+
+import pytest
+
+from quiz_pack import PackError, PackWriter, read_pack, write_pack
+from quiz_session import QuizSession
+from tests.helpers import make_question, make_vocabulary
+
+
+class Trickle(io.RawIOBase):
+    """A non-seekable stream returning at most ``step`` bytes per read, like a socket."""
+
+    def __init__(self, data, step=7):
+        self.data, self.pos, self.step = data, 0, step
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self.data[self.pos:self.pos + min(len(buffer), self.step)]
+        buffer[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+
+def make_quiz(n, seed=0):
+    rng = random.Random(seed)
+    vocab = make_vocabulary(500, seed)
+    return QuizSession.from_dicts([make_question(rng, vocab) for _ in range(n)], rng=rng)
+
+
+def audio_for(quiz, size, seed=0):
+    """Data-URL audio of ``size`` random bytes for every question and answer, except a linked first answer."""
+    rng = random.Random(seed)
+    urls = {"questions": {}, "answers": {}}
+    clips = {}
+    for q in quiz.questions:
+        for kind in ("question", "answer"):
+            data = rng.randbytes(size)
+            clips[(q.id, kind)] = data
+            urls[kind + "s"][q.id] = "data:audio/mpeg;base64," + base64.b64encode(data).decode()
+    urls["answers"][quiz.questions[0].id] = "https://example.com/not-packed.mp3"
+    del clips[(quiz.questions[0].id, "answer")]
+    return urls, clips
+
+
+def pack_bytes(quiz, audio_urls=None):
+    buffer = io.BytesIO()
+    write_pack(buffer, quiz, audio_urls, title="Cells")
+    return buffer.getvalue()
+
+
+@pytest.fixture(params=range(3))
+def seed(request):
+    return request.param
+
+
+@pytest.fixture
+def small(seed):
+    return pack_bytes(make_quiz(3, seed), audio_for(make_quiz(3, seed), 20, seed)[0])
+
+
+def test_a_pack_opens_to_the_quiz_it_was_written_from(seed):
+    quiz = make_quiz(40, seed)
+    quiz.answer(quiz.current_question.id, 0)  # Answers are not part of a pack.
+    urls, clips = audio_for(quiz, 300, seed)
+    pack = read_pack(io.BytesIO(pack_bytes(quiz, urls)))
+    assert pack.title == "Cells" and pack.audio == {key: ("audio/mpeg", clip) for key, clip in clips.items()}
+    session = pack.session()
+    asked = [quiz.questions[pos] for pos in quiz.order]
+    assert list(session.questions) == asked and session.option_orders == quiz.option_orders
+    assert [session.questions[pos].id for pos in session.order] == [q.id for q in asked]
+    assert session.answered_count == 0 and session.current_question == asked[0]
+    assert pack.audio_urls()["questions"] == urls["questions"]
+
+
+def test_every_corrupted_byte_is_refused(small):
+    for i in range(len(small)):
+        damaged = bytearray(small)
+        damaged[i] ^= 0x20
+        with pytest.raises(PackError):
+            read_pack(io.BytesIO(bytes(damaged)))
+
+
+def test_every_truncation_is_refused(small):
+    for end in range(len(small)):
+        with pytest.raises(PackError):
+            read_pack(io.BytesIO(small[:end]))
+
+
+@pytest.mark.parametrize("bad", [b"", b"[{\"question\": 1}]"])
+def test_other_files_are_refused(bad):
+    with pytest.raises(PackError):
+        read_pack(io.BytesIO(bad))
+
+
+def test_newer_format_versions_are_refused(small):
+    with pytest.raises(PackError):
+        read_pack(io.BytesIO(b"QUIZPACK/2\n" + small[len(b"QUIZPACK/1\n"):]))
+
+
+def test_unknown_record_kinds_are_skipped():
+    quiz = make_quiz(5)
+    first = quiz.questions[quiz.order[0]]
+    buffer = io.BytesIO()
+    with PackWriter(buffer) as writer:
+        writer._record("future", b"something new", "x")  # Still covered by the checksum.
+        writer.add_question(first, quiz.option_orders[0])
+    assert read_pack(io.BytesIO(buffer.getvalue())).questions == [first]
+
+
+def test_a_pack_is_read_from_a_trickling_stream_into_audio_sinks(seed):
+    quiz = make_quiz(40, seed)
+    urls, clips = audio_for(quiz, 300, seed)
+    data = pack_bytes(quiz, urls)
+    sinks = {}
+
+    def sink(q_id, kind, mime):
+        return sinks.setdefault((q_id, kind), io.BytesIO())
+
+    pack = read_pack(io.BytesIO(data))
+    streamed = read_pack(io.BufferedReader(Trickle(data), buffer_size=16), audio_sink=sink)
+    assert streamed.questions == pack.questions and streamed.option_orders == pack.option_orders
+    assert {key: out.getvalue() for key, out in sinks.items()} == clips
+
+
+def test_streaming_large_audio_holds_only_a_few_chunks():
+    quiz = make_quiz(20)
+    urls, _ = audio_for(quiz, 1_000_000)
+    stream = io.BufferedReader(Trickle(pack_bytes(quiz, urls), step=1 << 20))
+
+    class Discard:
+        def write(self, chunk):
+            pass
+
+    tracemalloc.start()
+    try:
+        read_pack(stream, audio_sink=lambda *_: Discard())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 2_000_000
+
+
+def write_records(meta, records):
+    """A pack with a valid checksum around hand-written records, as a hand-edited file would have."""
+    buffer = io.BytesIO()
+    with PackWriter(buffer) as writer:
+        writer._record("meta", json.dumps(meta).encode())
+        for record in records:
+            writer._record("question", json.dumps(record).encode())
+            writer.questions += 1
+    return buffer.getvalue()
+
+
+def record(**changes):
+    fields = dict(id="q_1", text="Which?", options=["a", "b", "c"], correct=1, hint="", explanation="",
+                  option_order=[2, 0, 1])
+    fields.update(changes)
+    return list(fields.values())
+
+
+def test_a_hand_written_valid_pack_opens():
+    pack = read_pack(io.BytesIO(write_records({"title": "Edited"}, [record(), record(id="q_2")])))
+    assert pack.title == "Edited" and [q.id for q in pack.questions] == ["q_1", "q_2"]
+    assert pack.session().current_question.correct == 1
+
+
+@pytest.mark.parametrize("bad", [
+    record(correct=3), record(correct=-1), record(correct="1"), record(options=["only"]),
+    record(options="abc"), record(text=""), record(option_order=[0, 1]), record(option_order=[0, 1, 1]),
+    record(option_order=[0, 1, 3]), record(option_order=["0", 1, 2]), record(id=7),
+], ids=["correct_too_high", "correct_negative", "correct_text", "one_option", "options_text", "empty_stem",
+        "order_too_short", "order_repeats", "order_out_of_range", "order_text", "id_not_text"])
+def test_a_malformed_question_is_refused(bad):
+    with pytest.raises(PackError):
+        read_pack(io.BytesIO(write_records({}, [bad])))
+
+
+def test_a_repeated_question_id_is_refused():
+    with pytest.raises(PackError):
+        read_pack(io.BytesIO(write_records({}, [record(), record()])))
+
+
+@pytest.mark.parametrize("meta", [[1, 2], "title", 3])
+def test_a_meta_record_that_is_not_an_object_is_refused(meta):
+    with pytest.raises(PackError):
+        read_pack(io.BytesIO(write_records(meta, [record()])))
@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from quiz_session import QuizSession
+from tests.helpers import make_questions
+
+
+def wrong(q):
+    return (q.correct + 1) % len(q.options)
+
+
+@pytest.fixture
+def quiz():
+    return QuizSession(make_questions(20), rng=random.Random(1))
+
+
+def answer_all(quiz, missed_every=3):
+    """Answers the attempt in order, missing every ``missed_every``-th question (none for 0); returns the missed ids."""
+    missed = []
+    for i in range(quiz.total):
+        q = quiz.current_question
+        if missed_every and i % missed_every == 0:
+            quiz.answer(q.id, wrong(q))
+            missed.append(q.id)
+        else:
+            quiz.answer(q.id, q.correct)
+        quiz.go_next()
+    return missed
+
+
+def test_questions_are_stored_once_and_indexed(quiz):
+    questions = make_questions(20)
+    assert sorted(quiz.questions) == sorted(questions)
+    assert all(quiz.question_by_id(q.id) == q for q in questions)
+    assert quiz.question_by_id("missing") is None
+    assert all(sorted(order) == [0, 1, 2, 3] for order in quiz.option_orders)
+
+
+def test_first_answer_wins(quiz):
+    q = quiz.current_question
+    first = quiz.answer(q.id, wrong(q))
+    assert not first.is_correct
+    assert quiz.answer(q.id, q.correct) is first
+    assert quiz.answer_for(q.id) == first and quiz.answered_count == 1
+    assert quiz.incorrect == [q.id] and quiz.correct_count == 0
+
+
+def test_score(quiz):
+    missed = answer_all(quiz)
+    correct = quiz.total - len(missed)
+    assert quiz.score() == (correct, 20, round(correct / 20 * 100))
+    assert QuizSession([]).score() == (0, 0, 0)
+
+
+def test_incorrect_list_keeps_the_order_questions_were_missed_in(quiz):
+    quiz.go_next()
+    later = quiz.current_question
+    quiz.answer(later.id, wrong(later))
+    quiz.go_back()
+    earlier = quiz.current_question
+    quiz.answer(earlier.id, wrong(earlier))
+    assert quiz.incorrect == [later.id, earlier.id]
+    assert quiz.incorrect_questions() == [later, earlier]
+    assert quiz.incorrect_question(1) == earlier
+
+
+def test_navigation_stops_at_the_ends(quiz):
+    assert not quiz.go_back() and quiz.current == 0
+    for _ in range(quiz.total - 1):
+        assert quiz.go_next()
+    assert quiz.is_last and not quiz.go_next()
+
+
+def test_redo_incorrect(quiz):
+    missed = answer_all(quiz)
+    quiz.finish()
+    assert quiz.redo_incorrect()
+    assert quiz.kind == QuizSession.REDO_WRONG and quiz.total == len(missed)
+    assert [quiz.questions[pos].id for pos in quiz.order] == [q.id for q in quiz.questions if q.id in set(missed)]
+    assert quiz.answered_count == 0 and quiz.incorrect == [] and quiz.current == 0 and not quiz.finished
+
+    answer_all(quiz, missed_every=0)
+    assert not quiz.redo_incorrect(), "nothing to redo after a perfect attempt"
+
+
+def test_retry(quiz):
+    answer_all(quiz)
+    quiz.finish()
+    quiz.retry()
+    assert quiz.kind == QuizSession.RETRY and quiz.attempt == 2
+    assert sorted(quiz.order) == list(range(20))
+    assert quiz.answered_count == 0 and quiz.incorrect == [] and quiz.current == 0 and not quiz.finished
+
+
+def test_finish_records_history_once(quiz):
+    missed = answer_all(quiz)
+    quiz.finish()
+    quiz.finish()
+    assert quiz.finished
+    assert quiz.history == [(QuizSession.FIRST, 20, 20 - len(missed), tuple(missed))]
+    quiz.redo_incorrect()
+    answer_all(quiz)
+    quiz.finish()
+    assert [s.kind for s in quiz.history] == [QuizSession.FIRST, QuizSession.REDO_WRONG]
+
+
+def test_restore(quiz):
+    answer_all(quiz)
+    quiz.finish()
+    quiz.redo_incorrect()
+    q = quiz.current_question
+    quiz.answer(q.id, q.correct)
+    quiz.go_next()
+
+    restored = QuizSession.restore(quiz.questions, quiz.attempt, quiz.kind, quiz.order, quiz.option_orders,
+                                   answers=[(q_id, a.selected) for q_id, a in quiz.answers.items()],
+                                   current=quiz.current, finished=quiz.finished, history=quiz.history)
+    for attr in ("questions", "attempt", "kind", "order", "option_orders", "answers", "correct_count",
+                 "incorrect", "current", "finished", "history"):
+        assert getattr(restored, attr) == getattr(quiz, attr), attr
+
+
+def test_known_orders_are_used_as_given():
+    questions = make_questions(5)
+    orders = ((4, 3, 2, 1, 0), ((3, 2, 1, 0),) * 5)
+    quiz = QuizSession(questions, shuffle=False, orders=orders)
+    assert quiz.questions == tuple(questions) and (quiz.order, quiz.option_orders) == orders
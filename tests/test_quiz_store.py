@@ -0,0 +1,111 @@
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from quiz_session import QuizSession
+from quiz_store import MemoryQuizStore, QuizCheckpoint, SQLiteQuizStore, create_quiz_store
+from tests.helpers import make_questions
+
+
+def fingerprint(quiz):
+    return (quiz.attempt, quiz.kind, quiz.order, quiz.option_orders, quiz.answers, quiz.incorrect,
+            quiz.correct_count, quiz.current, quiz.finished, quiz.history, quiz.questions)
+
+
+def step(quiz, rng):
+    """One random user action."""
+    roll = rng.random()
+    if quiz.finished:
+        if roll < 0.5 and quiz.incorrect:
+            quiz.redo_incorrect()
+        else:
+            quiz.retry()
+    elif roll < 0.55:
+        q = quiz.current_question
+        quiz.answer(q.id, rng.randrange(len(q.options)))
+    elif roll < 0.85:
+        quiz.go_next()
+    elif roll < 0.95:
+        quiz.go_back()
+    else:
+        quiz.finish()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryQuizStore()
+    return SQLiteQuizStore(str(tmp_path / "quiz.sqlite3"))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_restore_matches_the_live_session_at_any_point(store, seed):
+    rng = random.Random(seed)
+    quiz = QuizSession(make_questions(40, seed), rng=random.Random(seed))
+    checkpoint = QuizCheckpoint(f"s{seed}")
+    checkpoint.save(store, quiz)
+    for i in range(400):
+        step(quiz, rng)
+        checkpoint.save(store, quiz)
+        if rng.random() < 0.1:
+            record = store.load(checkpoint.key)
+            restored = record.to_session()
+            assert fingerprint(restored) == fingerprint(quiz), f"restore after step {i}"
+            # Carry on from the restored copy, as a new replica would.
+            quiz, checkpoint = restored, QuizCheckpoint.restored(checkpoint.key, restored, record)
+
+
+def test_audio_urls_are_checkpointed(store):
+    quiz = QuizSession(make_questions(5), rng=random.Random(0))
+    checkpoint = QuizCheckpoint("audio")
+    audio = {"questions": {}, "answers": {}}
+    checkpoint.save(store, quiz, audio)
+    audio["questions"][quiz.questions[0].id] = "https://example.invalid/q0.mp3"
+    checkpoint.save(store, quiz, audio)
+    assert store.load("audio").audio_urls == audio
+
+
+def test_missing_and_deleted_sessions_load_as_none(store):
+    assert store.load("missing") is None
+    quiz = QuizSession(make_questions(5), rng=random.Random(0))
+    QuizCheckpoint("gone").save(store, quiz)
+    store.delete("gone")
+    assert store.load("gone") is None
+
+
+def test_another_process_restores_sqlite_checkpoints(tmp_path):
+    path = str(tmp_path / "quiz.sqlite3")
+    store = SQLiteQuizStore(path)
+    quiz = QuizSession(make_questions(40), rng=random.Random(7))
+    checkpoint = QuizCheckpoint("shared")
+    rng = random.Random(7)
+    for _ in range(100):
+        step(quiz, rng)
+        checkpoint.save(store, quiz)
+    code = ("import json, sys; from quiz_store import SQLiteQuizStore; "
+            "q = SQLiteQuizStore(sys.argv[1]).load('shared').to_session(); "
+            "print(json.dumps([q.attempt, q.current, q.correct_count, q.incorrect, list(q.order)]))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, check=True,
+                         env=dict(os.environ, PYTHONPATH=root)).stdout
+    assert json.loads(out) == [quiz.attempt, quiz.current, quiz.correct_count, quiz.incorrect, list(quiz.order)]
+
+
+def test_stale_sessions_are_purged_when_a_quiz_starts(tmp_path):
+    path = str(tmp_path / "quiz.sqlite3")
+    store = SQLiteQuizStore(path)
+    quiz = QuizSession(make_questions(5), rng=random.Random(0))
+    QuizCheckpoint("old").save(store, quiz)
+    SQLiteQuizStore(path, max_age=0).save_quiz("fresh", quiz.questions, {})
+    assert store.load("old") is None
+
+
+def test_create_quiz_store(tmp_path):
+    assert isinstance(create_quiz_store("memory"), MemoryQuizStore)
+    assert isinstance(create_quiz_store("sqlite", str(tmp_path / "q.sqlite3")), SQLiteQuizStore)
+    with pytest.raises(ValueError):
+        create_quiz_store("redis")
@@ -0,0 +1,110 @@
+import copy
+import json
+import random
+
+import pytest
+
+from quiz_core import repair_questions, run_generation, validate_questions_array
+from tests.helpers import ScriptedBackend
+
+
+def good(i=0):
+    return {"question": f"Which option is number {i}?", "options": ["zero", "one", "two", "three"],
+            "correct": 1, "hint": "Count.", "explanation": "It is the second one."}
+
+
+# (item, expected correct index, fields counted as repaired)
+FIXABLE = [
+    (dict(good(), correct="1"), 1, {"correct"}),
+    (dict(good(), correct=" 2 "), 2, {"correct"}),
+    (dict(good(), correct=3.0), 3, {"correct"}),
+    (dict(good(), correct="b"), 1, {"correct"}),
+    (dict(good(), correct="Three"), 3, {"correct"}),
+    ({k: v for k, v in dict(good(), answer="two").items() if k != "correct"}, 2, {"correct"}),
+    ({k: v for k, v in dict(good(), correct_answer=0).items() if k != "correct"}, 0, {"correct"}),
+    ({k: v for k, v in good().items() if k != "explanation"}, 1, {"explanation"}),
+    (dict(good(), explanation=None, hint=None), 1, {"explanation"}),
+    (dict(good(), hint=7), 1, {"hint"}),
+    (dict(good(), question=1789), 1, {"question"}),
+    (dict(good(), options={"A": "zero", "B": "one", "C": "two"}), 1, {"options"}),
+    (dict(good(), options=[0, 1, 2, 3.5]), 1, {"options"}),
+    ({k: v for k, v in good().items() if k != "hint"}, 1, set()),
+]
+UNFIXABLE = [
+    "not an object",
+    dict(good(), correct=4),
+    dict(good(), correct=-1),
+    dict(good(), correct=True),
+    dict(good(), correct="E"),
+    dict(good(), correct="four"),
+    dict(good(), correct=None),
+    {k: v for k, v in good().items() if k != "correct"},
+    dict(good(), question="  "),
+    {k: v for k, v in good().items() if k != "question"},
+    dict(good(), options=["only one"]),
+    dict(good(), options="zero, one"),
+    dict(good(), options=["zero", None, "two"]),
+    dict(good(), options=["zero", "", "two"]),
+    # "2" is both index 2 ("3") and the text of option 1: ambiguous.
+    dict(good(), options=["1", "2", "3"], correct="2"),
+]
+
+
+@pytest.mark.parametrize("item, correct, fields", FIXABLE)
+def test_fixable_items_are_repaired_and_counted(item, correct, fields):
+    before = copy.deepcopy(item)
+    report = repair_questions([item])
+    assert item == before, "the input is not modified"
+    assert not report.quarantined and len(report.questions) == 1
+    fixed = report.questions[0]
+    assert fixed["correct"] == correct and set(report.repairs) == fields
+    assert validate_questions_array([fixed])["valid"]
+    assert "answer" not in fixed and "correct_answer" not in fixed
+
+
+@pytest.mark.parametrize("item", UNFIXABLE)
+def test_unfixable_items_are_set_aside_with_a_reason(item):
+    report = repair_questions([good(0), item, good(2)])
+    assert [q["question"] for q in report.questions] == [good(0)["question"], good(2)["question"]]
+    assert len(report.quarantined) == 1 and report.quarantined[0][0] == 1
+    assert report.quarantined[0][2].startswith("Item 2")
+    assert not report.repairs, "fixes are only counted for kept items"
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_repair_counts_add_up_in_a_mixed_batch(seed):
+    rng = random.Random(seed)
+    items, expected_kept, expected = [], 0, {}
+    for i in range(200):
+        roll = rng.random()
+        if roll < 0.6:
+            items.append(good(i))
+            expected_kept += 1
+        elif roll < 0.85:
+            item, _, fields = rng.choice(FIXABLE)
+            items.append(copy.deepcopy(item))
+            expected_kept += 1
+            for field in fields:
+                expected[field] = expected.get(field, 0) + 1
+        else:
+            items.append(copy.deepcopy(rng.choice(UNFIXABLE)))
+    report = repair_questions(items)
+    assert len(report.questions) == expected_kept and report.repairs == expected
+    assert len(report.questions) + len(report.quarantined) == len(items)
+    assert validate_questions_array(report.questions)["valid"]
+
+
+def test_one_bad_item_does_not_cost_the_whole_generation():
+    stems = ["Which planet is largest?", "What is the boiling point of water?", "Who painted the Mona Lisa?",
+             "Which gas do plants absorb?"]
+    response = json.dumps([dict(good(), question=stems[0]), dict(good(), question=stems[1], correct="C"),
+                           dict(good(), question=stems[2], correct=9), dict(good(), question=stems[3])])
+    result = run_generation(ScriptedBackend(response), "material", 4, "m")
+    assert result.ok and len(result.questions) == 3 and len(result.quarantined) == 1
+    assert [q["question"] for q in result.questions] == [stems[0], stems[1], stems[3]]
+    assert result.repairs == {"correct": 1} and not result.truncated
+
+
+def test_a_response_with_nothing_to_keep_is_invalid():
+    result = run_generation(ScriptedBackend(json.dumps([dict(good(), correct=9)])), "material", 1, "m")
+    assert result.error == "invalid" and "correct" in result.validation_error
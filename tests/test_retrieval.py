@@ -0,0 +1,78 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from retrieval import BM25Index, tokenize
+from tests.helpers import make_corpus, make_vocabulary
+
+
+def reference_scores(index, query):
+    """BM25 computed passage by passage from the passage texts, with no postings."""
+    passages = [entry[0] for entry in index.passages.values()]
+    counts = [Counter(tokenize(p.text)) for p in passages]
+    avg_length = sum(sum(c.values()) for c in counts) / len(counts)
+    scores = {}
+    for passage, c in zip(passages, counts):
+        length = sum(c.values())
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for other in counts if term in other)
+            if not c[term]:
+                continue
+            idf = math.log(1 + (len(counts) - df + 0.5) / (df + 0.5))
+            score += idf * c[term] * (index.k1 + 1) / (c[term] + index.k1 * (1 - index.b + index.b * length / avg_length))
+        if score:
+            scores[(passage.name, passage.seq)] = score
+    return scores
+
+
+@pytest.fixture(params=range(3))
+def corpus(request):
+    seed = request.param
+    vocab = make_vocabulary(300, seed)
+    docs = make_corpus(12, 3000, vocab, seed)
+    index = BM25Index(chunk_chars=400)
+    index.sync(docs)
+    return seed, vocab, docs, index
+
+
+def test_scores_match_a_direct_bm25_computation(corpus):
+    _, vocab, _, index = corpus
+    for query in (vocab[0], vocab[150], f"{vocab[3]} {vocab[40]} {vocab[299]}", "the and"):
+        expected = reference_scores(index, query)
+        got = {(p.name, p.seq): score for score, p in index.search(query, limit=len(index))}
+        assert got.keys() == expected.keys(), query
+        assert all(math.isclose(got[k], expected[k]) for k in got), query
+        ranked = index.search(query, limit=5)
+        assert [s for s, _ in ranked] == sorted((s for s, _ in ranked), reverse=True)
+
+
+def test_incremental_updates_equal_a_fresh_build(corpus):
+    seed, vocab, docs, index = corpus
+    names = sorted(docs)
+    docs = dict(docs)
+    docs[names[0]] = "photosynthesis in chloroplasts " * 50
+    del docs[names[1]]
+    docs["new.pdf"] = " ".join(random.Random(seed).choices(vocab, k=400))
+    assert index.sync(docs) == (2, 1)
+    assert index.sync(docs) == (0, 0), "unchanged text objects are not reindexed"
+    fresh = BM25Index(chunk_chars=400)
+    fresh.sync(docs)
+    assert index.total_length == fresh.total_length and len(index) == len(fresh)
+    assert {t: sorted(p.values()) for t, p in index.postings.items()} == \
+        {t: sorted(p.values()) for t, p in fresh.postings.items()}, "no stale postings"
+    assert index.search(vocab[7], 20) == fresh.search(vocab[7], 20)
+
+
+def test_context_stays_within_budget_in_reading_order(corpus):
+    _, vocab, docs, index = corpus
+    name = sorted(docs)[0]
+    index.sync(dict(docs, **{name: "photosynthesis in chloroplasts " * 50}))
+    text, passages = index.build_context("photosynthesis", max_chars=1500)
+    assert passages and all(p.name == name for p in passages) and len(text) <= 1500
+    text, passages = index.build_context(vocab[2], max_chars=5000, max_tokens=600)
+    assert len(text) <= 5000 and passages
+    assert passages == sorted(passages, key=lambda p: (p.name, p.seq))
+    assert index.build_context("zzzz-not-a-word", 5000) == ("", [])
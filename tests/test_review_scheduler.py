@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from quiz_model import Question
+from review_scheduler import DAY, MIN_EASE, QUALITY_CORRECT, QUALITY_WRONG, ReviewScheduler, new_card, sm2
+from tests.helpers import Clock, make_questions
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "review.sqlite3")
+
+
+@pytest.fixture
+def scheduler(path, clock):
+    scheduler = ReviewScheduler(path, clock=clock)
+    yield scheduler
+    scheduler.close()
+
+
+def due_ids(scheduler, learner, limit):
+    return [Question.from_dict(q).id for q in scheduler.due(learner, limit)]
+
+
+def scan_due(scheduler, learner, now, limit):
+    """The reference: every card read and sorted."""
+    rows = scheduler._conn.execute("SELECT q_id, due FROM review_cards WHERE learner = ?", (learner,)).fetchall()
+    return [q_id for due, q_id in sorted((due, q_id) for q_id, due in rows if due <= now)[:limit]]
+
+
+def test_sm2_intervals_and_ease():
+    # Passes at 1, 6, then 6 * ease days; a failure restarts at 1 day and lowers the ease.
+    card = new_card("q", 0.0)
+    intervals = []
+    for quality in (QUALITY_CORRECT, QUALITY_CORRECT, QUALITY_CORRECT, QUALITY_WRONG, QUALITY_CORRECT):
+        card = sm2(card, quality, 0.0)
+        intervals.append(card.interval)
+    assert intervals == [1.0, 6.0, 6.0 * 2.5, 1.0, 1.0]
+    assert card.ease == pytest.approx(2.5 - 0.54) and card.lapses == 1 and card.repetitions == 1
+
+
+def test_ease_does_not_fall_below_the_minimum():
+    card = new_card("q", 0.0)
+    for _ in range(20):
+        card = sm2(card, QUALITY_WRONG, 0.0)
+    assert card.ease == MIN_EASE and card.due == DAY
+
+
+def test_nothing_is_due_the_same_day(scheduler):
+    questions = make_questions(10)
+    for question in questions:
+        scheduler.record("ann", question, correct=False)
+    assert scheduler.due("ann") == [] and scheduler.due_count("ann") == 0
+    assert scheduler.card("bob", questions[0].id) is None and scheduler.due("bob", now=1e12) == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_the_heap_returns_what_a_full_scan_finds(scheduler, clock, seed):
+    rng = random.Random(seed)
+    questions = make_questions(300)
+    for question in questions:
+        scheduler.record("ann", question, correct=rng.random() < 0.7)
+    recorded = len(questions)
+    for step in range(3000):
+        clock.now += rng.uniform(0, DAY / 4)
+        if rng.random() < 0.3:
+            limit = rng.randint(1, 30)
+            due = due_ids(scheduler, "ann", limit)
+            assert due == scan_due(scheduler, "ann", clock.now, limit), step
+            assert scheduler.due_count("ann") >= len(due)
+        else:
+            question = rng.choice(questions)
+            card = scheduler.record("ann", question, correct=rng.random() < 0.7)
+            recorded += 1
+            assert card.due > clock.now and scheduler.card("ann", question.id) == card
+    history = scheduler.history("ann", limit=10_000)
+    assert len(history) == recorded and history[0][0] == question.id
+
+
+def test_the_schedule_survives_reopening(scheduler, path, clock):
+    rng = random.Random(0)
+    for question in make_questions(300):
+        clock.now += 60
+        scheduler.record("ann", question, correct=rng.random() < 0.7)
+    scheduler.close()
+    reopened = ReviewScheduler(path, clock=clock)
+    clock.now += 365 * DAY
+    due = due_ids(reopened, "ann", 500)
+    assert due == scan_due(reopened, "ann", clock.now, 500) and len(due) == reopened.due_count("ann") == 300
+    reopened.close()
@@ -0,0 +1,45 @@
+import pytest
+
+from source_store import SQLiteSourceStore
+
+
+@pytest.fixture
+def store():
+    store = SQLiteSourceStore(":memory:", chunk_chars=200)
+    store.save("a", {"bio": "Photosynthesis happens in chloroplasts. " * 20, "geo": "Rivers erode valleys."})
+    store.save("b", {"bio": "Photosynthesis, but for another user."})
+    return store
+
+
+def test_search_only_covers_the_users_own_sources(store):
+    hits = store.search("a", "photosynthesis")
+    assert hits and {p.name for p in hits} == {"bio"}
+    assert all(len(p.text) <= 200 for p in hits), "passages respect the chunk size"
+    assert [p.score for p in hits] == sorted((p.score for p in hits), reverse=True), "best match first"
+
+
+def test_search_matches_prefixes_case_insensitively(store):
+    assert store.search("a", "photo")
+    assert store.search("a", "eRoDe")[0].name == "geo"
+
+
+def test_fts_syntax_is_taken_literally(store):
+    assert store.search("a", 'valleys" (*') == store.search("a", "valleys")
+    assert store.search("a", "rivers NOT valleys") == []
+    assert store.search("a", "  ?! ") == []
+
+
+def test_overwrite_reindexes(store):
+    store.save("a", {"bio": "Now about mitochondria."})
+    assert not store.search("a", "photosynthesis") and store.search("a", "mitochondria")
+    assert store.get("a") == {"bio": "Now about mitochondria.", "geo": "Rivers erode valleys."}
+
+
+def test_delete_and_clear_leave_no_orphan_passages(store):
+    store.delete("a", ["bio"])
+    assert not store.search("a", "photosynthesis") and store.names("a") == ["geo"]
+    store.clear("a")
+    assert store.get("a") == {} and not store.search("a", "rivers")
+    assert store.search("b", "photosynthesis"), "clearing one user leaves the others"
+    fts_rows = store._conn.execute("SELECT COUNT(*) FROM source_chunks_fts").fetchone()[0]
+    assert fts_rows == store._conn.execute("SELECT COUNT(*) FROM source_chunks").fetchone()[0] == 1
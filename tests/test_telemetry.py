@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import telemetry
+from telemetry import configure, record, registry, span
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    configure(enabled=False)
+    registry.reset()
+    registry._gauges.pop("test_gauge", None)
+
+
+def test_disabled_spans_observe_nothing():
+    configure(enabled=False)
+    with span("phase"):
+        pass
+    record("phase", 1.0)
+    assert registry.snapshot() == {}
+
+
+def test_spans_are_observed_by_phase_and_tags():
+    configure()
+    with span("generate", model="m"):
+        pass
+    record("generate", 2.0, model="m")
+    record("generate", 1.0, model=None)
+    snapshot = registry.snapshot()
+    assert snapshot[("generate", (("model", "m"),))][0] == 2
+    assert snapshot[("generate", ())] == (1, 1.0)
+
+
+def test_a_failing_span_is_tagged_with_the_error():
+    configure()
+    with pytest.raises(KeyError):
+        with span("lookup"):
+            raise KeyError("x")
+    assert ("lookup", (("error", "KeyError"),)) in registry.snapshot()
+
+
+def test_the_log_directory_is_created(tmp_path):
+    path = tmp_path / "logs" / "metrics.jsonl"
+    configure(log_path=str(path))
+    record("generate", 0.5, model="m")
+    line = json.loads(path.read_text())
+    assert line["phase"] == "generate" and line["seconds"] == 0.5 and line["model"] == "m"
+
+
+def test_an_unwritable_log_drops_records_but_keeps_metrics(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    configure(log_path=str(blocker / "logs" / "metrics.jsonl"))
+    with span("render"):
+        pass
+    assert registry.snapshot()[("render", ())][0] == 1
+
+
+def test_prometheus_rendering():
+    configure()
+    record("generate", 0.02, model='a"b')
+    telemetry.register_gauge("test_gauge", "A gauge.", lambda: 7)
+    text = registry.render_prometheus()
+    assert 'knowledge_quest_phase_seconds_bucket{phase="generate",model="a\\"b",le="0.025"} 1' in text
+    assert 'knowledge_quest_phase_seconds_count{phase="generate",model="a\\"b"} 1' in text
+    assert "test_gauge 7" in text
@@ -0,0 +1,34 @@
+"""
+Splits source text into passages of bounded size for search and retrieval.
+
+Chunks end at the strongest break found in the second half of the size limit
+(a blank line, then a line end, a sentence end, a space), so passages rarely
+cut a sentence and never exceed ``max_chars``. Chunking is linear in the text
+length.
+"""
+
+CHUNK_CHARS = 1000
+_BREAKS = ("\n\n", "\n", ". ", " ")
+
+
+def chunk_spans(text, max_chars=CHUNK_CHARS):
+    """(start, end) offsets of consecutive chunks covering ``text``."""
+    spans = []
+    start, length = 0, len(text)
+    while start < length:
+        end = min(length, start + max_chars)
+        if end < length:
+            for sep in _BREAKS:
+                cut = text.rfind(sep, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        spans.append((start, end))
+        start = end
+    return spans
+
+
+def chunk_text(text, max_chars=CHUNK_CHARS):
+    """Non-blank chunks of ``text``, stripped of surrounding whitespace."""
+    chunks = (text[start:end].strip() for start, end in chunk_spans(text, max_chars))
+    return [chunk for chunk in chunks if chunk]